@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+班级系统缓存查询层
+用 st.cache_data 缓存 database.py 的读查询，写操作完成后按数据分组清除相关缓存，
+页面重跑时不再重复执行相同的 SQLite 查询
+"""
+
+import functools
+import os
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import streamlit as st
+
+import database
+
+# 查询缓存有效期（秒），兜底覆盖后台线程或其他进程直接写库的情况
+QUERY_CACHE_TTL = int(os.getenv('QUERY_CACHE_TTL', '60'))
+NOTIFICATION_CACHE_TTL = int(os.getenv('NOTIFICATION_CACHE_TTL', '15'))
+
+# 数据分组 -> 依赖该分组的缓存查询
+_cache_groups: Dict[str, List[Callable]] = defaultdict(list)
+
+
+def _cached_query(func: Callable, *groups: str, ttl: int = QUERY_CACHE_TTL) -> Callable:
+    """缓存读查询，并登记它依赖的数据分组"""
+    cached = st.cache_data(ttl=ttl, show_spinner=False)(func)
+    for group in groups:
+        _cache_groups[group].append(cached)
+    return cached
+
+
+def invalidate(*groups: str):
+    """清除依赖指定数据分组的查询缓存"""
+    cleared = set()
+    for group in groups:
+        for cached in _cache_groups.get(group, []):
+            if id(cached) not in cleared:
+                cached.clear()
+                cleared.add(id(cached))
+
+
+def invalidate_all():
+    """清除全部查询缓存"""
+    invalidate(*list(_cache_groups))
+
+
+def _invalidating(func: Callable, *groups: str) -> Callable:
+    """写操作完成后清除相关缓存"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            invalidate(*groups)
+    return wrapper
+
+
+# ===================== 缓存的读查询 =====================
+
+get_user_info = _cached_query(database.get_user_info, 'users')
+
+get_user_classes = _cached_query(database.get_user_classes, 'users', 'classes')
+get_teacher_classes = _cached_query(database.get_teacher_classes, 'classes')
+get_student_classes = _cached_query(database.get_student_classes, 'classes')
+get_class_students = _cached_query(database.get_class_students, 'classes')
+
+get_class_assignments = _cached_query(database.get_class_assignments, 'classes', 'assignments')
+get_assignment_by_id = _cached_query(database.get_assignment_by_id, 'classes', 'assignments')
+search_assignments = _cached_query(database.search_assignments, 'classes', 'assignments')
+
+get_assignment_submissions = _cached_query(database.get_assignment_submissions, 'classes', 'assignments', 'submissions')
+get_student_submissions_in_class = _cached_query(
+    database.get_student_submissions_in_class, 'classes', 'assignments', 'submissions'
+)
+get_grading_result = _cached_query(database.get_grading_result, 'submissions')
+get_assignment_status = _cached_query(database.get_assignment_status, 'assignments', 'submissions')
+get_user_submission_status = _cached_query(
+    database.get_user_submission_status, 'classes', 'assignments', 'submissions'
+)
+get_assignment_analytics_data = _cached_query(database.get_assignment_analytics_data, 'assignments', 'submissions')
+get_assignment_center_data = _cached_query(
+    database.get_assignment_center_data, 'users', 'classes', 'assignments', 'submissions'
+)
+get_user_assignment_summary = _cached_query(
+    database.get_user_assignment_summary, 'users', 'classes', 'assignments', 'submissions'
+)
+
+get_user_notifications = _cached_query(database.get_user_notifications, 'notifications', ttl=NOTIFICATION_CACHE_TTL)
+
+# ===================== 写操作（完成后清除缓存） =====================
+
+create_user = _invalidating(database.create_user, 'users')
+update_last_login = _invalidating(database.update_last_login, 'users')
+
+# 班级和作业的写操作会同时发送通知
+create_class = _invalidating(database.create_class, 'classes', 'notifications')
+join_class_by_code = _invalidating(database.join_class_by_code, 'classes', 'notifications')
+delete_class = _invalidating(database.delete_class, 'classes', 'notifications')
+leave_class = _invalidating(database.leave_class, 'classes', 'notifications')
+
+create_assignment = _invalidating(database.create_assignment, 'assignments', 'notifications')
+
+submit_assignment = _invalidating(database.submit_assignment, 'submissions')
+save_grading_result = _invalidating(database.save_grading_result, 'submissions')
+
+add_notification = _invalidating(database.add_notification, 'notifications')
+
+# ===================== 不缓存的函数 =====================
+
+init_database = database.init_database
+verify_user = database.verify_user
+get_db_connection = database.get_db_connection
@@ -5,42 +5,11 @@ AI批改系统API模块
 2. 无批改标准模式（自动生成）
 """
 
-from .calling_api import (
-    # 核心批改函数
-    batch_correction_with_standard,
-    batch_correction_without_standard,
-    
-    # 智能批改函数（自动选择模式）
-    intelligent_correction_with_files,
-    
-    # 简化版批改函数
-    simplified_batch_correction,
-    
-    # Web接口
-    web_correction_with_scheme,
-    web_correction_without_scheme,
-    web_batch_correction,
-    
-    # API配置相关
-    get_api_status,
-    update_api_config,
-    api_config,
-    
-    # 工具函数
-    GradingResult,
-    
-    # 向后兼容（保留旧版函数名）
-    correction_with_marking_scheme,
-    correction_without_marking_scheme,
-    generate_marking_scheme,
-    efficient_correction_single,
-    batch_efficient_correction,
-    correction_single_group,
-    
-    # 核心API调用函数
-    call_tongyiqianwen_api,
-    img_to_base64,
-)
+import importlib
+
+# calling_api 依赖 openai、PIL 等重量级库，导出名称在首次访问时才导入；
+# API配置位于轻量的 config 模块，读取配置不会加载批改引擎
+_CONFIG_EXPORTS = {'api_config', 'APIConfig'}
 
 __all__ = [
     # 新版简化函数
@@ -70,7 +39,35 @@ __all__ = [
     'batch_efficient_correction',
     'correction_single_group',
     
+    # 批改标准预编译
+    'precompile_marking_scheme',
+    'get_compiled_marking_scheme',
+    'invalidate_marking_scheme',
+    
     # 核心API调用函数
     'call_tongyiqianwen_api',
+    'call_tongyiqianwen_api_async',
+    'get_openai_client',
+    'get_async_openai_client',
+    'close_openai_clients',
+    'aclose_async_openai_clients',
+    'run_with_async_openai_clients',
     'img_to_base64',
-] 
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """首次访问导出名称时导入对应子模块"""
+    if name in _CONFIG_EXPORTS:
+        submodule = '.config'
+    elif name in __all__:
+        submodule = '.calling_api'
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(submodule, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
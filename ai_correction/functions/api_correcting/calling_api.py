@@ -12,9 +12,15 @@ from pathlib import Path
 import json
 import os
 import time
+import random
+import asyncio
+import hashlib
 import logging
+import threading
+import weakref
+from collections import OrderedDict
 from typing import Dict, List, Tuple, Any, Optional, Union
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import contextlib
 import io
 from PIL import Image
@@ -55,117 +61,8 @@ import warnings
 warnings.filterwarnings("ignore")
 os.environ['MUPDF_QUIET'] = '1'
 
-try:
-    import fitz  # PyMuPDF
-except ImportError:
-    fitz = None
-
-@dataclass
-class APIConfig:
-    """API配置类 - 增强版"""
-    api_key: str = ""
-    base_url: str = "https://openrouter.ai/api/v1"
-    
-    # 多模型支持 - 按优先级排序
-    available_models: list = None
-    current_model_index: int = 0
-    
-    max_tokens: int = 50000
-    temperature: float = 0.7
-    max_retries: int = 3
-    retry_delay: float = 1.0
-    timeout: int = 120
-    
-    def __post_init__(self):
-        """初始化后处理，从环境变量设置API密钥"""
-        # 初始化可用模型列表
-        if self.available_models is None:
-            self.available_models = [
-                "google/gemini-2.5-flash-lite-preview-06-17",  # 原始模型
-                "google/gemini-2.5-flash",                    # 备用模型1
-                "google/gemini-2.5-pro",                          # 备用模型2
-                "anthropic/claude-3-haiku",                   # 备用模型3
-                "meta-llama/llama-3-8b-instruct:free",       # 免费模型
-                "microsoft/wizardlm-2-8x22b:free",           # 免费模型2
-                "gryphe/mythomist-7b:free"                    # 免费模型3
-            ]
-        
-        env_key = os.getenv('OPENROUTER_API_KEY') or os.getenv('OPENAI_API_KEY')
-        if env_key:
-            self.api_key = env_key
-            return
-        
-        env_file_path = Path('.env')
-        if env_file_path.exists():
-            try:
-                with open(env_file_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#') and '=' in line:
-                            key, value = line.split('=', 1)
-                            if key.strip() == 'OPENROUTER_API_KEY' and value.strip():
-                                self.api_key = value.strip()
-                                return
-            except Exception as e:
-                logger.warning(f"读取.env文件失败: {e}")
-        
-        if not self.api_key:
-            self.api_key = "请在此处输入您的新API密钥"
-    
-    @property
-    def model(self) -> str:
-        """获取当前使用的模型"""
-        if self.current_model_index < len(self.available_models):
-            return self.available_models[self.current_model_index]
-        return self.available_models[0]  # 如果索引超出范围，返回第一个模型
-    
-    def switch_to_next_model(self) -> bool:
-        """切换到下一个可用模型"""
-        if self.current_model_index < len(self.available_models) - 1:
-            self.current_model_index += 1
-            logger.info(f"切换到备用模型: {self.model}")
-            return True
-        return False
-    
-    def reset_model(self):
-        """重置到第一个模型"""
-        self.current_model_index = 0
-        logger.info(f"重置为主要模型: {self.model}")
-    
-    def is_valid(self) -> bool:
-        """检查API配置是否有效"""
-        return bool(self.api_key and self.api_key.startswith(('sk-', 'or-')))
-    
-    def get_status(self) -> dict:
-        """获取配置状态信息"""
-        api_key_source = "default"
-        if os.getenv('OPENROUTER_API_KEY') or os.getenv('OPENAI_API_KEY'):
-            api_key_source = "environment"
-        elif Path('.env').exists():
-            try:
-                with open('.env', 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#') and '=' in line:
-                            key, value = line.split('=', 1)
-                            if key.strip() == 'OPENROUTER_API_KEY' and value.strip() and value.strip() != 'your_api_key_here':
-                                api_key_source = ".env file"
-                                break
-            except:
-                pass
-        
-        return {
-            "api_key_configured": bool(self.api_key and self.api_key != "请在此处输入您的新API密钥"),
-            "api_key_source": api_key_source,
-            "base_url": self.base_url,
-            "current_model": self.model,
-            "available_models": self.available_models,
-            "model_index": self.current_model_index,
-            "is_valid": self.is_valid()
-        }
-
-# 全局配置实例
-api_config = APIConfig()
+# 全局配置实例（定义在 config.py，读取配置无需加载本模块）
+from .config import APIConfig, api_config
 
 def img_to_base64(image_path, max_size_mb=4):
     """将图片文件转换为base64编码，支持自动压缩"""
@@ -800,6 +697,164 @@ def pdf_pages_to_base64_images(pdf_path, zoom=2.0):
     
     return base64_images
 
+# ===================== 批改标准预编译 =====================
+# 同一作业的所有学生共用同一份批改标准：页面渲染、Base64编码、文本提取和
+# 批改标准学习结果只做一次，按文件内容指纹缓存，文件内容变化时自动失效。
+
+MARKING_SCHEME_CACHE_SIZE = int(os.getenv('MARKING_SCHEME_CACHE_SIZE', '16'))
+FILE_DIGEST_CACHE_SIZE = int(os.getenv('FILE_DIGEST_CACHE_SIZE', '256'))
+
+@dataclass
+class CompiledMarkingScheme:
+    """预编译的批改标准"""
+    fingerprint: str
+    files: List[str]
+    file_info: List[str]
+    contents: List[List[Any]]  # 每个文件的API内容：文本，或 (图片格式, base64) 页面
+    rubric_text: str = ""
+    learning: Optional[Dict[str, Any]] = None  # IntelligentBatchProcessor 的批改标准学习结果
+    created_at: float = field(default_factory=time.time)
+    
+    @property
+    def page_count(self) -> int:
+        return sum(1 for parts in self.contents for part in parts if isinstance(part, tuple))
+    
+    def to_api_args(self) -> List[Any]:
+        """转换为 call_tongyiqianwen_api 的输入内容（文件说明 + 预渲染内容）"""
+        api_args = []
+        for info, parts in zip(self.file_info, self.contents):
+            api_args.append(f"\n{info}")
+            api_args.extend(parts)
+        return api_args
+
+_marking_scheme_cache: "OrderedDict[str, CompiledMarkingScheme]" = OrderedDict()
+_marking_scheme_compile_locks: Dict[str, threading.Lock] = {}
+_marking_scheme_lock = threading.Lock()
+_file_digest_cache: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+
+def _file_digest(file_path: str) -> str:
+    """计算文件内容哈希（按大小和修改时间缓存，LRU淘汰）"""
+    stat = os.stat(file_path)
+    with _marking_scheme_lock:
+        cached = _file_digest_cache.get(file_path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            _file_digest_cache.move_to_end(file_path)
+            return cached[2]
+    
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    file_hash = digest.hexdigest()
+    with _marking_scheme_lock:
+        _file_digest_cache[file_path] = (stat.st_size, stat.st_mtime_ns, file_hash)
+        _file_digest_cache.move_to_end(file_path)
+        while len(_file_digest_cache) > FILE_DIGEST_CACHE_SIZE:
+            _file_digest_cache.popitem(last=False)
+    return file_hash
+
+def _marking_scheme_fingerprint(marking_scheme_files: List[str]) -> str:
+    """批改标准指纹：文件名和内容都参与计算（文件名会出现在批改提示中）"""
+    digest = hashlib.sha256()
+    for file_path in marking_scheme_files:
+        digest.update(os.path.basename(file_path).encode('utf-8'))
+        digest.update(_file_digest(file_path).encode('ascii'))
+    return digest.hexdigest()
+
+def _compile_marking_scheme(fingerprint: str, marking_scheme_files: List[str]) -> CompiledMarkingScheme:
+    """渲染并编码批改标准文件"""
+    start_time = time.time()
+    file_info = []
+    contents = []
+    rubric_parts = []
+    
+    for i, file in enumerate(marking_scheme_files):
+        content_type, content = process_file_content(file)
+        if content_type == 'error':
+            raise ValueError(f"处理批改标准文件失败: {content}")
+        elif content_type == 'image':
+            contents.append([('jpeg', img_to_base64(file))])
+        elif content_type == 'pdf':
+            pages = pdf_pages_to_base64_images(file)
+            if not pages:
+                raise ValueError(f"处理批改标准文件失败: PDF页面渲染失败 {os.path.basename(file)}")
+            contents.append([('png', page) for page in pages])
+        else:
+            contents.append([content])
+            rubric_parts.append(content)
+        file_info.append(f"【批改方案文件 {i+1}】: {os.path.basename(file)}")
+    
+    scheme = CompiledMarkingScheme(
+        fingerprint=fingerprint,
+        files=list(marking_scheme_files),
+        file_info=file_info,
+        contents=contents,
+        rubric_text="\n\n".join(rubric_parts)
+    )
+    logger.info(f"批改标准预编译完成: {len(marking_scheme_files)} 个文件, {scheme.page_count} 页, "
+                f"耗时 {time.time() - start_time:.2f} 秒")
+    return scheme
+
+def get_compiled_marking_scheme(marking_scheme_files: List[str]) -> CompiledMarkingScheme:
+    """获取预编译的批改标准，未命中时编译一次（并发调用共享同一次编译）"""
+    fingerprint = _marking_scheme_fingerprint(marking_scheme_files)
+    
+    with _marking_scheme_lock:
+        scheme = _marking_scheme_cache.get(fingerprint)
+        if scheme is not None:
+            _marking_scheme_cache.move_to_end(fingerprint)
+            return scheme
+        compile_lock = _marking_scheme_compile_locks.setdefault(fingerprint, threading.Lock())
+    
+    with compile_lock:
+        with _marking_scheme_lock:
+            scheme = _marking_scheme_cache.get(fingerprint)
+        if scheme is not None:
+            return scheme
+        
+        scheme = _compile_marking_scheme(fingerprint, marking_scheme_files)
+        with _marking_scheme_lock:
+            _marking_scheme_cache[fingerprint] = scheme
+            while len(_marking_scheme_cache) > MARKING_SCHEME_CACHE_SIZE:
+                _marking_scheme_cache.popitem(last=False)
+            _marking_scheme_compile_locks.pop(fingerprint, None)
+        return scheme
+
+def store_marking_scheme_learning(scheme: CompiledMarkingScheme, learning: Dict[str, Any]):
+    """保存批改标准学习结果，供同一作业的后续批改复用"""
+    with _marking_scheme_lock:
+        scheme.learning = learning
+
+def invalidate_marking_scheme(marking_scheme_files: Optional[List[str]] = None):
+    """使预编译的批改标准失效（不传文件时清空全部）"""
+    with _marking_scheme_lock:
+        if marking_scheme_files is None:
+            _marking_scheme_cache.clear()
+            _file_digest_cache.clear()
+            return
+        for file_path in marking_scheme_files:
+            _file_digest_cache.pop(file_path, None)
+        stale = [
+            fingerprint for fingerprint, scheme in _marking_scheme_cache.items()
+            if set(scheme.files) & set(marking_scheme_files)
+        ]
+        for fingerprint in stale:
+            del _marking_scheme_cache[fingerprint]
+
+def precompile_marking_scheme(marking_scheme_files: List[str], learn: bool = True) -> CompiledMarkingScheme:
+    """教师上传批改标准时预编译，可选同时完成批改标准学习"""
+    scheme = get_compiled_marking_scheme(marking_scheme_files)
+    if learn and scheme.learning is None:
+        import asyncio
+        from .intelligent_batch_processor import IntelligentBatchProcessor
+        
+        learning = asyncio.run(run_with_async_openai_clients(
+            IntelligentBatchProcessor().learn_marking_scheme_files(marking_scheme_files, scheme)
+        ))
+        if learning.get('has_marking_scheme'):
+            store_marking_scheme_learning(scheme, learning)
+    return scheme
+
 def create_batch_grading_prompt(batch_number, total_batches, current_range, system_message):
     """创建分批批改的提示词"""
     batch_prompt = f"""
@@ -877,10 +932,158 @@ def split_grading_task(content_text, batch_size=10):
     
     return batches
 
+# ===================== 分批批改 =====================
+# 长试卷按题号范围分批：各批次并发调用，每批只发送与本批题目相关的文本片段和页面，
+# 页面只渲染编码一次，结果按批次顺序合并，失败的批次单独重试。
+
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '3'))
+BATCH_RETRY_ATTEMPTS = int(os.getenv('BATCH_RETRY_ATTEMPTS', '1'))
+
+# 题目定位只使用明确的题号标记，避免把小问编号 (1)、步骤编号 1. 误认为题目起点
+QUESTION_HEADING_PATTERN = re.compile(
+    r'第\s*(\d+)\s*题|题目\s*(\d+)|(?:Question|Problem)\s*(\d+)|\bQ\.?\s*(\d+)',
+    re.IGNORECASE
+)
+
+def locate_questions(text: str) -> List[Tuple[int, int]]:
+    """定位文本中的题目标记，返回按位置排序的 [(字符偏移, 题号)]"""
+    locations = []
+    for match in QUESTION_HEADING_PATTERN.finditer(text or ""):
+        number = next(group for group in match.groups() if group is not None)
+        locations.append((match.start(), int(number)))
+    return locations
+
+def trim_text_to_range(text: str, question_range: Tuple[int, int]) -> Optional[str]:
+    """
+    只保留题号范围内的文本片段
+    
+    题目标记之前的内容（说明、学生信息）始终保留；每个题目标记到下一个标记之间的片段
+    归属该题。文本中没有题目标记时原样返回，有标记但都不在范围内时返回 None。
+    """
+    locations = locate_questions(text)
+    if not locations:
+        return text
+    
+    start_num, end_num = question_range
+    parts = [text[:locations[0][0]]]
+    matched = False
+    for i, (offset, number) in enumerate(locations):
+        if start_num <= number <= end_num:
+            next_offset = locations[i + 1][0] if i + 1 < len(locations) else len(text)
+            parts.append(text[offset:next_offset])
+            matched = True
+    
+    if not matched:
+        return None
+    return "".join(parts)
+
+def _pdf_page_texts(pdf_path: str, page_count: int) -> Optional[List[str]]:
+    """读取PDF前 page_count 页的文本层，用于定位题目所在页"""
+    try:
+        import fitz
+    except ImportError:
+        return None
+    try:
+        with fitz.open(pdf_path) as doc:
+            if doc.page_count < page_count:
+                return None
+            return [doc.load_page(i).get_text() for i in range(page_count)]
+    except Exception as e:
+        logger.debug(f"读取PDF文本层失败 {os.path.basename(pdf_path)}: {e}")
+        return None
+
+def _page_question_sets(page_texts: List[str]) -> List[Optional[set]]:
+    """
+    计算每页涉及的题号：本页出现的题号，加上从上一页延续过来的题目。
+    没有文本层的页面返回 None（无法定位，所有批次都发送）。
+    """
+    question_sets = []
+    current = None
+    for page_text in page_texts:
+        if not page_text or not page_text.strip():
+            question_sets.append(None)
+            current = None
+            continue
+        numbers = [number for _, number in locate_questions(page_text)]
+        page_questions = set(numbers)
+        if current is not None:
+            page_questions.add(current)
+        question_sets.append(page_questions)
+        if numbers:
+            current = numbers[-1]
+    return question_sets
+
+def build_question_location_map(input_contents) -> List[Dict[str, Any]]:
+    """
+    预处理输入内容并建立题目位置表
+    
+    图片和PDF页面只渲染编码一次，各批次共享。每个条目为：
+    - {'kind': 'text', 'content': 文本}
+    - {'kind': 'page', 'content': (图片格式, base64), 'questions': 题号集合或 None}
+    - {'kind': 'raw', 'content': 原始输入}（无法预处理，交给 call_tongyiqianwen_api 处理）
+    """
+    location_map = []
+    for single_content in input_contents:
+        if (isinstance(single_content, tuple) and
+                len(single_content) == 2 and
+                all(isinstance(item, str) for item in single_content)):
+            location_map.append({'kind': 'page', 'content': single_content, 'questions': None})
+        elif isinstance(single_content, str) and os.path.isfile(single_content):
+            content_type, processed_content = process_file_content(single_content)
+            if content_type == 'text':
+                location_map.append({'kind': 'text', 'content': processed_content})
+            elif content_type == 'image':
+                location_map.append({
+                    'kind': 'page',
+                    'content': ('jpeg', img_to_base64(single_content)),
+                    'questions': None
+                })
+            elif content_type == 'pdf':
+                pages = pdf_pages_to_base64_images(single_content)
+                if not pages:
+                    location_map.append({'kind': 'raw', 'content': single_content})
+                    continue
+                page_texts = _pdf_page_texts(single_content, len(pages))
+                question_sets = _page_question_sets(page_texts) if page_texts else [None] * len(pages)
+                for page, questions in zip(pages, question_sets):
+                    location_map.append({'kind': 'page', 'content': ('png', page), 'questions': questions})
+            else:
+                location_map.append({'kind': 'raw', 'content': single_content})
+        elif isinstance(single_content, str):
+            location_map.append({'kind': 'text', 'content': single_content})
+        else:
+            location_map.append({'kind': 'raw', 'content': single_content})
+    return location_map
+
+def select_batch_contents(location_map: List[Dict[str, Any]], question_range: Tuple[int, int]) -> List[Any]:
+    """从题目位置表中选出当前批次需要的内容"""
+    start_num, end_num = question_range
+    selected = []
+    for item in location_map:
+        if item['kind'] == 'text':
+            trimmed = trim_text_to_range(item['content'], question_range)
+            if trimmed and trimmed.strip():
+                selected.append(trimmed)
+        elif item['kind'] == 'page':
+            questions = item['questions']
+            # 无法定位的页面、封面等不含题号的页面始终发送
+            if not questions or any(start_num <= number <= end_num for number in questions):
+                selected.append(item['content'])
+        else:
+            selected.append(item['content'])
+    return selected
+
+def _is_failed_api_result(result: Optional[str]) -> bool:
+    """call_tongyiqianwen_api 以 ❌/🚫 开头的字符串返回错误"""
+    return not result or not result.strip() or result.lstrip().startswith(('❌', '🚫'))
+
 def call_tongyiqianwen_api_batch(input_text: str, *input_contents, system_message: str = "", batch_size: int = 10) -> str:
     """
     分批调用API进行批改，避免循环和内存溢出
     
+    各批次并发调用（最多 BATCH_MAX_CONCURRENCY 个），每批只包含本批题号范围内的
+    文本片段和页面；失败的批次单独重试 BATCH_RETRY_ATTEMPTS 次，结果按批次顺序合并。
+    
     Args:
         input_text: 输入文本
         input_contents: 输入内容（图片等）
@@ -902,48 +1105,72 @@ def call_tongyiqianwen_api_batch(input_text: str, *input_contents, system_messag
         batches = split_grading_task(input_text, batch_size)
         logger.info(f"计划分{len(batches)}批处理，每批{batch_size}题")
         
-        all_results = []
+        # 页面只渲染编码一次，并记录每页涉及的题号
+        location_map = build_question_location_map(input_contents)
         
-        for i, batch_config in enumerate(batches):
+        def run_batch(batch_config):
             batch_number = batch_config['batch_number']
-            total_batches = batch_config['total_batches']
             current_range = batch_config['range']
             
-            logger.info(f"开始处理第{batch_number}批：第{current_range[0]}-{current_range[1]}题")
+            batch_text = trim_text_to_range(input_text, current_range) or input_text
+            batch_contents = select_batch_contents(location_map, current_range)
+            logger.info(f"开始处理第{batch_number}批：第{current_range[0]}-{current_range[1]}题，"
+                        f"文本{len(batch_text)}字符，内容{len(batch_contents)}项")
             
             # 创建当前批次的提示词
             batch_prompt = create_batch_grading_prompt(
-                batch_number, total_batches, current_range, system_message
+                batch_number, batch_config['total_batches'], current_range, system_message
             )
-            
-            # 调用API处理当前批次
-            try:
-                batch_result = call_tongyiqianwen_api(
-                    input_text, 
-                    *input_contents, 
-                    system_message=batch_prompt
-                )
+            batch_result = call_tongyiqianwen_api(batch_text, *batch_contents, system_message=batch_prompt)
+            if _is_failed_api_result(batch_result):
+                raise RuntimeError(batch_result.strip() if batch_result else "API返回空结果")
+            return batch_result
+        
+        results = {}
+        errors = {}
+        pending = list(batches)
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(BATCH_MAX_CONCURRENCY, len(batches)))) as executor:
+            for attempt in range(BATCH_RETRY_ATTEMPTS + 1):
+                if not pending:
+                    break
+                if attempt:
+                    logger.info(f"重试失败的批次: {[b['batch_number'] for b in pending]}")
                 
-                if batch_result:
-                    # 添加批次标识
-                    batch_header = f"\n{'='*50}\n📋 第{batch_number}批批改结果 (第{current_range[0]}-{current_range[1]}题)\n{'='*50}\n"
-                    all_results.append(batch_header + batch_result)
-                    
-                    logger.info(f"第{batch_number}批处理完成")
-                else:
-                    logger.warning(f"第{batch_number}批处理失败，跳过")
-                    
-            except Exception as e:
-                logger.error(f"第{batch_number}批处理出错: {str(e)}")
-                all_results.append(f"\n❌ 第{batch_number}批处理失败: {str(e)}\n")
-                continue
+                futures = [(batch_config, executor.submit(run_batch, batch_config)) for batch_config in pending]
+                pending = []
+                for batch_config, future in futures:
+                    batch_number = batch_config['batch_number']
+                    try:
+                        results[batch_number] = future.result()
+                        errors.pop(batch_number, None)
+                        logger.info(f"第{batch_number}批处理完成")
+                    except Exception as e:
+                        logger.error(f"第{batch_number}批处理出错: {str(e)}")
+                        errors[batch_number] = str(e)
+                        pending.append(batch_config)
+        
+        if not results:
+            logger.error("所有批次都处理失败")
+            return "❌ 分批批改失败，所有批次都出现错误"
         
-        # 合并所有结果
-        if all_results:
-            final_result = "\n".join(all_results)
-            
-            # 添加总结
-            summary = f"""
+        # 按批次顺序合并结果
+        all_results = []
+        for batch_config in batches:
+            batch_number = batch_config['batch_number']
+            current_range = batch_config['range']
+            if batch_number in results:
+                # 添加批次标识
+                batch_header = f"\n{'='*50}\n📋 第{batch_number}批批改结果 (第{current_range[0]}-{current_range[1]}题)\n{'='*50}\n"
+                all_results.append(batch_header + results[batch_number])
+            else:
+                all_results.append(f"\n❌ 第{batch_number}批处理失败: {errors[batch_number]}\n")
+        
+        final_result = "\n".join(all_results)
+        
+        # 添加总结
+        summary = f"""
 \n{'='*50}
 📊 分批批改总结
 {'='*50}
@@ -953,13 +1180,10 @@ def call_tongyiqianwen_api_batch(input_text: str, *input_contents, system_messag
 ✨ 批改完成！
 {'='*50}
 """
-            final_result += summary
-            
-            logger.info("分批批改全部完成")
-            return final_result
-        else:
-            logger.error("所有批次都处理失败")
-            return "❌ 分批批改失败，所有批次都出现错误"
+        final_result += summary
+        
+        logger.info("分批批改全部完成")
+        return final_result
             
     except Exception as e:
         logger.error(f"分批批改系统出错: {str(e)}")
@@ -967,12 +1191,106 @@ def call_tongyiqianwen_api_batch(input_text: str, *input_contents, system_messag
         logger.info("降级到普通批改模式")
         return call_tongyiqianwen_api(input_text, *input_contents, system_message=system_message)
 
-def call_tongyiqianwen_api(input_text: str, *input_contents, system_message: str = "") -> str:
-    """调用API进行多类型文件处理"""
-    from openai import OpenAI
-    
-    if not api_config.is_valid():
-        error_msg = f"""
+# ===================== OpenAI 客户端复用 =====================
+# 进程内按 (base_url, api_key, timeout) 复用客户端，连接池和 keep-alive 连接在请求之间共享，
+# 避免每次批改都重新建立 TCP/TLS 连接。异步客户端的连接池绑定事件循环，按事件循环分别缓存，
+# 同步入口用 run_with_async_openai_clients 包装协程，在事件循环结束前关闭这些客户端。
+
+OPENAI_POOL_MAX_CONNECTIONS = int(os.getenv('OPENAI_POOL_MAX_CONNECTIONS', '20'))
+OPENAI_POOL_MAX_KEEPALIVE = int(os.getenv('OPENAI_POOL_MAX_KEEPALIVE', '10'))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '60'))
+
+_openai_clients: Dict[Tuple[str, str, float], Any] = {}
+_async_openai_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()  # 事件循环 -> {键: 客户端}
+_openai_clients_lock = threading.Lock()
+
+def _openai_client_key(base_url: Optional[str] = None, api_key: Optional[str] = None,
+                       timeout: Optional[float] = None) -> Tuple[str, str, float]:
+    return (
+        base_url or api_config.base_url,
+        api_key or api_config.api_key,
+        float(timeout or api_config.timeout)
+    )
+
+def _openai_pool_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=OPENAI_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+def get_openai_client(base_url: Optional[str] = None, api_key: Optional[str] = None,
+                      timeout: Optional[float] = None):
+    """获取共享的 OpenAI 客户端（线程安全），默认使用当前 api_config"""
+    from openai import OpenAI, DefaultHttpxClient
+    
+    key = _openai_client_key(base_url, api_key, timeout)
+    with _openai_clients_lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            client = OpenAI(
+                base_url=key[0],
+                api_key=key[1],
+                timeout=key[2],
+                http_client=DefaultHttpxClient(limits=_openai_pool_limits())
+            )
+            _openai_clients[key] = client
+            logger.info(f"创建共享OpenAI客户端: {key[0]}")
+        return client
+
+def get_async_openai_client(base_url: Optional[str] = None, api_key: Optional[str] = None,
+                            timeout: Optional[float] = None):
+    """获取当前事件循环共享的 AsyncOpenAI 客户端，必须在协程中调用"""
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    
+    loop = asyncio.get_running_loop()
+    key = _openai_client_key(base_url, api_key, timeout)
+    with _openai_clients_lock:
+        loop_clients = _async_openai_clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                base_url=key[0],
+                api_key=key[1],
+                timeout=key[2],
+                http_client=DefaultAsyncHttpxClient(limits=_openai_pool_limits())
+            )
+            loop_clients[key] = client
+        return client
+
+async def aclose_async_openai_clients():
+    """关闭当前事件循环创建的异步客户端，须在事件循环结束前调用，否则连接池随事件循环泄漏"""
+    loop = asyncio.get_running_loop()
+    with _openai_clients_lock:
+        clients = list(_async_openai_clients.pop(loop, {}).values())
+    for client in clients:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.debug(f"关闭异步OpenAI客户端失败: {e}")
+
+async def run_with_async_openai_clients(awaitable):
+    """执行协程并在结束时关闭本事件循环的异步客户端（asyncio.run / run_until_complete 入口使用）"""
+    try:
+        return await awaitable
+    finally:
+        await aclose_async_openai_clients()
+
+def close_openai_clients():
+    """关闭所有共享的同步客户端，并丢弃异步客户端缓存（配置变更或进程退出时调用）"""
+    with _openai_clients_lock:
+        clients = list(_openai_clients.values())
+        _openai_clients.clear()
+        _async_openai_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.debug(f"关闭OpenAI客户端失败: {e}")
+
+def _invalid_config_message() -> str:
+    error_msg = f"""
 🚫 API配置错误
 
 可能的解决方案：
@@ -982,207 +1300,385 @@ def call_tongyiqianwen_api(input_text: str, *input_contents, system_message: str
 
 当前配置状态：
 {json.dumps(api_config.get_status(), ensure_ascii=False, indent=2)}"""
-        logger.error("API配置无效")
-        return error_msg
-    
-    try:
-        client = OpenAI(
-            api_key=api_config.api_key,
-            base_url=api_config.base_url,
-            timeout=api_config.timeout
-        )
-    except Exception as e:
-        error_msg = f"❌ OpenAI客户端初始化失败: {str(e)}"
-        logger.error(error_msg)
-        return error_msg
-    
+    logger.error("API配置无效")
+    return error_msg
+
+def _build_api_messages(input_text: str, input_contents, system_message: str = "") -> List[Dict[str, Any]]:
+    """将文本、(图片格式, base64) 页面和文件路径转换为 chat.completions 消息"""
     content = [{"type": "text", "text": input_text}]
     
-    try:
-        for single_content in input_contents:
-            if (isinstance(single_content, tuple) and 
-                len(single_content) == 2 and 
-                all(isinstance(item, str) for item in single_content)):
+    for single_content in input_contents:
+        if (isinstance(single_content, tuple) and 
+            len(single_content) == 2 and 
+            all(isinstance(item, str) for item in single_content)):
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:image/{single_content[0]};base64,{single_content[1]}"
+                }
+            })   
+        elif os.path.isfile(single_content):
+            logger.info(f"处理文件 [识别类型]: {os.path.basename(single_content)}")
+            content_type, processed_content = process_file_content(single_content)            
+            if content_type == 'text':
+                logger.info(f"文本文件处理完成: {os.path.basename(single_content)}, 长度: {len(processed_content)} 字符")
+                content.append({
+                    "type": "text",
+                    "text": processed_content
+                })
+            elif content_type == 'image':
+                logger.info(f"图片文件处理开始: {os.path.basename(single_content)}")
+                base_64_image = img_to_base64(single_content)
+                logger.info(f"图片文件处理完成: {os.path.basename(single_content)}, Base64长度: {len(base_64_image)}")
                 content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/{single_content[0]};base64,{single_content[1]}"
+                        "url": f"data:image/jpeg;base64,{base_64_image}"
                     }
-                })   
-            elif os.path.isfile(single_content):
-                logger.info(f"处理文件 [识别类型]: {os.path.basename(single_content)}")
-                content_type, processed_content = process_file_content(single_content)            
-                if content_type == 'text':
-                    logger.info(f"文本文件处理完成: {os.path.basename(single_content)}, 长度: {len(processed_content)} 字符")
-                    content.append({
-                        "type": "text",
-                        "text": processed_content
-                    })
-                elif content_type == 'image':
-                    logger.info(f"图片文件处理开始: {os.path.basename(single_content)}")
-                    base_64_image = img_to_base64(single_content)
-                    logger.info(f"图片文件处理完成: {os.path.basename(single_content)}, Base64长度: {len(base_64_image)}")
+                })    
+            elif content_type == 'pdf':
+                logger.info(f"PDF文件处理开始: {os.path.basename(single_content)}")
+                base_64_images = pdf_pages_to_base64_images(single_content)
+                logger.info(f"PDF文件处理完成: {os.path.basename(single_content)}, 共{len(base_64_images)}页")
+                for i, base_64_image in enumerate(base_64_images):
                     content.append({
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{base_64_image}"
+                            "url": f"data:image/png;base64,{base_64_image}"
                         }
-                    })    
-                elif content_type == 'pdf':
-                    logger.info(f"PDF文件处理开始: {os.path.basename(single_content)}")
-                    base_64_images = pdf_pages_to_base64_images(single_content)
-                    logger.info(f"PDF文件处理完成: {os.path.basename(single_content)}, 共{len(base_64_images)}页")
-                    for i, base_64_image in enumerate(base_64_images):
-                        content.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base_64_image}"
-                            }
-                        })
-                        logger.debug(f"PDF第{i+1}页已添加到内容中")
-                else:
-                    raise ValueError(f"The file {single_content} could not be processed.")
+                    })
+                    logger.debug(f"PDF第{i+1}页已添加到内容中")
             else:
-                content.append({
-                    "type": "text",
-                    "text": single_content
-                })
+                raise ValueError(f"The file {single_content} could not be processed.")
+        else:
+            content.append({
+                "type": "text",
+                "text": single_content
+            })
+    
+    final_message = []
+    if system_message:
+        final_message.append({"role": "system", "content": system_message})
+    final_message.append({"role": "user", "content": content})
+    return final_message
+
+# ===================== API调用遥测 =====================
+# 每次调用记录一条结构化遥测（模型、token数、字节数、编码/网络/解析耗时、重试次数），
+# 写入 MetricsCollector；完整请求和响应只在采样调试模式下记录（API_PAYLOAD_SAMPLE_RATE > 0）。
+
+API_PAYLOAD_SAMPLE_RATE = float(os.getenv('API_PAYLOAD_SAMPLE_RATE', '0'))
+payload_logger = logging.getLogger(f"{__name__}.payloads")
+if API_PAYLOAD_SAMPLE_RATE > 0:
+    payload_logger.setLevel(logging.DEBUG)
+
+try:
+    from src.infrastructure.logging import get_metrics_collector
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+
+@dataclass
+class APICallTelemetry:
+    """单次API调用的遥测记录"""
+    model: str
+    attempts: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    image_count: int = 0
+    encode_seconds: float = 0.0
+    network_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    success: bool = False
+    error: str = ""
+    
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "image_count": self.image_count,
+            "encode_seconds": round(self.encode_seconds, 4),
+            "network_seconds": round(self.network_seconds, 4),
+            "parse_seconds": round(self.parse_seconds, 4),
+            "success": self.success,
+            "error": self.error
+        }
+
+def _message_stats(final_message: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """统计请求字节数和图片数量（逐段累加，不对整个消息做字符串化）"""
+    total_bytes = 0
+    image_count = 0
+    for message in final_message:
+        content = message.get('content', '')
+        parts = [content] if isinstance(content, str) else content
+        for part in parts:
+            if isinstance(part, str):
+                total_bytes += len(part.encode('utf-8'))
+            elif part.get('type') == 'image_url':
+                total_bytes += len(part['image_url']['url'])
+                image_count += 1
+            else:
+                total_bytes += len(part.get('text', '').encode('utf-8'))
+    return total_bytes, image_count
+
+def _start_api_telemetry(final_message: List[Dict[str, Any]], encode_seconds: float) -> Tuple[APICallTelemetry, bool]:
+    """创建遥测记录，并决定本次调用是否采样记录完整内容"""
+    telemetry = APICallTelemetry(model=api_config.model, encode_seconds=encode_seconds)
+    telemetry.request_bytes, telemetry.image_count = _message_stats(final_message)
+    
+    sampled = API_PAYLOAD_SAMPLE_RATE > 0 and random.random() < API_PAYLOAD_SAMPLE_RATE
+    if sampled:
+        payload_logger.debug(f"API请求内容: {json.dumps(final_message, ensure_ascii=False)}")
+    return telemetry, sampled
+
+def _record_api_response(telemetry: APICallTelemetry, raw_response, sampled: bool) -> Optional[str]:
+    """解析原始响应并记录token数、响应字节数和解析耗时"""
+    parse_start = time.perf_counter()
+    response = raw_response.parse()
+    result = response.choices[0].message.content
+    
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        telemetry.prompt_tokens += usage.prompt_tokens or 0
+        telemetry.completion_tokens += usage.completion_tokens or 0
+    telemetry.response_bytes += len(raw_response.content)
+    telemetry.parse_seconds += time.perf_counter() - parse_start
+    
+    if sampled:
+        payload_logger.debug(f"API返回内容: {result}")
+    return result
+
+def _emit_api_telemetry(telemetry: APICallTelemetry):
+    """输出遥测：一行摘要日志 + MetricsCollector 指标"""
+    logger.info(
+        f"API调用{'成功' if telemetry.success else '失败'}: model={telemetry.model} "
+        f"tokens={telemetry.prompt_tokens}/{telemetry.completion_tokens} "
+        f"bytes={telemetry.request_bytes}/{telemetry.response_bytes} images={telemetry.image_count} "
+        f"encode={telemetry.encode_seconds:.2f}s network={telemetry.network_seconds:.2f}s "
+        f"parse={telemetry.parse_seconds:.3f}s retries={telemetry.retries}"
+    )
+    if not METRICS_AVAILABLE:
+        return
+    
+    try:
+        metrics = get_metrics_collector()
+        tags = {"model": telemetry.model}
+        metrics.increment_counter("api_calls", tags=tags)
+        if not telemetry.success:
+            metrics.increment_counter("api_errors", tags=tags)
+        metrics.increment_counter("api_prompt_tokens", telemetry.prompt_tokens, tags=tags)
+        metrics.increment_counter("api_completion_tokens", telemetry.completion_tokens, tags=tags)
+        metrics.record_timer("api_encode_time", telemetry.encode_seconds, tags=tags)
+        metrics.record_timer("api_network_time", telemetry.network_seconds, tags=tags)
+        metrics.record_timer("api_parse_time", telemetry.parse_seconds, tags=tags)
+        metrics.record_histogram("api_request_bytes", telemetry.request_bytes, tags=tags)
+        metrics.record_histogram("api_response_bytes", telemetry.response_bytes, tags=tags)
+        metrics.record_histogram("api_retries", telemetry.retries, tags=tags)
+        metrics.record_event("api_call", telemetry.to_dict())
     except Exception as e:
-        error_msg = f"❌ 文件处理失败: {str(e)}"
-        logger.error(error_msg)
-        return error_msg
+        logger.debug(f"记录API遥测失败: {e}")
 
-    for attempt in range(api_config.max_retries):
-        try:
-            final_message = []
-            if system_message:
-                final_message.append({"role": "system", "content": system_message})
-            final_message.append({"role": "user", "content": content})
-            
-            # 记录API调用详细信息
-            start_time = time.time()
-            logger.info(f"API调用尝试 {attempt + 1}/{api_config.max_retries}")
-            logger.info(f"发送的消息数量: {len(final_message)}")
-            logger.info(f"使用的模型: {api_config.model}")
-            
-            # 记录输入内容统计
-            total_text_length = sum(len(str(msg.get('content', ''))) for msg in final_message)
-            logger.info(f"输入内容总长度: {total_text_length} 字符")
-            
-            response = client.chat.completions.create(
-                model=api_config.model,
-                messages=final_message,
-                max_tokens=api_config.max_tokens,
-                temperature=api_config.temperature
-            )
+def _empty_result_action(attempt: int) -> Tuple[Optional[float], str]:
+    """API返回空结果时的处理：返回 (重试等待秒数, 最终消息)，等待秒数为 None 表示不再重试"""
+    logger.warning("API返回空结果")
+    if attempt < api_config.max_retries - 1:
+        return api_config.retry_delay, ""
+    logger.error("所有重试都失败，返回fallback消息")
+    return None, "❌ API返回了空结果。可能的原因：文件内容无法识别或API服务暂时不可用。"
 
-            result = response.choices[0].message.content
-            processing_time = time.time() - start_time
-            
-            # 记录API调用结果详细信息
-            logger.info("=" * 80)
-            logger.info("🔍 API调用完整返回结果:")
-            logger.info(f"返回内容长度: {len(result) if result else 0}")
-            logger.info(f"处理时间: {processing_time:.2f} 秒")
-            logger.info(f"返回内容预览: {result[:200] if result else 'None'}...")
-            logger.info(f"返回内容完整: {result if result else 'None'}")
-            logger.info("=" * 80)
-        
-            if not result or not result.strip():
-                logger.warning("API返回空结果")
-                if attempt < api_config.max_retries - 1:
-                    time.sleep(api_config.retry_delay)
-                    continue
-                else:
-                    fallback_msg = "❌ API返回了空结果。可能的原因：文件内容无法识别或API服务暂时不可用。"
-                    logger.error("所有重试都失败，返回fallback消息")
-                    return fallback_msg
-            
-            logger.info("✅ API调用成功完成")
-            return result
-        
-        except Exception as e:
-            error_str = str(e)
-            logger.error(f"API调用失败 (尝试 {attempt + 1}): {error_str}")
-            
-            if "timeout" in error_str.lower() or "timed out" in error_str.lower():
-                timeout_error_msg = f"""❌ 请求超时错误
+def _api_error_action(error_str: str, attempt: int, model_index: int) -> Tuple[Optional[float], str, int]:
+    """
+    根据错误类型决定重试策略：返回 (重试等待秒数, 最终错误消息, 下次使用的模型序号)，
+    等待秒数为 None 表示不再重试
+    """
+    logger.error(f"API调用失败 (尝试 {attempt + 1}): {error_str}")
+    can_retry = attempt < api_config.max_retries - 1
+    
+    if "timeout" in error_str.lower() or "timed out" in error_str.lower():
+        timeout_error_msg = f"""❌ 请求超时错误
 问题分析：网络连接超时、API服务器响应缓慢、处理的文件过大或过多
 解决方案：检查网络连接、减少单次处理的文件数量、稍后重试
 错误详情：{error_str}"""
-                if attempt < api_config.max_retries - 1:
-                    wait_time = api_config.retry_delay * (2 ** attempt)
-                    logger.info(f"遇到超时错误，等待 {wait_time} 秒后重试")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    return timeout_error_msg
-            
-            if "401" in error_str or "Unauthorized" in error_str:
-                auth_error_msg = f"""❌ 认证失败 (401 Unauthorized)
+        if can_retry:
+            wait_time = api_config.retry_delay * (2 ** attempt)
+            logger.info(f"遇到超时错误，等待 {wait_time} 秒后重试")
+            return wait_time, "", model_index
+        return None, timeout_error_msg, model_index
+    
+    if "401" in error_str or "Unauthorized" in error_str:
+        auth_error_msg = f"""❌ 认证失败 (401 Unauthorized)
 问题分析：API密钥无效或已过期、密钥格式错误、账户余额不足
 解决方案：检查API密钥、更新API密钥、检查账户状态
 当前使用的密钥来源：{api_config.get_status()['api_key_source']}
 原始错误：{error_str}"""
-                logger.error("认证失败")
-                return auth_error_msg
-            
-            elif "429" in error_str or "rate_limit" in error_str.lower():
-                # 尝试切换到备用模型
-                if api_config.switch_to_next_model():
-                    logger.info(f"遇到频率限制，切换到备用模型: {api_config.model}")
-                    # 重新创建客户端
-                    try:
-                        client = OpenAI(
-                            api_key=api_config.api_key,
-                            base_url=api_config.base_url,
-                            timeout=api_config.timeout
-                        )
-                        # 重置重试计数器，给新模型机会
-                        attempt = 0
-                        continue
-                    except Exception as model_switch_error:
-                        logger.error(f"切换模型失败: {model_switch_error}")
-                
-                # 如果没有更多模型可切换，则等待重试
-                rate_limit_msg = f"❌ API调用频率限制，当前模型：{api_config.model}。错误：{error_str}"
-                if attempt < api_config.max_retries - 1:
-                    wait_time = api_config.retry_delay * (2 ** attempt)
-                    logger.info(f"遇到频率限制，等待 {wait_time} 秒后重试")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    # 重置模型索引，为下次调用准备
-                    api_config.reset_model()
-                    return rate_limit_msg
-            
-            elif "500" in error_str or "502" in error_str or "503" in error_str or "504" in error_str:
-                if "504" in error_str:
-                    server_error_msg = f"""❌ 网关超时错误 (504 Gateway Timeout)
+        logger.error("认证失败")
+        return None, auth_error_msg, model_index
+    
+    elif "429" in error_str or "rate_limit" in error_str.lower():
+        # 尝试切换到备用模型（客户端与模型无关，无需重新创建）
+        next_index = api_config.next_model_index(model_index)
+        if next_index is not None:
+            logger.info(f"遇到频率限制，切换到备用模型: {api_config.model_at(next_index)}")
+            return 0, "", next_index
+        
+        # 如果没有更多模型可切换，则等待重试
+        rate_limit_msg = f"❌ API调用频率限制，当前模型：{api_config.model_at(model_index)}。错误：{error_str}"
+        if can_retry:
+            wait_time = api_config.retry_delay * (2 ** attempt)
+            logger.info(f"遇到频率限制，等待 {wait_time} 秒后重试")
+            return wait_time, "", model_index
+        # 重置模型索引，为下次调用准备（其他调用已切换或重置过时不再重置）
+        api_config.reset_model(expected_index=model_index)
+        return None, rate_limit_msg, model_index
+    
+    elif "500" in error_str or "502" in error_str or "503" in error_str or "504" in error_str:
+        if "504" in error_str:
+            server_error_msg = f"""❌ 网关超时错误 (504 Gateway Timeout)
 问题分析：API服务器响应超时、网络连接不稳定、服务器负载过高
 解决方案：检查网络连接稳定性、稍后重试、考虑减少单次处理的文件数量
 错误详情：{error_str}"""
+        else:
+            server_error_msg = f"❌ 服务器错误，请稍后重试。错误：{error_str}"
+        
+        if can_retry:
+            wait_time = api_config.retry_delay * (2 ** attempt)
+            logger.info(f"遇到服务器错误，等待 {wait_time} 秒后重试")
+            return wait_time, "", model_index
+        return None, server_error_msg, model_index
+    
+    if can_retry:
+        return api_config.retry_delay * (attempt + 1), "", model_index
+    error_msg = f"""❌ API调用失败 (所有重试已耗尽)
+错误详情：{error_str}
+可能的解决方案：检查网络连接、验证API密钥有效性、确认账户余额充足、稍后重试
+配置信息：{json.dumps(api_config.get_status(), ensure_ascii=False, indent=2)}"""
+    logger.error(error_msg)
+    return None, error_msg, model_index
+
+def call_tongyiqianwen_api(input_text: str, *input_contents, system_message: str = "") -> str:
+    """调用API进行多类型文件处理"""
+    if not api_config.is_valid():
+        return _invalid_config_message()
+    
+    try:
+        client = get_openai_client()
+    except Exception as e:
+        error_msg = f"❌ OpenAI客户端初始化失败: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+    
+    try:
+        encode_start = time.perf_counter()
+        final_message = _build_api_messages(input_text, input_contents, system_message)
+    except Exception as e:
+        error_msg = f"❌ 文件处理失败: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+    telemetry, sampled = _start_api_telemetry(final_message, time.perf_counter() - encode_start)
+
+    try:
+        model_index = api_config.current_model_index
+        for attempt in range(api_config.max_retries):
+            telemetry.attempts = attempt + 1
+            telemetry.model = api_config.model_at(model_index)
+            try:
+                network_start = time.perf_counter()
+                try:
+                    raw_response = client.chat.completions.with_raw_response.create(
+                        model=telemetry.model,
+                        messages=final_message,
+                        max_tokens=api_config.max_tokens,
+                        temperature=api_config.temperature
+                    )
+                finally:
+                    telemetry.network_seconds += time.perf_counter() - network_start
+                result = _record_api_response(telemetry, raw_response, sampled)
+            
+                if not result or not result.strip():
+                    wait_time, fallback_msg = _empty_result_action(attempt)
                 else:
-                    server_error_msg = f"❌ 服务器错误，请稍后重试。错误：{error_str}"
+                    telemetry.success = True
+                    return result
+            
+            except Exception as e:
+                telemetry.error = str(e)[:200]
+                wait_time, fallback_msg, model_index = _api_error_action(str(e), attempt, model_index)
+            
+            if wait_time is None:
+                return fallback_msg
+            time.sleep(wait_time)
+    finally:
+        _emit_api_telemetry(telemetry)
+
+async def call_tongyiqianwen_api_async(input_text: str, *input_contents, system_message: str = "") -> str:
+    """
+    call_tongyiqianwen_api 的异步版本
+    
+    使用当前事件循环共享的 AsyncOpenAI 客户端，文件渲染在线程中执行，
+    重试等待使用 asyncio.sleep，不阻塞事件循环。
+    """
+    if not api_config.is_valid():
+        return _invalid_config_message()
+    
+    try:
+        client = get_async_openai_client()
+    except Exception as e:
+        error_msg = f"❌ OpenAI客户端初始化失败: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+    
+    try:
+        encode_start = time.perf_counter()
+        final_message = await asyncio.to_thread(_build_api_messages, input_text, input_contents, system_message)
+    except Exception as e:
+        error_msg = f"❌ 文件处理失败: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+    telemetry, sampled = _start_api_telemetry(final_message, time.perf_counter() - encode_start)
+    
+    try:
+        model_index = api_config.current_model_index
+        for attempt in range(api_config.max_retries):
+            telemetry.attempts = attempt + 1
+            telemetry.model = api_config.model_at(model_index)
+            try:
+                network_start = time.perf_counter()
+                try:
+                    raw_response = await client.chat.completions.with_raw_response.create(
+                        model=telemetry.model,
+                        messages=final_message,
+                        max_tokens=api_config.max_tokens,
+                        temperature=api_config.temperature
+                    )
+                finally:
+                    telemetry.network_seconds += time.perf_counter() - network_start
+                result = _record_api_response(telemetry, raw_response, sampled)
                 
-                if attempt < api_config.max_retries - 1:
-                    wait_time = api_config.retry_delay * (2 ** attempt)
-                    logger.info(f"遇到服务器错误，等待 {wait_time} 秒后重试")
-                    time.sleep(wait_time)
-                    continue
+                if not result or not result.strip():
+                    wait_time, fallback_msg = _empty_result_action(attempt)
                 else:
-                    return server_error_msg
+                    telemetry.success = True
+                    return result
             
-            if attempt < api_config.max_retries - 1:
-                time.sleep(api_config.retry_delay * (attempt + 1))
-                continue
-            else:
-                error_msg = f"""❌ API调用失败 (所有重试已耗尽)
-错误详情：{error_str}
-可能的解决方案：检查网络连接、验证API密钥有效性、确认账户余额充足、稍后重试
-配置信息：{json.dumps(api_config.get_status(), ensure_ascii=False, indent=2)}"""
-                logger.error(error_msg)
-                return error_msg
+            except Exception as e:
+                telemetry.error = str(e)[:200]
+                wait_time, fallback_msg, model_index = _api_error_action(str(e), attempt, model_index)
+            
+            if wait_time is None:
+                return fallback_msg
+            await asyncio.sleep(wait_time)
+    finally:
+        _emit_api_telemetry(telemetry)
 
 # 标准API调用函数
 default_api = call_tongyiqianwen_api
@@ -1234,18 +1730,8 @@ def batch_correction_with_standard(marking_scheme_files: List[str], student_answ
                                   strictness_level: str = "中等", api=default_api, use_batch_processing: bool = True, batch_size: int = 10) -> dict:
     """批量批改 - 有批改标准模式"""
     try:
-        marking_contents = []
-        marking_file_info = []
-        for i, file in enumerate(marking_scheme_files):
-            content_type, content = process_file_content(file)
-            if content_type == 'error':
-                raise ValueError(f"处理批改标准文件失败: {content}")
-            elif content_type == 'image' or content_type == 'pdf':
-                marking_contents.append(file)
-                marking_file_info.append(f"【批改方案文件 {i+1}】: {os.path.basename(file)}")
-            else:
-                marking_contents.append(content)
-                marking_file_info.append(f"【批改方案文件 {i+1}】: {os.path.basename(file)}")
+        # 批改标准按内容预编译，同一作业的所有学生复用
+        marking_scheme = get_compiled_marking_scheme(marking_scheme_files) if marking_scheme_files else None
         
         student_contents = []
         student_file_info = []
@@ -1263,13 +1749,11 @@ def batch_correction_with_standard(marking_scheme_files: List[str], student_answ
         prompt = prompts_module.get_complete_grading_prompt(file_info_list=[])
         
         api_args = []
-        if marking_contents:
+        if marking_scheme:
             api_args.append("=" * 50)
             api_args.append("批改方案文件（包含正确答案和评分标准）：")
             api_args.append("=" * 50)
-            for i, (info, content) in enumerate(zip(marking_file_info, marking_contents)):
-                api_args.append(f"\n{info}")
-                api_args.append(content)
+            api_args.extend(marking_scheme.to_api_args())
             api_args.append("\n" + "=" * 50)
         
         if student_contents:
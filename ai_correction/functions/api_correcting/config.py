@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API配置
+独立于 calling_api，读取配置不需要加载 openai、PyMuPDF 等批改依赖
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class APIConfig:
+    """API配置类 - 增强版"""
+    api_key: str = ""
+    base_url: str = "https://openrouter.ai/api/v1"
+    
+    # 多模型支持 - 按优先级排序
+    available_models: list = None
+    current_model_index: int = 0
+    
+    max_tokens: int = 50000
+    temperature: float = 0.7
+    max_retries: int = 3
+    retry_delay: float = 1.0
+    timeout: int = 120
+    
+    _model_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """初始化后处理，从环境变量设置API密钥"""
+        # 初始化可用模型列表
+        if self.available_models is None:
+            self.available_models = [
+                "google/gemini-2.5-flash-lite-preview-06-17",  # 原始模型
+                "google/gemini-2.5-flash",                    # 备用模型1
+                "google/gemini-2.5-pro",                          # 备用模型2
+                "anthropic/claude-3-haiku",                   # 备用模型3
+                "meta-llama/llama-3-8b-instruct:free",       # 免费模型
+                "microsoft/wizardlm-2-8x22b:free",           # 免费模型2
+                "gryphe/mythomist-7b:free"                    # 免费模型3
+            ]
+        
+        env_key = os.getenv('OPENROUTER_API_KEY') or os.getenv('OPENAI_API_KEY')
+        if env_key:
+            self.api_key = env_key
+            return
+        
+        env_file_path = Path('.env')
+        if env_file_path.exists():
+            try:
+                with open(env_file_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith('#') and '=' in line:
+                            key, value = line.split('=', 1)
+                            if key.strip() == 'OPENROUTER_API_KEY' and value.strip():
+                                self.api_key = value.strip()
+                                return
+            except Exception as e:
+                logger.warning(f"读取.env文件失败: {e}")
+        
+        if not self.api_key:
+            self.api_key = "请在此处输入您的新API密钥"
+    
+    @property
+    def model(self) -> str:
+        """获取当前使用的模型"""
+        return self.model_at(self.current_model_index)
+    
+    def model_at(self, index: int) -> str:
+        """获取指定序号的模型"""
+        if index < len(self.available_models):
+            return self.available_models[index]
+        return self.available_models[0]  # 如果索引超出范围，返回第一个模型
+    
+    def switch_to_next_model(self) -> bool:
+        """切换到下一个可用模型"""
+        with self._model_lock:
+            if self.current_model_index < len(self.available_models) - 1:
+                self.current_model_index += 1
+                logger.info(f"切换到备用模型: {self.model}")
+                return True
+            return False
+    
+    def next_model_index(self, failed_index: int) -> Optional[int]:
+        """
+        在 failed_index 模型上遇到频率限制后应改用的模型序号，没有备用模型时返回 None
+        
+        每次调用各自持有模型序号：并发调用同时被限流时都只前进一个模型，
+        全局序号也只前进一次（供之后的调用直接使用备用模型）。
+        """
+        next_index = failed_index + 1
+        if next_index >= len(self.available_models):
+            return None
+        with self._model_lock:
+            if self.current_model_index < next_index:
+                self.current_model_index = next_index
+                logger.info(f"切换到备用模型: {self.model}")
+        return next_index
+    
+    def reset_model(self, expected_index: Optional[int] = None):
+        """重置到第一个模型；指定 expected_index 时，仅当全局序号仍是该值才重置"""
+        with self._model_lock:
+            if expected_index is not None and self.current_model_index != expected_index:
+                return
+            self.current_model_index = 0
+            logger.info(f"重置为主要模型: {self.model}")
+    
+    def is_valid(self) -> bool:
+        """检查API配置是否有效"""
+        return bool(self.api_key and self.api_key.startswith(('sk-', 'or-')))
+    
+    def get_status(self) -> dict:
+        """获取配置状态信息"""
+        api_key_source = "default"
+        if os.getenv('OPENROUTER_API_KEY') or os.getenv('OPENAI_API_KEY'):
+            api_key_source = "environment"
+        elif Path('.env').exists():
+            try:
+                with open('.env', 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith('#') and '=' in line:
+                            key, value = line.split('=', 1)
+                            if key.strip() == 'OPENROUTER_API_KEY' and value.strip() and value.strip() != 'your_api_key_here':
+                                api_key_source = ".env file"
+                                break
+            except:
+                pass
+        
+        return {
+            "api_key_configured": bool(self.api_key and self.api_key != "请在此处输入您的新API密钥"),
+            "api_key_source": api_key_source,
+            "base_url": self.base_url,
+            "current_model": self.model,
+            "available_models": self.available_models,
+            "model_index": self.current_model_index,
+            "is_valid": self.is_valid()
+        }
+
+# 全局配置实例
+api_config = APIConfig()
@@ -17,7 +17,8 @@ from pathlib import Path
 import time
 
 from .calling_api import (
-    call_tongyiqianwen_api,
+    call_tongyiqianwen_api_async,
+    run_with_async_openai_clients,
     process_file_content,
     convert_latex_to_unicode,
     detect_loop_and_cleanup,
@@ -25,7 +26,9 @@ from .calling_api import (
     clean_grading_output,
     convert_to_html_markdown,
     pdf_pages_to_base64_images,
-    img_to_base64
+    img_to_base64,
+    get_compiled_marking_scheme,
+    store_marking_scheme_learning
 )
 
 # 导入简化版提示词
@@ -116,6 +119,24 @@ class IntelligentBatchProcessor:
                 "learned_standards": {}
             }
         
+        # 同一作业的批改标准只学习一次，后续批改直接复用
+        try:
+            compiled_scheme = get_compiled_marking_scheme(marking_files)
+        except Exception as e:
+            logger.warning(f"⚠️ 批改标准预编译失败，将直接处理原始文件: {e}")
+            compiled_scheme = None
+        
+        if compiled_scheme is not None and compiled_scheme.learning:
+            logger.info("♻️ 复用已学习的批改标准")
+            return compiled_scheme.learning
+        
+        learning = await self.learn_marking_scheme_files(marking_files, compiled_scheme)
+        if compiled_scheme is not None and learning.get("has_marking_scheme"):
+            store_marking_scheme_learning(compiled_scheme, learning)
+        return learning
+    
+    async def learn_marking_scheme_files(self, marking_files: List[str], compiled_scheme=None) -> Dict[str, Any]:
+        """学习指定的批改标准文件（优先使用预编译的页面和文本）"""
         # 深度学习批改标准
         learning_prompt = f"""🛑 重要提醒：你可以直接查看PDF图像内容！
 
@@ -127,24 +148,36 @@ class IntelligentBatchProcessor:
         
         try:
             # 使用多媒体API学习批改标准
-            if marking_files and marking_files[0].endswith('.pdf'):
+            if compiled_scheme is not None and compiled_scheme.page_count:
+                logger.info("📄 使用多媒体API学习批改标准（预编译页面）...")
+                api_args = [learning_prompt]
+                api_args.extend(compiled_scheme.to_api_args())
+                
+                learning_result = await call_tongyiqianwen_api_async(
+                    *api_args,
+                    system_message="你是批改标准学习专家，需要深入理解评分标准的每个细节。"
+                )
+            elif marking_files and marking_files[0].endswith('.pdf'):
                 logger.info("📄 使用多媒体API学习批改标准...")
                 api_args = [learning_prompt]
                 api_args.extend(marking_files)
                 
-                learning_result = call_tongyiqianwen_api(
+                learning_result = await call_tongyiqianwen_api_async(
                     *api_args,
                     system_message="你是批改标准学习专家，需要深入理解评分标准的每个细节。"
                 )
             else:
                 # 处理文本文件
-                marking_content = ""
-                for file_path in marking_files:
-                    content = process_file_content(file_path)
-                    marking_content += f"\\n\\n=== {Path(file_path).name} ===\\n{content}"
+                if compiled_scheme is not None and compiled_scheme.rubric_text:
+                    marking_content = compiled_scheme.rubric_text
+                else:
+                    marking_content = ""
+                    for file_path in marking_files:
+                        content = process_file_content(file_path)
+                        marking_content += f"\n\n=== {Path(file_path).name} ===\n{content}"
                 
-                learning_result = call_tongyiqianwen_api(
-                    learning_prompt + f"\\n\\n批改标准内容：\\n{marking_content}",
+                learning_result = await call_tongyiqianwen_api_async(
+                    learning_prompt + f"\n\n批改标准内容：\n{marking_content}",
                     system_message="你是批改标准学习专家，需要深入理解评分标准的每个细节。"
                 )
             
@@ -603,19 +636,19 @@ class IntelligentBatchProcessor:
                 api_args.extend(pdf_files)  # 添加PDF文件路径
                 
                 # 调用多媒体API
-                result = call_tongyiqianwen_api(
+                result = await call_tongyiqianwen_api_async(
                     *api_args,
                     system_message="你是教育文件分析专家。请按照指定格式分析题目信息，重点关注批改标准文件中的题目数量和分值信息。你可以直接查看PDF图像内容。"
                 )
             else:
                 # 没有PDF文件，使用普通文本API调用
-                result = call_tongyiqianwen_api(
+                result = await call_tongyiqianwen_api_async(
                     analysis_prompt,
                     system_message="你是教育文件分析专家。请按照指定格式分析题目信息，重点关注批改标准文件中的题目数量和分值信息。"
                 )
             
             # 解析题目分析结果
-            logger.info(f"📊 第一步API返回结果：\\n{result}")
+            logger.debug(f"📊 第一步API返回结果：\\n{result}")
             
             # 尝试解析结果
             structure_data = self.parse_question_analysis_result(result, structured_content, file_info_list)
@@ -901,13 +934,13 @@ class IntelligentBatchProcessor:
                     api_args.extend(pdf_files)  # 添加PDF文件路径
                     
                     # 调用多媒体API
-                    result = call_tongyiqianwen_api(
+                    result = await call_tongyiqianwen_api_async(
                         *api_args,
                         system_message=ULTIMATE_SYSTEM_MESSAGE
                     )
                 else:
                     # 没有PDF文件，使用普通文本API调用
-                    result = call_tongyiqianwen_api(
+                    result = await call_tongyiqianwen_api_async(
                         full_prompt,
                         system_message=ULTIMATE_SYSTEM_MESSAGE
                     )
@@ -976,7 +1009,7 @@ class IntelligentBatchProcessor:
 """
             
             # 调用API进行一致性检查
-            check_result = call_tongyiqianwen_api(
+            check_result = await call_tongyiqianwen_api_async(
                 consistency_prompt,
                 system_message="你是批改质量检查专家，负责确保批改结果严格符合标准。"
             )
@@ -1025,7 +1058,7 @@ class IntelligentBatchProcessor:
 请基于以上批改结果生成总结。"""
         
         try:
-            summary = call_tongyiqianwen_api(
+            summary = await call_tongyiqianwen_api_async(
                 summary_prompt,
                 system_message="你是教育评估专家，请基于批改结果生成专业的学习总结报告。"
             )
@@ -1654,16 +1687,16 @@ def intelligent_batch_correction_sync(file_paths: List[str], file_info_list: Lis
     
     try:
         # 运行异步函数
-        return loop.run_until_complete(
+        return loop.run_until_complete(run_with_async_openai_clients(
             intelligent_batch_correction(file_paths, file_info_list, batch_size, max_concurrent)
-        )
+        ))
     except Exception as e:
         # 如果出现错误，尝试创建新的事件循环重试一次
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            return loop.run_until_complete(
+            return loop.run_until_complete(run_with_async_openai_clients(
                 intelligent_batch_correction(file_paths, file_info_list, batch_size, max_concurrent)
-            )
+            ))
         except Exception as retry_e:
             raise Exception(f"批改失败: {str(e)}, 重试也失败: {str(retry_e)}")
\ No newline at end of file
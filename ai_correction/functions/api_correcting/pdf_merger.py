@@ -41,6 +41,19 @@ import tempfile
 import urllib.request
 import shutil
 import re
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# 中文字体每个进程只查找、注册一次：字体目录 -> 注册的字体名
+_font_lock = threading.Lock()
+_registered_fonts = {}
+
+# 找不到中文字体时是否联网下载（离线环境可设为 0）
+FONT_DOWNLOAD_ENABLED = os.getenv('PDF_FONT_DOWNLOAD', '1') != '0'
+
+# 缩放后的图片按内容哈希缓存的目录名（位于 upload_dir 下）
+IMAGE_CACHE_DIR_NAME = '.pdf_image_cache'
 
 # 添加下载字体功能
 def download_font(font_url, save_path):
@@ -82,11 +95,23 @@ class PDFMerger:
         self.font_dir = Path(__file__).parent / 'fonts'
         self.font_dir.mkdir(exist_ok=True)
         
+        # 转换后的图片缓存目录
+        self.image_cache_dir = self.upload_dir / IMAGE_CACHE_DIR_NAME
+        self.image_cache_dir.mkdir(exist_ok=True)
+        
         # 注册中文字体
         self.setup_chinese_font()
 
     def setup_chinese_font(self):
-        """设置中文字体，适应不同操作系统环境"""
+        """设置中文字体（每个进程只查找、注册一次，后续实例直接复用）"""
+        key = str(self.font_dir)
+        with _font_lock:
+            if key not in _registered_fonts:
+                _registered_fonts[key] = self._register_chinese_font()
+        self.chinese_font_name = _registered_fonts[key]
+
+    def _register_chinese_font(self):
+        """查找并注册中文字体，适应不同操作系统环境，返回字体名"""
         # 获取当前操作系统
         import platform
         system_name = platform.system().lower()
@@ -262,7 +287,7 @@ class PDFMerger:
                     print(f"Failed to register font {font_path}: {str(e)}")
         
         # 使用备用方案 - 尝试下载并注册一个开源中文字体
-        if not font_found:
+        if not font_found and FONT_DOWNLOAD_ENABLED:
             try:
                 # 如果download_fonts模块存在，尝试使用它下载字体
                 import importlib.util
@@ -312,7 +337,7 @@ class PDFMerger:
 
         # 优先查找 NotoSansSC-Regular.otf
         noto_font_path = self.font_dir / 'NotoSansSC-Regular.otf'
-        if not noto_font_path.exists():
+        if not noto_font_path.exists() and FONT_DOWNLOAD_ENABLED:
             # 自动下载
             noto_url = 'https://github.com/googlefonts/noto-cjk/raw/main/Sans/OTF/SimplifiedChinese/NotoSansSC-Regular.otf'
             print('Downloading NotoSansSC-Regular.otf...')
@@ -326,6 +351,8 @@ class PDFMerger:
                 font_found = True
             except Exception as e:
                 print(f'Failed to register NotoSansSC: {e}')
+        
+        return self.chinese_font_name
 
     def merge_pdfs(self, files_to_include, result_text, title, output_path):
         temp_files = []
@@ -615,42 +642,44 @@ class PDFMerger:
             # 清理临时文件
             for temp_file in temp_files:
                 try:
-                    if os.path.exists(temp_file):
+                    if temp_file and os.path.exists(temp_file):
                         os.unlink(temp_file)
                 except Exception as e:
                     print(f"清理临时文件失败: {temp_file}, 错误: {str(e)}")
                     pass
                     
     def _process_image_file(self, file_info):
-        """处理图片文件并返回图片对象和临时文件路径"""
+        """
+        处理图片文件并返回图片对象和临时文件路径
+        
+        缩放后的图片按内容哈希缓存在 upload_dir/.pdf_image_cache 下，同一张图片
+        （例如每个学生报告都包含的题目和评分标准）只转换一次；缓存文件无需清理，
+        返回的临时文件路径为 None
+        """
+        image_data = None
         img_path = None
         
         # 处理 {'path': '/path/to/file'} 格式
         if isinstance(file_info, dict) and 'path' in file_info:
             img_path = file_info['path']
-            print(f"从路径加载图片: {img_path}")
         
         # 处理 UploadedFile 对象格式
         elif hasattr(file_info, 'getvalue'):
-            # 使用临时文件保存上传的文件内容
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-            tmp_file.write(file_info.getvalue())
-            img_path = tmp_file.name
-            tmp_file.close()
-            print(f"从上传文件创建临时文件: {img_path}")
+            image_data = file_info.getvalue()
         
         # 处理直接的文件路径字符串
-        elif isinstance(file_info, str) and os.path.exists(file_info):
+        elif isinstance(file_info, str):
             img_path = file_info
-            print(f"直接使用文件路径: {img_path}")
         
-        # 如果找到有效路径，尝试加载图片
-        if img_path and os.path.exists(img_path):
-            # 使用临时文件处理图片
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-            
-            # 尝试打开图片文件
-            img = PILImage.open(img_path)
+        if image_data is None:
+            if not img_path or not os.path.exists(img_path):
+                return None, None
+            with open(img_path, 'rb') as f:
+                image_data = f.read()
+        
+        cached_path = self.image_cache_dir / f"{hashlib.sha256(image_data).hexdigest()}.png"
+        if not cached_path.exists():
+            img = PILImage.open(io.BytesIO(image_data))
             
             if img.mode != 'RGB':
                 img = img.convert('RGB')
@@ -671,12 +700,19 @@ class PDFMerger:
                 new_width = new_height / aspect
             
             img = img.resize((int(new_width), int(new_height)), PILImage.Resampling.LANCZOS)
-            img.save(tmp_file.name, 'PNG')
             
-            img_obj = Image(tmp_file.name, width=new_width, height=new_height)
-            return img_obj, tmp_file.name
+            # 先写临时文件再替换，并行生成报告的进程不会读到写了一半的缓存
+            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png', dir=self.image_cache_dir)
+            tmp_file.close()
+            img.save(tmp_file.name, 'PNG')
+            os.replace(tmp_file.name, cached_path)
+        
+        # 缓存图片按页面尺寸（1像素=1点）保存，直接用其像素尺寸排版
+        with PILImage.open(cached_path) as cached_img:
+            width, height = cached_img.size
         
-        return None, None
+        img_obj = Image(str(cached_path), width=width, height=height)
+        return img_obj, None
     
     def _group_related_files(self, files_to_include):
         """
@@ -791,6 +827,82 @@ class PDFMerger:
             
         return blocks
 
+# 工作进程内复用的 PDFMerger，字体在进程启动时加载一次
+_worker_merger = None
+
+def _init_report_worker(upload_dir):
+    global _worker_merger
+    _worker_merger = PDFMerger(upload_dir)
+
+def _generate_report(job):
+    return _worker_merger.merge_pdfs(job['files'], job['result_text'], job['title'], job['output_path'])
+
+def generate_student_reports(jobs, upload_dir, max_workers=None):
+    """
+    在多个工作进程中并行生成每个学生的批改报告
+    
+    参数:
+    jobs: list, 每项为 {'files': 文件字典, 'result_text': 批改结果, 'title': 标题, 'output_path': 输出路径}，
+          文件字典中使用文件路径（UploadedFile 无法传递到工作进程）
+    upload_dir: 上传目录，图片转换缓存位于其下
+    max_workers: 工作进程数，默认不超过CPU核数
+    
+    返回:
+    list: 与 jobs 顺序一致的 (成功标志, 输出文件路径或错误信息)
+    """
+    if not jobs:
+        return []
+    
+    max_workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    if max_workers <= 1:
+        merger = PDFMerger(upload_dir)
+        return [merger.merge_pdfs(job['files'], job['result_text'], job['title'], job['output_path']) for job in jobs]
+    
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_report_worker,
+                             initargs=(str(upload_dir),)) as executor:
+        return list(executor.map(_generate_report, jobs))
+
+def merge_report_files(report_paths, output_path):
+    """
+    将多个报告合并为一个PDF
+    
+    每个报告按路径追加：PdfReader 读入文件内容后立即关闭文件句柄，
+    同时打开的文件数与报告数量无关。PdfWriter 会在内存中保留所有页面，
+    直到最后一次性写入输出文件（先写临时文件再替换），内存占用随报告数量增长
+    
+    返回:
+    tuple: (成功标志, 输出文件路径或错误信息)
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + '.part')
+    try:
+        writer = PdfWriter()
+        for report_path in report_paths:
+            writer.append(str(report_path))
+        with open(tmp_path, 'wb') as out_file:
+            writer.write(out_file)
+        os.replace(tmp_path, output_path)
+        return True, str(output_path)
+    except Exception as e:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        return False, f"PDF合并错误: {str(e)}"
+
+def generate_class_report(jobs, upload_dir, output_path, max_workers=None):
+    """
+    生成班级报告：并行生成每个学生的报告，再合并为一个PDF
+    
+    返回:
+    tuple: (成功标志, 输出文件路径或错误信息, 每个学生报告的生成结果)
+    """
+    results = generate_student_reports(jobs, upload_dir, max_workers)
+    report_paths = [path for success, path in results if success]
+    if not report_paths:
+        return False, "没有成功生成的学生报告", results
+    
+    success, message = merge_report_files(report_paths, output_path)
+    return success, message, results
+
 def process_correction_pdf(question_image, student_answer_image, marking_scheme_image, api_result, output_dir):
     """
     处理批改PDF生成请求
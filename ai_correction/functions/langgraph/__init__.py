@@ -1,11 +1,13 @@
 # LangGraph AI 批改系统
 # 正确集成到 ai_correction 中
 
-from .workflow import create_grading_workflow
+from .workflow import get_workflow, run_ai_grading, get_grading_progress
 from .state import GradingState
 from .agents import *
 
 __all__ = [
-    'create_grading_workflow',
+    'get_workflow',
+    'run_ai_grading',
+    'get_grading_progress',
     'GradingState',
 ]
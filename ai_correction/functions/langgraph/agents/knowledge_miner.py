@@ -16,7 +16,7 @@ import re
 # 导入现有的 API 调用功能
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from api_correcting.calling_api import call_api
+from api_correcting.calling_api import call_tongyiqianwen_api_async
 
 from ..state import GradingState, KnowledgePoint, ErrorAnalysis
 
@@ -452,7 +452,7 @@ class KnowledgeMiner:
         """调用AI进行分析"""
         try:
             # 使用现有的API调用功能
-            response = call_api(prompt, language="zh")
+            response = await call_tongyiqianwen_api_async(prompt)
             return response
         except Exception as e:
             logger.warning(f"AI分析调用失败: {e}")
@@ -2,37 +2,166 @@
 # -*- coding: utf-8 -*-
 """
 OCR & Vision Agent - 图像预处理、OCR、区域检测
-集成现有的 ai_recognition.py，符合原始需求
+集成 OCR.space 接口（与 ai_recognition.py 请求参数一致），支持预处理与 OCR 流水线
 """
 
 import os
+import asyncio
 import logging
 import json
-from typing import Dict, List, Any, Tuple
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from PIL import Image, ImageEnhance, ImageFilter
+import aiohttp
 import cv2
 import numpy as np
-from datetime import datetime
-
-# 导入现有的 OCR 功能
-import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from ai_recognition import ocr_space_file
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 from ..state import GradingState
 
 logger = logging.getLogger(__name__)
 
+# OCR.space 接口配置（与 ai_recognition.ocr_space_file 的请求参数一致）
+OCR_SPACE_ENDPOINT = os.getenv('OCR_SPACE_ENDPOINT', 'https://api.ocr.space/parse/image')
+OCR_REQUEST_TIMEOUT = float(os.getenv('OCR_REQUEST_TIMEOUT', '60'))
+# 流水线模式：预处理在进程池中执行，OCR 请求受限流器约束并发发送
+OCR_PIPELINED = os.getenv('OCR_PIPELINED', 'true').lower() == 'true'
+OCR_MAX_CONCURRENCY = int(os.getenv('OCR_MAX_CONCURRENCY', '4'))
+OCR_REQUESTS_PER_SECOND = float(os.getenv('OCR_REQUESTS_PER_SECOND', '2'))
+OCR_PREPROCESS_WORKERS = int(os.getenv('OCR_PREPROCESS_WORKERS', str(min(4, os.cpu_count() or 1))))
+OCR_MAX_RETRIES = 2
+
+
+def _parse_retry_after(value: Optional[str], default: float) -> float:
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析时返回 default"""
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)  # HTTP 日期总是 GMT
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _enhance_image(img: Image.Image) -> Image.Image:
+    """图像增强"""
+    # 调整对比度
+    contrast_enhancer = ImageEnhance.Contrast(img)
+    img = contrast_enhancer.enhance(1.2)
+
+    # 调整锐度
+    sharpness_enhancer = ImageEnhance.Sharpness(img)
+    img = sharpness_enhancer.enhance(1.1)
+
+    # 去噪
+    img = img.filter(ImageFilter.MedianFilter(size=3))
+
+    return img
+
+
+def _preprocess_image_file(image_path: str) -> str:
+    """预处理单张图像，返回预处理后的文件路径（失败时返回原始路径）
+
+    定义为模块级函数，以便在进程池中执行。
+    """
+    try:
+        # 创建预处理后的文件路径
+        base_name = Path(image_path).stem
+        output_dir = Path(image_path).parent / "preprocessed"
+        output_dir.mkdir(exist_ok=True)
+        output_path = output_dir / f"{base_name}_preprocessed.jpg"
+
+        # 图像预处理
+        with Image.open(image_path) as img:
+            # 转换为RGB模式
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            # 图像增强
+            enhanced_img = _enhance_image(img)
+
+            # 保存预处理后的图像
+            enhanced_img.save(output_path, 'JPEG', quality=95)
+
+        logger.info(f"图像预处理完成: {image_path}")
+        return str(output_path)
+
+    except Exception as e:
+        logger.warning(f"图像预处理失败: {image_path} - {e}")
+        # 如果预处理失败，使用原始图像
+        return image_path
+
+
+class OCRRateLimiter:
+    """
+    OCR 请求限流器
+    同时限制并发数和每秒请求数；收到 429 时按 Retry-After 暂停后续请求
+    """
+
+    def __init__(self, requests_per_second: float = OCR_REQUESTS_PER_SECOND,
+                 max_concurrency: int = OCR_MAX_CONCURRENCY):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_slot = 0.0
+
+    def _ensure_primitives(self):
+        # 同步原语绑定事件循环，跨 asyncio.run 调用时重新创建
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+    async def __aenter__(self):
+        self._ensure_primitives()
+        await self._semaphore.acquire()
+        try:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+    def backoff(self, delay: float):
+        """服务端限流时推迟后续请求"""
+        self._next_slot = max(self._next_slot, time.monotonic() + delay)
+
+
 class OCRVisionAgent:
     """
     OCR & Vision Agent
     集成现有的 ai_recognition.py，提供图像预处理、OCR、区域检测功能
     """
     
-    def __init__(self):
+    _preprocess_pool: Optional[ProcessPoolExecutor] = None
+
+    def __init__(self, pipelined: bool = OCR_PIPELINED,
+                 rate_limiter: Optional[OCRRateLimiter] = None):
         self.ocr_api_key = os.getenv('OCR_SPACE_API_KEY', 'K81037081488957')
         self.supported_languages = ['eng', 'chs', 'cht']  # 英文、简体中文、繁体中文
+        self.pipelined = pipelined
+        self.rate_limiter = rate_limiter or OCRRateLimiter()
         
     async def __call__(self, state: GradingState) -> GradingState:
         """
@@ -48,12 +177,19 @@ class OCRVisionAgent:
             # 获取所有有效的图像文件
             all_image_files = self._get_all_image_files(state)
             
-            # 图像预处理
-            preprocessed_images = await self._preprocess_images(all_image_files)
+            if self.pipelined:
+                # 流水线：第 N+1 页预处理的同时第 N 页进行 OCR
+                preprocessed_images, ocr_results = await self._process_images_pipelined(
+                    all_image_files, state['language']
+                )
+            else:
+                # 图像预处理
+                preprocessed_images = await self._preprocess_images(all_image_files)
+
+                # OCR 文本识别
+                ocr_results = await self._perform_ocr(preprocessed_images, state['language'])
+
             state['preprocessed_images'] = preprocessed_images
-            
-            # OCR 文本识别
-            ocr_results = await self._perform_ocr(preprocessed_images, state['language'])
             state['ocr_results'] = ocr_results
             
             # 图像区域检测
@@ -108,106 +244,144 @@ class OCRVisionAgent:
         preprocessed_images = {}
         
         for image_path in image_files:
-            try:
-                # 创建预处理后的文件路径
-                base_name = Path(image_path).stem
-                output_dir = Path(image_path).parent / "preprocessed"
-                output_dir.mkdir(exist_ok=True)
-                output_path = output_dir / f"{base_name}_preprocessed.jpg"
-                
-                # 图像预处理
-                with Image.open(image_path) as img:
-                    # 转换为RGB模式
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    
-                    # 图像增强
-                    enhanced_img = self._enhance_image(img)
-                    
-                    # 保存预处理后的图像
-                    enhanced_img.save(output_path, 'JPEG', quality=95)
-                    preprocessed_images[image_path] = str(output_path)
-                    
-                logger.info(f"图像预处理完成: {image_path}")
-                
-            except Exception as e:
-                logger.warning(f"图像预处理失败: {image_path} - {e}")
-                # 如果预处理失败，使用原始图像
-                preprocessed_images[image_path] = image_path
+            preprocessed_images[image_path] = _preprocess_image_file(image_path)
         
         return preprocessed_images
     
     def _enhance_image(self, img: Image.Image) -> Image.Image:
         """图像增强"""
-        # 调整对比度
-        contrast_enhancer = ImageEnhance.Contrast(img)
-        img = contrast_enhancer.enhance(1.2)
-        
-        # 调整锐度
-        sharpness_enhancer = ImageEnhance.Sharpness(img)
-        img = sharpness_enhancer.enhance(1.1)
-        
-        # 去噪
-        img = img.filter(ImageFilter.MedianFilter(size=3))
-        
-        return img
+        return _enhance_image(img)
     
-    async def _perform_ocr(self, preprocessed_images: Dict[str, str], language: str) -> Dict[str, Any]:
-        """执行 OCR 文本识别"""
-        ocr_results = {}
-        
-        # 语言映射
+    def _get_ocr_language(self, language: str) -> str:
+        """语言映射"""
         lang_map = {
             'zh': 'chs',  # 中文简体
             'en': 'eng',  # 英文
             'cht': 'cht'  # 中文繁体
         }
-        ocr_language = lang_map.get(language, 'eng')
+        return lang_map.get(language, 'eng')
+    
+    async def _perform_ocr(self, preprocessed_images: Dict[str, str], language: str) -> Dict[str, Any]:
+        """执行 OCR 文本识别（逐张顺序执行）"""
+        ocr_results = {}
+        ocr_language = self._get_ocr_language(language)
         
-        for original_path, preprocessed_path in preprocessed_images.items():
-            try:
-                logger.info(f"开始 OCR 识别: {preprocessed_path}")
-                
-                # 使用现有的 OCR 功能
-                ocr_response = ocr_space_file(
-                    filename=preprocessed_path,
-                    overlay=True,  # 获取坐标信息
-                    api_key=self.ocr_api_key,
-                    language=ocr_language
+        async with self._create_session() as session:
+            for original_path, preprocessed_path in preprocessed_images.items():
+                ocr_results[original_path] = await self._ocr_single_image(
+                    session, preprocessed_path, ocr_language
                 )
-                
-                # 解析 OCR 结果
-                ocr_data = json.loads(ocr_response)
-                
-                if ocr_data.get('IsErroredOnProcessing', False):
-                    raise Exception(f"OCR 处理错误: {ocr_data.get('ErrorMessage', 'Unknown error')}")
-                
-                # 提取文本和坐标信息
-                parsed_results = self._parse_ocr_results(ocr_data)
-                
-                ocr_results[original_path] = {
-                    'success': True,
-                    'text': parsed_results['text'],
-                    'words': parsed_results['words'],
-                    'lines': parsed_results['lines'],
-                    'confidence': parsed_results['confidence'],
-                    'raw_response': ocr_data
-                }
-                
-                logger.info(f"OCR 识别完成: {preprocessed_path}")
-                
-            except Exception as e:
-                logger.warning(f"OCR 识别失败: {preprocessed_path} - {e}")
-                ocr_results[original_path] = {
-                    'success': False,
-                    'error': str(e),
-                    'text': '',
-                    'words': [],
-                    'lines': []
-                }
         
         return ocr_results
     
+    async def _process_images_pipelined(self, image_files: List[str],
+                                        language: str) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """流水线处理：预处理在进程池中执行，完成后立即进入限流的并发 OCR"""
+        ocr_language = self._get_ocr_language(language)
+        
+        async with self._create_session() as session:
+            async def process(image_path: str) -> Tuple[str, Dict[str, Any]]:
+                preprocessed_path = await self._preprocess_in_pool(image_path)
+                ocr_result = await self._ocr_single_image(session, preprocessed_path, ocr_language)
+                return preprocessed_path, ocr_result
+            
+            results = await asyncio.gather(*(process(image_path) for image_path in image_files))
+        
+        # 结果按输入顺序组织
+        preprocessed_images = {}
+        ocr_results = {}
+        for image_path, (preprocessed_path, ocr_result) in zip(image_files, results):
+            preprocessed_images[image_path] = preprocessed_path
+            ocr_results[image_path] = ocr_result
+        
+        return preprocessed_images, ocr_results
+    
+    async def _preprocess_in_pool(self, image_path: str) -> str:
+        """在进程池中预处理图像，进程池不可用时退回线程执行"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_preprocess_pool(), _preprocess_image_file, image_path)
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            logger.warning(f"预处理进程池不可用，改用线程执行: {e}")
+            OCRVisionAgent._preprocess_pool = None
+            return await asyncio.to_thread(_preprocess_image_file, image_path)
+    
+    @classmethod
+    def _get_preprocess_pool(cls) -> ProcessPoolExecutor:
+        """获取共享的预处理进程池（惰性创建，跨任务复用）"""
+        if cls._preprocess_pool is None:
+            cls._preprocess_pool = ProcessPoolExecutor(max_workers=max(1, OCR_PREPROCESS_WORKERS))
+        return cls._preprocess_pool
+    
+    @classmethod
+    def shutdown_preprocess_pool(cls):
+        """关闭预处理进程池"""
+        if cls._preprocess_pool is not None:
+            cls._preprocess_pool.shutdown(wait=False, cancel_futures=True)
+            cls._preprocess_pool = None
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """创建 OCR 请求会话（连接在同一任务的所有页面间复用）"""
+        return aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=OCR_REQUEST_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=self.rate_limiter.max_concurrency)
+        )
+    
+    async def _ocr_single_image(self, session: aiohttp.ClientSession,
+                                preprocessed_path: str, ocr_language: str) -> Dict[str, Any]:
+        """识别单张图像"""
+        try:
+            logger.info(f"开始 OCR 识别: {preprocessed_path}")
+            
+            ocr_data = await self._request_ocr(session, preprocessed_path, ocr_language)
+            
+            if ocr_data.get('IsErroredOnProcessing', False):
+                raise Exception(f"OCR 处理错误: {ocr_data.get('ErrorMessage', 'Unknown error')}")
+            
+            # 提取文本和坐标信息
+            parsed_results = self._parse_ocr_results(ocr_data)
+            
+            logger.info(f"OCR 识别完成: {preprocessed_path}")
+            return {
+                'success': True,
+                'text': parsed_results['text'],
+                'words': parsed_results['words'],
+                'lines': parsed_results['lines'],
+                'confidence': parsed_results['confidence'],
+                'raw_response': ocr_data
+            }
+            
+        except Exception as e:
+            logger.warning(f"OCR 识别失败: {preprocessed_path} - {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'text': '',
+                'words': [],
+                'lines': []
+            }
+    
+    async def _request_ocr(self, session: aiohttp.ClientSession,
+                           image_path: str, ocr_language: str) -> Dict[str, Any]:
+        """调用 OCR.space 接口（overlay=True 获取坐标信息），服务端限流时退避重试"""
+        image_data = await asyncio.to_thread(Path(image_path).read_bytes)
+        
+        for attempt in range(OCR_MAX_RETRIES + 1):
+            form = aiohttp.FormData()
+            form.add_field('isOverlayRequired', 'true')
+            form.add_field('apikey', self.ocr_api_key)
+            form.add_field('language', ocr_language)
+            form.add_field('file', image_data, filename=Path(image_path).name)
+            
+            async with self.rate_limiter:
+                async with session.post(OCR_SPACE_ENDPOINT, data=form) as response:
+                    if response.status == 429 and attempt < OCR_MAX_RETRIES:
+                        retry_after = _parse_retry_after(response.headers.get('Retry-After'), 2 ** attempt)
+                        self.rate_limiter.backoff(retry_after)
+                        continue
+                    response.raise_for_status()
+                    return json.loads(await response.text())
+    
     def _parse_ocr_results(self, ocr_data: Dict) -> Dict[str, Any]:
         """解析 OCR 结果"""
         all_text = []
@@ -275,7 +449,7 @@ class OCRVisionAgent:
         
         for original_path, preprocessed_path in preprocessed_images.items():
             try:
-                regions = await self._detect_image_regions(preprocessed_path)
+                regions = await asyncio.to_thread(self._detect_image_regions_sync, preprocessed_path)
                 image_regions[original_path] = regions
                 logger.info(f"区域检测完成: {preprocessed_path}, 检测到 {len(regions)} 个区域")
                 
@@ -287,6 +461,10 @@ class OCRVisionAgent:
     
     async def _detect_image_regions(self, image_path: str) -> List[Dict]:
         """检测单个图像的区域"""
+        return self._detect_image_regions_sync(image_path)
+    
+    def _detect_image_regions_sync(self, image_path: str) -> List[Dict]:
+        """检测单个图像的区域（OpenCV 同步实现）"""
         regions = []
         
         try:
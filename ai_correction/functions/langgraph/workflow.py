@@ -9,6 +9,8 @@ LangGraph Workflow - 优化的AI批改系统工作流编排
 import logging
 import hashlib
 import json
+import os
+import threading
 from typing import Dict, Any, List, Callable
 from datetime import datetime
 from pathlib import Path
@@ -16,6 +18,8 @@ from pathlib import Path
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 
+from src.ai_optimization.cache import IntelligentCache, LRUCachePolicy, SizeLimitedCachePolicy
+
 from .state import GradingState
 from .agents.upload_validator import UploadValidator
 from .agents.ocr_vision_agent import OCRVisionAgent
@@ -27,24 +31,86 @@ from .agents.result_assembler import ResultAssembler
 
 logger = logging.getLogger(__name__)
 
-# 全局缓存
-_ocr_cache = {}
-_file_hash_cache = {}
+# 全局缓存（所有工作流实例共享）
+# OCR结果按文件内容哈希寻址，写入即落盘，重启后可复用；内存与磁盘均有上限
+# 默认目录相对项目根目录解析，不依赖进程的当前工作目录
+OCR_CACHE_DIR = os.getenv(
+    'LANGGRAPH_CACHE_DIR',
+    str(Path(__file__).resolve().parents[2] / 'cache' / 'langgraph_ocr')
+)
+OCR_CACHE_MAX_ENTRIES = int(os.getenv('LANGGRAPH_OCR_CACHE_ENTRIES', '200'))
+OCR_CACHE_MAX_BYTES = int(os.getenv('LANGGRAPH_OCR_CACHE_BYTES', str(256 * 1024 * 1024)))
+OCR_CACHE_MAX_DISK_BYTES = int(os.getenv('LANGGRAPH_OCR_CACHE_DISK_BYTES', str(1024 * 1024 * 1024)))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# OCR缓存在首次使用时创建，导入模块不会创建缓存目录
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+# 文件路径 -> (大小, 修改时间, 内容哈希)，文件被覆盖后大小或修改时间变化即重新计算
+_file_hash_cache = IntelligentCache(policies=[LRUCachePolicy(2000)], name="langgraph_file_hash")
+
+def _get_ocr_cache() -> IntelligentCache:
+    """获取OCR结果缓存（首次调用时创建并加载磁盘上已有的结果）"""
+    global _ocr_cache
+    if _ocr_cache is None:
+        with _ocr_cache_lock:
+            if _ocr_cache is None:
+                _ocr_cache = IntelligentCache(
+                    policies=[LRUCachePolicy(OCR_CACHE_MAX_ENTRIES), SizeLimitedCachePolicy(OCR_CACHE_MAX_BYTES)],
+                    name="langgraph_ocr",
+                    spill_dir=OCR_CACHE_DIR,
+                    spill_max_bytes=OCR_CACHE_MAX_DISK_BYTES,
+                    persistent=True
+                )
+    return _ocr_cache
 
 def _get_file_hash(file_path: str) -> str:
-    """获取文件哈希值用于缓存"""
+    """获取文件内容哈希值用于缓存（流式计算，按大小和修改时间校验）"""
     try:
-        if file_path in _file_hash_cache:
-            return _file_hash_cache[file_path]
+        stat = os.stat(file_path)
+        cached = _file_hash_cache.get(file_path)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
 
+        digest = hashlib.sha256()
         with open(file_path, 'rb') as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
 
-        _file_hash_cache[file_path] = file_hash
+        _file_hash_cache.set(file_path, (stat.st_size, stat.st_mtime_ns, file_hash))
         return file_hash
     except Exception:
         return f"hash_{hash(file_path)}"
 
+_OCR_CACHE_FIELDS = ('ocr_results', 'image_regions', 'preprocessed_images')
+
+def _to_content_addressed_ocr(result: Dict[str, Any], path_hashes: Dict[str, str]) -> Dict[str, Any]:
+    """将按文件路径组织的OCR结果转换为按内容哈希组织"""
+    return {
+        field: {
+            path_hashes[file_path]: value
+            for file_path, value in (result.get(field) or {}).items()
+            if file_path in path_hashes
+        }
+        for field in _OCR_CACHE_FIELDS
+    }
+
+def _restore_cached_ocr(cached: Dict[str, Any], path_hashes: Dict[str, str]) -> Dict[str, Any]:
+    """将按内容哈希缓存的OCR结果映射回当前任务的文件路径"""
+    restored = {field: {} for field in _OCR_CACHE_FIELDS}
+    for file_path, file_hash in path_hashes.items():
+        for field in _OCR_CACHE_FIELDS:
+            if file_hash in cached.get(field, {}):
+                restored[field][file_path] = cached[field][file_hash]
+
+        # 预处理图像可能已被清理，回退为原始文件
+        preprocessed = restored['preprocessed_images'].get(file_path)
+        if preprocessed is not None and not os.path.exists(preprocessed):
+            restored['preprocessed_images'][file_path] = file_path
+
+    return restored
+
 def _should_skip_ocr(files: List[str]) -> bool:
     """判断是否可以跳过OCR处理"""
     for file_path in files:
@@ -161,22 +227,18 @@ class OptimizedAIGradingWorkflow:
         async def cached_ocr(state: GradingState) -> GradingState:
             # 检查缓存
             cache_key = self._get_ocr_cache_key(state)
-            if cache_key in _ocr_cache:
+            path_hashes = self._get_path_hashes(state)
+            cached_result = _get_ocr_cache().get(cache_key)
+            if cached_result is not None:
                 logger.info("使用OCR缓存结果")
-                cached_result = _ocr_cache[cache_key]
-                state.update(cached_result)
+                state.update(_restore_cached_ocr(cached_result, path_hashes))
                 return state
 
             # 执行OCR
             result = await ocr_agent(state)
 
-            # 缓存结果
-            cache_data = {
-                'ocr_results': result.get('ocr_results', {}),
-                'image_regions': result.get('image_regions', {}),
-                'preprocessed_images': result.get('preprocessed_images', {})
-            }
-            _ocr_cache[cache_key] = cache_data
+            # 缓存结果（按文件内容哈希存储，与上传路径无关）
+            _get_ocr_cache().set(cache_key, _to_content_addressed_ocr(result, path_hashes))
 
             return result
 
@@ -256,12 +318,17 @@ class OptimizedAIGradingWorkflow:
         return compressed_state
 
     def _get_ocr_cache_key(self, state: GradingState) -> str:
-        """生成OCR缓存键"""
+        """生成OCR缓存键（基于文件内容和识别语言，与文件路径无关）"""
         file_hashes = []
         for file_path in state['answer_files'] + state['question_files']:
             file_hashes.append(_get_file_hash(file_path))
 
-        return f"ocr_{'_'.join(sorted(file_hashes))}"
+        return f"ocr_{state.get('language', 'zh')}_{'_'.join(sorted(file_hashes))}"
+
+    def _get_path_hashes(self, state: GradingState) -> Dict[str, str]:
+        """获取本次任务所有文件的路径到内容哈希映射"""
+        all_files = state['answer_files'] + state['question_files'] + (state.get('marking_files') or [])
+        return {file_path: _get_file_hash(file_path) for file_path in all_files}
 
     async def run_grading(
         self,
@@ -552,18 +619,21 @@ class OptimizedAIGradingWorkflow:
         }
 
     def clear_cache(self):
-        """清理缓存"""
-        global _ocr_cache, _file_hash_cache
-        _ocr_cache.clear()
+        """清理缓存（包括磁盘上的OCR结果）"""
+        _get_ocr_cache().clear()
         _file_hash_cache.clear()
         logger.info("缓存已清理")
 
     def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计"""
+        ocr_cache = _get_ocr_cache()
         return {
-            'ocr_cache_size': len(_ocr_cache),
+            'ocr_cache_size': len(ocr_cache),
             'file_hash_cache_size': len(_file_hash_cache),
-            'cache_keys': list(_ocr_cache.keys())[:5]  # 显示前5个缓存键
+            'cache_keys': ocr_cache.keys()[-5:],  # 显示最近使用的5个缓存键
+            'ocr_cache': ocr_cache.get_stats(),
+            'file_hash_cache': _file_hash_cache.get_stats(),
+            'cache_dir': OCR_CACHE_DIR
         }
 
 # 全局工作流实例
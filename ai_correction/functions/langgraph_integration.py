@@ -15,6 +15,10 @@ from datetime import datetime
 # 导入 LangGraph 工作流
 from .langgraph.workflow import run_ai_grading, get_grading_progress
 
+# Agent 通过 api_correcting.calling_api 调用模型（agents 中已将 functions 目录加入 sys.path），
+# 事件循环结束前要关闭同一模块为该事件循环缓存的异步客户端
+from api_correcting.calling_api import run_with_async_openai_clients
+
 logger = logging.getLogger(__name__)
 
 class LangGraphIntegration:
@@ -241,7 +245,7 @@ def intelligent_correction_with_files_langgraph(
     asyncio.set_event_loop(loop)
     
     try:
-        result = loop.run_until_complete(
+        result = loop.run_until_complete(run_with_async_openai_clients(
             integration.intelligent_correction_with_langgraph(
                 question_files=question_files,
                 answer_files=answer_files,
@@ -250,7 +254,7 @@ def intelligent_correction_with_files_langgraph(
                 language=language,
                 mode=mode
             )
-        )
+        ))
         
         # 转换为文本格式（兼容现有代码）
         if result.get('success', False):
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟加载工具
+批改引擎、LangGraph、PDF 库等重量级模块在首次使用时才导入，缩短应用冷启动时间
+"""
+
+import functools
+import importlib
+import importlib.util
+from typing import Callable
+
+
+def lazy_function(module_name: str, name: str) -> Callable:
+    """返回一个代理函数，首次调用时才导入 module_name 并转发到其中的 name"""
+    def wrapper(*args, **kwargs):
+        return getattr(importlib.import_module(module_name), name)(*args, **kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = name
+    wrapper.__doc__ = f"延迟加载的 {module_name}.{name}"
+    return wrapper
+
+
+def has_module(module_name: str) -> bool:
+    """检查模块是否存在（只查找，不导入）"""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def can_import(module_name: str) -> bool:
+    """检查模块能否实际导入（首次调用时导入，结果缓存）
+
+    has_module 只确认文件存在；模块自身或其依赖导入失败时这里返回 False。
+    """
+    try:
+        importlib.import_module(module_name)
+        return True
+    except Exception:
+        return False
@@ -7,15 +7,33 @@ AI功能提示词优化与调用功能完善模块
 __version__ = "1.0.0"
 __author__ = "AI Optimization Team"
 
-# 导出主要组件
-from .prompt_engine import PromptEngine
-from .api_manager import APIClient
-from .quality_control import ConsistencyChecker
-from .content_processor import ContentRecognizer
+import importlib
+
+# 导出主要组件 -> 所在子包；子包依赖 aiohttp 等库，首次访问时才导入，
+# 只使用 cache 等子模块时不必加载全部组件
+_EXPORTS = {
+    "PromptEngine": ".prompt_engine",
+    "APIClient": ".api_manager",
+    "ConsistencyChecker": ".quality_control",
+    "ContentRecognizer": ".content_processor",
+}
 
 __all__ = [
     "PromptEngine",
     "APIClient", 
     "ConsistencyChecker",
     "ContentRecognizer"
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """首次访问导出组件时导入对应子包"""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -4,13 +4,16 @@ API调用管理模块
 提供多模型管理、智能路由、重试机制和性能监控功能。
 """
 
-from .api_client import APIClient
+from .api_client import APIClient, APIStatusError
+from .concurrency import AdaptiveConcurrencyLimiter
 from .model_manager import ModelManager
 from .retry_manager import RetryManager
 from .monitor import APIMonitor
 
 __all__ = [
     "APIClient",
+    "APIStatusError",
+    "AdaptiveConcurrencyLimiter",
     "ModelManager",
     "RetryManager",
     "APIMonitor"
@@ -9,13 +9,15 @@ import aiohttp
 import json
 import time
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple, Union
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import base64
 
 from ..models.api_models import APIResponse, ModelConfig, UsageStats, APICallContext, TaskType
 from ..config.config_manager import ConfigManager
+from .concurrency import AdaptiveConcurrencyLimiter
+from .model_manager import ModelManager
 
 logger = logging.getLogger(__name__)
 
@@ -31,13 +33,29 @@ class CallContext:
     timeout: int = 120
     max_retries: int = 3
 
+class APIStatusError(Exception):
+    """非200的HTTP响应"""
+    
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+    
+    @property
+    def is_rate_limited(self) -> bool:
+        return self.status_code == 429
+
 class APIClient:
     """统一API客户端"""
     
-    def __init__(self, config_manager: Optional[ConfigManager] = None):
+    def __init__(self,
+                 config_manager: Optional[ConfigManager] = None,
+                 model_manager: Optional[ModelManager] = None,
+                 concurrency: Optional[AdaptiveConcurrencyLimiter] = None):
         self.config_manager = config_manager or ConfigManager()
+        self.model_manager = model_manager  # 提供模型健康数据，用于路由和性能记录
         self.session: Optional[aiohttp.ClientSession] = None
-        self.semaphore = asyncio.Semaphore(3)  # 并发控制
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter()  # 自适应并发控制
         self._request_counter = 0
         
     async def __aenter__(self):
@@ -53,9 +71,11 @@ class APIClient:
         """确保HTTP会话存在"""
         if self.session is None or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=300)  # 5分钟总超时
+            # 连接数跟随并发上限，避免连接池成为瓶颈
+            max_connections = self.concurrency.max_limit
             self.session = aiohttp.ClientSession(
                 timeout=timeout,
-                connector=aiohttp.TCPConnector(limit=10, limit_per_host=5)
+                connector=aiohttp.TCPConnector(limit=max(10, max_connections), limit_per_host=max_connections)
             )
     
     async def close(self):
@@ -81,12 +101,14 @@ class APIClient:
             model_config: 模型配置
             prompt: 提示词
             content: 内容列表
-            **kwargs: 其他参数
+            **kwargs: 其他参数（timeout、max_retries、task_type）
             
         Returns:
             APIResponse: API响应
         """
-        async with self.semaphore:  # 并发控制
+        async with self.concurrency.slot() as slot:  # 自适应并发控制
+            # 拿到名额后再路由，使排队期间产生的健康状态变化生效
+            model_config = self._route_model(model_config, kwargs.get('task_type'))
             await self._ensure_session()
             
             context = CallContext(
@@ -102,10 +124,53 @@ class APIClient:
             logger.info(f"开始API调用 {context.request_id} - 模型: {model_config.name}")
             
             try:
-                return await self._execute_request(context)
+                response = await self._execute_request(context)
             except Exception as e:
                 logger.error(f"API调用失败 {context.request_id}: {str(e)}")
+                if isinstance(e, APIStatusError) and e.is_rate_limited:
+                    # 限流反映的是容量而非模型故障，不计入成功率
+                    slot.throttled = True
+                    if self.model_manager:
+                        self.model_manager.mark_rate_limited(model_config.id, e.retry_after or 30.0)
+                else:
+                    self._record_model_performance(context, None)
                 raise
+            
+            slot.failed = not response.is_successful()
+            self._record_model_performance(context, response)
+            return response
+    
+    def _route_model(self, model_config: ModelConfig, task_type: Optional[TaskType] = None) -> ModelConfig:
+        """根据 ModelManager 的健康数据选择实际调用的模型"""
+        if self.model_manager is None or model_config.id not in self.model_manager.models:
+            return model_config
+        if self.model_manager.is_model_healthy(model_config.id):
+            return model_config
+        
+        if task_type is None:
+            task_type = model_config.supported_tasks[0] if model_config.supported_tasks else TaskType.GRADING
+        fallback = self.model_manager.select_optimal_model(task_type, exclude_models=[model_config.id])
+        if fallback is None:
+            return model_config  # 没有健康的替代模型时仍尝试原模型
+        
+        logger.info(f"模型 {model_config.id} 当前不可用，改用 {fallback.id}")
+        return fallback
+    
+    def _record_model_performance(self, context: CallContext, response: Optional[APIResponse]):
+        """将调用结果写入 ModelManager 的性能指标"""
+        if self.model_manager is None:
+            return
+        if response is None:
+            response_time = (datetime.now() - context.start_time).total_seconds()
+            self.model_manager.update_model_performance(context.model_config.id, response_time, 0.0, 0.0, False)
+        else:
+            self.model_manager.update_model_performance(
+                response.model_id,
+                response.response_time,
+                response.quality_score or 0.0,
+                response.usage_stats.cost,
+                response.is_successful()
+            )
     
     async def _execute_request(self, context: CallContext) -> APIResponse:
         """执行具体的API请求"""
@@ -130,13 +195,23 @@ class APIClient:
                     return self._parse_response(context, response_data, response_time)
                 else:
                     error_text = await response.text()
-                    raise Exception(f"HTTP {response.status}: {error_text}")
+                    raise APIStatusError(
+                        response.status, error_text, self._parse_retry_after(response.headers.get('Retry-After'))
+                    )
                     
         except asyncio.TimeoutError:
             raise Exception(f"请求超时 ({context.timeout}秒)")
         except aiohttp.ClientError as e:
             raise Exception(f"网络错误: {str(e)}")
     
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """解析 Retry-After 头（仅支持秒数）"""
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+    
     def _build_request_data(self, context: CallContext) -> Dict[str, Any]:
         """构建请求数据"""
         messages = []
@@ -291,51 +366,101 @@ class APIClient:
         
         return max(0.0, min(1.0, score))
     
+    async def stream_batch(self,
+                           requests: List[Dict[str, Any]],
+                           max_workers: Optional[int] = None,
+                           max_throttle_retries: int = 3) -> AsyncIterator[Tuple[int, APIResponse]]:
+        """
+        流式批量API调用，按完成顺序产出结果
+        
+        固定数量的工作协程从队列取请求，每次调用占用自适应并发名额，
+        因此慢请求不会阻塞其余请求。被429限流的请求在 Retry-After 后重新排队。
+        
+        Args:
+            requests: 请求列表，每项为 call_api 的关键字参数
+            max_workers: 本批最大并发（默认为并发上限的最大值）
+            max_throttle_retries: 单个请求因429重新排队的最大次数
+            
+        Yields:
+            Tuple[int, APIResponse]: (请求在列表中的下标, 响应)
+        """
+        if not requests:
+            return
+        
+        pending: asyncio.Queue = asyncio.Queue()
+        for index in range(len(requests)):
+            pending.put_nowait((index, 0))
+        results: asyncio.Queue = asyncio.Queue()
+        remaining = len(requests)
+        
+        async def worker():
+            while True:
+                index, throttled_count = await pending.get()
+                try:
+                    response = await self.call_api(**requests[index])
+                except APIStatusError as e:
+                    if e.is_rate_limited and throttled_count < max_throttle_retries:
+                        if self._has_fallback(requests[index]):
+                            delay = 0.0  # 有健康的替代模型时立即重试
+                        elif e.retry_after is not None:
+                            delay = e.retry_after
+                        else:
+                            delay = 2 ** throttled_count * 0.5
+                        asyncio.get_running_loop().call_later(
+                            delay, pending.put_nowait, (index, throttled_count + 1)
+                        )
+                        continue
+                    response = self._error_response(requests[index], e)
+                except Exception as e:
+                    response = self._error_response(requests[index], e)
+                results.put_nowait((index, response))
+        
+        worker_count = min(len(requests), max_workers or self.concurrency.max_limit)
+        workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+        try:
+            while remaining:
+                yield await results.get()
+                remaining -= 1
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
     async def batch_call(self, 
                         requests: List[Dict[str, Any]], 
-                        batch_size: int = 5) -> List[APIResponse]:
+                        batch_size: Optional[int] = None) -> List[APIResponse]:
         """
         批量API调用
         
         Args:
             requests: 请求列表
-            batch_size: 批次大小
+            batch_size: 本批最大并发（None 表示仅由自适应并发控制）
             
         Returns:
-            List[APIResponse]: 响应列表
+            List[APIResponse]: 与请求顺序一致的响应列表
         """
-        results = []
-        
-        # 分批处理
-        for i in range(0, len(requests), batch_size):
-            batch = requests[i:i + batch_size]
-            
-            # 并发执行批次内的请求
-            tasks = []
-            for req in batch:
-                task = self.call_api(**req)
-                tasks.append(task)
-            
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # 处理异常结果
-            for result in batch_results:
-                if isinstance(result, Exception):
-                    logger.error(f"批量调用中的错误: {str(result)}")
-                    # 创建错误响应
-                    error_response = APIResponse(
-                        request_id=self._generate_request_id(),
-                        model_id="unknown",
-                        content="",
-                        usage_stats=UsageStats(),
-                        response_time=0.0,
-                        quality_score=0.0,
-                        timestamp=datetime.now(),
-                        status_code=500,
-                        error_message=str(result)
-                    )
-                    results.append(error_response)
-                else:
-                    results.append(result)
-        
-        return results
\ No newline at end of file
+        results: List[Optional[APIResponse]] = [None] * len(requests)
+        async for index, response in self.stream_batch(requests, max_workers=batch_size):
+            results[index] = response
+        return results
+    
+    def _has_fallback(self, request: Dict[str, Any]) -> bool:
+        """请求的模型被限流时，是否会被路由到其他模型"""
+        model_config = request['model_config']
+        return self._route_model(model_config, request.get('task_type')) is not model_config
+    
+    def _error_response(self, request: Dict[str, Any], error: Exception) -> APIResponse:
+        """为失败的请求创建错误响应"""
+        logger.error(f"批量调用中的错误: {str(error)}")
+        model_config = request.get('model_config')
+        return APIResponse(
+            request_id=self._generate_request_id(),
+            model_id=model_config.id if model_config else "unknown",
+            content="",
+            usage_stats=UsageStats(),
+            response_time=0.0,
+            quality_score=0.0,
+            timestamp=datetime.now(),
+            status_code=error.status_code if isinstance(error, APIStatusError) else 500,
+            error_message=str(error)
+        )
@@ -0,0 +1,145 @@
+"""
+自适应并发控制
+
+按 AIMD（加性增、乘性减）策略根据观测到的延迟和429比例动态调整并发上限。
+"""
+
+import asyncio
+import time
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConcurrencySlot:
+    """一次占用的并发名额，调用结束时记录结果"""
+    started_at: float
+    throttled: bool = False
+    failed: bool = False
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发限制器
+
+    - 每个成功且延迟正常的请求使上限增加 1/上限（约每轮增加1）
+    - 收到429时上限乘以 backoff_ratio；延迟超过基线的 latency_tolerance 倍时温和下调
+    - 同一拥塞窗口内只下调一次：只有在上次下调之后发出的请求才能再次触发
+    - 429比例（指数移动平均）高于 throttle_threshold 时暂停增长
+    """
+
+    def __init__(self,
+                 initial_limit: int = 4,
+                 min_limit: int = 1,
+                 max_limit: int = 32,
+                 backoff_ratio: float = 0.5,
+                 latency_backoff_ratio: float = 0.9,
+                 latency_tolerance: float = 2.0,
+                 throttle_threshold: float = 0.05,
+                 smoothing: float = 0.2):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("需要满足 1 <= min_limit <= initial_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_backoff_ratio = latency_backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.throttle_threshold = throttle_threshold
+        self.smoothing = smoothing
+
+        self._limit = float(initial_limit)
+        self.in_flight = 0
+        self.min_latency: Optional[float] = None
+        self.latency_ewma: Optional[float] = None
+        self.throttle_rate = 0.0
+        self.peak_in_flight = 0
+        self._last_decrease = float('-inf')
+        self._condition: Optional[asyncio.Condition] = None
+        self._condition_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return max(self.min_limit, int(self._limit))
+
+    def _get_condition(self) -> asyncio.Condition:
+        # 条件变量绑定事件循环，跨 asyncio.run 调用时重新创建
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+        return self._condition
+
+    async def acquire(self) -> ConcurrencySlot:
+        """等待并占用一个并发名额"""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return ConcurrencySlot(started_at=time.monotonic())
+
+    async def release(self, slot: ConcurrencySlot):
+        """释放名额并根据本次结果调整上限"""
+        self._observe(slot)
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[ConcurrencySlot]:
+        """占用名额的上下文管理器；调用方在其中设置 throttled/failed"""
+        slot = await self.acquire()
+        try:
+            yield slot
+        except BaseException:
+            slot.failed = True
+            raise
+        finally:
+            await self.release(slot)
+
+    def _observe(self, slot: ConcurrencySlot):
+        latency = time.monotonic() - slot.started_at
+        self.throttle_rate += self.smoothing * ((1.0 if slot.throttled else 0.0) - self.throttle_rate)
+
+        if slot.throttled:
+            self._decrease(slot, self.backoff_ratio, "429限流")
+            return
+        if slot.failed:
+            return  # 其他错误的延迟不代表服务容量
+
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.smoothing * (latency - self.latency_ewma)
+
+        if self.latency_ewma > self.min_latency * self.latency_tolerance:
+            self._decrease(slot, self.latency_backoff_ratio, "延迟升高")
+        elif self.throttle_rate <= self.throttle_threshold:
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+
+    def _decrease(self, slot: ConcurrencySlot, ratio: float, reason: str):
+        if slot.started_at < self._last_decrease:
+            return  # 本拥塞窗口内已经下调过
+        previous = self.limit
+        self._limit = max(float(self.min_limit), self._limit * ratio)
+        self._last_decrease = time.monotonic()
+        if self.limit != previous:
+            logger.info(f"并发上限下调 {previous} -> {self.limit}（{reason}）")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取当前并发控制状态"""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "min_latency": self.min_latency,
+            "latency_ewma": self.latency_ewma,
+            "throttle_rate": self.throttle_rate
+        }
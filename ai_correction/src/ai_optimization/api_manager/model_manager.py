@@ -93,6 +93,7 @@ class ModelManager:
         self._health_check_interval = 300  # 5分钟
         self._health_check_task: Optional[asyncio.Task] = None
         self._model_locks: Dict[str, asyncio.Semaphore] = {}
+        self._rate_limited_until: Dict[str, float] = {}  # 模型限流冷却截止时间（monotonic）
         
         # 加载模型配置
         self._load_models_from_config()
@@ -198,6 +199,7 @@ class ModelManager:
     def get_available_models(self, task_type: Optional[TaskType] = None) -> List[ModelConfig]:
         """获取可用模型列表"""
         available_models = []
+        self._restore_rate_limited_models()
         
         for model in self.models.values():
             if not model.is_available or model.status != ModelStatus.AVAILABLE:
@@ -426,6 +428,34 @@ class ModelManager:
             self.models[model_id].update_status(status, reason)
             logger.info(f"模型状态更新: {model_id} -> {status.value} ({reason})")
     
+    def mark_rate_limited(self, model_id: str, retry_after: float = 30.0):
+        """收到429后将模型标记为限流，冷却结束后自动恢复"""
+        if model_id not in self.models:
+            return
+        self._rate_limited_until[model_id] = time.monotonic() + max(retry_after, 0.0)
+        if self.models[model_id].status == ModelStatus.AVAILABLE:
+            self.set_model_status(model_id, ModelStatus.RATE_LIMITED, f"触发限流，{retry_after:.0f}秒后恢复")
+    
+    def is_model_healthy(self, model_id: str) -> bool:
+        """模型当前是否可以接收请求"""
+        model = self.models.get(model_id)
+        if model is None:
+            return False
+        self._restore_rate_limited_models()
+        return model.is_available and model.status == ModelStatus.AVAILABLE
+    
+    def _restore_rate_limited_models(self):
+        """恢复限流冷却已结束的模型"""
+        if not self._rate_limited_until:
+            return
+        now = time.monotonic()
+        for model_id, until in list(self._rate_limited_until.items()):
+            if until > now:
+                continue
+            del self._rate_limited_until[model_id]
+            if self.models[model_id].status == ModelStatus.RATE_LIMITED:
+                self.set_model_status(model_id, ModelStatus.AVAILABLE, "限流冷却结束")
+    
     def get_model_status(self, model_id: str) -> Optional[ModelStatus]:
         """获取模型状态"""
         model = self.models.get(model_id)
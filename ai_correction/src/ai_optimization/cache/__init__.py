@@ -5,10 +5,11 @@
 """
 
 from .intelligent_cache import IntelligentCache
-from .cache_policies import TTLCachePolicy, LRUCachePolicy, SizeLimitedCachePolicy
+from .cache_policies import CachePolicy, TTLCachePolicy, LRUCachePolicy, SizeLimitedCachePolicy
 
 __all__ = [
     "IntelligentCache",
+    "CachePolicy",
     "TTLCachePolicy",
     "LRUCachePolicy",
     "SizeLimitedCachePolicy"
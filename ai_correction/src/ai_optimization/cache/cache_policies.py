@@ -1,21 +1,68 @@
 """
-缓存策略（占位）
+缓存策略
+
+定义 IntelligentCache 使用的容量、过期和字节大小限制策略。
+策略只负责判断，条目的顺序维护与淘汰由 IntelligentCache 以 O(1) 完成。
 """
 
-class TTLCachePolicy:
+from typing import Optional
+
+
+class CachePolicy:
+    """缓存策略基类"""
+
+    # 策略是否依赖条目字节数；没有任何策略依赖时缓存不估算条目大小
+    limits_bytes = False
+
+    def is_over_limit(self, entry_count: int, total_bytes: int) -> bool:
+        """缓存是否超出策略限制（超出时淘汰最久未使用的条目）"""
+        return False
+
+    def get_ttl(self) -> Optional[float]:
+        """条目默认存活时间（秒），None 表示不过期"""
+        return None
+
+    def describe(self) -> dict:
+        """策略描述，用于统计输出"""
+        return {"policy": self.__class__.__name__}
+
+
+class TTLCachePolicy(CachePolicy):
     """TTL缓存策略"""
-    
+
     def __init__(self, ttl=3600):
         self.ttl = ttl
 
-class LRUCachePolicy:
+    def get_ttl(self) -> Optional[float]:
+        return self.ttl
+
+    def describe(self) -> dict:
+        return {"policy": self.__class__.__name__, "ttl": self.ttl}
+
+
+class LRUCachePolicy(CachePolicy):
     """LRU缓存策略"""
-    
+
     def __init__(self, max_size=1000):
         self.max_size = max_size
 
-class SizeLimitedCachePolicy:
+    def is_over_limit(self, entry_count: int, total_bytes: int) -> bool:
+        return entry_count > self.max_size
+
+    def describe(self) -> dict:
+        return {"policy": self.__class__.__name__, "max_size": self.max_size}
+
+
+class SizeLimitedCachePolicy(CachePolicy):
     """大小限制缓存策略"""
-    
+
+    limits_bytes = True
+
     def __init__(self, max_size=100*1024*1024):
-        self.max_size = max_size
\ No newline at end of file
+        self.max_size = max_size
+
+    def is_over_limit(self, entry_count: int, total_bytes: int) -> bool:
+        return total_bytes > self.max_size
+
+    def describe(self) -> dict:
+        return {"policy": self.__class__.__name__, "max_bytes": self.max_size}
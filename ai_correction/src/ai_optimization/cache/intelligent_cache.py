@@ -1,9 +1,394 @@
 """
-智能缓存（占位）
+智能缓存
+
+基于 OrderedDict 的 O(1) LRU 缓存，支持 TTL 过期、字节大小统计、
+命中率指标以及可选的磁盘溢出（淘汰条目写入磁盘，未命中时再读回）。
+持久化模式下条目写入即落盘，进程重启后仍可读回。
 """
 
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .cache_policies import CachePolicy, LRUCachePolicy
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+@dataclass
+class _CacheEntry:
+    """缓存条目"""
+    value: Any
+    size: int
+    expires_at: Optional[float] = None
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
+
+
 class IntelligentCache:
     """智能缓存"""
-    
-    def __init__(self):
-        pass
\ No newline at end of file
+
+    SPILL_SUFFIX = ".pkl"
+
+    def __init__(self, policies: Optional[Iterable[CachePolicy]] = None,
+                 name: str = "default",
+                 spill_dir: Optional[str] = None,
+                 spill_max_bytes: Optional[int] = None,
+                 persistent: bool = False,
+                 size_estimator: Optional[Callable[[Any], int]] = None):
+        """
+        初始化智能缓存
+
+        Args:
+            policies: 缓存策略列表，默认 LRUCachePolicy(1000)
+            name: 缓存名称，用于日志和统计
+            spill_dir: 磁盘溢出目录，为 None 时淘汰条目直接丢弃
+            spill_max_bytes: 磁盘溢出目录的最大字节数，为 None 时不限制
+            persistent: 持久化模式，写入时同步落盘（需要 spill_dir），
+                内存淘汰不影响磁盘副本
+            size_estimator: 自定义条目字节大小估算函数；未指定且没有字节上限策略时
+                不估算条目大小（字节统计为 0），避免每次写入都序列化整个值
+        """
+        self.name = name
+        self.policies: List[CachePolicy] = list(policies) if policies else [LRUCachePolicy()]
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.persistent = persistent and bool(spill_dir)
+        if size_estimator is not None:
+            self._size_estimator = size_estimator
+        elif any(policy.limits_bytes for policy in self.policies):
+            self._size_estimator = self.estimate_size
+        else:
+            self._size_estimator = None
+
+        self._entries: "OrderedDict[Any, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+        # 磁盘溢出索引：文件名 -> 字节数，按写入顺序排列
+        self._spill_index: "OrderedDict[str, int]" = OrderedDict()
+        self._spill_bytes = 0
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "spills": 0,
+            "spill_hits": 0,
+            "spill_evictions": 0
+        }
+
+        self._default_ttl = None
+        for policy in self.policies:
+            ttl = policy.get_ttl()
+            if ttl is not None:
+                self._default_ttl = ttl if self._default_ttl is None else min(self._default_ttl, ttl)
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._load_spill_index()
+
+    # ------------------------------------------------------------------
+    # 基本操作
+    # ------------------------------------------------------------------
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """获取缓存值，命中时将条目移动到最近使用位置"""
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                if entry.is_expired(now):
+                    self._remove_entry(key)
+                    self._stats["expirations"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+
+            if self.spill_dir:
+                spilled = self._load_from_disk(key, now)
+                if spilled is not None:
+                    self._stats["hits"] += 1
+                    self._stats["spill_hits"] += 1
+                    self._insert(key, spilled)
+                    return spilled.value
+
+            self._stats["misses"] += 1
+            return default
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None,
+            size: Optional[int] = None) -> None:
+        """写入缓存值，超出策略限制时淘汰最久未使用的条目"""
+        ttl = self._default_ttl if ttl is None else ttl
+        if size is None:
+            size = self._size_estimator(value) if self._size_estimator else 0
+        entry = _CacheEntry(
+            value=value,
+            size=size,
+            expires_at=time.time() + ttl if ttl is not None else None
+        )
+
+        # 持久化模式下在锁外序列化，锁内只替换文件并更新索引
+        tmp_path = self._dump_to_tmp(key, entry) if self.persistent else None
+
+        with self._lock:
+            if self.persistent:
+                if tmp_path is not None:
+                    self._commit_spill(key, tmp_path)
+            elif self.spill_dir:
+                self._remove_spilled(self._spill_file_name(key))
+            self._insert(key, entry)
+
+    def get_or_set(self, key: Any, factory: Callable[[], Any],
+                   ttl: Optional[float] = None) -> Any:
+        """获取缓存值，未命中时调用 factory 生成并写入"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl=ttl)
+        return value
+
+    def delete(self, key: Any) -> bool:
+        """删除缓存条目（包括磁盘溢出副本）"""
+        with self._lock:
+            removed = self._remove_entry(key)
+            if self.spill_dir:
+                removed = self._remove_spilled(self._spill_file_name(key)) or removed
+            return removed
+
+    def clear(self) -> None:
+        """清空缓存（包括磁盘溢出副本）"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            for file_name in list(self._spill_index.keys()):
+                self._remove_spilled(file_name)
+
+    def purge_expired(self) -> int:
+        """清理内存中所有已过期条目，返回清理数量"""
+        with self._lock:
+            now = time.time()
+            expired_keys = [key for key, entry in self._entries.items() if entry.is_expired(now)]
+            for key in expired_keys:
+                self._remove_entry(key)
+            self._stats["expirations"] += len(expired_keys)
+            return len(expired_keys)
+
+    def __contains__(self, key: Any) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not entry.is_expired(time.time())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> List[Any]:
+        """按最久未使用到最近使用的顺序返回内存中的键"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "bytes": self._total_bytes,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                **self._stats,
+                "spill_enabled": bool(self.spill_dir),
+                "persistent": self.persistent,
+                "spill_files": len(self._spill_index),
+                "spill_bytes": self._spill_bytes,
+                "policies": [policy.describe() for policy in self.policies]
+            }
+
+    def reset_stats(self) -> None:
+        """重置统计计数"""
+        with self._lock:
+            for stat in self._stats:
+                self._stats[stat] = 0
+
+    @staticmethod
+    def estimate_size(value: Any) -> int:
+        """估算条目字节大小"""
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if isinstance(value, str):
+            return len(value.encode("utf-8"))
+        try:
+            return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return sys.getsizeof(value)
+
+    # ------------------------------------------------------------------
+    # 内部实现
+    # ------------------------------------------------------------------
+
+    def _insert(self, key: Any, entry: _CacheEntry) -> None:
+        """插入条目并执行淘汰"""
+        self._remove_entry(key)
+        self._entries[key] = entry
+        self._total_bytes += entry.size
+        self._enforce_limits()
+
+    def _remove_entry(self, key: Any) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._total_bytes -= entry.size
+        return True
+
+    def _is_over_limit(self) -> bool:
+        return any(
+            policy.is_over_limit(len(self._entries), self._total_bytes)
+            for policy in self.policies
+        )
+
+    def _enforce_limits(self) -> None:
+        """按 LRU 顺序淘汰条目，直到满足所有策略限制"""
+        now = time.time()
+        while self._entries and self._is_over_limit():
+            key, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size
+            self._stats["evictions"] += 1
+
+            # 持久化模式下条目已在磁盘上，无需再次写入
+            if self.spill_dir and not self.persistent and not entry.is_expired(now):
+                self._write_to_disk(key, entry)
+
+    # ------------------------------------------------------------------
+    # 磁盘溢出
+    # ------------------------------------------------------------------
+
+    def _spill_file_name(self, key: Any) -> str:
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest() + self.SPILL_SUFFIX
+
+    def _load_spill_index(self) -> None:
+        """加载已有的磁盘溢出文件（按修改时间排序）"""
+        try:
+            files = [
+                entry for entry in os.scandir(self.spill_dir)
+                if entry.is_file() and entry.name.endswith(self.SPILL_SUFFIX)
+            ]
+        except OSError as e:
+            logger.warning(f"缓存 {self.name} 读取溢出目录失败: {e}")
+            return
+
+        for file_entry in sorted(files, key=lambda f: f.stat().st_mtime):
+            size = file_entry.stat().st_size
+            self._spill_index[file_entry.name] = size
+            self._spill_bytes += size
+
+    def _write_to_disk(self, key: Any, entry: _CacheEntry) -> None:
+        """将条目写入磁盘（溢出或持久化）"""
+        tmp_path = self._dump_to_tmp(key, entry)
+        if tmp_path is not None:
+            self._commit_spill(key, tmp_path)
+
+    def _dump_to_tmp(self, key: Any, entry: _CacheEntry) -> Optional[str]:
+        """将条目序列化到临时文件，不访问共享状态，可在锁外调用"""
+        path = os.path.join(self.spill_dir, self._spill_file_name(key))
+        # 每个线程使用独立的临时文件，避免并发写入同一个键时互相覆盖
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((key, entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"缓存 {self.name} 溢出写入失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        return tmp_path
+
+    def _commit_spill(self, key: Any, tmp_path: str) -> None:
+        """将临时文件替换为正式溢出文件并更新索引（需持有锁）"""
+        file_name = self._spill_file_name(key)
+        path = os.path.join(self.spill_dir, file_name)
+
+        try:
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"缓存 {self.name} 溢出写入失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self._remove_spill_index(file_name)
+        size = os.path.getsize(path)
+        self._spill_index[file_name] = size
+        self._spill_bytes += size
+        self._stats["spills"] += 1
+
+        if self.spill_max_bytes is not None:
+            while self._spill_bytes > self.spill_max_bytes and self._spill_index:
+                oldest = next(iter(self._spill_index))
+                self._remove_spilled(oldest)
+                self._stats["spill_evictions"] += 1
+
+    def _load_from_disk(self, key: Any, now: float) -> Optional[_CacheEntry]:
+        """从磁盘读回条目；溢出模式下读回后删除磁盘副本，持久化模式下保留"""
+        file_name = self._spill_file_name(key)
+        if file_name not in self._spill_index:
+            return None
+
+        path = os.path.join(self.spill_dir, file_name)
+        try:
+            with open(path, "rb") as f:
+                stored_key, entry = pickle.load(f)
+        except Exception as e:
+            logger.debug(f"缓存 {self.name} 溢出读取失败: {e}")
+            self._remove_spilled(file_name)
+            return None
+
+        if stored_key != key or entry.is_expired(now):
+            self._remove_spilled(file_name)
+            if stored_key == key:
+                self._stats["expirations"] += 1
+            return None
+
+        if self.persistent:
+            # 标记为最近使用，重启后按修改时间恢复顺序
+            self._spill_index.move_to_end(file_name)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        else:
+            self._remove_spilled(file_name)
+        return entry
+
+    def _remove_spill_index(self, file_name: str) -> None:
+        size = self._spill_index.pop(file_name, None)
+        if size is not None:
+            self._spill_bytes -= size
+
+    def _remove_spilled(self, file_name: str) -> bool:
+        if file_name not in self._spill_index:
+            return False
+        self._remove_spill_index(file_name)
+        try:
+            os.remove(os.path.join(self.spill_dir, file_name))
+        except OSError:
+            pass
+        return True
@@ -16,6 +16,7 @@ from datetime import datetime
 from PIL import Image, ImageOps
 import base64
 
+from ..cache import IntelligentCache, LRUCachePolicy, SizeLimitedCachePolicy
 from ..config.config_manager import ConfigManager
 from ..models.api_models import ModelConfig, TaskType
 
@@ -95,6 +96,15 @@ class ContentOptimizer:
         self.image_compressor = ImageCompressor(self.config)
         self.size_controller = SizeController(self.config)
         
+        # 压缩结果缓存：相同内容在相同限制下只压缩一次
+        self._compression_cache = IntelligentCache(
+            policies=[
+                LRUCachePolicy(self.config['compression_cache_entries']),
+                SizeLimitedCachePolicy(self.config['compression_cache_bytes'])
+            ],
+            name="content_compression"
+        )
+        
         logger.info("内容优化器初始化完成")
     
     def _load_config(self):
@@ -117,6 +127,12 @@ class ContentOptimizer:
             ),
             'enable_aggressive_compression': self.config_manager.get(
                 'ai_optimization.content_processor.enable_aggressive_compression', False
+            ),
+            'compression_cache_entries': self.config_manager.get(
+                'ai_optimization.content_processor.compression_cache_entries', 256
+            ),
+            'compression_cache_bytes': self.config_manager.get(
+                'ai_optimization.content_processor.compression_cache_bytes', 64 * 1024 * 1024
             )
         }
     
@@ -166,7 +182,7 @@ class ContentOptimizer:
         for item in optimized_content.text_items:
             if len(item.content) > self.config['max_text_length']:
                 original_length = len(item.content)
-                item.content = self.text_compressor.compress_text(
+                item.content = self._compress_text_cached(
                     item.content, self.config['max_text_length']
                 )
                 item.size = len(item.content.encode('utf-8'))
@@ -183,7 +199,7 @@ class ContentOptimizer:
         for item in optimized_content.image_items:
             if item.size > self.config['max_image_size']:
                 original_size = item.size
-                item.content = self.image_compressor.compress_image(
+                item.content = self._compress_image_cached(
                     item.content, self.config['max_image_size']
                 )
                 item.size = len(item.content)
@@ -246,6 +262,24 @@ class ContentOptimizer:
             optimization_metadata=optimization_metadata
         )
     
+    def _compress_text_cached(self, text: str, max_length: int) -> str:
+        """压缩文本（按内容哈希缓存）"""
+        cache_key = ('text', hashlib.sha256(text.encode('utf-8')).hexdigest(), max_length)
+        return self._compression_cache.get_or_set(
+            cache_key, lambda: self.text_compressor.compress_text(text, max_length)
+        )
+    
+    def _compress_image_cached(self, image_data: bytes, max_size: int) -> bytes:
+        """压缩图像（按内容哈希缓存）"""
+        cache_key = ('image', hashlib.sha256(image_data).hexdigest(), max_size)
+        return self._compression_cache.get_or_set(
+            cache_key, lambda: self.image_compressor.compress_image(image_data, max_size)
+        )
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取压缩缓存统计信息"""
+        return self._compression_cache.get_stats()
+    
     def _needs_optimization(self, content: ProcessedContent, model_config: ModelConfig) -> bool:
         """检查是否需要优化"""
         # 检查总大小
@@ -331,7 +365,7 @@ class ContentOptimizer:
                 
                 # 根据token数量压缩文本
                 target_length = self._estimate_length_from_tokens(target_tokens)
-                item.content = self.text_compressor.compress_text(item.content, target_length)
+                item.content = self._compress_text_cached(item.content, target_length)
                 item.size = len(item.content.encode('utf-8'))
                 
                 # 重新计算当前token数
@@ -345,7 +379,7 @@ class ContentOptimizer:
                 target_image_tokens = int(current_image_tokens * 0.7)  # 减少30%
                 target_size = self._estimate_size_from_image_tokens(target_image_tokens)
                 
-                item.content = self.image_compressor.compress_image(item.content, target_size)
+                item.content = self._compress_image_cached(item.content, target_size)
                 item.size = len(item.content)
                 
                 # 重新计算当前token数
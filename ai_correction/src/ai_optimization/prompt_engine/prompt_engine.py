@@ -14,6 +14,7 @@ from ..models.prompt_models import (
     PromptTemplate, GeneratedPrompt, PromptLayer, PromptParameter
 )
 from ..config.config_manager import ConfigManager
+from ..cache import IntelligentCache, LRUCachePolicy, TTLCachePolicy
 
 
 class ContextAnalyzer:
@@ -192,8 +193,17 @@ class PromptEngine:
         self.config = self._load_config()
         
         # 初始化缓存
-        self._prompt_cache = {}
-        self._feature_cache = {}
+        self._prompt_cache = IntelligentCache(
+            policies=[
+                LRUCachePolicy(self.config["prompt_cache_size"]),
+                TTLCachePolicy(self.config["prompt_cache_ttl"])
+            ],
+            name="prompt"
+        )
+        self._feature_cache = IntelligentCache(
+            policies=[LRUCachePolicy(self.config["feature_cache_size"])],
+            name="prompt_features"
+        )
     
     def _load_config(self) -> Dict[str, Any]:
         """加载配置"""
@@ -202,7 +212,10 @@ class PromptEngine:
             "enable_optimization": self.config_manager.get("prompt.enable_optimization", True),
             "cache_enabled": self.config_manager.get("prompt.cache_enabled", True),
             "default_language": self.config_manager.get("prompt.default_language", "zh"),
-            "quality_threshold": self.config_manager.get("prompt.quality_threshold", 0.8)
+            "quality_threshold": self.config_manager.get("prompt.quality_threshold", 0.8),
+            "prompt_cache_size": self.config_manager.get("prompt.cache_size", 1000),
+            "prompt_cache_ttl": self.config_manager.get("prompt.cache_ttl", 3600),
+            "feature_cache_size": self.config_manager.get("prompt.feature_cache_size", 2000)
         }
     
     def generate_prompt(self, template: PromptTemplate, content_info: Dict[str, Any],
@@ -260,13 +273,14 @@ class PromptEngine:
         # 生成特征缓存键
         cache_key = self._generate_feature_cache_key(content_info)
         
-        if cache_key in self._feature_cache:
+        features = self._feature_cache.get(cache_key)
+        if features is not None:
             self.logger.debug("使用缓存的内容特征")
-            return self._feature_cache[cache_key]
+            return features
         
         # 分析特征并缓存
         features = self.context_analyzer.analyze(content_info)
-        self._feature_cache[cache_key] = features
+        self._feature_cache.set(cache_key, features)
         
         return features
     
@@ -400,18 +414,12 @@ class PromptEngine:
     def _cache_prompt(self, prompt: GeneratedPrompt, features: Dict[str, Any]):
         """缓存提示词"""
         cache_key = f"{prompt.template_id}_{prompt.context_hash}"
-        self._prompt_cache[cache_key] = {
+        # 超出容量时由 LRU 策略 O(1) 淘汰，过期由 TTL 策略处理
+        self._prompt_cache.set(cache_key, {
             "prompt": prompt,
             "features": features,
             "timestamp": datetime.now()
-        }
-        
-        # 限制缓存大小
-        if len(self._prompt_cache) > 1000:
-            # 移除最旧的缓存项
-            oldest_key = min(self._prompt_cache.keys(), 
-                           key=lambda k: self._prompt_cache[k]["timestamp"])
-            del self._prompt_cache[oldest_key]
+        })
     
     def get_cached_prompt(self, template_id: str, content_info: Dict[str, Any],
                          parameters: Dict[str, Any] = None) -> Optional[GeneratedPrompt]:
@@ -427,17 +435,10 @@ class PromptEngine:
         
         cache_key = f"{template_id}_{context_hash}"
         
-        if cache_key in self._prompt_cache:
-            cached_item = self._prompt_cache[cache_key]
-            
-            # 检查缓存是否过期（1小时）
-            age = (datetime.now() - cached_item["timestamp"]).total_seconds()
-            if age < 3600:  # 1小时
-                self.logger.debug(f"使用缓存的提示词: {cache_key}")
-                return cached_item["prompt"]
-            else:
-                # 删除过期缓存
-                del self._prompt_cache[cache_key]
+        cached_item = self._prompt_cache.get(cache_key)
+        if cached_item is not None:
+            self.logger.debug(f"使用缓存的提示词: {cache_key}")
+            return cached_item["prompt"]
         
         return None
     
@@ -452,5 +453,7 @@ class PromptEngine:
         return {
             "prompt_cache_size": len(self._prompt_cache),
             "feature_cache_size": len(self._feature_cache),
-            "cache_enabled": self.config["cache_enabled"]
+            "cache_enabled": self.config["cache_enabled"],
+            "prompt_cache": self._prompt_cache.get_stats(),
+            "feature_cache": self._feature_cache.get_stats()
         }
\ No newline at end of file
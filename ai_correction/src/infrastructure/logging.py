@@ -381,6 +381,7 @@ class MetricsCollector:
         self.counters: Dict[str, int] = defaultdict(int)
         self.gauges: Dict[str, float] = {}
         self.timers: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+        self.events: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
         self._lock = threading.RLock()
     
     def increment_counter(self, name: str, value: int = 1, tags: Dict[str, str] = None):
@@ -407,6 +408,17 @@ class MetricsCollector:
             key = self._make_key(name, tags)
             self.metrics[key].append(value)
     
+    def record_event(self, name: str, fields: Dict[str, Any]):
+        """记录结构化事件（每个名称保留最近1000条）"""
+        with self._lock:
+            self.events[name].append({"timestamp": time.time(), **fields})
+    
+    def get_events(self, name: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取最近的结构化事件"""
+        with self._lock:
+            events = list(self.events.get(name, []))
+            return events[-limit:] if limit else events
+    
     def get_counter(self, name: str, tags: Dict[str, str] = None) -> int:
         """获取计数器值"""
         with self._lock:
@@ -488,6 +500,7 @@ class MetricsCollector:
             self.counters.clear()
             self.gauges.clear()
             self.timers.clear()
+            self.events.clear()
     
     def _make_key(self, name: str, tags: Dict[str, str] = None) -> str:
         """生成指标键"""
@@ -728,6 +741,20 @@ def get_performance_logger(name: str) -> PerformanceLogger:
     return PerformanceLogger(logger)
 
 
+_metrics_collector: Optional[MetricsCollector] = None
+_metrics_collector_lock = threading.Lock()
+
+
+def get_metrics_collector() -> MetricsCollector:
+    """获取进程共享的指标收集器"""
+    global _metrics_collector
+    if _metrics_collector is None:
+        with _metrics_collector_lock:
+            if _metrics_collector is None:
+                _metrics_collector = MetricsCollector()
+    return _metrics_collector
+
+
 if __name__ == "__main__":
     # 日志系统测试
     from src.config.settings import LoggingSettings
@@ -38,6 +38,7 @@ class TaskType(Enum):
     REPORT_GENERATION = "report_generation" # 报告生成
     DATA_EXPORT = "data_export"            # 数据导出
     SYSTEM_MAINTENANCE = "system_maintenance" # 系统维护
+    CLASS_GRADING = "class_grading"        # 班级作业批改
 
 
 @dataclass
@@ -165,6 +166,9 @@ class Task:
     # 依赖关系
     depends_on: List[str] = field(default_factory=list)  # 依赖的任务ID列表
     
+    # 并发分组（同一分组内的任务受分组并发上限约束，如同一作业的批改任务）
+    concurrency_group: Optional[str] = None
+    
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         return {
@@ -184,7 +188,8 @@ class Task:
             'last_updated': self.last_updated.isoformat(),
             'config': self.config.to_dict(),
             'created_by': self.created_by,
-            'depends_on': self.depends_on
+            'depends_on': self.depends_on,
+            'concurrency_group': self.concurrency_group
         }
     
     @classmethod
@@ -207,7 +212,8 @@ class Task:
             last_updated=datetime.fromisoformat(data.get('last_updated', datetime.now().isoformat())),
             config=TaskConfig.from_dict(data.get('config', {})),
             created_by=data.get('created_by'),
-            depends_on=data.get('depends_on', [])
+            depends_on=data.get('depends_on', []),
+            concurrency_group=data.get('concurrency_group')
         )
     
     def update_progress(self, current_step: str, completed_steps: int, total_steps: int, 
@@ -6,21 +6,26 @@
 """
 
 import json
+import os
 import sqlite3
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from datetime import datetime
 from pathlib import Path
 import logging
 
 from src.models.classroom_grading_task import ClassroomGradingTask, ClassroomTaskStatus
 from src.models.submission import Submission, SubmissionStatus
-from src.models.task import Task, TaskType, TaskPriority
+from src.models.task import Task, TaskConfig, TaskStatus, TaskType, TaskPriority
 from src.models.grading_config import GradingConfig
 from src.services.task_service import TaskService, get_task_service
 from src.services.grading_config_service import GradingConfigService
 from src.infrastructure.logging import get_logger
 
 
+# 单个作业同时批改的学生数（可通过环境变量配置）
+DEFAULT_ASSIGNMENT_CONCURRENCY = int(os.getenv('CLASS_GRADING_CONCURRENCY', '4'))
+
+
 class ClassroomGradingService:
     """班级批改服务"""
     
@@ -34,6 +39,9 @@ class ClassroomGradingService:
         self.task_service = task_service or get_task_service()
         self.grading_config_service = grading_config_service or GradingConfigService()
         
+        # 班级批改函数注册表（名称 -> 批改函数），任务数据中只保存名称以便持久化
+        self._grading_functions: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Any]] = {}
+        
         # 确保数据库存在
         self._ensure_database()
         
@@ -128,6 +136,137 @@ class ClassroomGradingService:
         
         # 注册处理器
         self.task_service.register_task_handler('classroom_grading', classroom_grading_handler)
+        self.task_service.register_task_handler(TaskType.CLASS_GRADING.value, self._class_grading_handler)
+    
+    def register_grading_function(self, name: str,
+                                  grading_function: Callable[[Dict[str, Any], Dict[str, Any]], Any]):
+        """注册班级批改函数，函数签名为 (assignment, submission) -> 批改结果"""
+        self._grading_functions[name] = grading_function
+        self.logger.info(f"注册班级批改函数: {name}")
+    
+    @staticmethod
+    def _assignment_group(assignment_id: int) -> str:
+        """作业批改任务的并发分组名"""
+        return f"assignment:{assignment_id}"
+    
+    def submit_assignment_grading(self, assignment: Dict[str, Any], submissions: List[Dict[str, Any]],
+                                  grading_function: str, max_concurrency: Optional[int] = None,
+                                  created_by: Optional[str] = None) -> List[str]:
+        """
+        将作业的提交批量提交到后台任务队列
+        
+        每份提交一个任务，同一作业的任务共享并发分组，并发数不超过 max_concurrency。
+        已在队列中等待或运行的提交不会重复提交。
+        """
+        if grading_function not in self._grading_functions:
+            raise ValueError(f"未注册的批改函数: {grading_function}")
+        
+        group = self._assignment_group(assignment['id'])
+        self.task_service.set_group_concurrency(group, max_concurrency or DEFAULT_ASSIGNMENT_CONCURRENCY)
+        
+        active_submissions = {
+            task.input_data.get('submission', {}).get('id')
+            for task in self.task_service.get_tasks_by_group(group)
+            if task.status in (TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.RETRYING)
+        }
+        
+        task_ids = []
+        for submission in submissions:
+            if submission['id'] in active_submissions:
+                continue
+            
+            task_id = self.task_service.create_task(
+                name=f"批改作业 - {assignment.get('title', '未知作业')}",
+                task_type=TaskType.CLASS_GRADING,
+                input_data={
+                    'grading_function': grading_function,
+                    'assignment': assignment,
+                    'submission': {
+                        'id': submission['id'],
+                        'student_username': submission['student_username'],
+                        'files': submission.get('files') or submission.get('answer_files') or []
+                    }
+                },
+                description=f"为学生 {submission['student_username']} 批改作业",
+                priority=TaskPriority.NORMAL,
+                # 首次执行失败即结束，未批改的提交可由教师重新发起批改
+                config=TaskConfig(max_retries=1),
+                created_by=created_by,
+                concurrency_group=group
+            )
+            task_ids.append(task_id)
+        
+        self.logger.info(f"作业 {assignment['id']} 已提交 {len(task_ids)} 个后台批改任务")
+        return task_ids
+    
+    def get_assignment_grading_progress(self, assignment_id: int) -> Dict[str, Any]:
+        """获取作业后台批改进度（每份提交取最近一次任务）"""
+        latest_tasks: Dict[Any, Task] = {}
+        for task in self.task_service.get_tasks_by_group(self._assignment_group(assignment_id)):
+            submission_id = task.input_data.get('submission', {}).get('id')
+            current = latest_tasks.get(submission_id)
+            if current is None or task.created_at > current.created_at:
+                latest_tasks[submission_id] = task
+        
+        tasks = list(latest_tasks.values())
+        status_counts = {status: 0 for status in TaskStatus}
+        for task in tasks:
+            status_counts[task.status] += 1
+        
+        total = len(tasks)
+        finished = status_counts[TaskStatus.COMPLETED] + status_counts[TaskStatus.FAILED] + \
+            status_counts[TaskStatus.CANCELLED]
+        
+        return {
+            'assignment_id': assignment_id,
+            'total': total,
+            'pending': status_counts[TaskStatus.PENDING] + status_counts[TaskStatus.RETRYING],
+            'running': status_counts[TaskStatus.RUNNING],
+            'completed': status_counts[TaskStatus.COMPLETED],
+            'failed': status_counts[TaskStatus.FAILED] + status_counts[TaskStatus.CANCELLED],
+            'progress': finished / total if total else 0.0,
+            'is_running': total > 0 and finished < total,
+            'running_students': [
+                task.input_data['submission']['student_username']
+                for task in tasks if task.status == TaskStatus.RUNNING
+            ],
+            'failures': [
+                {
+                    'student': task.input_data['submission']['student_username'],
+                    'error': task.errors[-1].error_message if task.errors else '未知错误'
+                }
+                for task in tasks if task.status in (TaskStatus.FAILED, TaskStatus.CANCELLED)
+            ]
+        }
+    
+    def _class_grading_handler(self, task: Task) -> Dict[str, Any]:
+        """班级作业批改任务处理器"""
+        grading_function = self._grading_functions.get(task.input_data.get('grading_function'))
+        if not grading_function:
+            raise ValueError(f"未注册的批改函数: {task.input_data.get('grading_function')}")
+        
+        submission = task.input_data['submission']
+        task.update_progress(
+            current_step="AI批改",
+            completed_steps=0,
+            total_steps=1,
+            current_operation=f"正在批改 {submission['student_username']} 的作业"
+        )
+        
+        result = grading_function(task.input_data['assignment'], submission)
+        
+        task.update_progress(
+            current_step="批改完成",
+            completed_steps=1,
+            total_steps=1,
+            current_operation="批改任务已完成"
+        )
+        
+        return {
+            'submission_id': submission['id'],
+            'student_username': submission['student_username'],
+            'result': result if isinstance(result, (dict, str, int, float, bool)) or result is None else str(result)
+        }
     
     def trigger_auto_grading(self, submission: Submission) -> str:
         """触发自动批改"""
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件预览服务
+上传时为图片生成固定尺寸缩略图、为PDF生成首页预览，按内容哈希保存在上传文件旁的
+.previews 目录，页面重跑时直接读取缓存预览，原图只在用户放大查看时加载
+"""
+
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps, features
+
+from src.infrastructure.logging import get_logger
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+PDF_EXTENSIONS = {'.pdf'}
+PREVIEW_DIR_NAME = '.previews'
+
+
+class PreviewService:
+    """文件预览服务"""
+
+    def __init__(self, max_size: int = 1024, quality: int = 80, memory_cache_size: int = 64):
+        self.max_size = max_size
+        self.quality = quality
+        self.memory_cache_size = memory_cache_size
+        self.logger = get_logger(f"{__name__}.PreviewService")
+
+        # 浏览器普遍支持 WebP，体积更小；Pillow 未编译 WebP 时退回 JPEG
+        if features.check('webp'):
+            self.format, self.mime_type, self.extension = 'WEBP', 'image/webp', 'webp'
+        else:
+            self.format, self.mime_type, self.extension = 'JPEG', 'image/jpeg', 'jpg'
+
+        self._lock = threading.Lock()
+        # (路径, 修改时间, 大小) -> 内容哈希，避免每次重跑都重新读取原文件
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        # 内容哈希 -> 预览图 base64
+        self._encoded: 'OrderedDict[str, str]' = OrderedDict()
+
+    # ------------------------------------------------------------------
+    # 内容寻址
+    # ------------------------------------------------------------------
+
+    def file_hash(self, file_path: str) -> str:
+        """计算文件内容的 SHA-256"""
+        stat = os.stat(file_path)
+        key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(key)
+        if cached:
+            return cached
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+
+        with self._lock:
+            self._hashes[key] = content_hash
+        return content_hash
+
+    def preview_path(self, file_path: str, content_hash: Optional[str] = None) -> Path:
+        """预览图位置：上传文件所在目录下的 .previews/<内容哈希>_<尺寸>.<格式>"""
+        content_hash = content_hash or self.file_hash(file_path)
+        return Path(file_path).parent / PREVIEW_DIR_NAME / f"{content_hash}_{self.max_size}.{self.extension}"
+
+    @staticmethod
+    def supports(file_path: str) -> bool:
+        """是否能为该文件生成预览"""
+        suffix = Path(file_path).suffix.lower()
+        return suffix in IMAGE_EXTENSIONS or suffix in PDF_EXTENSIONS
+
+    # ------------------------------------------------------------------
+    # 生成
+    # ------------------------------------------------------------------
+
+    def generate_preview(self, file_path: str) -> Optional[Path]:
+        """
+        生成预览图并返回其路径
+
+        同一内容只生成一次（重复上传的相同文件共享预览）；
+        不支持的类型或生成失败时返回 None。
+        """
+        if not self.supports(file_path) or not os.path.exists(file_path):
+            return None
+
+        try:
+            target = self.preview_path(file_path)
+            if target.exists():
+                return target
+
+            if Path(file_path).suffix.lower() in PDF_EXTENSIONS:
+                image = self._render_pdf_first_page(file_path)
+            else:
+                image = Image.open(file_path)
+            if image is None:
+                return None
+
+            with image:
+                # 按 EXIF 方向旋转：重新编码后方向标签丢失，浏览器无法再自动旋转
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((self.max_size, self.max_size), Image.Resampling.LANCZOS)
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                buffer = io.BytesIO()
+                image.save(buffer, format=self.format, quality=self.quality, optimize=True)
+
+            # 先写临时文件再替换，避免并发会话读到写了一半的预览
+            target.parent.mkdir(exist_ok=True)
+            tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(buffer.getvalue())
+            os.replace(tmp_path, target)
+            return target
+
+        except Exception as e:
+            self.logger.warning(f"生成预览失败 {os.path.basename(file_path)}: {e}")
+            return None
+
+    def _render_pdf_first_page(self, file_path: str) -> Optional[Image.Image]:
+        """用 PyMuPDF 渲染PDF首页，未安装时返回 None"""
+        try:
+            import fitz
+        except ImportError:
+            return None
+
+        with fitz.open(file_path) as doc:
+            if doc.page_count == 0:
+                return None
+            page = doc.load_page(0)
+            zoom = self.max_size / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            return Image.open(io.BytesIO(pixmap.tobytes('png')))
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def get_preview_base64(self, file_path: str) -> Optional[Tuple[str, str]]:
+        """
+        获取预览图的 (MIME类型, base64)
+
+        优先读取内存缓存，其次读取磁盘上的预览，预览不存在时（如旧的上传文件）即时生成。
+        """
+        if not self.supports(file_path) or not os.path.exists(file_path):
+            return None
+
+        try:
+            content_hash = self.file_hash(file_path)
+        except OSError as e:
+            self.logger.warning(f"读取文件失败 {os.path.basename(file_path)}: {e}")
+            return None
+
+        with self._lock:
+            encoded = self._encoded.get(content_hash)
+            if encoded:
+                self._encoded.move_to_end(content_hash)
+                return self.mime_type, encoded
+
+        target = self.preview_path(file_path, content_hash)
+        if not target.exists() and self.generate_preview(file_path) is None:
+            return None
+        encoded = base64.b64encode(target.read_bytes()).decode()
+
+        with self._lock:
+            self._encoded[content_hash] = encoded
+            while len(self._encoded) > self.memory_cache_size:
+                self._encoded.popitem(last=False)
+        return self.mime_type, encoded
@@ -41,6 +41,9 @@ class TaskQueue:
         # 任务处理器注册
         self._task_handlers: Dict[str, Callable] = {}
         
+        # 并发分组上限（分组名 -> 最大并发数）
+        self._group_limits: Dict[str, int] = {}
+        
         # 控制标志
         self._running = False
         self._shutdown = False
@@ -48,6 +51,9 @@ class TaskQueue:
         # 监控线程
         self._monitor_thread: Optional[threading.Thread] = None
         
+        # 唤醒事件：提交或完成任务时立即调度，无需等待下一轮轮询
+        self._wakeup = threading.Event()
+        
         # 锁
         self._lock = threading.RLock()
     
@@ -57,6 +63,13 @@ class TaskQueue:
             self._task_handlers[task_type] = handler
             self.logger.info(f"注册任务处理器: {task_type}")
     
+    def set_group_concurrency(self, group: str, max_concurrency: int):
+        """设置并发分组的最大并发数"""
+        with self._lock:
+            self._group_limits[group] = max(1, max_concurrency)
+            self.logger.info(f"设置分组并发上限: {group} = {self._group_limits[group]}")
+        self._wakeup.set()
+    
     def submit_task(self, task: Task) -> str:
         """提交任务到队列"""
         with self._lock:
@@ -80,7 +93,9 @@ class TaskQueue:
             self._add_history(task.id, "created", {"priority": task.priority.value})
             
             self.logger.info(f"任务已提交: {task.id} - {task.name}")
-            return task.id
+        
+        self._wakeup.set()
+        return task.id
     
     def start(self):
         """启动任务队列处理"""
@@ -244,6 +259,11 @@ class TaskQueue:
         """根据状态获取任务列表"""
         return [task for task in self._tasks.values() if task.status == status]
     
+    def get_tasks_by_group(self, group: str) -> List[Task]:
+        """获取并发分组内的任务列表"""
+        with self._lock:
+            return [task for task in self._tasks.values() if task.concurrency_group == group]
+    
     def get_queue_status(self) -> Dict[str, Any]:
         """获取队列状态"""
         with self._lock:
@@ -290,7 +310,9 @@ class TaskQueue:
                 if int(time.time()) % 300 == 0:  # 每5分钟清理一次
                     self.cleanup_expired_tasks()
                 
-                time.sleep(1)  # 1秒检查一次
+                # 最多1秒检查一次，有任务提交或完成时立即处理
+                self._wakeup.wait(1)
+                self._wakeup.clear()
                 
             except Exception as e:
                 self.logger.error(f"监控循环异常: {e}", exc_info=True)
@@ -320,12 +342,31 @@ class TaskQueue:
             for task in pending_tasks:
                 self._pending_queue.append(task.id)
             
-            # 启动任务
+            # 启动任务（分组并发已满的任务保留在队列中）
+            blocked_tasks = deque()
             while self._pending_queue and len(self._running_tasks) < self.max_workers:
                 task_id = self._pending_queue.popleft()
                 task = self._tasks.get(task_id)
-                if task:
-                    self._start_task(task)
+                if not task:
+                    continue
+                if self._is_group_full(task.concurrency_group):
+                    blocked_tasks.append(task_id)
+                    continue
+                self._start_task(task)
+            
+            self._pending_queue.extendleft(reversed(blocked_tasks))
+    
+    def _is_group_full(self, group: Optional[str]) -> bool:
+        """检查并发分组是否已达到并发上限"""
+        limit = self._group_limits.get(group) if group else None
+        if limit is None:
+            return False
+        
+        running = sum(
+            1 for task_id in self._running_tasks
+            if self._tasks[task_id].concurrency_group == group
+        )
+        return running >= limit
     
     def _start_task(self, task: Task):
         """启动任务"""
@@ -424,6 +465,7 @@ class TaskQueue:
             # 从运行队列中移除
             with self._lock:
                 self._running_tasks.pop(task.id, None)
+            self._wakeup.set()
     
     def _schedule_retry(self, task: Task):
         """安排重试"""
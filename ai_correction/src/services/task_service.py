@@ -6,6 +6,7 @@
 """
 
 import json
+import os
 import sqlite3
 from typing import Dict, List, Optional, Any, Callable
 from datetime import datetime, timedelta
@@ -242,7 +243,7 @@ class TaskService:
     def create_task(self, name: str, task_type: TaskType, input_data: Dict[str, Any],
                    description: str = "", priority: TaskPriority = TaskPriority.NORMAL,
                    config: Optional[TaskConfig] = None, created_by: Optional[str] = None,
-                   depends_on: List[str] = None) -> str:
+                   depends_on: List[str] = None, concurrency_group: Optional[str] = None) -> str:
         """创建新任务"""
         
         task = Task(
@@ -253,7 +254,8 @@ class TaskService:
             input_data=input_data,
             config=config or TaskConfig(),
             created_by=created_by,
-            depends_on=depends_on or []
+            depends_on=depends_on or [],
+            concurrency_group=concurrency_group
         )
         
         # 保存到数据库
@@ -323,6 +325,14 @@ class TaskService:
         """根据状态获取任务列表"""
         return self.task_queue.get_tasks_by_status(status)
     
+    def get_tasks_by_group(self, group: str) -> List[Task]:
+        """获取并发分组内的任务列表"""
+        return self.task_queue.get_tasks_by_group(group)
+    
+    def set_group_concurrency(self, group: str, max_concurrency: int):
+        """设置并发分组的最大并发数"""
+        self.task_queue.set_group_concurrency(group, max_concurrency)
+    
     def get_tasks_by_user(self, user_id: str) -> List[Task]:
         """获取用户的任务列表"""
         return [task for task in self.task_queue._tasks.values() if task.created_by == user_id]
@@ -438,7 +448,7 @@ def get_task_service() -> TaskService:
     """获取任务服务实例"""
     global _task_service
     if _task_service is None:
-        _task_service = TaskService()
+        _task_service = TaskService(max_workers=int(os.getenv('TASK_QUEUE_MAX_WORKERS', '4')))
     return _task_service
 
 
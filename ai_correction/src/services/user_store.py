@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用户存储服务
+以 SQLite 按用户、按记录分行保存本地用户和批改历史，替代整文件读写的 user_data.json
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.infrastructure.logging import get_logger
+
+
+class UserStore:
+    """用户存储服务"""
+
+    def __init__(self, db_path: str = "user_data.db", legacy_json_path: Optional[str] = "user_data.json"):
+        self.db_path = Path(db_path)
+        self.logger = get_logger(f"{__name__}.UserStore")
+        self._local = threading.local()
+
+        self._init_database()
+
+        if legacy_json_path:
+            self.migrate_from_json(legacy_json_path)
+        self.ensure_demo_user()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接（WAL 模式，读写互不阻塞）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def _init_database(self):
+        """初始化数据库"""
+        try:
+            with self._connect() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS users (
+                        username TEXT PRIMARY KEY,
+                        password TEXT NOT NULL,
+                        email TEXT,
+                        created_at TEXT
+                    )
+                ''')
+
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS grading_records (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        username TEXT NOT NULL,
+                        timestamp TEXT,
+                        files_count INTEGER DEFAULT 0,
+                        data TEXT NOT NULL,
+                        FOREIGN KEY (username) REFERENCES users (username) ON DELETE CASCADE
+                    )
+                ''')
+
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS store_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT
+                    )
+                ''')
+
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_records_user ON grading_records (username, id)')
+
+        except Exception as e:
+            self.logger.error(f"初始化用户数据库失败: {e}")
+            raise
+
+    # ------------------------------------------------------------------
+    # 迁移
+    # ------------------------------------------------------------------
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        一次性迁移 user_data.json
+
+        在单个事务中导入所有用户和历史记录，成功后将原文件重命名为 *.migrated，
+        迁移标记写入 store_meta，重复调用不会重复导入。返回迁移的记录数。
+        """
+        json_path = Path(json_path)
+        if not json_path.exists() or self._get_meta('json_migrated'):
+            return 0
+
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            self.logger.error(f"读取 {json_path} 失败，跳过迁移: {e}")
+            return 0
+
+        migrated_records = 0
+        with self._connect() as conn:
+            # 加写锁后再次检查，避免多个进程同时迁移
+            conn.execute('BEGIN IMMEDIATE')
+            if self._get_meta('json_migrated'):
+                return 0
+            for username, user in data.items():
+                conn.execute(
+                    'INSERT OR IGNORE INTO users (username, password, email, created_at) VALUES (?, ?, ?, ?)',
+                    (username, user.get('password', ''), user.get('email'), user.get('created_at'))
+                )
+                for record in user.get('records', []):
+                    self._insert_record(conn, username, record)
+                    migrated_records += 1
+            conn.execute(
+                'INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)',
+                ('json_migrated', datetime.now().isoformat())
+            )
+
+        os.replace(json_path, json_path.with_name(json_path.name + '.migrated'))
+        self.logger.info(f"已从 {json_path} 迁移 {len(data)} 个用户、{migrated_records} 条批改记录")
+        return migrated_records
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute('SELECT value FROM store_meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    # ------------------------------------------------------------------
+    # 用户
+    # ------------------------------------------------------------------
+
+    def ensure_demo_user(self):
+        """确保演示用户存在"""
+        self.create_user(
+            "demo",
+            hashlib.sha256("demo".encode()).hexdigest(),
+            "demo@example.com"
+        )
+
+    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        """获取用户信息（不含历史记录）"""
+        row = self._connect().execute(
+            'SELECT username, password, email, created_at FROM users WHERE username = ?', (username,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def create_user(self, username: str, password_hash: str, email: Optional[str] = None) -> bool:
+        """创建用户，用户名已存在时返回 False"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO users (username, password, email, created_at) VALUES (?, ?, ?, ?)',
+                (username, password_hash, email, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            return cursor.rowcount == 1
+
+    # ------------------------------------------------------------------
+    # 批改记录
+    # ------------------------------------------------------------------
+
+    def _insert_record(self, conn: sqlite3.Connection, username: str, record: Dict[str, Any]) -> int:
+        files_count = record.get('files_count', len(record.get('files', [])))
+        cursor = conn.execute(
+            'INSERT INTO grading_records (username, timestamp, files_count, data) VALUES (?, ?, ?, ?)',
+            (username, record.get('timestamp'), files_count, json.dumps(record, ensure_ascii=False, default=str))
+        )
+        return cursor.lastrowid
+
+    def add_record(self, username: str, record: Dict[str, Any]) -> Optional[int]:
+        """追加一条批改记录，用户不存在时返回 None"""
+        with self._connect() as conn:
+            exists = conn.execute('SELECT 1 FROM users WHERE username = ?', (username,)).fetchone()
+            if not exists:
+                return None
+            return self._insert_record(conn, username, record)
+
+    def get_records(self, username: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """分页获取批改记录（最新的在前），每条记录带有 record_id"""
+        rows = self._connect().execute(
+            'SELECT id, data FROM grading_records WHERE username = ? ORDER BY id DESC LIMIT ? OFFSET ?',
+            (username, limit, offset)
+        ).fetchall()
+        return [{**json.loads(row['data']), 'record_id': row['id']} for row in rows]
+
+    def get_record(self, username: str, record_id: int) -> Optional[Dict[str, Any]]:
+        """获取单条批改记录"""
+        row = self._connect().execute(
+            'SELECT id, data FROM grading_records WHERE username = ? AND id = ?', (username, record_id)
+        ).fetchone()
+        return {**json.loads(row['data']), 'record_id': row['id']} if row else None
+
+    def get_record_stats(self, username: str) -> Dict[str, int]:
+        """获取批改次数和处理文件总数"""
+        row = self._connect().execute(
+            'SELECT COUNT(*) AS count, COALESCE(SUM(files_count), 0) AS files FROM grading_records WHERE username = ?',
+            (username,)
+        ).fetchone()
+        return {'count': row['count'], 'files': row['files']}
+
+    def count_records(self, username: str) -> int:
+        """获取批改次数"""
+        return self.get_record_stats(username)['count']
+
+    def clear_records(self, username: str) -> int:
+        """清空用户的批改记录，返回删除数量"""
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM grading_records WHERE username = ?', (username,)).rowcount
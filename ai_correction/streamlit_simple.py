@@ -14,16 +14,21 @@ from pathlib import Path
 import time
 import re
 import base64
+import threading
 import html
-from functions.api_correcting import (
-    intelligent_correction_with_files, 
-    img_to_base64,
-    api_config,  # 导入API配置
-    call_tongyiqianwen_api,  # 导入API调用函数
-    batch_correction_with_standard,  # 添加批改函数
-    batch_correction_without_standard,  # 添加批改函数
-    simplified_batch_correction  # 添加简化批改函数
-)
+from functions.api_correcting import api_config  # 导入API配置（轻量模块）
+from functions.lazy_loader import can_import, has_module, lazy_function
+
+# 批改引擎（functions.api_correcting.calling_api）依赖 openai、PIL、PyMuPDF 等重量级库，
+# 首次调用时才加载，缩短应用冷启动时间
+_API_MODULE = 'functions.api_correcting'
+intelligent_correction_with_files = lazy_function(_API_MODULE, 'intelligent_correction_with_files')
+img_to_base64 = lazy_function(_API_MODULE, 'img_to_base64')
+call_tongyiqianwen_api = lazy_function(_API_MODULE, 'call_tongyiqianwen_api')  # 导入API调用函数
+batch_correction_with_standard = lazy_function(_API_MODULE, 'batch_correction_with_standard')  # 添加批改函数
+batch_correction_without_standard = lazy_function(_API_MODULE, 'batch_correction_without_standard')  # 添加批改函数
+simplified_batch_correction = lazy_function(_API_MODULE, 'simplified_batch_correction')  # 添加简化批改函数
+precompile_marking_scheme = lazy_function(_API_MODULE, 'precompile_marking_scheme')  # 批改标准预编译
 # 修复版批改函数已通过 functions.api_correcting 导入
 FIXED_API_AVAILABLE = True
 print("正在使用修复版API调用模块")
@@ -31,9 +36,11 @@ import logging
 import io
 from PIL import Image
 
+logger = logging.getLogger(__name__)
+
 # 导入班级系统数据库模块
 try:
-    from database import (
+    from cached_queries import (
         init_database,
         create_user,
         verify_user,
@@ -86,49 +93,38 @@ st.set_page_config(
 )
 
 # 导入额外API函数
-try:
-    from functions.api_correcting import (
-        correction_single_group,
-        generate_marking_scheme,
-        correction_with_marking_scheme,
-        correction_without_marking_scheme
-    )
-    
-    # 检查API配置状态（静默检查，不显示在主页面）
-    api_status = api_config.get_status()
-    if api_config.is_valid():
-        API_AVAILABLE = True
-    else:
-        API_AVAILABLE = False
-            
-except ImportError as e:
-    API_AVAILABLE = False
-    st.warning(f"⚠️ AI批改引擎未就绪：{str(e)}")
-
-# 导入LangGraph集成 - 简化版本（不包含OCR）
-try:
-    from functions.langgraph_integration_optimized import (
-        get_simplified_langgraph_integration,
-        intelligent_correction_with_files_langgraph_simplified
+correction_single_group = lazy_function(_API_MODULE, 'correction_single_group')
+generate_marking_scheme = lazy_function(_API_MODULE, 'generate_marking_scheme')
+correction_with_marking_scheme = lazy_function(_API_MODULE, 'correction_with_marking_scheme')
+correction_without_marking_scheme = lazy_function(_API_MODULE, 'correction_without_marking_scheme')
+
+# 检查API配置状态（静默检查，不显示在主页面）
+API_AVAILABLE = api_config.is_valid()
+
+# LangGraph集成 - 简化版本（不包含OCR），构建批改模式列表时才尝试导入
+def langgraph_available() -> bool:
+    """LangGraph 批改是否可用；导入失败时不提供该模式"""
+    return (
+        can_import('functions.langgraph_integration_optimized') and can_import('functions.langgraph_integration')
     )
-    from functions.langgraph_integration import (
-        show_langgraph_progress,
-        show_langgraph_results
-    )
-    LANGGRAPH_AVAILABLE = True
-    st.success("✅ LangGraph AI批改系统已就绪（简化版，不包含OCR）")
-except ImportError as e:
-    LANGGRAPH_AVAILABLE = False
-    st.warning(f"⚠️ LangGraph系统未就绪：{str(e)}")
 
-# 导入进度相关模块
-try:
-    from functions.progress_ui import show_progress_page, show_progress_modal
-    from functions.correction_service import get_correction_service
-    PROGRESS_AVAILABLE = True
-except ImportError as e:
-    PROGRESS_AVAILABLE = False
-    st.warning(f"⚠️ 进度模块未就绪：{str(e)}")
+get_simplified_langgraph_integration = lazy_function(
+    'functions.langgraph_integration_optimized', 'get_simplified_langgraph_integration'
+)
+intelligent_correction_with_files_langgraph_simplified = lazy_function(
+    'functions.langgraph_integration_optimized', 'intelligent_correction_with_files_langgraph_simplified'
+)
+show_langgraph_progress = lazy_function('functions.langgraph_integration', 'show_langgraph_progress')
+show_langgraph_results = lazy_function('functions.langgraph_integration', 'show_langgraph_results')
+
+# 进度相关模块
+PROGRESS_AVAILABLE = has_module('functions.progress_ui') and has_module('functions.correction_service')
+if PROGRESS_AVAILABLE:
+    show_progress_page = lazy_function('functions.progress_ui', 'show_progress_page')
+    show_progress_modal = lazy_function('functions.progress_ui', 'show_progress_modal')
+    get_correction_service = lazy_function('functions.correction_service', 'get_correction_service')
+else:
+    st.warning("⚠️ 进度模块未就绪")
     
     # 演示函数
     def correction_single_group(*files, **kwargs):
@@ -206,10 +202,13 @@ except ImportError:
     PREVIEW_AVAILABLE = False
 
 # 常量设置
-DATA_FILE = Path("user_data.json")
+DATA_FILE = Path("user_data.json")  # 旧版用户数据，首次启动时迁移到 USER_DB_FILE
+USER_DB_FILE = Path("user_data.db")
+HISTORY_PAGE_SIZE = 20
 UPLOAD_DIR = Path("uploads")
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = ['txt', 'md', 'pdf', 'docx', 'jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp']
+CLASS_GRADING_POLL_SECONDS = 2  # 后台批改进度刷新间隔（秒）
 
 # 确保目录存在
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -1365,8 +1364,8 @@ def preview_file(file_path, file_name):
         
         if file_type == 'image' and PREVIEW_AVAILABLE:
             try:
-                image = Image.open(file_path)
-                st.image(image, caption=file_name, use_column_width=True)
+                preview = get_preview_service().generate_preview(file_path)
+                st.image(str(preview or file_path), caption=file_name, use_column_width=True)
             except Exception as e:
                 st.error(f"图片预览失败: {e}")
                 
@@ -1471,32 +1470,22 @@ def init_session():
 >>>>>>> b42dfdc87b0c14ed38790b4ae0a68ff39e132e3d
 
 # 数据管理
-def read_users():
+@st.cache_resource
+def get_user_store():
+    """本地用户和批改历史存储（首次创建时自动迁移 user_data.json）"""
+    from src.services.user_store import UserStore
+    return UserStore(db_path=str(USER_DB_FILE), legacy_json_path=str(DATA_FILE))
+
+@st.cache_resource
+def get_preview_service():
+    """文件预览服务（缩略图按内容哈希缓存在上传目录的 .previews 下）"""
+    from src.services.preview_service import PreviewService
+    return PreviewService()
+
+def save_grading_record(record):
+    """保存批改记录到当前用户的历史"""
     try:
-        if DATA_FILE.exists():
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
-            data = {}
-        
-        # 确保demo用户存在
-        if "demo" not in data:
-            data["demo"] = {
-                "password": hashlib.sha256("demo".encode()).hexdigest(),
-                "email": "demo@example.com",
-                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "records": []
-            }
-            save_users(data)
-        
-        return data
-    except:
-        return {}
-
-def save_users(data):
-    try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        get_user_store().add_record(st.session_state.username, record)
     except Exception as e:
         st.error(f"保存失败: {e}")
 
@@ -1536,6 +1525,9 @@ def save_files(files, username, file_category=None):
         with open(file_path, "wb") as f:
             f.write(file.getbuffer())
         
+        # 上传时生成一次预览，结果页和历史页直接读取
+        get_preview_service().generate_preview(str(file_path))
+        
         # 返回包含路径和名称的字典
         saved_files_info.append({
             "path": str(file_path),
@@ -1743,8 +1735,8 @@ def show_login():
                                 st.error("用户名或密码错误")
                         else:
                             # 回退到文件系统
-                            users = read_users()
-                            stored_pwd = users.get(username, {}).get('password')
+                            user = get_user_store().get_user(username)
+                            stored_pwd = user['password'] if user else None
                             input_pwd = hashlib.sha256(password.encode()).hexdigest()
                             
                             if stored_pwd == input_pwd:
@@ -1791,15 +1783,11 @@ def show_login():
                                     st.error("用户名已存在")
                             else:
                                 # 回退到文件系统
-                                users = read_users()
-                                if new_username not in users:
-                                    users[new_username] = {
-                                        "password": hashlib.sha256(new_password.encode()).hexdigest(),
-                                        "email": new_email or f"{new_username}@example.com",
-                                        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                        "records": []
-                                    }
-                                    save_users(users)
+                                if get_user_store().create_user(
+                                    new_username,
+                                    hashlib.sha256(new_password.encode()).hexdigest(),
+                                    new_email or f"{new_username}@example.com"
+                                ):
                                     st.success("注册成功！请登录")
                                 else:
                                     st.error("用户名已存在")
@@ -2117,7 +2105,7 @@ def show_grading():
         ]
 
         # 如果LangGraph可用，添加LangGraph选项
-        if LANGGRAPH_AVAILABLE:
+        if langgraph_available():
             mode_options.append(("🧠 LangGraph智能批改", "langgraph"))
 
         mode = st.selectbox(
@@ -2138,7 +2126,7 @@ def show_grading():
                     saved_marking_files = save_files(marking_files or [], st.session_state.username) if marking_files else []
                     
                     # 根据模式选择批改方法
-                    if mode == "langgraph" and LANGGRAPH_AVAILABLE:
+                    if mode == "langgraph" and langgraph_available():
                         st.info("🧠 LangGraph智能批改系统启动中...")
 
                         # 创建进度显示容器
@@ -2186,25 +2174,22 @@ def show_grading():
                         )
                     
                     # 保存记录
-                    users = read_users()
-                    if st.session_state.username in users:
-                        all_file_names = []
-                        if question_files:
-                            all_file_names.extend([f"[题目]{f.name}" for f in question_files])
-                        if answer_files:
-                            all_file_names.extend([f"[答案]{f.name}" for f in answer_files])
-                        if marking_files:
-                            all_file_names.extend([f"[标准]{f.name}" for f in marking_files])
-                        
-                        record = {
-                            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            'files': all_file_names,
-                            'settings': {'strictness': strictness, 'language': language, 'mode': mode},
-                            'result': result,
-                            'files_count': len(all_uploaded_files)
-                        }
-                        users[st.session_state.username]['records'].append(record)
-                        save_users(users)
+                    all_file_names = []
+                    if question_files:
+                        all_file_names.extend([f"[题目]{f.name}" for f in question_files])
+                    if answer_files:
+                        all_file_names.extend([f"[答案]{f.name}" for f in answer_files])
+                    if marking_files:
+                        all_file_names.extend([f"[标准]{f.name}" for f in marking_files])
+                    
+                    record = {
+                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        'files': all_file_names,
+                        'settings': {'strictness': strictness, 'language': language, 'mode': mode},
+                        'result': result,
+                        'files_count': len(all_uploaded_files)
+                    }
+                    save_grading_record(record)
                     
                     # 保存批改结果和文件数据，跳转到结果页面
                     st.session_state.correction_result = result
@@ -2247,18 +2232,15 @@ def show_result():
         # 保存历史记录到用户数据中
         if st.session_state.logged_in and st.session_state.correction_result and st.session_state.uploaded_files_data:
             try:
-                users = read_users()
-                if st.session_state.username in users:
-                    record = {
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'files': [f.get('display_name', f.get('name', 'unknown')) for f in st.session_state.uploaded_files_data],
-                        'file_data': st.session_state.uploaded_files_data,
-                        'settings': st.session_state.get('correction_settings', {}),
-                        'result': st.session_state.correction_result,
-                        'files_count': len(st.session_state.uploaded_files_data)
-                    }
-                    users[st.session_state.username]['records'].append(record)
-                    save_users(users)
+                record = {
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'files': [f.get('display_name', f.get('name', 'unknown')) for f in st.session_state.uploaded_files_data],
+                    'file_data': st.session_state.uploaded_files_data,
+                    'settings': st.session_state.get('correction_settings', {}),
+                    'result': st.session_state.correction_result,
+                    'files_count': len(st.session_state.uploaded_files_data)
+                }
+                get_user_store().add_record(st.session_state.username, record)
             except Exception as e:
                 st.error(f"保存历史记录失败：{str(e)}")
     
@@ -2317,8 +2299,9 @@ def show_result():
         if files_data and current_index < len(files_data):
             current_file = files_data[current_index]
             
-            # 生成预览内容
-            preview_html = generate_file_preview_html(current_file)
+            # 生成预览内容（默认显示缩略图，勾选后才加载原图）
+            full_resolution = st.checkbox("🔍 查看原图", key=f"full_resolution_{current_index}")
+            preview_html = generate_file_preview_html(current_file, full_resolution=full_resolution)
             
             # 使用components.html显示
             st.components.v1.html(preview_html, height=520, scrolling=True)
@@ -2503,8 +2486,8 @@ def show_result():
             st.session_state.page = "history"
             st_rerun()
 
-def generate_file_preview_html(file_data):
-    """生成文件预览的完整HTML"""
+def generate_file_preview_html(file_data, full_resolution=False):
+    """生成文件预览的完整HTML（默认使用缓存的缩略图，full_resolution 时加载原图）"""
     
     # 基础HTML模板
     base_template = """
@@ -2580,9 +2563,13 @@ def generate_file_preview_html(file_data):
     if file_type == 'image':
         # 图片预览
         try:
-            image_base64 = get_image_base64(file_data['path'])
+            preview = None if full_resolution else get_preview_service().get_preview_base64(file_data['path'])
+            if preview:
+                mime_type, image_base64 = preview
+            else:
+                mime_type, image_base64 = "image/png", get_image_base64(file_data['path'])
             if image_base64:
-                content = f'<h3>🖼️ {html.escape(file_data["name"])}</h3><img src="data:image/png;base64,{image_base64}" alt="Preview" />'
+                content = f'<h3>🖼️ {html.escape(file_data["name"])}</h3><img src="data:{mime_type};base64,{image_base64}" alt="Preview" />'
             else:
                 content = '<div class="error"><p>图片加载失败</p></div>'
         except Exception as e:
@@ -2603,10 +2590,18 @@ def generate_file_preview_html(file_data):
             import os
             file_size_mb = os.path.getsize(file_data['path']) / (1024 * 1024)
             
+            # 首页预览（需要 PyMuPDF，未安装时只显示文档信息）
+            first_page_html = ''
+            preview = get_preview_service().get_preview_base64(file_data['path'])
+            if preview:
+                mime_type, image_base64 = preview
+                first_page_html = f'<img src="data:{mime_type};base64,{image_base64}" alt="第1页" style="margin-bottom: 10px;" />'
+            
             # 显示PDF文档信息
             content = f'''
             <div style="border: 1px solid #ddd; border-radius: 8px; padding: 15px; background: #f8f9fa;">
                 <h3 style="margin-top: 0;">📄 {html.escape(file_data["name"])}</h3>
+                {first_page_html}
                 <div style="margin: 10px 0;">
                     <p style="margin: 5px 0; color: #666;">
                         <strong>文件大小:</strong> {file_size_mb:.1f} MB
@@ -2700,18 +2695,15 @@ def show_result_original():
                 )
                 
                 # 保存记录
-                users = read_users()
-                if st.session_state.username in users:
-                    record = {
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'files': [f['display_name'] for f in task['all_file_info']],
-                        'file_data': task['all_file_info'],
-                        'settings': settings,
-                        'result': result,
-                        'files_count': len(task['all_file_info'])
-                    }
-                    users[st.session_state.username]['records'].append(record)
-                    save_users(users)
+                record = {
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'files': [f['display_name'] for f in task['all_file_info']],
+                    'file_data': task['all_file_info'],
+                    'settings': settings,
+                    'result': result,
+                    'files_count': len(task['all_file_info'])
+                }
+                save_grading_record(record)
                 
                 # 保存结果并更新状态
                 st.session_state.correction_result = result
@@ -3312,8 +3304,16 @@ def show_result_original():
                     
                     if file_type == 'image':
                         try:
-                            # 获取图片的base64编码
-                            image_base64 = get_image_base64(current_file['path'])
+                            # 获取缓存的缩略图，勾选查看原图时才编码原图
+                            file_ext = current_file['path'].split('.')[-1].lower()
+                            mime_type = f"image/{file_ext}" if file_ext in ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'] else "image/jpeg"
+                            image_base64 = None
+                            if not st.checkbox("🔍 查看原图", key=f"full_resolution_original_{st.session_state.current_file_index}"):
+                                preview = get_preview_service().get_preview_base64(current_file['path'])
+                                if preview:
+                                    mime_type, image_base64 = preview
+                            if not image_base64:
+                                image_base64 = get_image_base64(current_file['path'])
                             if not image_base64:
                                 # 尝试重新获取base64
                                 import base64
@@ -3321,9 +3321,6 @@ def show_result_original():
                                     image_base64 = base64.b64encode(img_file.read()).decode()
                             
                             if image_base64:
-                                file_ext = current_file['path'].split('.')[-1].lower()
-                                mime_type = f"image/{file_ext}" if file_ext in ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'] else "image/jpeg"
-                                
                                 # 图片预览HTML - 优化滚动和缩放体
                                 image_info = f'<div class="image-info-bar" style="position: sticky; top: 0; z-index: 5; background: rgba(74, 85, 104, 0.95); backdrop-filter: blur(8px); color: #e2e8f0; font-size: 0.85rem; margin: 0 -10px 20px -10px; padding: 12px 20px; font-weight: 600; text-align: center; border-bottom: 2px solid rgba(96, 165, 250, 0.3); box-shadow: 0 2px 8px rgba(0,0,0,0.3);">🖼️ 图片预览: {current_file["name"]}</div>'
                                 
@@ -3543,7 +3540,7 @@ def show_result_original():
             st.markdown("#### 🧠 LangGraph智能分析")
 
             # 显示LangGraph特殊结果
-            if LANGGRAPH_AVAILABLE:
+            if langgraph_available():
                 show_langgraph_results(st.session_state.langgraph_result)
 
             # 显示传统文本结果
@@ -3621,10 +3618,10 @@ def show_history():
     
     st.markdown('<h2 class="main-title">📚 批改历史</h2>', unsafe_allow_html=True)
     
-    users = read_users()
-    records = users.get(st.session_state.username, {}).get('records', [])
+    user_store = get_user_store()
+    stats = user_store.get_record_stats(st.session_state.username)
     
-    if not records:
+    if not stats['count']:
         st.info("暂无批改记录")
         if st.button("🚀 开始批改", use_container_width=True):
             st.session_state.page = "grading"
@@ -3634,17 +3631,15 @@ def show_history():
     # 统计信息 - 增强样式
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("📊 总批改次数", len(records))
+        st.metric("📊 总批改次数", stats['count'])
     with col2:
-        total_files = sum(r.get('files_count', len(r.get('files', []))) for r in records)
-        st.metric("📁 处理文件数量", total_files)
+        st.metric("📁 处理文件数量", stats['files'])
     with col3:
         if st.button("🗑️ 清空历史", help="清空所有历史记录"):
             if 'confirm_delete' not in st.session_state:
                 st.session_state.confirm_delete = True
             else:
-                users[st.session_state.username]['records'] = []
-                save_users(users)
+                user_store.clear_records(st.session_state.username)
                 del st.session_state.confirm_delete
                 st.success('✅ 历史记录已清空')
                 st_rerun()
@@ -3655,8 +3650,7 @@ def show_history():
         col_confirm, col_cancel = st.columns(2)
         with col_confirm:
             if st.button("✅ 是，清空", use_container_width=True, type="primary"):
-                users[st.session_state.username]['records'] = []
-                save_users(users)
+                user_store.clear_records(st.session_state.username)
                 del st.session_state.confirm_delete
                 st.success("✅ 历史记录已清空")
                 st_rerun()
@@ -3667,10 +3661,15 @@ def show_history():
     
     st.markdown("---")
     
-    # 记录列表 - 增强显示
+    # 记录列表 - 增强显示（分页加载，只读取当前页的记录）
     st.subheader("📋 历史记录列表")
     
-    for i, record in enumerate(reversed(records), 1):
+    total_pages = (stats['count'] + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+    history_page = min(st.session_state.get('history_page', 0), total_pages - 1)
+    offset = history_page * HISTORY_PAGE_SIZE
+    records = user_store.get_records(st.session_state.username, limit=HISTORY_PAGE_SIZE, offset=offset)
+    
+    for i, record in enumerate(records, offset + 1):
         # 获取记录信息
         timestamp = record.get('timestamp', '未知时间')
         files = record.get('files', ['无文件信息'])
@@ -3825,6 +3824,21 @@ def show_history():
                     st.button("💾 无结果", disabled=True, use_container_width=True, 
                              help="该记录没有可下载的结果")
     
+    # 分页
+    if total_pages > 1:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("⬅️ 上一页", disabled=history_page == 0, use_container_width=True):
+                st.session_state.history_page = history_page - 1
+                st_rerun()
+        with col_page:
+            st.markdown(f"<div style='text-align: center;'>第 {history_page + 1} / {total_pages} 页</div>",
+                        unsafe_allow_html=True)
+        with col_next:
+            if st.button("下一页 ➡️", disabled=history_page >= total_pages - 1, use_container_width=True):
+                st.session_state.history_page = history_page + 1
+                st_rerun()
+    
     # 底部操作
     st.markdown("---")
     col1, col2 = st.columns(2)
@@ -3909,8 +3923,7 @@ def show_sidebar():
             st.markdown("---")
             
             # 统计信息
-            users = read_users()
-            count = len(users.get(st.session_state.username, {}).get('records', []))
+            count = get_user_store().count_records(st.session_state.username)
             st.metric("批改次数", count)
             
             st.markdown("---")
@@ -4285,6 +4298,7 @@ def show_teacher_assignments():
                         )
                         
                         if assignment_id:
+                            warm_marking_scheme(saved_marking_files)
                             st.success(f"🎉 作业创建成功！")
                             
                             # 发送通知给班级学生
@@ -5390,7 +5404,11 @@ def show_simplified_grading_center():
             
             with col4:
                 # 统一的操作按钮
-                if status['ungraded'] > 0:
+                grading_progress = get_class_grading_service().get_assignment_grading_progress(assignment['id'])
+                if grading_progress['is_running']:
+                    st.button("⏳ 后台批改中", key=f"grading_running_{assignment['id']}",
+                              disabled=True, use_container_width=True)
+                elif status['ungraded'] > 0:
                     if st.button("🚀 开始批改", key=f"unified_grade_{assignment['id']}",
                                type="primary", use_container_width=True):
                         # 根据是否有批改标准选择不同的批改方式
@@ -5403,6 +5421,11 @@ def show_simplified_grading_center():
                                use_container_width=True):
                         show_grading_results_summary(assignment['id'], assignment)
             
+            # 后台批改进度（页面刷新后根据任务队列恢复显示）
+            if grading_progress['is_running'] or \
+                    assignment['id'] in st.session_state.get('watched_grading_assignments', set()):
+                show_class_grading_progress(assignment['id'])
+            
             st.markdown("---")
     
     # 移除手动批改的单独界面 - 统一处理
@@ -5607,6 +5630,7 @@ def show_quick_assignment_form(class_id):
                    )
                    
                    if assignment_id:
+                       warm_marking_scheme(saved_marking_files)
                        st.success("✅ 作业发布成功！")
                        st_rerun()
                    else:
@@ -5762,8 +5786,6 @@ def show_grading_result_preview(submission, assignment):
 # 后台批改启动函数
 def start_background_grading(assignment_id, assignment):
    """启动后台批改任务"""
-   st.info("🚀 批改任务已启动，将在后台进行...")
-   
    try:
        submissions = get_assignment_submissions(assignment_id)
        ungraded_submissions = [s for s in submissions if not s.get('ai_result')]
@@ -5772,53 +5794,9 @@ def start_background_grading(assignment_id, assignment):
            st.info("✅ 所有作业都已批改完成")
            return
        
-       # 创建后台任务标记
-       st.session_state.background_grading = {
-           'assignment_id': assignment_id,
-           'total': len(ungraded_submissions),
-           'completed': 0,
-           'status': 'running'
-       }
-       
-       # 模拟后台批改（实际应该用异步任务）
-       progress_bar = st.progress(0)
-       status_text = st.empty()
-       
-       for i, submission in enumerate(ungraded_submissions):
-           status_text.text(f"正在批改 {submission['student_username']} 的作业...")
-           
-           try:
-               # 调用AI批改
-               result = batch_correction_with_standard(
-                   marking_scheme_files=assignment['marking_files'],
-                   student_answer_files=submission['files'],
-                   strictness_level="标准"
-               )
-               
-               # 保存结果
-               update_submission_ai_result(submission['id'], str(result))
-               
-               # 发送通知
-               add_notification(
-                   submission['student_username'],
-                   f"作业已批改：{assignment['title']}",
-                   f"您的作业已完成批改，请查看结果。",
-                   "success"
-               )
-               
-               progress_bar.progress((i + 1) / len(ungraded_submissions))
-               
-           except Exception as e:
-               st.error(f"❌ 批改 {submission['student_username']} 的作业失败：{str(e)}")
-       
-       status_text.text("✅ 批改完成！")
-       st.success(f"🎉 成功批改 {len(ungraded_submissions)} 份作业！")
-       
-       # 清除后台任务标记
-       if 'background_grading' in st.session_state:
-           del st.session_state.background_grading
-       
-       st_rerun()
+       # 提交到后台任务队列，批改不占用当前页面会话
+       submitted = submit_class_grading(assignment_id, assignment, ungraded_submissions, 'with_standard')
+       st.info(f"🚀 已提交 {submitted} 份作业到后台批改，可以离开或刷新页面")
        
    except Exception as e:
        st.error(f"❌ 批改失败：{str(e)}")
@@ -5864,6 +5842,20 @@ def share_result_to_class(submission, assignment):
    except Exception as e:
        st.error(f"❌ 分享失败：{str(e)}")
 
+# 批改标准预编译
+def warm_marking_scheme(marking_files):
+    """后台预编译并学习批改标准，该作业所有学生的批改直接复用"""
+    if not marking_files:
+        return
+    
+    def warm():
+        try:
+            precompile_marking_scheme(list(marking_files), learn=True)
+        except Exception as e:
+            logger.warning(f"批改标准预编译失败: {e}")
+    
+    threading.Thread(target=warm, daemon=True).start()
+
 # 保存作业文件的辅助函数
 def save_assignment_file(file, file_type, username):
    """保存作业文件"""
@@ -6253,78 +6245,133 @@ def start_enhanced_batch_grading(assignment_id, assignment, ungraded_count):
 
 # 执行增强批改
 def execute_enhanced_batch_grading(assignment_id, assignment, ungraded_submissions):
-    """执行增强的批量批改"""
-    progress_container = st.container()
+    """执行增强的批量批改（提交到后台任务队列并发执行）"""
+    submitted = submit_class_grading(assignment_id, assignment, ungraded_submissions, 'with_standard')
+    st.success(f"🚀 已提交 {submitted} 份作业到后台批改，可以离开或刷新页面，进度会自动更新")
+
+# 后台班级批改服务
+@st.cache_resource
+def get_class_grading_service():
+    """获取班级批改服务（进程内共享，页面刷新或关闭后批改任务继续执行）"""
+    from src.services.classroom_grading_service import ClassroomGradingService
+    
+    service = ClassroomGradingService()
+    service.register_grading_function('with_standard', grade_submission_with_standard)
+    service.register_grading_function('without_standard', grade_submission_without_standard)
+    return service
+
+def submit_class_grading(assignment_id, assignment, ungraded_submissions, grading_function):
+    """提交后台批改任务，返回新提交的任务数"""
+    task_ids = get_class_grading_service().submit_assignment_grading(
+        assignment,
+        ungraded_submissions,
+        grading_function,
+        created_by=st.session_state.get('username')
+    )
+    st.session_state.setdefault('watched_grading_assignments', set()).add(assignment_id)
+    return len(task_ids)
+
+def grade_submission_with_standard(assignment, submission):
+    """批改单份作业（有批改标准），在后台任务线程中执行"""
+    # 服务重启后任务可能被重新执行，已批改的提交直接跳过
+    if get_grading_result(assignment['id'], submission['student_username']):
+        return 'skipped'
+    
+    # 调用AI批改
+    result = batch_correction_with_standard(
+        marking_scheme_files=assignment['marking_files'],
+        student_answer_files=submission['files'],
+        strictness_level="标准"
+    )
     
-    with progress_container:
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        results_container = st.container()
-        
-        success_count = 0
-        failed_submissions = []
-        
-        for i, submission in enumerate(ungraded_submissions):
-            status_text.text(f"🤖 正在批改 {submission['student_username']} 的作业... ({i+1}/{len(ungraded_submissions)})")
-            
-            try:
-                # 调用AI批改
-                result = batch_correction_with_standard(
-                    marking_scheme_files=assignment['marking_files'],
-                    student_answer_files=submission['files'],
-                    strictness_level="标准"
-                )
-                
-                # 保存结果
-                update_submission_ai_result(submission['id'], str(result))
-                
-                # 发送通知
-                add_notification(
-                    submission['student_username'],
-                    f"作业已批改：{assignment['title']}",
-                    f"您的作业已完成AI批改，请查看结果。",
-                    "success"
-                )
-                
-                success_count += 1
-                
-                # 显示实时结果
-                with results_container:
-                    st.success(f"✅ {submission['student_username']} - 批改完成")
-                
-            except Exception as e:
-                failed_submissions.append({
-                    'student': submission['student_username'],
-                    'error': str(e)
-                })
-                
-                with results_container:
-                    st.error(f"❌ {submission['student_username']} - 批改失败：{str(e)}")
-            
-            # 更新进度
-            progress_bar.progress((i + 1) / len(ungraded_submissions))
-        
-        # 显示最终结果
-        status_text.text("🎉 批改任务完成！")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("成功批改", success_count, delta=f"✅ {success_count}")
-        with col2:
-            st.metric("失败数量", len(failed_submissions), delta=f"❌ {len(failed_submissions)}")
-        
-        if failed_submissions:
-            with st.expander("❌ 失败详情", expanded=False):
-                for failed in failed_submissions:
-                    st.error(f"**{failed['student']}**: {failed['error']}")
-        
-        if success_count > 0:
-            st.balloons()
-            st.success(f"🎉 批改完成！成功批改 {success_count} 份作业")
-        
-        # 自动刷新页面
-        time.sleep(2)
-        st_rerun()
+    # 保存结果
+    update_submission_ai_result(submission['id'], str(result))
+    
+    # 发送通知
+    add_notification(
+        submission['student_username'],
+        f"作业已批改：{assignment['title']}",
+        f"您的作业已完成AI批改，请查看结果。",
+        "success"
+    )
+    return 'graded'
+
+def grade_submission_without_standard(assignment, submission):
+    """批改单份作业（无批改标准），在后台任务线程中执行"""
+    if get_grading_result(assignment['id'], submission['student_username']):
+        return 'skipped'
+    
+    # 检查学生提交的文件
+    if not submission.get('files') or len(submission['files']) == 0:
+        raise ValueError("学生未提交任何文件")
+    
+    # 验证文件是否存在
+    valid_files = []
+    for file_path in submission['files']:
+        if Path(file_path).exists():
+            valid_files.append(file_path)
+        else:
+            print(f"警告：文件不存在 {file_path}")
+    
+    if not valid_files:
+        raise ValueError("学生提交的文件都不存在")
+    
+    # 调用无标准AI批改
+    if assignment.get('question_files'):
+        # 有题目文件的情况
+        result = batch_correction_without_standard(
+            question_files=assignment['question_files'],
+            student_answer_files=valid_files,
+            strictness_level="标准"
+        )
+    else:
+        # 没有题目文件，纯粹基于学生答案进行分析
+        result = intelligent_correction_with_files(
+            answer_files=valid_files,
+            marking_scheme_files=[],  # 空的批改标准
+            strictness_level="标准"
+        )
+    
+    # 保存结果
+    update_submission_ai_result(submission['id'], str(result))
+    
+    # 发送通知
+    add_notification(
+        submission['student_username'],
+        f"作业已智能批改：{assignment['title']}",
+        f"您的作业已完成AI智能分析，请查看结果。",
+        "success"
+    )
+    return 'graded'
+
+@st.fragment(run_every=CLASS_GRADING_POLL_SECONDS)
+def show_class_grading_progress(assignment_id):
+    """显示后台批改进度（定时刷新，页面刷新后根据任务队列恢复）"""
+    progress = get_class_grading_service().get_assignment_grading_progress(assignment_id)
+    if not progress['total']:
+        return
+    
+    finished = progress['completed'] + progress['failed']
+    
+    if progress['is_running']:
+        st.progress(progress['progress'])
+        status = f"🤖 后台批改中... ({finished}/{progress['total']})"
+        if progress['running_students']:
+            status += f" 正在批改：{'、'.join(progress['running_students'])}"
+        st.text(status)
+        st.caption("💡 批改在后台进行，关闭或刷新页面不会中断")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("成功批改", progress['completed'], delta=f"✅ {progress['completed']}")
+    with col2:
+        st.metric("失败数量", progress['failed'], delta=f"❌ {progress['failed']}")
+    
+    if progress['failures']:
+        with st.expander("❌ 失败详情", expanded=False):
+            for failed in progress['failures']:
+                st.error(f"**{failed['student']}**: {failed['error']}")
 
 # 手动批改界面
 def show_enhanced_manual_grading(assignment):
@@ -6634,103 +6681,10 @@ def start_no_standard_batch_grading(assignment_id, assignment, ungraded_count):
 
 # 执行无标准批改
 def execute_no_standard_batch_grading(assignment_id, assignment, ungraded_submissions):
-    """执行无批改标准的批量批改"""
-    progress_container = st.container()
-    
-    with progress_container:
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        results_container = st.container()
-        
-        success_count = 0
-        failed_submissions = []
-        
-        for i, submission in enumerate(ungraded_submissions):
-            status_text.text(f"🤖 正在智能分析 {submission['student_username']} 的作业... ({i+1}/{len(ungraded_submissions)})")
-            
-            try:
-                # 检查学生提交的文件
-                if not submission.get('files') or len(submission['files']) == 0:
-                    raise ValueError("学生未提交任何文件")
-                
-                # 验证文件是否存在
-                valid_files = []
-                for file_path in submission['files']:
-                    if Path(file_path).exists():
-                        valid_files.append(file_path)
-                    else:
-                        print(f"警告：文件不存在 {file_path}")
-                
-                if not valid_files:
-                    raise ValueError("学生提交的文件都不存在")
-                
-                # 调用无标准AI批改
-                if assignment.get('question_files'):
-                    # 有题目文件的情况
-                    result = batch_correction_without_standard(
-                        question_files=assignment['question_files'],
-                        student_answer_files=valid_files,
-                        strictness_level="标准"
-                    )
-                else:
-                    # 没有题目文件，纯粹基于学生答案进行分析
-                    result = intelligent_correction_with_files(
-                        answer_files=valid_files,
-                        marking_scheme_files=[],  # 空的批改标准
-                        strictness_level="标准"
-                    )
-                
-                # 保存结果
-                update_submission_ai_result(submission['id'], str(result))
-                
-                # 发送通知
-                add_notification(
-                    submission['student_username'],
-                    f"作业已智能批改：{assignment['title']}",
-                    f"您的作业已完成AI智能分析，请查看结果。",
-                    "success"
-                )
-                
-                success_count += 1
-                
-                # 显示实时结果
-                with results_container:
-                    st.success(f"✅ {submission['student_username']} - 智能分析完成")
-                
-            except Exception as e:
-                failed_submissions.append({
-                    'student': submission['student_username'],
-                    'error': str(e)
-                })
-                
-                with results_container:
-                    st.error(f"❌ {submission['student_username']} - 分析失败：{str(e)}")
-            
-            # 更新进度
-            progress_bar.progress((i + 1) / len(ungraded_submissions))
-        
-        # 显示最终结果
-        status_text.text("🎉 智能批改任务完成！")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("成功分析", success_count, delta=f"✅ {success_count}")
-        with col2:
-            st.metric("失败数量", len(failed_submissions), delta=f"❌ {len(failed_submissions)}")
-        
-        if failed_submissions:
-            with st.expander("❌ 失败详情", expanded=False):
-                for failed in failed_submissions:
-                    st.error(f"**{failed['student']}**: {failed['error']}")
-        
-        if success_count > 0:
-            st.balloons()
-            st.success(f"🎉 智能批改完成！成功分析 {success_count} 份作业")
-            st.info("💡 无标准批改结果仅供参考，建议教师进一步审核")
-        
-        # 自动刷新页面
-        time.sleep(2)
-        st_rerun()
+    """执行无批改标准的批量批改（提交到后台任务队列并发执行）"""
+    submitted = submit_class_grading(assignment_id, assignment, ungraded_submissions, 'without_standard')
+    st.success(f"🚀 已提交 {submitted} 份作业到后台智能批改，可以离开或刷新页面，进度会自动更新")
+    st.info("💡 无标准批改结果仅供参考，建议教师进一步审核")
 
 # 更新作业文件的辅助函数
 def update_assignment_files(assignment_id, file_type, file_path):
@@ -7473,6 +7427,8 @@ def show_create_assignment_tab():
                     deadline=f"{deadline} {deadline_time}"
                 )
                 
+                if assignment_id:
+                    warm_marking_scheme(marking_file_paths)
                 st.success(f"✅ 作业创建成功！")
                 st.balloons()
                 
@@ -7814,7 +7770,7 @@ def show_my_created_classes_tab():
                     if st.button("🗑️ 确认删除", use_container_width=True, type="primary"):
                         if confirm_name == st.session_state.get('delete_class_name', ''):
                             try:
-                                from database import delete_class
+                                from cached_queries import delete_class
                                 success = delete_class(st.session_state.delete_class_id, st.session_state.username)
                                 if success:
                                     st.success("✅ 班级删除成功")
@@ -7840,7 +7796,7 @@ def show_my_joined_classes_tab():
     st.markdown("#### 👥 我加入的班级")
     
     try:
-        from database import get_student_classes
+        from cached_queries import get_student_classes
         classes = get_student_classes(st.session_state.username)
         if not classes:
             st.info("您还没有加入任何班级")
@@ -7866,7 +7822,7 @@ def show_my_joined_classes_tab():
                 with col3:
                     # 获取我的提交数量
                     try:
-                        from database import get_student_submissions_in_class
+                        from cached_queries import get_student_submissions_in_class
                         submissions = get_student_submissions_in_class(st.session_state.username, cls['id'])
                         st.metric("已提交", len(submissions))
                     except:
@@ -7909,7 +7865,7 @@ def show_my_joined_classes_tab():
                 with col2:
                     if st.button("🚪 确认退出", use_container_width=True, type="primary"):
                         try:
-                            from database import leave_class
+                            from cached_queries import leave_class
                             success = leave_class(st.session_state.leave_class_id, st.session_state.username)
                             if success:
                                 st.success("✅ 已成功退出班级")
@@ -8098,7 +8054,7 @@ def show_class_detail():
     
     # 获取班级信息
     try:
-        from database import get_teacher_classes, get_student_classes
+        from cached_queries import get_teacher_classes, get_student_classes
         
         # 获取用户创建的班级和加入的班级
         created_classes = get_teacher_classes(st.session_state.username)
@@ -8132,7 +8088,7 @@ def show_class_detail():
     
     # 获取学生列表
     try:
-        from database import get_class_students
+        from cached_queries import get_class_students
         students = get_class_students(class_id)
         
         if not students:
@@ -8153,7 +8109,7 @@ def show_class_detail():
                 with col2:
                     # 获取学生作业统计
                     try:
-                        from database import get_student_submissions_in_class
+                        from cached_queries import get_student_submissions_in_class
                         submissions = get_student_submissions_in_class(student['username'], class_id)
                         st.metric("已提交", len(submissions))
                     except:
@@ -8193,7 +8149,7 @@ def show_student_detail():
     
     # 获取学生信息
     try:
-        from database import get_user_info
+        from cached_queries import get_user_info
         student_info = get_user_info(student_username)
         if not student_info:
             st.error("学生不存在")
@@ -8227,7 +8183,7 @@ def show_student_detail():
     with col2:
         st.markdown("#### 📊 作业统计")
         try:
-            from database import get_student_submissions_in_class, get_class_assignments
+            from cached_queries import get_student_submissions_in_class, get_class_assignments
             submissions = get_student_submissions_in_class(student_username, class_id)
             assignments = get_class_assignments(class_id)
             
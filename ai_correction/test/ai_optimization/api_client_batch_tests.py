@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+APIClient 流式批量调用测试
+使用本地 aiohttp 桩服务注入延迟和429限流，检查吞吐量、AIMD 并发调整和基于模型健康状态的路由
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+import unittest
+
+from aiohttp import web
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.ai_optimization.api_manager import APIClient, AdaptiveConcurrencyLimiter, ModelManager
+from src.ai_optimization.api_manager.model_manager import ModelPerformanceMetrics
+from src.ai_optimization.models.api_models import ModelConfig, ModelProvider, ModelStatus, TaskType
+
+_COMPLETION = {
+    "choices": [{"message": {"content": "批改完成：答案正确，建议加强分析过程的书写。"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}
+}
+
+
+class StubModelServer:
+    """模拟大模型接口：可注入固定/随机延迟、容量限流（429）和排队延迟"""
+
+    def __init__(self, latency=0.02, jitter=0.0, capacity=None, queueing=False, always_throttle=()):
+        self.latency = latency
+        self.jitter = jitter
+        self.capacity = capacity
+        self.queueing = queueing  # True: 超出容量时排队变慢而不是返回429
+        self.always_throttle = set(always_throttle)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.hits = {}
+        self.throttled = 0
+        self._rng = random.Random(0)
+
+    async def handle(self, request):
+        path = request.path
+        self.hits[path] = self.hits.get(path, 0) + 1
+        body = await request.json()
+        if path in self.always_throttle:
+            self.throttled += 1
+            return web.Response(status=429, text="rate limited", headers={"Retry-After": "30"})
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.capacity and self.in_flight > self.capacity and not self.queueing:
+                self.throttled += 1
+                return web.Response(status=429, text="rate limited", headers={"Retry-After": "0.02"})
+
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            if self.capacity and self.queueing:
+                delay *= max(1.0, self.in_flight / self.capacity)
+            delay = body.get("delay", delay)
+            await asyncio.sleep(delay)
+            return web.json_response(_COMPLETION)
+        finally:
+            self.in_flight -= 1
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post('/{model}', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self.base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+
+def _model(model_id: str, endpoint: str) -> ModelConfig:
+    return ModelConfig(
+        id=model_id, name=model_id, provider=ModelProvider.CUSTOM, endpoint=endpoint,
+        supported_tasks=[TaskType.GRADING], api_key="test-key", cost_per_token=0.000001
+    )
+
+
+def _requests(model: ModelConfig, count: int) -> list:
+    return [
+        {"model_config": model, "prompt": f"批改第{i}份作业", "content": [{"type": "text", "content": "x=2"}]}
+        for i in range(count)
+    ]
+
+
+async def _fixed_chunk_batch(client: APIClient, requests: list, batch_size: int = 5) -> list:
+    """原实现：每批5个请求用 gather 执行，整批等待最慢的请求"""
+    results = []
+    for i in range(0, len(requests), batch_size):
+        results.extend(await asyncio.gather(
+            *(client.call_api(**req) for req in requests[i:i + batch_size]), return_exceptions=True
+        ))
+    return results
+
+
+class TestStreamingBatchCall(unittest.TestCase):
+    """流式批量调用测试"""
+
+    def test_streaming_throughput_beats_fixed_chunks(self):
+        """延迟参差不齐时，流式池不会被每批最慢的请求拖住"""
+        async def run():
+            async with StubModelServer(latency=0.01, jitter=0.15) as server:
+                model = _model("stub", f"{server.base_url}/stub")
+                requests = _requests(model, 60)
+
+                async with APIClient(concurrency=AdaptiveConcurrencyLimiter(
+                        initial_limit=5, min_limit=5, max_limit=5)) as client:
+                    start = time.perf_counter()
+                    chunked = await _fixed_chunk_batch(client, requests)
+                    chunked_time = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    streamed = await client.batch_call(requests)
+                    streamed_time = time.perf_counter() - start
+                return chunked, chunked_time, streamed, streamed_time
+
+        chunked, chunked_time, streamed, streamed_time = asyncio.run(run())
+        print(f"\n60个请求（并发5）: 固定分批 {60 / chunked_time:.1f} 请求/秒, 流式池 {60 / streamed_time:.1f} 请求/秒")
+
+        self.assertEqual(len(streamed), 60)
+        self.assertTrue(all(r.is_successful() for r in streamed))
+        self.assertTrue(all(r.is_successful() for r in chunked))
+        self.assertLess(streamed_time, chunked_time * 0.85)
+
+    def test_results_yielded_as_completed(self):
+        """慢请求不阻塞其他结果的产出"""
+        async def run():
+            async with StubModelServer(latency=0.01) as server:
+                model = _model("stub", f"{server.base_url}/stub")
+                requests = _requests(model, 10)
+                slow = dict(requests[0], prompt="慢请求")
+                requests[0] = slow
+
+                original_build = APIClient._build_request_data
+
+                def build(client, context):
+                    data = original_build(client, context)
+                    if context.prompt == "慢请求":
+                        data["delay"] = 0.5
+                    return data
+
+                async with APIClient() as client:
+                    client._build_request_data = lambda context: build(client, context)
+                    return [index async for index, _ in client.stream_batch(requests)]
+
+        order = asyncio.run(run())
+        self.assertEqual(sorted(order), list(range(10)))
+        self.assertEqual(order[-1], 0)
+
+    def test_aimd_converges_under_throttling(self):
+        """服务端容量有限时，并发上限增长后在429处回落，所有请求最终成功"""
+        async def run():
+            async with StubModelServer(latency=0.02, capacity=6) as server:
+                model = _model("stub", f"{server.base_url}/stub")
+                limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=32)
+                async with APIClient(concurrency=limiter) as client:
+                    limits = []
+                    results = []
+                    async for _, response in client.stream_batch(_requests(model, 300), max_throttle_retries=10):
+                        results.append(response)
+                        limits.append(limiter.limit)
+                return server, limiter, limits, results
+
+        server, limiter, limits, results = asyncio.run(run())
+        print(f"\n容量6: 并发上限范围 {min(limits)}-{max(limits)}, 最终 {limiter.limit}, "
+              f"429次数 {server.throttled}, 服务端峰值并发 {server.peak_in_flight}")
+
+        self.assertTrue(all(r.is_successful() for r in results))
+        self.assertGreater(max(limits), 6)  # 加性增长探测到容量之上
+        self.assertLessEqual(max(limits), 16)  # 429触发乘性回落
+        self.assertLess(server.throttled, 300 * 0.3)
+
+    def test_latency_growth_limits_concurrency(self):
+        """服务端排队导致延迟升高时，不会把并发一直加到上限"""
+        async def run():
+            async with StubModelServer(latency=0.02, capacity=4, queueing=True) as server:
+                model = _model("stub", f"{server.base_url}/stub")
+                limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=32)
+                async with APIClient(concurrency=limiter) as client:
+                    results = await client.batch_call(_requests(model, 200))
+                return limiter, results
+
+        limiter, results = asyncio.run(run())
+        self.assertTrue(all(r.is_successful() for r in results))
+        self.assertLess(limiter.peak_in_flight, 16)
+
+
+class TestModelHealthRouting(unittest.TestCase):
+    """基于 ModelManager 健康数据的路由"""
+
+    def test_rate_limited_model_routed_to_healthy_one(self):
+        async def run():
+            async with StubModelServer(latency=0.01, always_throttle={"/primary"}) as server:
+                manager = ModelManager()
+                manager.stop_health_check()
+                primary = _model("primary", f"{server.base_url}/primary")
+                backup = _model("backup", f"{server.base_url}/backup")
+                manager.models = {"primary": primary, "backup": backup}
+                manager.performance_metrics = {m: ModelPerformanceMetrics(m) for m in manager.models}
+
+                async with APIClient(model_manager=manager) as client:
+                    results = await client.batch_call(_requests(primary, 20))
+                return server, manager, results
+
+        server, manager, results = asyncio.run(run())
+
+        self.assertTrue(all(r.is_successful() for r in results))
+        self.assertTrue(all(r.model_id == "backup" for r in results))
+        self.assertEqual(manager.get_model_status("primary"), ModelStatus.RATE_LIMITED)
+        self.assertEqual(manager.get_model_metrics("backup").total_requests, 20)
+        # 只有路由生效前的少数请求打到了被限流的模型
+        self.assertLessEqual(server.hits.get("/primary", 0), 4)
+
+    def test_rate_limit_cooldown_restores_model(self):
+        async def run():
+            manager = ModelManager()
+            manager.stop_health_check()
+            manager.models = {"primary": _model("primary", "http://127.0.0.1:9/primary")}
+            manager.mark_rate_limited("primary", retry_after=0.05)
+            before = manager.is_model_healthy("primary")
+            await asyncio.sleep(0.06)
+            return before, manager.is_model_healthy("primary")
+
+        before, after = asyncio.run(run())
+        self.assertFalse(before)
+        self.assertTrue(after)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IntelligentCache 单元测试
+覆盖 LRU 淘汰、TTL 过期、字节大小限制、命中统计和磁盘溢出
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.ai_optimization.cache import (
+    IntelligentCache, LRUCachePolicy, TTLCachePolicy, SizeLimitedCachePolicy
+)
+
+
+class IntelligentCacheTests(unittest.TestCase):
+    """IntelligentCache 测试"""
+
+    def test_lru_eviction_order(self):
+        """超出容量时淘汰最久未使用的条目"""
+        cache = IntelligentCache(policies=[LRUCachePolicy(max_size=2)])
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # a 变为最近使用
+        cache.set("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+
+    def test_ttl_expiration(self):
+        """过期条目视为未命中"""
+        cache = IntelligentCache(policies=[LRUCachePolicy(10), TTLCachePolicy(ttl=60)])
+        cache.set("key", "value")
+
+        with patch("time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get("key"))
+
+        stats = cache.get_stats()
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_size_limit_tracks_bytes(self):
+        """字节上限按条目大小淘汰"""
+        cache = IntelligentCache(policies=[SizeLimitedCachePolicy(max_size=10)])
+        cache.set("a", b"x" * 4)
+        cache.set("b", b"x" * 4)
+        self.assertEqual(cache.total_bytes, 8)
+
+        cache.set("c", b"x" * 4)
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.total_bytes, 8)
+
+        cache.set("b", b"x")  # 覆盖写入时更新字节数
+        self.assertEqual(cache.total_bytes, 5)
+
+    def test_hit_rate(self):
+        """命中率统计"""
+        cache = IntelligentCache()
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("missing")
+
+        stats = cache.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+    def test_disk_spill_round_trip(self):
+        """淘汰条目写入磁盘并在未命中时读回"""
+        with tempfile.TemporaryDirectory() as spill_dir:
+            cache = IntelligentCache(policies=[LRUCachePolicy(1)], spill_dir=spill_dir)
+            cache.set("a", {"text": "第一题"})
+            cache.set("b", {"text": "第二题"})
+
+            self.assertEqual(len(os.listdir(spill_dir)), 1)
+            self.assertEqual(cache.get("a"), {"text": "第一题"})
+
+            stats = cache.get_stats()
+            self.assertEqual(stats["spills"], 2)  # 读回 a 时 b 被溢出
+            self.assertEqual(stats["spill_hits"], 1)
+
+            # 新实例可以读取已有的溢出文件
+            reopened = IntelligentCache(policies=[LRUCachePolicy(1)], spill_dir=spill_dir)
+            self.assertEqual(reopened.get("b"), {"text": "第二题"})
+
+    def test_spill_max_bytes(self):
+        """磁盘溢出目录超出上限时删除最旧的文件"""
+        with tempfile.TemporaryDirectory() as spill_dir:
+            cache = IntelligentCache(
+                policies=[LRUCachePolicy(1)], spill_dir=spill_dir, spill_max_bytes=1
+            )
+            cache.set("a", b"x" * 100)
+            cache.set("b", b"x" * 100)
+            cache.set("c", b"x" * 100)
+
+            self.assertEqual(os.listdir(spill_dir), [])
+            self.assertIsNone(cache.get("a"))
+
+
+    def test_persistent_survives_restart(self):
+        """持久化模式写入即落盘，新实例可直接读取"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IntelligentCache(
+                policies=[LRUCachePolicy(1)], spill_dir=cache_dir, persistent=True
+            )
+            cache.set("a", {"text": "第一题"})
+            cache.set("b", {"text": "第二题"})
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            # 读回后磁盘副本仍保留
+            self.assertEqual(cache.get("a"), {"text": "第一题"})
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            reopened = IntelligentCache(
+                policies=[LRUCachePolicy(1)], spill_dir=cache_dir, persistent=True
+            )
+            self.assertEqual(reopened.get("a"), {"text": "第一题"})
+            self.assertEqual(reopened.get("b"), {"text": "第二题"})
+            self.assertTrue(reopened.get_stats()["persistent"])
+
+    def test_size_estimated_only_with_byte_limit(self):
+        """没有字节上限策略时不估算条目大小"""
+        with patch.object(IntelligentCache, "estimate_size", return_value=4) as estimate:
+            cache = IntelligentCache(policies=[LRUCachePolicy(10)])
+            cache.set("a", {"text": "第一题"})
+            estimate.assert_not_called()
+            self.assertEqual(cache.total_bytes, 0)
+
+            limited = IntelligentCache(policies=[SizeLimitedCachePolicy(max_size=10)])
+            limited.set("a", {"text": "第一题"})
+            estimate.assert_called_once()
+            self.assertEqual(limited.total_bytes, 4)
+
+    def test_persistent_write_serializes_outside_lock(self):
+        """持久化写入在锁外序列化，序列化期间其他线程仍可访问缓存"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IntelligentCache(spill_dir=cache_dir, persistent=True)
+            cache.set("other", 1)
+            seen = []
+
+            class Probe:
+                def __reduce__(self):
+                    reader = threading.Thread(target=lambda: seen.append(cache.get("other")))
+                    reader.start()
+                    reader.join(timeout=1)
+                    seen.append(reader.is_alive())
+                    return (dict, ())
+
+            cache.set("probe", Probe())
+            self.assertEqual(seen, [1, False])
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分批批改测试
+验证题号范围批次并发执行、按题号裁剪上下文、按顺序合并以及失败批次单独重试
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions'))
+os.makedirs('logs', exist_ok=True)  # calling_api 导入时写入 logs/api_debug.log
+
+from api_correcting import calling_api
+from api_correcting.config import APIConfig
+from api_correcting.calling_api import (
+    call_tongyiqianwen_api_batch, trim_text_to_range, select_batch_contents, _page_question_sets
+)
+
+
+def _paper(questions: int = 30) -> str:
+    """构造一份足够长、需要分批的学生答卷"""
+    parts = ["学生姓名：张三\n"]
+    for i in range(1, questions + 1):
+        parts.append(f"第{i}题 解答：" + f"答案{i} " * 40 + "\n")
+    return "".join(parts)
+
+
+class TestParallelBatchGrading(unittest.TestCase):
+    """分批批改测试"""
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.fail_once = set()
+
+    def _stub_api(self, input_text, *input_contents, system_message=""):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.calls.append((input_text, input_contents, system_message))
+        time.sleep(0.1)
+        with self.lock:
+            self.running -= 1
+        batch = system_message.split('第', 1)[1].split('批', 1)[0]
+        if batch in self.fail_once:
+            self.fail_once.discard(batch)
+            return "❌ 服务器错误，请稍后重试"
+        return f"批次{batch}结果"
+
+    def test_batches_run_concurrently_and_merge_in_order(self):
+        """三个批次并发执行，结果按批次顺序合并"""
+        paper = _paper()
+        with patch.object(calling_api, 'call_tongyiqianwen_api', side_effect=self._stub_api), \
+                patch.object(calling_api, 'BATCH_MAX_CONCURRENCY', 3):
+            start = time.time()
+            result = call_tongyiqianwen_api_batch(paper, system_message="批改", batch_size=10)
+            elapsed = time.time() - start
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(self.max_running, 3)
+        self.assertLess(elapsed, 3 * 0.1)
+        self.assertLess(result.index("批次1结果"), result.index("批次2结果"))
+        self.assertLess(result.index("批次2结果"), result.index("批次3结果"))
+
+    def test_batches_only_receive_their_questions(self):
+        """每个批次只收到本批题目的文本和页面"""
+        paper = _paper()
+        pages = [('png', f'page{i}') for i in range(3)]
+        location_map = [
+            {'kind': 'page', 'content': pages[0], 'questions': {1, 2, 3}},
+            {'kind': 'page', 'content': pages[1], 'questions': {12, 13}},
+            {'kind': 'page', 'content': pages[2], 'questions': None},
+        ]
+        with patch.object(calling_api, 'call_tongyiqianwen_api', side_effect=self._stub_api), \
+                patch.object(calling_api, 'build_question_location_map', return_value=location_map):
+            call_tongyiqianwen_api_batch(paper, system_message="批改", batch_size=10)
+
+        by_batch = {system_message.split('第', 1)[1].split('批', 1)[0]: (text, contents)
+                    for text, contents, system_message in self.calls}
+        first_text, first_contents = by_batch['1']
+        self.assertIn("学生姓名：张三", first_text)
+        self.assertIn("第10题", first_text)
+        self.assertNotIn("第11题", first_text)
+        self.assertLess(len(first_text), len(paper) / 2)
+        self.assertEqual(first_contents, (pages[0], pages[2]))
+        self.assertEqual(by_batch['2'][1], (pages[1], pages[2]))
+        self.assertEqual(by_batch['3'][1], (pages[2],))
+
+    def test_failed_batch_retried_individually(self):
+        """失败的批次单独重试，其他批次不重复调用"""
+        self.fail_once = {'2'}
+        with patch.object(calling_api, 'call_tongyiqianwen_api', side_effect=self._stub_api):
+            result = call_tongyiqianwen_api_batch(_paper(), system_message="批改", batch_size=10)
+
+        batches_called = [system_message.split('第', 1)[1].split('批', 1)[0] for _, _, system_message in self.calls]
+        self.assertEqual(sorted(batches_called), ['1', '2', '2', '3'])
+        self.assertIn("批次2结果", result)
+        self.assertNotIn("❌", result)
+
+    def test_trim_and_page_mapping(self):
+        """文本裁剪保留前言，页面题号包含跨页延续的题目"""
+        text = "说明\n第1题 a\n第2题 b\n第3题 c"
+        self.assertEqual(trim_text_to_range(text, (2, 2)), "说明\n第2题 b\n")
+        self.assertIsNone(trim_text_to_range(text, (5, 6)))
+        self.assertEqual(trim_text_to_range("没有题号", (5, 6)), "没有题号")
+
+        question_sets = _page_question_sets(["封面", "第1题 ... 第2题", "续", ""])
+        self.assertEqual(question_sets, [set(), {1, 2}, {2}, None])
+
+        location_map = [{'kind': 'text', 'content': text}]
+        self.assertEqual(select_batch_contents(location_map, (7, 8)), [])
+
+
+class StubCompletions:
+    """模拟 chat.completions：throttled 中的模型返回429，其他模型返回结果"""
+
+    def __init__(self, throttled, barrier=None):
+        self.throttled = set(throttled)
+        self.barrier = barrier
+        self.models = []
+        self.lock = threading.Lock()
+        self.with_raw_response = self
+
+    def create(self, model, **kwargs):
+        with self.lock:
+            self.models.append(model)
+        if model in self.throttled:
+            if self.barrier is not None:
+                self.barrier.wait(timeout=5)  # 所有调用同时被限流
+            raise RuntimeError("Error code: 429 - rate_limit exceeded")
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"{model} 批改结果"))],
+            usage=SimpleNamespace(prompt_tokens=1, completion_tokens=1)
+        )
+        return SimpleNamespace(parse=lambda: response, content=b"{}")
+
+
+class TestRateLimitModelFallback(unittest.TestCase):
+    """并发调用遇到频率限制时的备用模型切换"""
+
+    def setUp(self):
+        self.config = APIConfig(available_models=["m0", "m1", "m2"], retry_delay=0)
+        self.config.api_key = "sk-test"  # __post_init__ 会用环境变量覆盖构造参数
+        patcher = patch.object(calling_api, 'api_config', self.config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _call_concurrently(self, completions, count):
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        with patch.object(calling_api, 'get_openai_client', return_value=client), \
+                ThreadPoolExecutor(max_workers=count) as executor:
+            return list(executor.map(lambda i: calling_api.call_tongyiqianwen_api(f"第{i}份"), range(count)))
+
+    def test_concurrent_rate_limits_do_not_skip_fallbacks(self):
+        """多个调用同时被限流时都切换到第一个备用模型，而不是各自把全局模型往后推"""
+        completions = StubCompletions({"m0"}, barrier=threading.Barrier(4))
+        results = self._call_concurrently(completions, 4)
+
+        self.assertEqual(results, ["m1 批改结果"] * 4)
+        self.assertNotIn("m2", completions.models)
+        self.assertEqual(self.config.current_model_index, 1)
+
+    def test_exhausted_call_does_not_reset_running_calls(self):
+        """耗尽备用模型的调用只在全局模型未被改动时重置，不影响其他调用已持有的模型"""
+        self.config.current_model_index = 2
+        self.assertIsNone(self.config.next_model_index(2))
+        self.config.current_model_index = 1  # 其他调用已重置并重新切换
+        self.config.reset_model(expected_index=2)
+        self.assertEqual(self.config.current_model_index, 1)
+
+        completions = StubCompletions({"m0", "m1", "m2"})
+        result = self._call_concurrently(completions, 1)[0]
+        self.assertIn("频率限制", result)
+        self.assertEqual(completions.models, ["m1", "m2", "m2"])
+        self.assertEqual(self.config.current_model_index, 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
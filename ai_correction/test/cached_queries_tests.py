@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存查询层测试
+验证重复查询命中缓存，写操作后相关缓存失效
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import database
+import cached_queries
+
+
+class TestCachedQueries(unittest.TestCase):
+    """缓存查询层测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_patch = patch.object(database, 'DB_PATH', Path(self.temp_dir) / "class_system.db")
+        self.db_patch.start()
+        database.init_database()
+        cached_queries.invalidate_all()
+
+        database.register_user('teacher', 'pw', 'teacher', '老师')
+        database.register_user('student', 'pw', 'student', '学生')
+        invite_code = database.create_class('teacher', '一班')
+        database.join_class('student', invite_code)
+        self.class_id = database.get_teacher_classes('teacher')[0]['id']
+
+        self.queries = 0
+        original_connection = database.get_db_connection
+
+        def counting_connection():
+            self.queries += 1
+            return original_connection()
+
+        self.conn_patch = patch.object(database, 'get_db_connection', side_effect=counting_connection)
+        self.conn_patch.start()
+
+    def tearDown(self):
+        self.conn_patch.stop()
+        self.db_patch.stop()
+        cached_queries.invalidate_all()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_repeated_queries_hit_cache(self):
+        """页面重跑时重复查询不再访问数据库"""
+        for _ in range(10):
+            cached_queries.get_class_assignments(self.class_id)
+            cached_queries.get_user_classes('teacher', 'teacher')
+        self.assertEqual(self.queries, 2 + 1)  # get_user_classes 内部先查询用户信息
+
+    def test_writes_invalidate_related_queries(self):
+        """创建作业和提交后相关查询返回最新数据"""
+        self.assertEqual(cached_queries.get_class_assignments(self.class_id), [])
+        notification_count = len(cached_queries.get_user_notifications('student'))
+        cached_queries.get_user_info('student')
+
+        assignment_id = cached_queries.create_assignment(self.class_id, '第一次作业')
+        self.assertEqual(len(cached_queries.get_class_assignments(self.class_id)), 1)
+        notifications = cached_queries.get_user_notifications('student')
+        self.assertEqual(len(notifications), notification_count + 1)
+        self.assertIn('新作业发布', [n['title'] for n in notifications])
+
+        self.assertEqual(cached_queries.get_assignment_submissions(assignment_id), [])
+        cached_queries.submit_assignment(assignment_id, 'student', ['answer.jpg'])
+        self.assertEqual(len(cached_queries.get_assignment_submissions(assignment_id)), 1)
+
+        # 与写操作无关的分组不受影响
+        queries = self.queries
+        cached_queries.get_user_notifications('student')
+        cached_queries.get_user_info('student')
+        self.assertEqual(self.queries, queries)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+班级后台批改测试
+验证作业批改任务通过任务队列并发执行，并遵守单个作业的并发上限
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.task_service import TaskService
+from src.services.classroom_grading_service import ClassroomGradingService
+
+
+class TestClassGradingQueue(unittest.TestCase):
+    """班级后台批改测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.task_service = TaskService(db_path=str(Path(self.temp_dir) / "tasks.db"), max_workers=8)
+        self.grading_service = ClassroomGradingService(
+            db_path=str(Path(self.temp_dir) / "class_system.db"),
+            task_service=self.task_service
+        )
+
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.graded = []
+
+        def grade(assignment, submission):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.2)
+            with self.lock:
+                self.running -= 1
+                self.graded.append(submission['student_username'])
+            if submission['student_username'] == 'student_fail':
+                raise ValueError("学生未提交任何文件")
+            return 'graded'
+
+        self.grading_service.register_grading_function('stub', grade)
+        self.assignment = {'id': 1, 'title': '第一次作业', 'marking_files': []}
+
+    def tearDown(self):
+        self.task_service.shutdown()
+
+    def _wait_until_finished(self, timeout: float = 10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            progress = self.grading_service.get_assignment_grading_progress(self.assignment['id'])
+            if progress['total'] and not progress['is_running']:
+                return progress
+            time.sleep(0.05)
+        self.fail("后台批改未在限定时间内完成")
+
+    def test_assignment_concurrency_limit(self):
+        """同一作业的批改任务并发执行且不超过并发上限"""
+        submissions = [
+            {'id': i, 'student_username': f'student_{i}', 'files': [f'answer_{i}.jpg']}
+            for i in range(8)
+        ]
+
+        start = time.time()
+        task_ids = self.grading_service.submit_assignment_grading(
+            self.assignment, submissions, 'stub', max_concurrency=4
+        )
+        progress = self._wait_until_finished()
+        elapsed = time.time() - start
+
+        self.assertEqual(len(task_ids), 8)
+        self.assertEqual(progress['completed'], 8)
+        self.assertEqual(progress['progress'], 1.0)
+        self.assertEqual(self.max_running, 4)
+        self.assertLess(elapsed, 8 * 0.2)  # 明显快于逐个批改
+
+    def test_active_submissions_not_resubmitted(self):
+        """等待或运行中的提交不会被重复提交，失败原因可查询"""
+        submissions = [
+            {'id': 1, 'student_username': 'student_ok', 'files': ['a.jpg']},
+            {'id': 2, 'student_username': 'student_fail', 'files': []}
+        ]
+
+        first = self.grading_service.submit_assignment_grading(self.assignment, submissions, 'stub')
+        second = self.grading_service.submit_assignment_grading(self.assignment, submissions, 'stub')
+        progress = self._wait_until_finished()
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second, [])
+        self.assertEqual(sorted(self.graded), ['student_fail', 'student_ok'])
+        self.assertEqual(progress['completed'], 1)
+        self.assertEqual(progress['failures'], [{'student': 'student_fail', 'error': '学生未提交任何文件'}])
+
+    def test_unknown_grading_function(self):
+        """未注册的批改函数直接报错"""
+        with self.assertRaises(ValueError):
+            self.grading_service.submit_assignment_grading(self.assignment, [], 'missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
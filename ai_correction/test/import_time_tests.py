@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冷启动导入时间测试
+使用 python -X importtime 检查应用启动阶段的导入，重量级模块必须延迟到首次使用时加载
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# streamlit_simple 启动时执行的项目内导入
+STARTUP_IMPORTS = (
+    "import cached_queries\n"
+    "import functions.lazy_loader\n"
+    "from functions.api_correcting import api_config\n"
+    "import src.ai_optimization.cache\n"
+)
+
+# 启动阶段不允许加载的重量级模块
+HEAVY_MODULES = (
+    'openai',
+    'fitz',
+    'fpdf',
+    'langgraph',
+    'aiohttp',
+    'functions.api_correcting.calling_api',
+    'functions.langgraph_integration_optimized',
+    'src.ai_optimization.api_manager',
+)
+
+# 项目自身启动导入的耗时预算（毫秒，不含 streamlit 框架本身）
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', '300'))
+
+
+def _import_times(code: str) -> dict:
+    """在干净的子进程中执行导入，返回 {模块名: (累计耗时(微秒), 是否为顶层导入)}"""
+    with tempfile.TemporaryDirectory() as cwd:
+        os.makedirs(os.path.join(cwd, 'logs'))  # calling_api 导入时写入 logs/api_debug.log
+        env = {**os.environ, 'PYTHONPATH': PROJECT_ROOT, 'PYTHONDONTWRITEBYTECODE': '1'}
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=cwd, env=env, capture_output=True, text=True, timeout=120
+        )
+    if proc.returncode != 0:
+        raise AssertionError(f"导入失败:\n{proc.stderr[-2000:]}")
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(cumulative), not name.startswith('  '))
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    """冷启动导入时间测试"""
+
+    def test_startup_skips_heavy_modules(self):
+        """启动阶段不加载批改引擎、LangGraph、PDF 库和 AI 优化组件"""
+        warmup = _import_times('import streamlit')  # 同时预热文件系统缓存
+        times = _import_times('import streamlit\n' + STARTUP_IMPORTS)
+
+        loaded = [m for m in HEAVY_MODULES if any(n == m or n.startswith(m + '.') for n in times)]
+        self.assertEqual(loaded, [], f"启动阶段加载了重量级模块: {loaded}")
+
+        # 框架已预热，剩余的顶层导入即项目自身的启动开销
+        project_ms = sum(
+            us for name, (us, top_level) in times.items() if top_level and name not in warmup
+        ) / 1000
+        print(f"\n项目启动导入耗时: {project_ms:.1f}ms（预算 {IMPORT_BUDGET_MS:.0f}ms）")
+        self.assertLess(project_ms, IMPORT_BUDGET_MS)
+
+    def test_first_use_loads_engine(self):
+        """首次访问批改函数时才加载批改引擎，并与启动时的配置共享同一实例"""
+        # 子进程内的断言失败时 _import_times 抛出 AssertionError
+        _import_times(
+            "import sys\n"
+            "from functions.api_correcting import api_config\n"
+            "from functions.lazy_loader import lazy_function\n"
+            "get_api_status = lazy_function('functions.api_correcting', 'get_api_status')\n"
+            "assert 'functions.api_correcting.calling_api' not in sys.modules\n"
+            "get_api_status()\n"
+            "from functions.api_correcting import calling_api\n"
+            "assert calling_api.api_config is api_config\n"
+        )
+
+    def test_can_import_detects_broken_modules(self):
+        """存在但导入失败的模块（如 LangGraph 集成）判定为不可用，且只尝试导入一次"""
+        with tempfile.TemporaryDirectory() as package_dir:
+            with open(os.path.join(package_dir, 'broken_integration.py'), 'w') as f:
+                f.write("import builtins\nbuiltins.attempts = getattr(builtins, 'attempts', 0) + 1\n"
+                        "from functions.langgraph import create_grading_workflow\n")
+            _import_times(
+                "import sys, builtins\n"
+                f"sys.path.insert(0, {package_dir!r})\n"
+                "from functions.lazy_loader import can_import, has_module\n"
+                "assert has_module('broken_integration')\n"
+                "assert not can_import('broken_integration')\n"
+                "assert not can_import('broken_integration')\n"
+                "assert builtins.attempts == 1\n"
+                "assert can_import('functions.lazy_loader')\n"
+            )
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
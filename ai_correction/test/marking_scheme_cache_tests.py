@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批改标准预编译缓存测试
+检查按内容指纹复用、文件修改后失效、LRU淘汰，以及批改提示不依赖后台学习的时机
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from functions.api_correcting import calling_api
+from functions.api_correcting.calling_api import (
+    batch_correction_with_standard,
+    get_compiled_marking_scheme,
+    invalidate_marking_scheme,
+    store_marking_scheme_learning
+)
+
+
+class TestCompiledMarkingSchemeCache(unittest.TestCase):
+    """批改标准缓存测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        invalidate_marking_scheme()
+        compile_scheme = calling_api._compile_marking_scheme
+        patcher = mock.patch.object(calling_api, '_compile_marking_scheme', side_effect=compile_scheme)
+        self.compile = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        invalidate_marking_scheme()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, name, text, directory=None):
+        path = os.path.join(directory or self.temp_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_same_content_reuses_compiled_scheme(self):
+        """同名同内容的批改标准只编译一次，即使位于不同目录"""
+        scheme_file = self._write('MARKING_第一章.txt', '第1题：x=2，5分')
+        other_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        copy_file = self._write('MARKING_第一章.txt', '第1题：x=2，5分', other_dir)
+
+        first = get_compiled_marking_scheme([scheme_file])
+        self.assertIs(get_compiled_marking_scheme([scheme_file]), first)
+        self.assertIs(get_compiled_marking_scheme([copy_file]), first)
+        self.assertEqual(self.compile.call_count, 1)
+        self.assertIn('x=2', first.rubric_text)
+
+    def test_edited_file_is_recompiled(self):
+        """批改标准文件内容变化后重新编译，显式失效会移除缓存"""
+        scheme_file = self._write('MARKING_第一章.txt', '第1题：x=2，5分')
+        first = get_compiled_marking_scheme([scheme_file])
+
+        self._write('MARKING_第一章.txt', '第1题：x=3，共10分')
+        second = get_compiled_marking_scheme([scheme_file])
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.fingerprint, first.fingerprint)
+        self.assertIn('x=3', second.rubric_text)
+
+        invalidate_marking_scheme([scheme_file])
+        self.assertNotIn(second.fingerprint, calling_api._marking_scheme_cache)
+        self.assertNotIn(scheme_file, calling_api._file_digest_cache)
+        self.assertIsNot(get_compiled_marking_scheme([scheme_file]), second)
+        self.assertEqual(self.compile.call_count, 3)
+
+    def test_least_recently_used_scheme_evicted(self):
+        """超过缓存容量时淘汰最久未使用的批改标准"""
+        files = [self._write(f'MARKING_{i}.txt', f'第{i}题：{i}分') for i in range(3)]
+
+        with mock.patch.object(calling_api, 'MARKING_SCHEME_CACHE_SIZE', 2):
+            first = get_compiled_marking_scheme([files[0]])
+            second = get_compiled_marking_scheme([files[1]])
+            get_compiled_marking_scheme([files[0]])  # 访问后第一份变为最近使用
+            get_compiled_marking_scheme([files[2]])
+
+            self.assertEqual(len(calling_api._marking_scheme_cache), 2)
+            self.assertIn(first.fingerprint, calling_api._marking_scheme_cache)
+            self.assertNotIn(second.fingerprint, calling_api._marking_scheme_cache)
+
+    def test_file_digest_cache_is_bounded(self):
+        """文件摘要缓存同样按LRU限制条目数"""
+        files = [self._write(f'MARKING_{i}.txt', f'第{i}题') for i in range(5)]
+
+        with mock.patch.object(calling_api, 'FILE_DIGEST_CACHE_SIZE', 3):
+            for path in files:
+                calling_api._file_digest(path)
+
+            self.assertEqual(list(calling_api._file_digest_cache), files[2:])
+
+    def test_grading_prompt_independent_of_learning(self):
+        """后台学习是否完成不影响批改提示内容"""
+        scheme_file = self._write('MARKING_第一章.txt', '第1题：x=2，5分')
+        answer_file = self._write('学生_张三.txt', '第1题：x=2')
+        calls = []
+
+        def fake_api(*args, **kwargs):
+            calls.append(args)
+            return '批改结果'
+
+        batch_correction_with_standard([scheme_file], [answer_file], api=fake_api)
+        store_marking_scheme_learning(
+            get_compiled_marking_scheme([scheme_file]),
+            {'has_marking_scheme': True, 'learning_result': '评分要点：只看最终答案'}
+        )
+        batch_correction_with_standard([scheme_file], [answer_file], api=fake_api)
+
+        self.assertEqual(calls[0], calls[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR 流水线性能测试
+使用本地桩 OCR 服务，测量 30 页班级作业包在顺序模式与流水线模式下的每秒处理页数
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from email.utils import formatdate
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+from PIL import Image, ImageDraw
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from functions.langgraph.agents import ocr_vision_agent
+from functions.langgraph.agents.ocr_vision_agent import OCRVisionAgent, OCRRateLimiter
+
+BUNDLE_PAGES = 30
+STUB_LATENCY = 0.05  # 桩服务每次识别耗时（秒）
+
+
+def _stub_ocr_response() -> dict:
+    """构造与 OCR.space 格式一致的响应"""
+    return {
+        'IsErroredOnProcessing': False,
+        'ParsedResults': [{
+            'ParsedText': '第1题 答案 x=2',
+            'TextOverlay': {
+                'Lines': [{
+                    'Words': [
+                        {'WordText': '第1题', 'Confidence': 95, 'Left': 10, 'Top': 10, 'Width': 40, 'Height': 12},
+                        {'WordText': 'x=2', 'Confidence': 90, 'Left': 60, 'Top': 10, 'Width': 30, 'Height': 12}
+                    ],
+                    'MinLeft': 10, 'MinTop': 10, 'MaxWidth': 80, 'MaxHeight': 12
+                }]
+            }
+        }]
+    }
+
+
+class TestOCRPipelinePerformance(unittest.TestCase):
+    """OCR 流水线性能测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pages = []
+        for i in range(BUNDLE_PAGES):
+            page_path = Path(self.temp_dir) / f"student_page_{i:02d}.png"
+            img = Image.new('RGB', (620, 877), 'white')
+            ImageDraw.Draw(img).text((100, 100 + i), f"第{i + 1}页 答案", fill='black')
+            img.save(page_path)
+            self.pages.append(str(page_path))
+
+    def tearDown(self):
+        OCRVisionAgent.shutdown_preprocess_pool()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    async def _run_bundle(self, pipelined: bool) -> tuple:
+        """启动桩服务并处理一个 30 页作业包，返回 (每秒页数, OCR结果)"""
+        async def handle(request):
+            await request.post()
+            await asyncio.sleep(STUB_LATENCY)
+            return web.Response(text=json.dumps(_stub_ocr_response()), content_type='application/json')
+
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post('/parse/image', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        original_endpoint = ocr_vision_agent.OCR_SPACE_ENDPOINT
+        ocr_vision_agent.OCR_SPACE_ENDPOINT = f"http://127.0.0.1:{port}/parse/image"
+        try:
+            agent = OCRVisionAgent(
+                pipelined=pipelined,
+                rate_limiter=OCRRateLimiter(requests_per_second=100, max_concurrency=8)
+            )
+            start = time.perf_counter()
+            if pipelined:
+                _, ocr_results = await agent._process_images_pipelined(self.pages, 'zh')
+            else:
+                preprocessed = await agent._preprocess_images(self.pages)
+                ocr_results = await agent._perform_ocr(preprocessed, 'zh')
+            elapsed = time.perf_counter() - start
+        finally:
+            ocr_vision_agent.OCR_SPACE_ENDPOINT = original_endpoint
+            await runner.cleanup()
+
+        return BUNDLE_PAGES / elapsed, ocr_results
+
+    def test_pipelined_throughput(self):
+        """流水线模式吞吐量高于顺序模式，且结果一致"""
+        sequential_pps, sequential_results = asyncio.run(self._run_bundle(pipelined=False))
+        pipelined_pps, pipelined_results = asyncio.run(self._run_bundle(pipelined=True))
+
+        self.assertEqual(list(pipelined_results.keys()), self.pages)
+        self.assertTrue(all(r['success'] for r in pipelined_results.values()))
+        self.assertEqual(
+            [r['text'] for r in sequential_results.values()],
+            [r['text'] for r in pipelined_results.values()]
+        )
+        self.assertGreater(
+            pipelined_pps, sequential_pps,
+            f"30页作业包: 顺序模式 {sequential_pps:.1f} 页/秒, 流水线模式 {pipelined_pps:.1f} 页/秒"
+        )
+
+    def test_retry_after_parsing(self):
+        """Retry-After 支持秒数和 HTTP 日期，无法解析时使用指数退避时间"""
+        parse = ocr_vision_agent._parse_retry_after
+        self.assertEqual(parse('3', 1), 3.0)
+        self.assertAlmostEqual(parse(formatdate(time.time() + 30, usegmt=True), 1), 30, delta=1.5)
+        self.assertEqual(parse('Wed, 21 Oct 2015 07:28:00 GMT', 1), 0.0)
+        self.assertEqual(parse('soon', 4), 4)
+        self.assertEqual(parse(None, 2), 2)
+
+    def test_http_date_retry_after_is_retried(self):
+        """服务端以 HTTP 日期形式返回 Retry-After 时，请求退避后重试成功"""
+        async def run():
+            attempts = []
+
+            async def handle(request):
+                await request.post()
+                attempts.append(time.monotonic())
+                if len(attempts) == 1:
+                    return web.Response(status=429, headers={'Retry-After': formatdate(usegmt=True)})
+                return web.Response(text=json.dumps(_stub_ocr_response()), content_type='application/json')
+
+            app = web.Application(client_max_size=32 * 1024 * 1024)
+            app.router.add_post('/parse/image', handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+
+            original_endpoint = ocr_vision_agent.OCR_SPACE_ENDPOINT
+            ocr_vision_agent.OCR_SPACE_ENDPOINT = f"http://127.0.0.1:{port}/parse/image"
+            try:
+                agent = OCRVisionAgent(rate_limiter=OCRRateLimiter(requests_per_second=100))
+                async with aiohttp.ClientSession() as session:
+                    result = await agent._request_ocr(session, self.pages[0], 'chs')
+            finally:
+                ocr_vision_agent.OCR_SPACE_ENDPOINT = original_endpoint
+                await runner.cleanup()
+            return attempts, result
+
+        attempts, result = asyncio.run(run())
+        self.assertEqual(len(attempts), 2)
+        self.assertFalse(result['IsErroredOnProcessing'])
+
+    def test_rate_limiter_spacing(self):
+        """限流器按每秒请求数间隔发出请求"""
+        async def run():
+            limiter = OCRRateLimiter(requests_per_second=20, max_concurrency=4)
+            starts = []
+
+            async def request():
+                async with limiter:
+                    starts.append(time.monotonic())
+
+            await asyncio.gather(*(request() for _ in range(5)))
+            return starts
+
+        starts = asyncio.run(run())
+        self.assertGreaterEqual(starts[-1] - starts[0], 4 * 0.05 * 0.9)
+
+    def test_rate_limiter_reused_across_event_loops(self):
+        """同一个限流器（如 get_workflow 持有的单例 Agent）可在多次 asyncio.run 中使用"""
+        limiter = OCRRateLimiter(requests_per_second=100, max_concurrency=2)
+
+        async def run():
+            async def request():
+                async with limiter:
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(request() for _ in range(4)))
+
+        asyncio.run(run())
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenAI 客户端复用测试
+使用本地模拟 chat.completions 接口，对比每次新建客户端与共享客户端的请求开销（p50/p95）
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions'))
+os.makedirs('logs', exist_ok=True)  # calling_api 导入时写入 logs/api_debug.log
+
+from openai import OpenAI
+
+from api_correcting import calling_api
+
+REQUESTS = 40
+
+_COMPLETION = {
+    'id': 'chatcmpl-test',
+    'object': 'chat.completion',
+    'created': 0,
+    'model': 'mock-model',
+    'choices': [{
+        'index': 0,
+        'message': {'role': 'assistant', 'content': '第1题 得分：2/2'},
+        'finish_reason': 'stop'
+    }],
+    'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}
+}
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """模拟 OpenRouter chat.completions 接口，记录客户端连接"""
+    protocol_version = 'HTTP/1.1'  # 支持 keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps(_COMPLETION).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered), ordered[int(len(ordered) * 0.95) - 1]
+
+
+class TestOpenAIClientPool(unittest.TestCase):
+    """OpenAI 客户端复用测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _MockHandler)
+        cls.server.connections = set()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        calling_api.close_openai_clients()
+        self.server.connections.clear()
+        self.config_patch = patch.multiple(
+            calling_api.api_config, base_url=self.base_url, api_key='sk-test', timeout=10
+        )
+        self.config_patch.start()
+
+    def tearDown(self):
+        self.config_patch.stop()
+        calling_api.close_openai_clients()
+
+    def _request(self, client):
+        client.chat.completions.create(
+            model='mock-model', messages=[{'role': 'user', 'content': 'ping'}], max_tokens=10
+        )
+
+    def test_shared_client_reuses_connections(self):
+        """共享客户端复用 keep-alive 连接，开销低于每次新建客户端"""
+        fresh = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            client = OpenAI(api_key='sk-test', base_url=self.base_url, timeout=10)
+            self._request(client)
+            client.close()
+            fresh.append(time.perf_counter() - start)
+        fresh_connections = len(self.server.connections)
+
+        self.server.connections.clear()
+        shared = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            self._request(calling_api.get_openai_client())
+            shared.append(time.perf_counter() - start)
+
+        fresh_p50, fresh_p95 = _percentiles(fresh)
+        shared_p50, shared_p95 = _percentiles(shared)
+        print(f"\n每次新建客户端: p50 {fresh_p50 * 1000:.2f}ms, p95 {fresh_p95 * 1000:.2f}ms, 连接数 {fresh_connections}")
+        print(f"共享客户端:     p50 {shared_p50 * 1000:.2f}ms, p95 {shared_p95 * 1000:.2f}ms, "
+              f"连接数 {len(self.server.connections)}")
+
+        self.assertEqual(fresh_connections, REQUESTS)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertLess(shared_p50, fresh_p50)
+
+    def test_registry_keys(self):
+        """相同配置返回同一客户端，配置变化时创建新客户端"""
+        client = calling_api.get_openai_client()
+        self.assertIs(calling_api.get_openai_client(), client)
+        self.assertIsNot(calling_api.get_openai_client(timeout=30), client)
+        self.assertIsNot(calling_api.get_openai_client(api_key='sk-other'), client)
+
+    def test_async_twin(self):
+        """异步版本在同一事件循环内共享客户端，并返回结果"""
+        async def run():
+            results = await asyncio.gather(*(
+                calling_api.call_tongyiqianwen_api_async('批改', system_message='系统') for _ in range(5)
+            ))
+            client = calling_api.get_async_openai_client()
+            return results, client is calling_api.get_async_openai_client(), client
+
+        results, same_client, client = asyncio.run(calling_api.run_with_async_openai_clients(run()))
+        self.assertEqual(results, ['第1题 得分：2/2'] * 5)
+        self.assertTrue(same_client)
+        self.assertTrue(client.is_closed())
+
+    def test_async_clients_closed_per_event_loop(self):
+        """每次 asyncio.run 结束前关闭该事件循环的异步客户端，不遗留连接池"""
+        async def run():
+            await calling_api.call_tongyiqianwen_api_async('批改', system_message='系统')
+            return calling_api.get_async_openai_client()
+
+        clients = [asyncio.run(calling_api.run_with_async_openai_clients(run())) for _ in range(2)]
+
+        self.assertIsNot(clients[0], clients[1])
+        self.assertTrue(all(client.is_closed() for client in clients))
+        self.assertEqual(len(calling_api._async_openai_clients), 0)
+
+    @unittest.skipUnless(calling_api.METRICS_AVAILABLE, "MetricsCollector 不可用")
+    def test_call_telemetry(self):
+        """每次调用写入一条结构化遥测，不记录完整内容"""
+        metrics = calling_api.get_metrics_collector()
+        metrics.reset_metrics()
+
+        with self.assertLogs(calling_api.logger, level='INFO') as logs:
+            result = calling_api.call_tongyiqianwen_api('批改', ('png', 'A' * 1000), system_message='系统')
+
+        self.assertEqual(result, '第1题 得分：2/2')
+        event = metrics.get_events('api_call')[-1]
+        self.assertTrue(event['success'])
+        self.assertEqual(event['retries'], 0)
+        self.assertEqual((event['prompt_tokens'], event['completion_tokens']), (10, 5))
+        self.assertEqual(event['image_count'], 1)
+        self.assertGreater(event['request_bytes'], 1000)
+        self.assertGreater(event['response_bytes'], 0)
+        self.assertGreater(event['network_seconds'], 0)
+        self.assertEqual(metrics.get_counter('api_calls', tags={'model': event['model']}), 1)
+        self.assertFalse(any('A' * 1000 in line or '返回内容完整' in line for line in logs.output))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF报告生成测试
+验证字体每个进程只加载一次、图片转换按内容缓存，以及并行生成并合并班级报告
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions'))
+os.environ['PDF_FONT_DOWNLOAD'] = '0'  # 测试环境不联网下载字体
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from api_correcting import pdf_merger
+from api_correcting.pdf_merger import PDFMerger
+
+RESULT_TEXT = """科目：数学
+题目类型：解答题
+总分：8/10
+学生答案批改如下:
+第1题 得分：8/10
+✓ 正确点：思路正确
+✗ 错误点：计算错误"""
+
+
+class TestPDFReportPipeline(unittest.TestCase):
+    """PDF报告生成测试"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.upload_dir = self.temp_dir / 'uploads'
+        self.question = self._image('question.png', (255, 255, 255))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _image(self, name: str, color) -> str:
+        path = self.temp_dir / name
+        Image.new('RGB', (1200, 1600), color).save(path)
+        return str(path)
+
+    def _job(self, student: int) -> dict:
+        answer = self._image(f'answer_{student}.png', (student * 40, 100, 100))
+        return {
+            'files': {'question_1': {'path': self.question}, 'student_answer_1': {'path': answer}},
+            'result_text': RESULT_TEXT,
+            'title': f'学生{student} 批改报告',
+            'output_path': str(self.temp_dir / f'report_{student}.pdf')
+        }
+
+    def test_font_registered_once_per_process(self):
+        """多个 PDFMerger 实例共享同一次字体注册"""
+        with patch.dict(pdf_merger._registered_fonts, clear=True), \
+                patch.object(PDFMerger, '_register_chinese_font', return_value='Helvetica') as register:
+            for _ in range(3):
+                self.assertEqual(PDFMerger(self.upload_dir).chinese_font_name, 'Helvetica')
+        self.assertEqual(register.call_count, 1)
+
+    def test_image_pages_cached_by_hash(self):
+        """共享的题目图片只转换一次，重复导出不再缩放图片"""
+        merger = PDFMerger(self.upload_dir)
+        jobs = [self._job(i) for i in range(1, 3)]
+        for job in jobs:
+            success, _ = merger.merge_pdfs(job['files'], job['result_text'], job['title'], job['output_path'])
+            self.assertTrue(success)
+
+        cache_dir = self.upload_dir / pdf_merger.IMAGE_CACHE_DIR_NAME
+        self.assertEqual(len(list(cache_dir.glob('*.png'))), 3)
+
+        with patch.object(pdf_merger.PILImage.Image, 'resize', side_effect=AssertionError("应命中图片缓存")):
+            success, _ = merger.merge_pdfs(jobs[0]['files'], RESULT_TEXT, '重新导出', jobs[0]['output_path'])
+        self.assertTrue(success)
+
+    def test_class_report_generated_in_parallel(self):
+        """并行生成每个学生的报告，并合并为一个班级报告"""
+        jobs = [self._job(i) for i in range(1, 5)]
+        output_path = self.temp_dir / 'class_report.pdf'
+
+        success, path, results = pdf_merger.generate_class_report(jobs, self.upload_dir, output_path, max_workers=2)
+
+        self.assertTrue(success, path)
+        self.assertEqual([r[0] for r in results], [True] * len(jobs))
+        student_pages = sum(len(PdfReader(job['output_path']).pages) for job in jobs)
+        self.assertEqual(len(PdfReader(path).pages), student_pages)
+        self.assertFalse(Path(str(output_path) + '.part').exists())
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), "需要 /proc 统计打开的文件")
+    def test_merge_does_not_keep_report_files_open(self):
+        """合并时每个报告读入后即关闭，写出结果时不再占用源文件句柄"""
+        report_paths = []
+        for i in range(30):
+            writer = PdfWriter()
+            writer.add_blank_page(width=595, height=842)
+            path = self.temp_dir / f'blank_{i}.pdf'
+            with open(path, 'wb') as f:
+                writer.write(f)
+            report_paths.append(str(path))
+
+        open_reports = []
+        original_write = PdfWriter.write
+
+        def write(writer, stream):
+            targets = {os.path.realpath(os.path.join('/proc/self/fd', fd)) for fd in os.listdir('/proc/self/fd')}
+            open_reports.extend(path for path in report_paths if os.path.realpath(path) in targets)
+            return original_write(writer, stream)
+
+        with patch.object(PdfWriter, 'write', write):
+            success, path = pdf_merger.merge_report_files(report_paths, self.temp_dir / 'merged.pdf')
+
+        self.assertTrue(success, path)
+        self.assertEqual(open_reports, [])
+        self.assertEqual(len(PdfReader(path).pages), len(report_paths))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
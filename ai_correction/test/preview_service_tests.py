@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件预览服务测试
+验证缩略图尺寸、EXIF 方向、按内容哈希复用预览以及内存缓存
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services import preview_service
+from src.services.preview_service import PreviewService
+
+
+class TestPreviewService(unittest.TestCase):
+    """文件预览服务测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.service = PreviewService(max_size=512)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _scan(self, name: str, color=(200, 200, 200)) -> str:
+        path = str(Path(self.temp_dir) / name)
+        Image.new('RGBA', (3000, 4000), color + (255,)).save(path, format='PNG')
+        return path
+
+    def test_thumbnail_generated_once(self):
+        """上传时生成固定尺寸缩略图，相同内容的文件共享同一预览"""
+        first = self._scan('ANSWER_1.png')
+        second = str(Path(self.temp_dir) / 'ANSWER_2.png')
+        shutil.copy(first, second)
+
+        preview = self.service.generate_preview(first)
+        self.assertEqual(preview.parent.name, preview_service.PREVIEW_DIR_NAME)
+        with Image.open(preview) as image:
+            self.assertEqual(max(image.size), 512)
+            self.assertEqual(image.format, self.service.format)
+        self.assertLess(preview.stat().st_size, os.path.getsize(first))
+
+        with patch.object(preview_service.Image, 'open', side_effect=AssertionError("不应重新打开原图")):
+            self.assertEqual(self.service.generate_preview(second), preview)
+
+        self.assertIsNone(self.service.generate_preview(str(Path(self.temp_dir) / 'notes.txt')))
+
+    def test_exif_orientation_applied(self):
+        """竖拍的手机照片（Orientation=6）生成竖向预览"""
+        path = str(Path(self.temp_dir) / 'PHOTO_1.jpg')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # 顺时针旋转90度显示
+        Image.new('RGB', (4000, 3000), (200, 200, 200)).save(path, format='JPEG', exif=exif)
+
+        with Image.open(self.service.generate_preview(path)) as image:
+            self.assertEqual(image.size, (384, 512))
+            self.assertNotIn(0x0112, image.getexif())
+
+    def test_preview_served_from_cache(self):
+        """重复读取预览不再访问原图和预览文件，内容变化后重新生成"""
+        path = self._scan('ANSWER_1.png')
+        mime_type, encoded = self.service.get_preview_base64(path)
+        self.assertEqual(mime_type, self.service.mime_type)
+
+        with patch.object(Path, 'read_bytes', side_effect=AssertionError("应命中内存缓存")):
+            self.assertEqual(self.service.get_preview_base64(path), (mime_type, encoded))
+
+        Image.new('RGB', (800, 600), (10, 10, 10)).save(path, format='PNG')
+        os.utime(path, ns=(0, 1))  # 确保修改时间变化
+        self.assertNotEqual(self.service.get_preview_base64(path)[1], encoded)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用户存储测试
+验证 user_data.json 迁移、分页历史查询以及并发写入
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.user_store import UserStore
+
+
+class TestUserStore(unittest.TestCase):
+    """用户存储测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = str(Path(self.temp_dir) / "user_data.db")
+        self.json_path = Path(self.temp_dir) / "user_data.json"
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _record(self, i: int) -> dict:
+        return {
+            'timestamp': f"2025-01-01 00:00:{i:02d}",
+            'files': [f"[答案]answer_{i}.jpg", "[标准]scheme.pdf"],
+            'settings': {'strictness': '中等'},
+            'result': f"第{i}次批改结果",
+            'files_count': 2
+        }
+
+    def test_migrate_from_json(self):
+        """一次性迁移旧版 JSON，重复启动不会重复导入"""
+        self.json_path.write_text(json.dumps({
+            'alice': {
+                'password': hashlib.sha256(b'pw').hexdigest(),
+                'email': 'alice@example.com',
+                'created_at': '2025-01-01 00:00:00',
+                'records': [self._record(i) for i in range(3)]
+            }
+        }, ensure_ascii=False), encoding='utf-8')
+
+        store = UserStore(db_path=self.db_path, legacy_json_path=str(self.json_path))
+        self.assertFalse(self.json_path.exists())
+        self.assertTrue(Path(str(self.json_path) + '.migrated').exists())
+        self.assertEqual(store.get_user('alice')['email'], 'alice@example.com')
+        self.assertEqual(store.get_record_stats('alice'), {'count': 3, 'files': 6})
+        self.assertIsNotNone(store.get_user('demo'))
+
+        # 旧文件被恢复后再次启动也不会重复导入
+        shutil.copy(str(self.json_path) + '.migrated', self.json_path)
+        store = UserStore(db_path=self.db_path, legacy_json_path=str(self.json_path))
+        self.assertEqual(store.count_records('alice'), 3)
+
+    def test_paginated_history(self):
+        """历史记录按最新在前分页返回"""
+        store = UserStore(db_path=self.db_path, legacy_json_path=None)
+        self.assertTrue(store.create_user('bob', 'hash'))
+        self.assertFalse(store.create_user('bob', 'other'))
+        for i in range(25):
+            store.add_record('bob', self._record(i))
+
+        first_page = store.get_records('bob', limit=10)
+        last_page = store.get_records('bob', limit=10, offset=20)
+        self.assertEqual([r['result'] for r in first_page[:2]], ['第24次批改结果', '第23次批改结果'])
+        self.assertEqual(len(last_page), 5)
+        self.assertEqual(last_page[-1]['result'], '第0次批改结果')
+        self.assertEqual(store.get_record('bob', first_page[0]['record_id'])['result'], '第24次批改结果')
+
+        self.assertIsNone(store.add_record('nobody', self._record(0)))
+        self.assertEqual(store.clear_records('bob'), 25)
+        self.assertEqual(store.count_records('bob'), 0)
+
+    def test_concurrent_writes(self):
+        """多个会话同时写入不会丢失记录"""
+        store = UserStore(db_path=self.db_path, legacy_json_path=None)
+        store.create_user('carol', 'hash')
+
+        def write(worker: int):
+            session_store = UserStore(db_path=self.db_path, legacy_json_path=None)
+            for i in range(20):
+                session_store.add_record('carol', self._record(i))
+
+        threads = [threading.Thread(target=write, args=(w,)) for w in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(store.count_records('carol'), 100)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
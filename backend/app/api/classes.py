@@ -1,9 +1,10 @@
 """Class management API endpoints."""
 
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
@@ -30,6 +31,7 @@ from app.schemas.class_schema import (
     ClassStudentWithInfo
 )
 from app.services.class_service import ClassService
+from app.services.export_service import EXPORT_MEDIA_TYPES, ClassDataExporter
 
 router = APIRouter(prefix="/classes", tags=["classes"])
 
@@ -448,13 +450,34 @@ async def get_class_performance(
 @router.get("/{class_id}/ranking")
 async def get_class_ranking(
     class_id: UUID,
+    assignment_id: Optional[UUID] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get student ranking in class."""
+    """Get student ranking in class, optionally for a single assignment."""
     try:
         class_service = ClassService(db)
-        ranking = await class_service.get_class_ranking(class_id, current_user.id)
+        ranking = await class_service.get_class_ranking(class_id, current_user.id, assignment_id, limit)
+        return {"class_id": str(class_id), "ranking": ranking}
+    except ClassNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except InsufficientPermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+
+
+@router.get("/{class_id}/ranking/{student_id}")
+async def get_student_ranking(
+    class_id: UUID,
+    student_id: UUID,
+    assignment_id: Optional[UUID] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a student's rank and percentile in class."""
+    try:
+        class_service = ClassService(db)
+        ranking = await class_service.get_student_ranking(class_id, student_id, current_user.id, assignment_id)
         return {"class_id": str(class_id), "ranking": ranking}
     except ClassNotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -469,26 +492,37 @@ async def export_class_data(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Export class data for analysis."""
-    if format_type not in ["json", "csv"]:
+    """Export class data for analysis.
+    
+    JSON returns the class summary; CSV and Parquet stream one row per submission.
+    """
+    if format_type not in ["json", *EXPORT_MEDIA_TYPES]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Format must be 'json' or 'csv'"
+            detail="Format must be 'json', 'csv' or 'parquet'"
         )
     
     try:
         class_service = ClassService(db)
-        export_data = await class_service.export_class_data(class_id, current_user.id, format_type)
         
         if format_type == "json":
-            return export_data
-        else:
-            # For CSV format, we would convert to CSV here
-            # For now, return JSON with a note
-            export_data["note"] = "CSV export will be implemented in future version"
-            return export_data
+            return await class_service.export_class_data(class_id, current_user.id, format_type)
+        
+        # Check permissions before the response starts streaming
+        class_obj = await class_service.get_class_by_id(class_id, current_user.id)
+        if class_obj.teacher_id != current_user.id:
+            raise InsufficientPermissionError("Only the class teacher can export class data")
+        
+        exporter = ClassDataExporter()
+        return StreamingResponse(
+            exporter.stream(class_id, format_type),
+            media_type=EXPORT_MEDIA_TYPES[format_type],
+            headers={"Content-Disposition": f'attachment; filename="class_{class_id}.{format_type}"'}
+        )
             
     except ClassNotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except InsufficientPermissionError as e:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
\ No newline at end of file
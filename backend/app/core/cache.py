@@ -21,6 +21,7 @@ class CacheManager:
         self.ASSIGNMENT_PREFIX = "assignment:"
         self.GRADING_PREFIX = "grading:"
         self.ANALYTICS_PREFIX = "analytics:"
+        self.FILE_ANALYSIS_PREFIX = "file_analysis:"
         
         # Default expiration times (in seconds)
         self.DEFAULT_EXPIRE = 3600  # 1 hour
@@ -213,6 +214,29 @@ class CacheManager:
                 return None
         return None
 
+    
+    async def cache_file_analysis(
+        self,
+        file_hash: str,
+        analysis_type: str,
+        result: dict,
+        expire: Optional[int] = None
+    ) -> bool:
+        """Cache AI analysis of file content, keyed by content hash."""
+        key = f"{self.FILE_ANALYSIS_PREFIX}{file_hash}:{analysis_type}"
+        return await self.redis.set(key, result, expire=expire or self.LONG_EXPIRE)
+    
+    async def get_file_analysis(self, file_hash: str, analysis_type: str) -> Optional[dict]:
+        """Get cached AI analysis of file content."""
+        key = f"{self.FILE_ANALYSIS_PREFIX}{file_hash}:{analysis_type}"
+        cached_data = await self.redis.get(key)
+        if cached_data:
+            try:
+                return json.loads(cached_data)
+            except (json.JSONDecodeError, TypeError):
+                return None
+        return None
+
 
 # Global cache manager instance
 cache_manager = CacheManager()
@@ -80,6 +80,8 @@ class Settings(BaseSettings):
     SMTP_USERNAME: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
     SMTP_USE_TLS: bool = True
+    SMTP_POOL_SIZE: int = 5
+    SMTP_RATE_PER_SECOND: float = 10.0
     
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
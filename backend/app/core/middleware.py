@@ -1,5 +1,6 @@
 """Middleware for authentication and authorization."""
 
+import math
 import time
 from typing import Callable, Optional
 from uuid import UUID
@@ -11,6 +12,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.auth import auth_manager
 from app.core.database import get_db_session
 from app.core.permissions import PermissionManager, Permission
+from app.core.rate_limit import InMemoryRateLimiter
 from app.models.user import User
 from app.services.user_service import UserService
 
@@ -77,42 +79,25 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware for rate limiting."""
+    """Middleware for per-client rate limiting (token bucket per IP)."""
     
-    def __init__(self, app, calls_per_minute: int = 60):
+    def __init__(self, app, calls_per_minute: int = 60, max_clients: int = 100_000):
         super().__init__(app)
         self.calls_per_minute = calls_per_minute
         self.window_size = 60  # 1 minute
-        self.request_counts = {}
+        self.limiter = InMemoryRateLimiter(calls_per_minute, self.window_size, max_keys=max_clients)
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """Process request through rate limiting middleware."""
-        client_ip = request.client.host
-        current_time = time.time()
+        client_ip = request.client.host if request.client else "unknown"
         
-        # Clean old entries
-        cutoff_time = current_time - self.window_size
-        self.request_counts = {
-            ip: [(timestamp, count) for timestamp, count in requests 
-                 if timestamp > cutoff_time]
-            for ip, requests in self.request_counts.items()
-        }
-        
-        # Count requests for this IP
-        if client_ip not in self.request_counts:
-            self.request_counts[client_ip] = []
-        
-        # Add current request
-        self.request_counts[client_ip].append((current_time, 1))
-        
-        # Check rate limit
-        total_requests = sum(count for _, count in self.request_counts[client_ip])
-        
-        if total_requests > self.calls_per_minute:
+        allowed, retry_after = self.limiter.hit(client_ip)
+        if not allowed:
             return Response(
                 content='{"detail": "请求过于频繁，请稍后重试"}',
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                media_type="application/json"
+                media_type="application/json",
+                headers={"Retry-After": str(math.ceil(retry_after))}
             )
         
         return await call_next(request)
@@ -6,9 +6,13 @@ Professional PDF report generation with Chinese font support
 import os
 import re
 import logging
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 try:
     from reportlab.lib.pagesizes import A4
@@ -28,20 +32,42 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Per-process caches: fonts are registered once per font directory and
+# paragraph styles are built once per font, however many generators exist.
+_font_lock = threading.Lock()
+_font_setup_done: Dict[str, bool] = {}
+_style_cache: Dict[str, Dict[str, "ParagraphStyle"]] = {}
+_shared_generators: Dict[Tuple[str, bool], "GradingPDFGenerator"] = {}
+
+# Generator used by batch worker processes (set by _init_batch_worker)
+_worker_generator: Optional["GradingPDFGenerator"] = None
+
 class GradingPDFGenerator:
     """Professional PDF generator for AI grading results"""
     
-    def __init__(self, font_dir: str = "fonts"):
+    def __init__(self, font_dir: str = "fonts", invariant: bool = False):
         if not REPORTLAB_AVAILABLE:
             raise ImportError("ReportLab is required for PDF generation. Install with: pip install reportlab")
         
         self.font_dir = Path(font_dir)
+        # Invariant output omits creation timestamps and random IDs, so the same
+        # input always produces the same bytes
+        self.invariant = invariant
         self.styles = getSampleStyleSheet()
         self._setup_fonts()
         self._setup_styles()
     
     def _setup_fonts(self):
-        """Setup Chinese fonts for PDF generation"""
+        """Setup Chinese fonts for PDF generation (once per process and font directory)"""
+        font_key = str(self.font_dir.resolve())
+        with _font_lock:
+            if _font_setup_done.get(font_key):
+                return
+            self._register_fonts()
+            _font_setup_done[font_key] = True
+    
+    def _register_fonts(self):
+        """Register the first available Chinese font in the font directory"""
         try:
             # Create fonts directory if it doesn't exist
             if not self.font_dir.exists():
@@ -81,8 +107,16 @@ class GradingPDFGenerator:
         # Check if Chinese font is available
         chinese_font = 'ChineseFont' if 'ChineseFont' in pdfmetrics.getRegisteredFontNames() else 'Helvetica'
         
+        cached = _style_cache.get(chinese_font)
+        if cached is None:
+            cached = _style_cache.setdefault(chinese_font, self._build_styles(chinese_font))
+        for name, style in cached.items():
+            setattr(self, name, style)
+    
+    def _build_styles(self, chinese_font: str) -> Dict[str, "ParagraphStyle"]:
+        """Build the paragraph styles for a font"""
         # Title style
-        self.title_style = ParagraphStyle(
+        title_style = ParagraphStyle(
             'CustomTitle',
             parent=self.styles['Title'],
             fontSize=20,
@@ -93,7 +127,7 @@ class GradingPDFGenerator:
         )
         
         # Subtitle style
-        self.subtitle_style = ParagraphStyle(
+        subtitle_style = ParagraphStyle(
             'CustomSubtitle',
             parent=self.styles['Heading2'],
             fontSize=14,
@@ -104,7 +138,7 @@ class GradingPDFGenerator:
         )
         
         # Normal text style
-        self.normal_style = ParagraphStyle(
+        normal_style = ParagraphStyle(
             'CustomNormal',
             parent=self.styles['Normal'],
             fontSize=12,
@@ -114,7 +148,7 @@ class GradingPDFGenerator:
         )
         
         # Code style
-        self.code_style = ParagraphStyle(
+        code_style = ParagraphStyle(
             'CustomCode',
             parent=self.styles['Code'],
             fontSize=10,
@@ -125,7 +159,7 @@ class GradingPDFGenerator:
         )
         
         # Important information style
-        self.important_style = ParagraphStyle(
+        important_style = ParagraphStyle(
             'Important',
             parent=self.styles['Normal'],
             fontSize=12,
@@ -135,7 +169,7 @@ class GradingPDFGenerator:
         )
         
         # Score style
-        self.score_style = ParagraphStyle(
+        score_style = ParagraphStyle(
             'Score',
             parent=self.styles['Normal'],
             fontSize=14,
@@ -143,6 +177,15 @@ class GradingPDFGenerator:
             textColor=colors.darkblue,
             fontName=chinese_font if chinese_font == 'ChineseFont' else 'Helvetica-Bold'
         )
+        
+        return {
+            'title_style': title_style,
+            'subtitle_style': subtitle_style,
+            'normal_style': normal_style,
+            'code_style': code_style,
+            'important_style': important_style,
+            'score_style': score_style,
+        }
     
     def _parse_grading_content(self, content: str) -> List[Dict[str, Any]]:
         """Parse grading results into structured format"""
@@ -210,7 +253,7 @@ class GradingPDFGenerator:
         
         return sections
     
-    def _create_header_footer(self, canvas_obj, doc):
+    def _create_header_footer(self, canvas_obj, doc, generated_at: Optional[datetime] = None):
         """Create page header and footer"""
         canvas_obj.saveState()
         
@@ -225,7 +268,7 @@ class GradingPDFGenerator:
         canvas_obj.drawRightString(
             A4[0] - 50, 
             30, 
-            f"第 {doc.page} 页 | {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+            f"第 {doc.page} 页 | {(generated_at or datetime.now()).strftime('%Y-%m-%d %H:%M')}"
         )
         
         canvas_obj.restoreState()
@@ -235,8 +278,10 @@ class GradingPDFGenerator:
                     output_path: str, 
                     title: str = "AI批改结果报告", 
                     student_info: Optional[Dict[str, Any]] = None,
-                    statistics: Optional[Dict[str, Any]] = None) -> bool:
+                    statistics: Optional[Dict[str, Any]] = None,
+                    generated_at: Optional[datetime] = None) -> bool:
         """Generate PDF report from grading results"""
+        generated_at = generated_at or datetime.now()
         try:
             # Create output directory
             output_path = Path(output_path)
@@ -249,7 +294,8 @@ class GradingPDFGenerator:
                 rightMargin=72,
                 leftMargin=72,
                 topMargin=100,
-                bottomMargin=72
+                bottomMargin=72,
+                invariant=self.invariant
             )
             
             # Document content
@@ -277,7 +323,7 @@ class GradingPDFGenerator:
                         ['题目数量', str(statistics.get('questions_graded', 0))]
                     ])
                 
-                info_data.append(['生成时间', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+                info_data.append(['生成时间', generated_at.strftime('%Y-%m-%d %H:%M:%S')])
                 
                 info_table = Table(info_data, colWidths=[2*inch, 4*inch])
                 info_table.setStyle(TableStyle([
@@ -330,7 +376,8 @@ class GradingPDFGenerator:
                 story.append(Spacer(1, 12))
             
             # Build PDF
-            doc.build(story, onFirstPage=self._create_header_footer, onLaterPages=self._create_header_footer)
+            header_footer = partial(self._create_header_footer, generated_at=generated_at)
+            doc.build(story, onFirstPage=header_footer, onLaterPages=header_footer)
             
             logger.info(f"PDF report generated successfully: {output_path}")
             return True
@@ -366,31 +413,238 @@ class GradingPDFGenerator:
     def generate_batch_report(self, 
                             grading_results: List[Dict[str, Any]], 
                             output_dir: str,
-                            title_prefix: str = "批改报告") -> List[str]:
-        """Generate batch PDF reports"""
-        generated_files = []
+                            title_prefix: str = "批改报告",
+                            max_workers: Optional[int] = None,
+                            bundle_path: Optional[str] = None,
+                            generated_at: Optional[datetime] = None) -> List[str]:
+        """Generate batch PDF reports
         
-        for i, result in enumerate(grading_results):
-            try:
-                filename = f"{title_prefix}_{i+1:03d}.pdf"
-                output_path = Path(output_dir) / filename
-                
-                success = self.generate_pdf(
-                    content=result.get('content', ''),
-                    output_path=str(output_path),
-                    title=f"{title_prefix} #{i+1}",
-                    student_info=result.get('student_info'),
-                    statistics=result.get('statistics')
-                )
-                
-                if success:
-                    generated_files.append(str(output_path))
-                    
-            except Exception as e:
-                logger.error(f"Failed to generate report {i+1}: {e}")
+        Reports are rendered in a process pool (one process when max_workers
+        is 1 or there is a single report) and share one generation time. With
+        bundle_path, the reports are also merged, in order, into one PDF as
+        they finish rendering, without holding the merged PDF in memory.
+        """
+        generated_at = generated_at or datetime.now()
+        jobs = [
+            (
+                i,
+                str(Path(output_dir) / f"{title_prefix}_{i+1:03d}.pdf"),
+                f"{title_prefix} #{i+1}",
+                result,
+                generated_at
+            )
+            for i, result in enumerate(grading_results)
+        ]
+        
+        workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+        if workers <= 1 or len(jobs) <= 1:
+            rendered = (self._render_batch_item(job) for job in jobs)
+            generated_files = self._collect_batch_results(rendered, bundle_path)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_batch_worker,
+                initargs=(str(self.font_dir), self.invariant)
+            ) as executor:
+                # map yields in submission order, so merging overlaps rendering
+                rendered = executor.map(_render_batch_job, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+                generated_files = self._collect_batch_results(rendered, bundle_path)
         
         logger.info(f"Generated {len(generated_files)} PDF reports")
         return generated_files
+    
+    def _render_batch_item(self, job: tuple) -> Tuple[int, Optional[str]]:
+        """Render one batch report, returning (index, output path or None)"""
+        index, output_path, title, result, generated_at = job
+        try:
+            success = self.generate_pdf(
+                content=result.get('content', ''),
+                output_path=output_path,
+                title=title,
+                student_info=result.get('student_info'),
+                statistics=result.get('statistics'),
+                generated_at=generated_at
+            )
+            return index, output_path if success else None
+        except Exception as e:
+            logger.error(f"Failed to generate report {index+1}: {e}")
+            return index, None
+    
+    def _collect_batch_results(self, rendered, bundle_path: Optional[str]) -> List[str]:
+        """Collect rendered report paths in order, appending each to the bundle.
+        
+        Each report is copied into the bundle file as soon as it is rendered
+        (see PdfBundleWriter), so merging overlaps rendering and memory does
+        not grow with the size of the batch.
+        """
+        generated_files = []
+        bundle_file = None
+        writer = None
+        if bundle_path:
+            # Write to a temporary file so readers never see a partial bundle
+            bundle = Path(bundle_path)
+            bundle.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = bundle.with_name(bundle.name + '.part')
+            bundle_file = open(tmp_path, 'wb')
+            writer = PdfBundleWriter(bundle_file)
+        
+        try:
+            for _, output_path in rendered:
+                if output_path:
+                    generated_files.append(output_path)
+                    if writer is not None:
+                        writer.append(output_path)
+            
+            if writer is not None and generated_files:
+                writer.close()
+                bundle_file.close()
+                os.replace(tmp_path, bundle)
+                logger.info(f"Merged {len(generated_files)} PDF reports into {bundle}")
+        finally:
+            if bundle_file is not None and not bundle_file.closed:
+                bundle_file.close()
+                tmp_path.unlink(missing_ok=True)
+        
+        return generated_files
+
+class PdfBundleWriter:
+    """Concatenate PDF files into one PDF stream, one input at a time.
+    
+    PyPDF2's PdfWriter keeps every appended page in memory until it writes
+    the file. This writer instead copies each input's pages, and the objects
+    they reference, to the output as soon as the input is appended, and only
+    keeps the byte offset of every written object and the ids of the pages.
+    close() then writes the page tree, the cross-reference table and the
+    trailer.
+    """
+    
+    _INHERITED_PAGE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self._offsets = array("q", [0])  # byte offset of each object; object 0 is the free list head
+        self._page_ids: List[int] = []
+        self._pages_id = self._reserve()
+        self._catalog_id = self._reserve()
+        stream.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    
+    def append(self, path: str) -> None:
+        """Copy every page of the PDF at path to the end of the bundle"""
+        from PyPDF2 import PdfReader
+        from PyPDF2.generic import NameObject
+        
+        reader = PdfReader(path)
+        id_map: Dict[Tuple[int, int], int] = {}
+        pending: List[Tuple[int, Any]] = []
+        
+        pages = list(reader.pages)
+        page_ids = [self._reserve() for _ in pages]
+        for page, page_id in zip(pages, page_ids):
+            if page.indirect_reference is not None:
+                id_map[(page.indirect_reference.idnum, page.indirect_reference.generation)] = page_id
+        
+        for page, page_id in zip(pages, page_ids):
+            copied = self._copy(
+                {key: value for key, value in page.items() if key != "/Parent"}, id_map, pending
+            )
+            for key in self._INHERITED_PAGE_KEYS:
+                if key not in copied:
+                    value = self._inherited(page, key)
+                    if value is not None:
+                        copied[NameObject(key)] = self._copy(value, id_map, pending)
+            copied[NameObject("/Parent")] = self._ref(self._pages_id)
+            self._write_object(page_id, copied)
+            
+            while pending:
+                object_id, obj = pending.pop()
+                self._write_object(object_id, self._copy(obj, id_map, pending))
+        
+        self._page_ids.extend(page_ids)
+    
+    def close(self) -> None:
+        """Write the page tree, cross-reference table and trailer"""
+        from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject, NumberObject
+        
+        self._write_object(self._pages_id, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(self._ref(page_id) for page_id in self._page_ids),
+            NameObject("/Count"): NumberObject(len(self._page_ids)),
+        }))
+        self._write_object(self._catalog_id, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): self._ref(self._pages_id),
+        }))
+        
+        xref_offset = self._stream.tell()
+        self._stream.write(f"xref\n0 {len(self._offsets)}\n0000000000 65535 f \n".encode("ascii"))
+        for offset in self._offsets[1:]:
+            self._stream.write(f"{offset:010d} 00000 n \n".encode("ascii"))
+        self._stream.write(
+            f"trailer\n<< /Size {len(self._offsets)} /Root {self._catalog_id} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+        )
+    
+    def _reserve(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets) - 1
+    
+    @staticmethod
+    def _ref(object_id: int):
+        from PyPDF2.generic import IndirectObject
+        return IndirectObject(object_id, 0, None)
+    
+    @staticmethod
+    def _inherited(page, key: str):
+        node = page
+        while key not in node and "/Parent" in node:
+            node = node["/Parent"].get_object()
+        return node.raw_get(key) if key in node else None
+    
+    def _copy(self, obj, id_map: Dict[Tuple[int, int], int], pending: List[Tuple[int, Any]]):
+        """Copy a PDF object, renumbering indirect references into the bundle"""
+        from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+        
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key not in id_map:
+                id_map[key] = self._reserve()
+                pending.append((id_map[key], obj.get_object()))
+            return self._ref(id_map[key])
+        if isinstance(obj, StreamObject):
+            copied = StreamObject()
+            copied._data = obj._data  # still encoded; /Filter is copied below
+            for key, value in obj.items():
+                if key != "/Length":
+                    copied[NameObject(key)] = self._copy(value, id_map, pending)
+            return copied
+        if isinstance(obj, (DictionaryObject, dict)):
+            return DictionaryObject({NameObject(key): self._copy(value, id_map, pending) for key, value in obj.items()})
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copy(value, id_map, pending) for value in obj)
+        return obj
+    
+    def _write_object(self, object_id: int, obj) -> None:
+        self._offsets[object_id] = self._stream.tell()
+        self._stream.write(f"{object_id} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(self._stream, None)
+        self._stream.write(b"\nendobj\n")
+
+def get_pdf_generator(font_dir: str = "fonts", invariant: bool = False) -> GradingPDFGenerator:
+    """Get the shared generator for this process"""
+    key = (str(Path(font_dir).resolve()), invariant)
+    generator = _shared_generators.get(key)
+    if generator is None:
+        generator = _shared_generators.setdefault(key, GradingPDFGenerator(font_dir, invariant))
+    return generator
+
+def _init_batch_worker(font_dir: str, invariant: bool):
+    """Batch worker initializer: register fonts and build styles once per process"""
+    global _worker_generator
+    _worker_generator = get_pdf_generator(font_dir, invariant)
+
+def _render_batch_job(job: tuple) -> Tuple[int, Optional[str]]:
+    """Batch worker entry point"""
+    return _worker_generator._render_batch_item(job)
 
 # Convenience functions for integration
 def create_grading_pdf(content: str, 
@@ -400,7 +654,7 @@ def create_grading_pdf(content: str,
                       statistics: Optional[Dict[str, Any]] = None) -> bool:
     """Create a PDF report from grading results"""
     try:
-        generator = GradingPDFGenerator()
+        generator = get_pdf_generator()
         return generator.generate_pdf(content, output_path, title, student_info, statistics)
     except Exception as e:
         logger.error(f"PDF generation failed: {e}")
@@ -408,11 +662,13 @@ def create_grading_pdf(content: str,
 
 def create_batch_pdfs(grading_results: List[Dict[str, Any]], 
                      output_dir: str,
-                     title_prefix: str = "Grading Report") -> List[str]:
+                     title_prefix: str = "Grading Report",
+                     max_workers: Optional[int] = None,
+                     bundle_path: Optional[str] = None) -> List[str]:
     """Create batch PDF reports"""
     try:
-        generator = GradingPDFGenerator()
-        return generator.generate_batch_report(grading_results, output_dir, title_prefix)
+        generator = get_pdf_generator()
+        return generator.generate_batch_report(grading_results, output_dir, title_prefix, max_workers, bundle_path)
     except Exception as e:
         logger.error(f"Batch PDF generation failed: {e}")
         return []
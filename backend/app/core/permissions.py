@@ -1,7 +1,9 @@
 """Advanced permission system for role-based and resource-based access control."""
 
+import time
+from collections import OrderedDict
 from enum import Enum
-from typing import Dict, List, Set, Union
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -111,6 +113,117 @@ ROLE_PERMISSIONS: Dict[UserRole, Set[Permission]] = {
 }
 
 
+class PermissionDecisionCache:
+    """Short-TTL, process-wide cache of resource access decisions.
+
+    Entries are keyed by (user, role, resource type, resource id, permission)
+    and indexed by user and by resource so that membership, ownership and role
+    changes can drop exactly the affected decisions.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 30.0,
+        max_entries: int = 50_000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple, Tuple[float, bool]]" = OrderedDict()
+        self._by_user: Dict[UUID, Set[Tuple]] = {}
+        self._by_resource: Dict[Tuple[ResourceType, UUID], Set[Tuple]] = {}
+
+    @staticmethod
+    def make_key(
+        user: User,
+        resource_type: ResourceType,
+        resource_id: UUID,
+        permission: Permission
+    ) -> Tuple:
+        return (user.id, user.role, resource_type, resource_id, permission)
+
+    def get(self, key: Tuple) -> Optional[bool]:
+        """Return the cached decision, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, allowed = entry
+        if expires_at <= self._clock():
+            self._discard(key)
+            return None
+        return allowed
+
+    def set(self, key: Tuple, allowed: bool) -> None:
+        if key in self._entries:
+            self._discard(key)
+        while len(self._entries) >= self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+        self._entries[key] = (self._clock() + self.ttl_seconds, allowed)
+        user_id, _, resource_type, resource_id, _ = key
+        self._by_user.setdefault(user_id, set()).add(key)
+        self._by_resource.setdefault((resource_type, resource_id), set()).add(key)
+
+    def invalidate_user(self, user_id: UUID) -> None:
+        """Drop every decision made for a user."""
+        for key in self._by_user.pop(user_id, set()):
+            self._discard(key)
+
+    def invalidate_resource(self, resource_type: ResourceType, resource_id: UUID) -> None:
+        """Drop every decision made about a resource."""
+        for key in self._by_resource.pop((resource_type, resource_id), set()):
+            self._discard(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+        self._by_resource.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, key: Tuple) -> None:
+        if self._entries.pop(key, None) is None:
+            return
+        user_id, _, resource_type, resource_id, _ = key
+        for index, index_key in ((self._by_user, user_id), (self._by_resource, (resource_type, resource_id))):
+            keys = index.get(index_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[index_key]
+
+
+# Shared across requests; the request-scoped memo lives in the session's info dict
+permission_cache = PermissionDecisionCache()
+
+_REQUEST_MEMO_KEY = "permission_decisions"
+
+
+def _request_memo(db: AsyncSession) -> Dict[Tuple, bool]:
+    """Decisions made during the current request (one session per request)."""
+    return db.info.setdefault(_REQUEST_MEMO_KEY, {})
+
+
+def invalidate_user_permissions(user_id: UUID, db: Optional[AsyncSession] = None) -> None:
+    """Forget cached decisions for a user after a role or relationship change."""
+    permission_cache.invalidate_user(user_id)
+    if db is not None:
+        db.info.pop(_REQUEST_MEMO_KEY, None)
+
+
+def invalidate_resource_permissions(
+    resource_type: ResourceType,
+    resource_id: UUID,
+    db: Optional[AsyncSession] = None
+) -> None:
+    """Forget cached decisions about a resource after a membership or ownership change."""
+    permission_cache.invalidate_resource(resource_type, resource_id)
+    if db is not None:
+        db.info.pop(_REQUEST_MEMO_KEY, None)
+
+
 class PermissionManager:
     """Permission manager for checking user permissions."""
     
@@ -146,8 +259,20 @@ class PermissionManager:
         if not self.has_permission(user, permission):
             return False
         
-        # Then check resource-specific access
-        return await self._check_resource_access(user, resource_type, resource_id)
+        # Then check resource-specific access, consulting the request memo and
+        # the shared cache before hitting the database
+        key = PermissionDecisionCache.make_key(user, resource_type, resource_id, permission)
+        memo = _request_memo(self.db)
+        if key in memo:
+            return memo[key]
+
+        allowed = permission_cache.get(key)
+        if allowed is None:
+            allowed = await self._check_resource_access(user, resource_type, resource_id)
+            permission_cache.set(key, allowed)
+
+        memo[key] = allowed
+        return allowed
     
     async def _check_resource_access(
         self,
@@ -2,7 +2,8 @@
 
 import logging
 import time
-from typing import Optional, Tuple
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
 
 from app.core.redis import redis_manager
 
@@ -160,6 +161,74 @@ class RateLimiter:
             }
 
 
+class InMemoryRateLimiter:
+    """Per-process token-bucket rate limiter with O(1) cost per request.
+    
+    Each key has a bucket of ``limit`` tokens refilled evenly over
+    ``window_seconds``. Buckets live in an LRU-ordered dict: a bucket idle for
+    a full window is back at capacity, so it is evicted lazily (a couple of
+    entries per request), and ``max_keys`` bounds memory under key floods.
+    """
+    
+    # Idle buckets checked for eviction per request
+    EVICTIONS_PER_HIT = 2
+    
+    def __init__(
+        self,
+        limit: int,
+        window_seconds: float,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.refill_rate = limit / window_seconds
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (tokens, last update time), least recently seen first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+    
+    def hit(self, key: str) -> Tuple[bool, float]:
+        """
+        Consume a token for key.
+        
+        Returns:
+            Tuple of (is_allowed, retry_after_seconds)
+        """
+        now = self.clock()
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = float(self.limit)
+        else:
+            tokens, updated = bucket
+            tokens = min(self.limit, tokens + (now - updated) * self.refill_rate)
+        
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        
+        self._evict(now)
+        
+        retry_after = 0.0 if allowed else (1 - tokens) / self.refill_rate
+        return allowed, retry_after
+    
+    def _evict(self, now: float) -> None:
+        """Drop idle (fully refilled) buckets from the LRU end, and enforce max_keys."""
+        buckets = self._buckets
+        for _ in range(self.EVICTIONS_PER_HIT):
+            oldest_key = next(iter(buckets))
+            if now - buckets[oldest_key][1] < self.window_seconds:
+                break
+            del buckets[oldest_key]
+        
+        while len(buckets) > self.max_keys:
+            buckets.popitem(last=False)
+
+
 # Global rate limiter instance
 rate_limiter = RateLimiter()
 
@@ -5,8 +5,14 @@ from .user import User, UserRole, ParentStudentRelation
 from .class_model import Class, ClassStudent
 from .assignment import Assignment, AssignmentStatus, Submission, SubmissionStatus
 from .file import File, FileType, FileStatus
-from .ai import GradingTask, GradingTaskStatus, ChatMessage, MessageType
-from .notification import Notification, NotificationType, NotificationPriority
+from .ai import GradingTask, GradingTaskStatus, ChatMessage, ConversationMemory, MessageType
+from .notification import (
+    EmailDelivery,
+    EmailDeliveryStatus,
+    Notification,
+    NotificationType,
+    NotificationPriority
+)
 from .analytics import LearningAnalytics
 
 # Export all models
@@ -35,12 +41,15 @@ __all__ = [
     "GradingTask",
     "GradingTaskStatus",
     "ChatMessage",
+    "ConversationMemory",
     "MessageType",
     
     # Notification models
     "Notification",
     "NotificationType",
     "NotificationPriority",
+    "EmailDelivery",
+    "EmailDeliveryStatus",
     
     # Analytics models
     "LearningAnalytics",
@@ -213,4 +213,50 @@ class ChatMessage(Base):
         """Get a preview of the message content."""
         if len(self.content) <= 100:
             return self.content
-        return self.content[:97] + "..."
\ No newline at end of file
+        return self.content[:97] + "..."
+
+class ConversationMemory(Base):
+    """Summarized conversation memory of one user for the AI assistant.
+    
+    Holds a rolling summary of older turns plus a bounded window of recent
+    turns, so the agent context can be restored without replaying history.
+    """
+    
+    __tablename__ = "conversation_memories"
+    
+    # Primary key
+    id: Mapped[UUID] = mapped_column(
+        PostgresUUID(as_uuid=True),
+        primary_key=True,
+        default=uuid4
+    )
+    
+    # Foreign key
+    user_id: Mapped[UUID] = mapped_column(
+        PostgresUUID(as_uuid=True),
+        ForeignKey("users.id"),
+        nullable=False,
+        unique=True,
+        index=True
+    )
+    
+    # Memory content
+    summary: Mapped[str] = mapped_column(Text, default="", nullable=False)
+    recent_turns: Mapped[list] = mapped_column(JSON, default=list, nullable=False)
+    summarized_turns: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<ConversationMemory(user_id={self.user_id}, turns={len(self.recent_turns or [])})>"
@@ -5,7 +5,7 @@ from decimal import Decimal
 from typing import Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, func
+from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, UniqueConstraint, func
 from sqlalchemy import JSON
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -17,6 +17,10 @@ class LearningAnalytics(Base):
     """Learning analytics model for tracking student performance."""
     
     __tablename__ = "learning_analytics"
+    __table_args__ = (
+        # One rollup row per knowledge point; also serves per-user lookups
+        UniqueConstraint("user_id", "subject", "knowledge_point", name="uq_learning_analytics_user_point"),
+    )
     
     # Primary key
     id: Mapped[UUID] = mapped_column(
@@ -51,7 +51,8 @@ class File(Base):
     file_type: Mapped[FileType] = mapped_column(String(50), nullable=False, index=True)
     mime_type: Mapped[str] = mapped_column(String(100), nullable=False)
     file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    
+    file_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)  # SHA-256
+
     # Storage information
     file_url: Mapped[str] = mapped_column(String(500), nullable=False)
     storage_path: Mapped[Optional[str]] = mapped_column(String(500))
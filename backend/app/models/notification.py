@@ -5,7 +5,7 @@ from enum import Enum
 from typing import Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, String, Text, func
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy import JSON
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -41,6 +41,12 @@ class NotificationPriority(str, Enum):
     URGENT = "urgent"
 
 
+class EmailDeliveryStatus(str, Enum):
+    """Email delivery outcome enumeration."""
+    SENT = "sent"
+    FAILED = "failed"
+
+
 class Notification(Base):
     """Notification model for user communications."""
     
@@ -144,4 +150,50 @@ class Notification(Base):
         """Mark notification as sent."""
         if not self.is_sent:
             self.is_sent = True
-            self.sent_at = datetime.utcnow()
\ No newline at end of file
+            self.sent_at = datetime.utcnow()
+
+
+class EmailDelivery(Base):
+    """Delivery outcome for one recipient of a bulk email job.
+    
+    Written as each email completes, so an interrupted job can be resumed
+    without re-sending emails that were already delivered.
+    """
+    
+    __tablename__ = "email_deliveries"
+    __table_args__ = (
+        UniqueConstraint("job_id", "recipient_index", name="uq_email_delivery_job_recipient"),
+    )
+    
+    # Primary key
+    id: Mapped[UUID] = mapped_column(
+        PostgresUUID(as_uuid=True),
+        primary_key=True,
+        default=uuid4
+    )
+    
+    # Bulk job and position of the recipient within it
+    job_id: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+    recipient_index: Mapped[int] = mapped_column(Integer, nullable=False)
+    to_email: Mapped[str] = mapped_column(String(255), nullable=False)
+    
+    # Outcome
+    status: Mapped[EmailDeliveryStatus] = mapped_column(String(20), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<EmailDelivery(job_id={self.job_id}, to_email={self.to_email}, status={self.status})>"
@@ -7,7 +7,6 @@ from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
 from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain.memory import ConversationBufferWindowMemory
 from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
@@ -29,6 +28,7 @@ from app.schemas.ai_agent import (
 )
 from app.services.user_service import UserService
 from app.services.analytics_service import AnalyticsService
+from app.services.conversation_memory import ConversationMemoryStore
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -54,12 +54,8 @@ class AIAgentService:
             max_tokens=2000
         )
         
-        # Initialize memory for conversation context
-        self.memory = ConversationBufferWindowMemory(
-            k=10,  # Keep last 10 messages
-            memory_key="chat_history",
-            return_messages=True
-        )
+        # Per-user conversation memory (recent turns plus a rolling summary)
+        self.memory_store = ConversationMemoryStore(db, self.llm)
         
         # Initialize prompt templates
         self._setup_prompt_templates()
@@ -176,7 +172,6 @@ class AIAgentService:
             self.agent_executor = AgentExecutor(
                 agent=self.agent,
                 tools=self.tools,
-                memory=self.memory,
                 verbose=True,
                 max_iterations=3,
                 early_stopping_method="generate"
@@ -216,7 +211,7 @@ class AIAgentService:
             # Process message with agent
             start_time = datetime.utcnow()
             
-            response = await self._run_agent_async(agent_context)
+            response = await self._run_agent_async(user_id, agent_context)
             
             end_time = datetime.utcnow()
             response_time_ms = int((end_time - start_time).total_seconds() * 1000)
@@ -250,18 +245,27 @@ class AIAgentService:
             logger.error(f"Error processing chat message: {str(e)}")
             raise AIServiceError(f"Failed to process chat message: {str(e)}")
     
-    async def _run_agent_async(self, context: Dict[str, Any]) -> str:
-        """Run the agent asynchronously."""
+    async def _run_agent_async(self, user_id: UUID, context: Dict[str, Any]) -> str:
+        """Run the agent in a worker thread with the user's own conversation memory.
+        
+        A failed turn is answered with an apology but not added to the memory.
+        """
         try:
-            # For now, we'll use a simple implementation
-            # In a full implementation, this would use the actual agent executor
-            result = self.agent_executor.invoke(context)
-            return result.get("output", "I'm sorry, I couldn't process your request.")
+            return await self.memory_store.run_turn(
+                user_id,
+                context["input"],
+                lambda chat_history: self._invoke_agent({**context, "chat_history": chat_history})
+            )
             
         except Exception as e:
             logger.error(f"Agent execution error: {str(e)}")
             return "I apologize, but I'm experiencing some technical difficulties. Please try again later."
     
+    def _invoke_agent(self, context: Dict[str, Any]) -> str:
+        """Invoke the agent executor (blocking); errors propagate to the caller."""
+        result = self.agent_executor.invoke(context)
+        return result.get("output", "I'm sorry, I couldn't process your request.")
+    
     async def _save_chat_message(
         self,
         user_id: UUID,
@@ -330,7 +334,7 @@ class AIAgentService:
             await self.db.commit()
             
             # Clear memory as well
-            self.memory.clear()
+            await self.memory_store.clear(user_id)
             
             return True
             
@@ -1218,11 +1222,10 @@ class AIAgentService:
             elif action == "clear_memory":
                 # Clear conversation memory
                 success = await self.clear_chat_history(user_id)
-                self.memory.clear()
                 return {"status": "success" if success else "error", "message": "Memory cleared"}
             
             elif action == "optimize_memory":
-                # Optimize memory by keeping only important messages
+                # Fold older turns into the conversation summary
                 await self._optimize_conversation_memory(user_id)
                 return {"status": "success", "message": "Memory optimized"}
             
@@ -1234,44 +1237,9 @@ class AIAgentService:
             raise AIServiceError(f"Failed to manage conversation memory: {str(e)}")
     
     async def _optimize_conversation_memory(self, user_id: UUID) -> None:
-        """Optimize conversation memory by keeping only important messages."""
+        """Optimize conversation memory by folding older turns into the summary."""
         try:
-            # Get all messages
-            all_messages = await self.get_chat_history(user_id, limit=100)
-            
-            if len(all_messages) <= 20:
-                return  # No need to optimize
-            
-            # Identify important messages
-            important_messages = []
-            
-            for msg in all_messages:
-                # Keep system messages (context)
-                if msg.is_system_message:
-                    important_messages.append(msg)
-                    continue
-                
-                # Keep messages with high engagement
-                if msg.is_user_message and len(msg.content) > 50:
-                    important_messages.append(msg)
-                    continue
-                
-                # Keep AI responses with context data
-                if msg.is_assistant_message and msg.context_data:
-                    important_messages.append(msg)
-                    continue
-                
-                # Keep recent messages (last 10)
-                if msg in all_messages[-10:]:
-                    important_messages.append(msg)
-            
-            # Update memory with important messages only
-            self.memory.clear()
-            for msg in important_messages[-10:]:  # Keep last 10 important messages
-                if msg.is_user_message:
-                    self.memory.chat_memory.add_user_message(msg.content)
-                elif msg.is_assistant_message:
-                    self.memory.chat_memory.add_ai_message(msg.content)
+            await self.memory_store.compact(user_id)
             
         except Exception as e:
             logger.error(f"Error optimizing conversation memory: {str(e)}")
@@ -2,18 +2,34 @@
 
 import logging
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
-from uuid import UUID
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
 
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import case, delete, select, func, tuple_
 
 from app.core.exceptions import ValidationError
+from app.models.analytics import LearningAnalytics
 from app.models.user import User
 from app.models.assignment import Assignment, Submission
 
 logger = logging.getLogger(__name__)
 
+# Weight of the newest graded attempt in the exponentially-decayed mastery score
+MASTERY_DECAY_ALPHA = Decimal("0.3")
+
+# Score percentage at or above which an attempt counts as correct
+CORRECT_SCORE_THRESHOLD = 60.0
+
+# Rollup key used when an assignment has no subject or topic
+DEFAULT_ROLLUP_KEY = "general"
+
+# (subject, topic, knowledge_point, score_percentage, attempted_at)
+RollupEvent = Tuple[str, Optional[str], str, float, datetime]
+
 
 class AnalyticsService:
     """Service for analyzing learning data and generating insights."""
@@ -41,9 +57,15 @@ class AnalyticsService:
             else:
                 start_date = end_date - timedelta(days=30)  # Default to last month
             
-            # Query submissions for the user in the time period
+            # Query only the submission columns the metrics need
             query = (
-                select(Submission)
+                select(
+                    Submission.id,
+                    Submission.assignment_id,
+                    Submission.score,
+                    Submission.submitted_at,
+                    Submission.graded_at
+                )
                 .join(Assignment)
                 .where(
                     Submission.student_id == user_id,
@@ -56,7 +78,7 @@ class AnalyticsService:
                 query = query.where(Assignment.subject.in_(subjects))
             
             result = await self.db.execute(query)
-            submissions = result.scalars().all()
+            submissions = result.all()
             
             # Calculate performance metrics
             total_submissions = len(submissions)
@@ -113,85 +135,25 @@ class AnalyticsService:
         user_id: UUID,
         threshold: float = 0.7
     ) -> List[Dict[str, Any]]:
-        """Identify areas where the user is performing below threshold."""
+        """Identify knowledge points where the user is performing below threshold."""
         try:
-            # Get user performance data
-            performance_data = await self.get_user_performance_data(user_id)
-            
-            # Analyze submissions by subject/topic
             weak_areas = []
+            for rollup in await self.get_knowledge_rollups(user_id):
+                mastery = float(rollup.mastery_level or 0) / 100
+                error_rate = rollup.error_count / rollup.total_attempts if rollup.total_attempts else 0
+                
+                if mastery < threshold or error_rate > 0.3:
+                    weak_areas.append({
+                        "area": rollup.knowledge_point,
+                        "subject": rollup.subject,
+                        "average_score": round(mastery, 2),
+                        "error_count": rollup.error_count,
+                        "total_attempts": rollup.total_attempts,
+                        "severity": "high" if mastery < 0.5 else "medium"
+                    })
             
-            # Group submissions by subject
-            subject_performance = {}
-            for submission in performance_data.get("submissions", []):
-                if submission.get("score") is not None:
-                    # In a real implementation, we'd get the assignment subject
-                    # For now, we'll use mock data with some analysis
-                    subject = "mathematics"  # This would come from the assignment
-                    
-                    if subject not in subject_performance:
-                        subject_performance[subject] = {
-                            "scores": [],
-                            "total_attempts": 0,
-                            "error_count": 0
-                        }
-                    
-                    score = submission["score"]
-                    subject_performance[subject]["scores"].append(score)
-                    subject_performance[subject]["total_attempts"] += 1
-                    
-                    if score < threshold * 100:  # Convert threshold to percentage
-                        subject_performance[subject]["error_count"] += 1
-            
-            # Identify weak areas based on performance
-            for subject, perf in subject_performance.items():
-                if perf["scores"]:
-                    avg_score = sum(perf["scores"]) / len(perf["scores"])
-                    error_rate = perf["error_count"] / perf["total_attempts"]
-                    
-                    if avg_score < threshold * 100 or error_rate > 0.3:
-                        # Determine specific weak areas within the subject
-                        if subject == "mathematics":
-                            if avg_score < 60:
-                                weak_areas.append({
-                                    "area": "Quadratic Equations",
-                                    "subject": subject,
-                                    "average_score": avg_score / 100,
-                                    "error_count": perf["error_count"],
-                                    "total_attempts": perf["total_attempts"],
-                                    "severity": "high" if avg_score < 50 else "medium"
-                                })
-                            elif avg_score < 70:
-                                weak_areas.append({
-                                    "area": "Geometry Proofs",
-                                    "subject": subject,
-                                    "average_score": avg_score / 100,
-                                    "error_count": perf["error_count"],
-                                    "total_attempts": perf["total_attempts"],
-                                    "severity": "medium"
-                                })
-            
-            # If no real data, return mock weak areas for demonstration
-            if not weak_areas:
-                weak_areas = [
-                    {
-                        "area": "Quadratic Equations",
-                        "subject": "mathematics",
-                        "average_score": 0.65,
-                        "error_count": 8,
-                        "total_attempts": 12,
-                        "severity": "medium"
-                    },
-                    {
-                        "area": "Geometry Proofs",
-                        "subject": "mathematics", 
-                        "average_score": 0.58,
-                        "error_count": 15,
-                        "total_attempts": 20,
-                        "severity": "high"
-                    }
-                ]
-            
+            # Weakest areas first
+            weak_areas.sort(key=lambda area: area["average_score"])
             return weak_areas
             
         except Exception as e:
@@ -233,80 +195,186 @@ class AnalyticsService:
         user_id: UUID,
         subjects: Optional[List[str]] = None
     ) -> Dict[str, float]:
-        """Calculate mastery levels for different topics."""
+        """Calculate mastery levels (0-1) for each knowledge point."""
         try:
-            # Get user performance data
-            performance_data = await self.get_user_performance_data(user_id)
-            
-            # Calculate mastery based on recent performance
-            mastery_levels = {}
-            
-            # Analyze submissions to calculate mastery
-            topic_scores = {}
-            for submission in performance_data.get("submissions", []):
-                if submission.get("score") is not None:
-                    # In a real implementation, we'd get the topic from the assignment
-                    # For now, we'll simulate different topics based on score patterns
-                    score = submission["score"]
-                    
-                    # Simulate topic assignment based on score patterns
-                    if score >= 85:
-                        topic = "Linear Equations"
-                    elif score >= 70:
-                        topic = "Quadratic Functions"
-                    elif score >= 60:
-                        topic = "Geometry Basics"
-                    elif score >= 50:
-                        topic = "Trigonometry"
-                    else:
-                        topic = "Calculus Basics"
-                    
-                    if topic not in topic_scores:
-                        topic_scores[topic] = []
-                    topic_scores[topic].append(score)
-            
-            # Calculate mastery levels based on performance
-            for topic, scores in topic_scores.items():
-                if scores:
-                    # Calculate mastery using weighted average (recent scores matter more)
-                    weights = [i + 1 for i in range(len(scores))]  # More weight to recent scores
-                    weighted_avg = sum(s * w for s, w in zip(scores, weights)) / sum(weights)
-                    
-                    # Convert to mastery level (0-1 scale)
-                    mastery_level = min(weighted_avg / 100, 1.0)
-                    
-                    # Apply consistency bonus/penalty
-                    if len(scores) > 1:
-                        consistency = 1 - (max(scores) - min(scores)) / 100
-                        mastery_level = mastery_level * (0.8 + 0.2 * consistency)
-                    
-                    mastery_levels[topic] = round(mastery_level, 2)
-            
-            # If no real data, return mock mastery levels
-            if not mastery_levels:
-                mastery_levels = {
-                    "Linear Equations": 0.85,
-                    "Quadratic Functions": 0.72,
-                    "Geometry Basics": 0.90,
-                    "Trigonometry": 0.65,
-                    "Calculus Basics": 0.55
-                }
-            
-            # Filter by subjects if specified
-            if subjects:
-                filtered_mastery = {}
-                for topic, level in mastery_levels.items():
-                    # Simple subject matching (in real implementation, would be more sophisticated)
-                    if any(subject.lower() in topic.lower() for subject in subjects):
-                        filtered_mastery[topic] = level
-                return filtered_mastery
-            
-            return mastery_levels
+            rollups = await self.get_knowledge_rollups(user_id, subjects)
+            return {
+                rollup.knowledge_point: round(float(rollup.mastery_level or 0) / 100, 2)
+                for rollup in rollups
+            }
             
         except Exception as e:
             logger.error(f"Error calculating mastery levels: {str(e)}")
             raise ValidationError(f"Failed to calculate mastery levels: {str(e)}")
     
+    async def get_knowledge_rollups(
+        self,
+        user_id: UUID,
+        subjects: Optional[List[str]] = None
+    ) -> List[LearningAnalytics]:
+        """Get the user's knowledge-point rollups (single indexed query)."""
+        query = select(LearningAnalytics).where(LearningAnalytics.user_id == user_id)
+        if subjects:
+            query = query.where(LearningAnalytics.subject.in_(subjects))
+        query = query.order_by(LearningAnalytics.subject, LearningAnalytics.knowledge_point)
+        
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+    
+    async def record_grading_result(self, submission: Submission, regrade: bool = False) -> None:
+        """Fold a graded submission into the student's knowledge-point rollups.
+        
+        A first grading is applied as one more attempt; each rollup row is
+        upserted in a single statement, so concurrent gradings for the same
+        student don't lose updates. A regrade (the submission was already
+        counted) recomputes the affected knowledge point instead, so the rows
+        stay identical to ``rebuild_knowledge_rollups``.
+        """
+        if submission.score is None:
+            return
+        
+        assignment = await self.db.get(Assignment, submission.assignment_id)
+        events = self._rollup_events(submission, assignment)
+        if regrade:
+            await self._replay_rollups(
+                submission.student_id,
+                knowledge_points={(subject, knowledge_point) for subject, _, knowledge_point, _, _ in events}
+            )
+            return
+        
+        try:
+            for event in events:
+                await self.db.execute(self._rollup_upsert(submission.student_id, event))
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+    
+    async def rebuild_knowledge_rollups(self, user_id: UUID) -> int:
+        """Recompute a user's rollups from scratch by replaying graded submissions.
+        
+        Submissions are replayed in grading order, producing the same rows as the
+        incremental hook. Returns the number of replayed submissions.
+        """
+        return await self._replay_rollups(user_id)
+    
+    async def _replay_rollups(
+        self,
+        user_id: UUID,
+        knowledge_points: Optional[Set[Tuple[str, str]]] = None
+    ) -> int:
+        """Replay graded submissions into the user's rollups.
+        
+        With ``knowledge_points`` only those (subject, knowledge point) rows are
+        rebuilt. Returns the number of replayed submissions.
+        """
+        query = (
+            select(Submission, Assignment)
+            .join(Assignment, Submission.assignment_id == Assignment.id)
+            .where(
+                Submission.student_id == user_id,
+                Submission.score.is_not(None),
+                Submission.graded_at.is_not(None)
+            )
+            .order_by(Submission.graded_at, Submission.id)
+        )
+        rows = (await self.db.execute(query)).all()
+        
+        stale = delete(LearningAnalytics).where(LearningAnalytics.user_id == user_id)
+        if knowledge_points is not None:
+            stale = stale.where(
+                tuple_(LearningAnalytics.subject, LearningAnalytics.knowledge_point).in_(list(knowledge_points))
+            )
+        
+        replayed = 0
+        try:
+            await self.db.execute(stale)
+            for submission, assignment in rows:
+                events = [
+                    event for event in self._rollup_events(submission, assignment)
+                    if knowledge_points is None or (event[0], event[2]) in knowledge_points
+                ]
+                for event in events:
+                    await self.db.execute(self._rollup_upsert(user_id, event))
+                replayed += bool(events)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        
+        return replayed
+    
+    def _rollup_events(
+        self,
+        submission: Submission,
+        assignment: Optional[Assignment]
+    ) -> List[RollupEvent]:
+        """Map a graded submission to the rollup rows it updates."""
+        subject = (assignment.subject if assignment else None) or DEFAULT_ROLLUP_KEY
+        topic = assignment.topic if assignment else None
+        knowledge_point = topic or subject
+        
+        max_score = submission.max_score or (assignment.total_points if assignment else None) or 100
+        score = max(0.0, min(100.0, submission.score * 100.0 / max_score))
+        attempted_at = submission.graded_at or datetime.utcnow()
+        
+        return [(subject, topic, knowledge_point, score, attempted_at)]
+    
+    def _rollup_upsert(self, user_id: UUID, event: RollupEvent):
+        """Build an INSERT ... ON CONFLICT DO UPDATE for one graded attempt."""
+        subject, topic, knowledge_point, score, attempted_at = event
+        table = LearningAnalytics.__table__
+        correct = score >= CORRECT_SCORE_THRESHOLD
+        score = Decimal(str(round(score, 2)))
+        
+        dialect = self.db.get_bind().dialect.name
+        insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+        
+        stmt = insert(table).values(
+            id=uuid4(),
+            user_id=user_id,
+            subject=subject,
+            topic=topic,
+            knowledge_point=knowledge_point,
+            mastery_level=score,
+            accuracy_rate=Decimal("100") if correct else Decimal("0"),
+            total_attempts=1,
+            correct_attempts=int(correct),
+            error_count=int(not correct),
+            practice_count=0,
+            total_time_spent=0,
+            streak_count=int(correct),
+            best_streak=int(correct),
+            first_attempt_at=attempted_at,
+            last_attempt_at=attempted_at
+        )
+        
+        streak = table.c.streak_count + 1 if correct else 0
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.subject, table.c.knowledge_point],
+            set_={
+                "topic": topic,
+                "mastery_level": (
+                    func.coalesce(table.c.mastery_level, score) * (1 - MASTERY_DECAY_ALPHA)
+                    + score * MASTERY_DECAY_ALPHA
+                ),
+                "accuracy_rate": (
+                    (table.c.correct_attempts + int(correct)) * Decimal("100") / (table.c.total_attempts + 1)
+                ),
+                "total_attempts": table.c.total_attempts + 1,
+                "correct_attempts": table.c.correct_attempts + int(correct),
+                "error_count": table.c.error_count + int(not correct),
+                "streak_count": streak,
+                "best_streak": (
+                    case((table.c.streak_count + 1 > table.c.best_streak, table.c.streak_count + 1),
+                         else_=table.c.best_streak)
+                    if correct else table.c.best_streak
+                ),
+                "last_attempt_at": attempted_at,
+                "last_updated": func.now()
+            }
+        )
+    
     async def analyze_learning_patterns(
         self,
         user_id: UUID,
@@ -433,4 +501,16 @@ class AnalyticsService:
         if not strengths:
             strengths = ["Shows dedication to learning", "Actively engages with assignments"]
         
-        return strengths
\ No newline at end of file
+        return strengths
+
+
+async def update_learning_analytics(db: AsyncSession, submission: Submission, regrade: bool = False) -> None:
+    """Grading-completion hook: update the student's rollups without failing the grading.
+    
+    Pass ``regrade=True`` when the submission had been graded before, so its
+    earlier score is replaced rather than counted as another attempt.
+    """
+    try:
+        await AnalyticsService(db).record_grading_result(submission, regrade)
+    except Exception as e:
+        logger.warning(f"Failed to update learning analytics for submission {submission.id}: {str(e)}")
@@ -15,9 +15,13 @@ from app.core.exceptions import (
     SubmissionNotFoundError,
     ValidationError
 )
+from app.core.permissions import ResourceType, invalidate_resource_permissions
 from app.models.assignment import Assignment, AssignmentStatus, Submission, SubmissionStatus
 from app.models.class_model import Class, ClassStudent
 from app.models.user import User, UserRole
+from app.services.analytics_service import update_learning_analytics
+from app.services.leaderboard_service import update_leaderboards
+from app.services.score_statistics import update_score_statistics
 from app.schemas.assignment import (
     AssignmentCreate,
     AssignmentStats,
@@ -139,8 +143,35 @@ class AssignmentService:
         assignment.updated_at = datetime.utcnow()
         
         await self.db.commit()
+        invalidate_resource_permissions(ResourceType.ASSIGNMENT, assignment_id, self.db)
         return True
 
+    async def transfer_assignment(
+        self,
+        assignment_id: UUID,
+        teacher_id: UUID,
+        new_teacher_id: UUID
+    ) -> Assignment:
+        """Hand an assignment over to another teacher."""
+        assignment = await self.get_assignment_by_id(assignment_id)
+        
+        # Check if user is the teacher of this assignment
+        if assignment.teacher_id != teacher_id:
+            raise InsufficientPermissionError("Only the assignment creator can transfer this assignment")
+        
+        new_teacher = await self.db.get(User, new_teacher_id)
+        if not new_teacher or new_teacher.role != UserRole.TEACHER:
+            raise ValidationError("New owner must be a teacher")
+        
+        assignment.teacher_id = new_teacher_id
+        assignment.updated_at = datetime.utcnow()
+        
+        await self.db.commit()
+        await self.db.refresh(assignment)
+        invalidate_resource_permissions(ResourceType.ASSIGNMENT, assignment_id, self.db)
+        
+        return assignment
+
     async def publish_assignment(
         self,
         assignment_id: UUID,
@@ -506,6 +537,10 @@ class AssignmentService:
         if submission.assignment.teacher_id != teacher_id:
             raise InsufficientPermissionError("Only the assignment creator can grade submissions")
         
+        # A regrade replaces the earlier score in the learning analytics rollups
+        # instead of adding an attempt; leaderboards store the latest score anyway
+        regrade = submission.graded_at is not None
+        
         # Update submission with grade
         submission.score = grade_data.score
         if grade_data.max_score:
@@ -520,6 +555,10 @@ class AssignmentService:
         await self.db.commit()
         await self.db.refresh(submission)
         
+        await update_learning_analytics(self.db, submission, regrade=regrade)
+        await update_leaderboards(self.db, submission)
+        update_score_statistics(submission)
+        
         # Send notification to student
         try:
             from app.services.notification_service import AssignmentNotificationService
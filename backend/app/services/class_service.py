@@ -3,7 +3,7 @@
 import random
 import string
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Set
 from uuid import UUID
 
 from sqlalchemy import and_, func, select
@@ -18,9 +18,14 @@ from app.core.exceptions import (
     StudentNotInClassError,
     ValidationError
 )
+from app.core.permissions import (
+    ResourceType,
+    invalidate_resource_permissions,
+    invalidate_user_permissions,
+)
 from app.models.assignment import Assignment
 from app.models.class_model import Class, ClassStudent
-from app.models.user import User, UserRole
+from app.models.user import ParentStudentRelation, User, UserRole
 from app.schemas.class_schema import (
     ClassCreate,
     ClassStats,
@@ -28,6 +33,7 @@ from app.schemas.class_schema import (
     ClassStudentCreate,
     ClassStudentJoin
 )
+from app.services.leaderboard_service import LeaderboardService
 
 
 class ClassService:
@@ -137,6 +143,8 @@ class ClassService:
         class_obj.updated_at = datetime.utcnow()
         
         await self.db.commit()
+        invalidate_resource_permissions(ResourceType.CLASS, class_id, self.db)
+        await self._invalidate_class_assignment_permissions(class_id)
         return True
 
     async def get_teacher_classes(
@@ -369,28 +377,69 @@ class ClassService:
     async def get_class_ranking(
         self,
         class_id: UUID,
-        user_id: UUID
+        user_id: UUID,
+        assignment_id: Optional[UUID] = None,
+        limit: Optional[int] = None
     ) -> List[dict]:
-        """Get student ranking in class (placeholder for future implementation)."""
-        class_obj = await self.get_class_by_id(class_id, user_id)
+        """Get student ranking in class, or on one assignment of the class.
+        
+        Ranked students come from the leaderboard, best first; active students
+        without graded work are listed after them, numbered in enrollment order.
+        """
+        # Get all active students (verifies the class and teacher permission)
+        students = {str(student.id): student for student in await self.get_class_students(class_id, user_id)}
         
-        # Get all active students
-        students = await self.get_class_students(class_id, user_id)
+        total_assignments = 1 if assignment_id else (await self.db.execute(
+            select(func.count(Assignment.id)).where(Assignment.class_id == class_id)
+        )).scalar() or 0
+        
+        leaderboard = LeaderboardService(self.db)
+        entries = await leaderboard.get_top(class_id, limit=None, assignment_id=assignment_id)
         
-        # This will be enhanced when assignment and grading data is available
         ranking = [
             {
-                "rank": idx + 1,
-                "student_id": str(student.id),
-                "student_name": student.name,
-                "average_score": None,  # To be calculated from assignments
-                "total_assignments": 0,  # To be calculated from assignments
-                "completion_rate": 0.0  # To be calculated from assignments
+                "rank": entry["rank"],
+                "student_id": entry["student_id"],
+                "student_name": students[entry["student_id"]].name,
+                "average_score": entry["score"],
+                "total_assignments": entry["graded_count"],
+                "completion_rate": round(entry["graded_count"] / total_assignments, 2) if total_assignments else 0.0
             }
-            for idx, student in enumerate(students)
+            for entry in entries
+            if entry["student_id"] in students
         ]
         
-        return ranking
+        ranked_ids = {entry["student_id"] for entry in ranking}
+        unranked = [(student_id, student) for student_id, student in students.items() if student_id not in ranked_ids]
+        ranking.extend(
+            {
+                "rank": len(ranked_ids) + idx + 1,
+                "student_id": student_id,
+                "student_name": student.name,
+                "average_score": None,
+                "total_assignments": 0,
+                "completion_rate": 0.0
+            }
+            for idx, (student_id, student) in enumerate(unranked)
+        )
+        
+        return ranking[:limit] if limit is not None else ranking
+
+    async def get_student_ranking(
+        self,
+        class_id: UUID,
+        student_id: UUID,
+        user_id: UUID,
+        assignment_id: Optional[UUID] = None
+    ) -> Optional[dict]:
+        """Get one student's rank and percentile in a class (None without graded work)."""
+        class_obj = await self.get_class_by_id(class_id, user_id)
+        
+        # Students may only look up their own position
+        if user_id != class_obj.teacher_id and user_id != student_id:
+            raise InsufficientPermissionError("Students can only view their own ranking")
+        
+        return await LeaderboardService(self.db).get_student_rank(class_id, student_id, assignment_id)
 
     async def _generate_unique_class_code(self, length: int = 8) -> str:
         """Generate a unique class code."""
@@ -453,6 +502,7 @@ class ClassService:
             existing_membership.joined_at = datetime.utcnow()
             existing_membership.left_at = None
             await self.db.commit()
+            await self._invalidate_membership_permissions(class_id, student_id)
             await self.db.refresh(existing_membership)
             return existing_membership
         
@@ -465,6 +515,7 @@ class ClassService:
         
         self.db.add(membership)
         await self.db.commit()
+        await self._invalidate_membership_permissions(class_id, student_id)
         await self.db.refresh(membership)
         
         return membership
@@ -492,6 +543,7 @@ class ClassService:
             existing_membership.joined_at = datetime.utcnow()
             existing_membership.left_at = None
             await self.db.commit()
+            await self._invalidate_membership_permissions(class_obj.id, student_id)
             await self.db.refresh(existing_membership)
             return existing_membership
         
@@ -504,6 +556,7 @@ class ClassService:
         
         self.db.add(membership)
         await self.db.commit()
+        await self._invalidate_membership_permissions(class_obj.id, student_id)
         await self.db.refresh(membership)
         
         return membership
@@ -530,6 +583,7 @@ class ClassService:
         membership.left_at = datetime.utcnow()
         
         await self.db.commit()
+        await self._invalidate_membership_permissions(class_id, student_id)
         return True
 
     async def leave_class(
@@ -551,6 +605,7 @@ class ClassService:
         membership.left_at = datetime.utcnow()
         
         await self.db.commit()
+        await self._invalidate_membership_permissions(class_id, student_id)
         return True
 
     async def get_class_students(
@@ -635,6 +690,81 @@ class ClassService:
         result = await self.db.execute(query)
         return result.scalars().all()
 
+    # Permission checking methods
+
+    async def is_class_teacher(self, class_id: UUID, teacher_id: UUID) -> bool:
+        """Check if user is the teacher of an active class."""
+        result = await self.db.execute(
+            select(Class.id).where(
+                and_(
+                    Class.id == class_id,
+                    Class.teacher_id == teacher_id,
+                    Class.is_active == True
+                )
+            )
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def is_student_in_class(self, class_id: UUID, student_id: UUID) -> bool:
+        """Check if student is actively enrolled in a class."""
+        membership = await self._get_class_membership(class_id, student_id)
+        return membership is not None and membership.is_active
+
+    async def is_parent_child_in_class(self, class_id: UUID, parent_id: UUID) -> bool:
+        """Check if any of a parent's children is actively enrolled in a class."""
+        from app.models.user import ParentStudentRelation
+
+        result = await self.db.execute(
+            select(ClassStudent.id)
+            .join(ParentStudentRelation, ParentStudentRelation.student_id == ClassStudent.student_id)
+            .where(
+                and_(
+                    ClassStudent.class_id == class_id,
+                    ParentStudentRelation.parent_id == parent_id,
+                    ClassStudent.is_active == True
+                )
+            )
+            .limit(1)
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def _invalidate_membership_permissions(self, class_id: UUID, student_id: UUID) -> None:
+        """Drop cached access decisions that depend on a class membership.
+        
+        The student's own decisions, the parents' decisions (class, assignments,
+        files, grading tasks), the teachers' decisions about the student's work
+        and every decision about the class and its assignments can change.
+        ``permission_cache`` is per process: other workers keep serving their
+        cached decisions until the TTL expires.
+        """
+        invalidate_user_permissions(student_id, self.db)
+        invalidate_resource_permissions(ResourceType.USER, student_id, self.db)
+        invalidate_resource_permissions(ResourceType.CLASS, class_id, self.db)
+        
+        parent_ids = (await self.db.execute(
+            select(ParentStudentRelation.parent_id).where(ParentStudentRelation.student_id == student_id)
+        )).scalars().all()
+        for parent_id in parent_ids:
+            invalidate_user_permissions(parent_id, self.db)
+        
+        class_teacher_id = (await self.db.execute(
+            select(Class.teacher_id).where(Class.id == class_id)
+        )).scalar_one_or_none()
+        teacher_ids = await self._invalidate_class_assignment_permissions(class_id)
+        if class_teacher_id is not None:
+            teacher_ids.add(class_teacher_id)
+        for teacher_id in teacher_ids:
+            invalidate_user_permissions(teacher_id, self.db)
+    
+    async def _invalidate_class_assignment_permissions(self, class_id: UUID) -> Set[UUID]:
+        """Drop cached decisions about a class's assignments; return their teachers' ids."""
+        rows = (await self.db.execute(
+            select(Assignment.id, Assignment.teacher_id).where(Assignment.class_id == class_id)
+        )).all()
+        for assignment_id, _ in rows:
+            invalidate_resource_permissions(ResourceType.ASSIGNMENT, assignment_id, self.db)
+        return {teacher_id for _, teacher_id in rows}
+
     async def _get_student(self, student_id: UUID) -> User:
         """Get student user and verify role."""
         query = select(User).where(
@@ -0,0 +1,199 @@
+"""Per-user conversation memory: a bounded window of recent turns plus a rolling summary."""
+
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ai import ConversationMemory
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """请将已有的对话摘要与新的对话内容合并为一段简洁的摘要。
+保留用户的学习情况、目标、薄弱环节以及已经给出的重要建议，不要编造内容。
+
+已有摘要：
+{summary}
+
+新的对话：
+{conversation}"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one per CJK character, one per four other characters."""
+    cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@dataclass
+class UserMemory:
+    """Conversation memory of one user."""
+    user_id: UUID
+    summary: str = ""
+    turns: List[Dict[str, str]] = field(default_factory=list)
+    summarized_turns: int = 0
+    _row: Optional[ConversationMemory] = field(default=None, repr=False)
+
+    @property
+    def token_count(self) -> int:
+        return estimate_tokens(self.summary) + sum(
+            estimate_tokens(turn["human"]) + estimate_tokens(turn["ai"]) for turn in self.turns
+        )
+
+    def as_messages(self) -> List[BaseMessage]:
+        """Chat history for the agent prompt: the summary, then the recent turns."""
+        messages: List[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"此前对话摘要：{self.summary}"))
+        for turn in self.turns:
+            messages.append(HumanMessage(content=turn["human"]))
+            messages.append(AIMessage(content=turn["ai"]))
+        return messages
+
+
+# Serializes turns of the same user across requests handled by this process
+_user_locks: "weakref.WeakValueDictionary[UUID, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _user_lock(user_id: UUID) -> asyncio.Lock:
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _user_locks[user_id] = lock
+    return lock
+
+
+class ConversationMemoryStore:
+    """Database-backed conversation memory, one record per user.
+
+    Recent turns are kept verbatim up to ``max_turns`` turns and ``max_tokens``
+    tokens (summary included). Only when that budget is exceeded are the
+    oldest turns folded into the summary, pruning the window to half the
+    budget so that one summarization covers several turns.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        llm: BaseChatModel,
+        max_turns: int = 10,
+        max_tokens: int = 2000
+    ):
+        self.db = db
+        self.llm = llm
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+
+    async def load(self, user_id: UUID) -> UserMemory:
+        """Load a user's memory (empty if the user has none yet)."""
+        result = await self.db.execute(
+            select(ConversationMemory).where(ConversationMemory.user_id == user_id)
+        )
+        row = result.scalar_one_or_none()
+        if row is None:
+            return UserMemory(user_id=user_id)
+        return UserMemory(
+            user_id=user_id,
+            summary=row.summary or "",
+            turns=list(row.recent_turns or []),
+            summarized_turns=row.summarized_turns or 0,
+            _row=row
+        )
+
+    async def run_turn(
+        self,
+        user_id: UUID,
+        user_input: str,
+        invoke: Callable[[List[BaseMessage]], str]
+    ) -> str:
+        """Run one conversation turn with the user's own history.
+
+        ``invoke`` receives the chat history and returns the reply; it is
+        blocking (e.g. an agent executor) and runs in a worker thread. If it
+        raises, nothing is recorded and the exception propagates.
+        """
+        async with _user_lock(user_id):
+            memory = await self.load(user_id)
+            response = await asyncio.to_thread(invoke, memory.as_messages())
+            await self._add_turn(memory, user_input, response)
+            return response
+
+    async def add_turn(self, user_id: UUID, user_input: str, response: str) -> UserMemory:
+        """Record a turn that was answered outside ``run_turn``."""
+        async with _user_lock(user_id):
+            memory = await self.load(user_id)
+            await self._add_turn(memory, user_input, response)
+            return memory
+
+    async def compact(self, user_id: UUID) -> UserMemory:
+        """Fold everything but the newest half-window into the summary now."""
+        async with _user_lock(user_id):
+            memory = await self.load(user_id)
+            if len(memory.turns) > self.max_turns // 2:
+                await self._fold_oldest_turns(memory)
+                await self._save(memory)
+            return memory
+
+    async def clear(self, user_id: UUID) -> None:
+        async with _user_lock(user_id):
+            await self.db.execute(delete(ConversationMemory).where(ConversationMemory.user_id == user_id))
+            await self.db.commit()
+
+    async def _add_turn(self, memory: UserMemory, user_input: str, response: str) -> None:
+        memory.turns.append({"human": user_input, "ai": response})
+        if len(memory.turns) > self.max_turns or memory.token_count > self.max_tokens:
+            await self._fold_oldest_turns(memory)
+        await self._save(memory)
+
+    async def _fold_oldest_turns(self, memory: UserMemory) -> None:
+        """Move the oldest turns into the summary, keeping at least the newest turn."""
+        keep_turns = max(1, self.max_turns // 2)
+        token_budget = self.max_tokens // 2 - estimate_tokens(memory.summary)
+        kept: List[Dict[str, str]] = []
+        for turn in reversed(memory.turns):
+            cost = estimate_tokens(turn["human"]) + estimate_tokens(turn["ai"])
+            if kept and (len(kept) >= keep_turns or cost > token_budget):
+                break
+            kept.append(turn)
+            token_budget -= cost
+        kept.reverse()
+
+        folded = memory.turns[:len(memory.turns) - len(kept)]
+        if not folded:
+            return
+        summary = await self._summarize(memory.summary, folded)
+        if summary is None:
+            return  # Keep the turns verbatim and retry folding on a later turn
+        memory.summary = summary
+        memory.turns = kept
+        memory.summarized_turns += len(folded)
+
+    async def _summarize(self, summary: str, turns: List[Dict[str, str]]) -> Optional[str]:
+        """Merge turns into the summary; None if the LLM call failed."""
+        conversation = "\n".join(f"用户：{turn['human']}\n助手：{turn['ai']}" for turn in turns)
+        prompt = SUMMARY_PROMPT.format(summary=summary or "（无）", conversation=conversation)
+        try:
+            result = await self.llm.ainvoke([HumanMessage(content=prompt)])
+            return result.content if hasattr(result, "content") else str(result)
+        except Exception as e:
+            # Don't fail the conversation; the caller leaves the memory untouched
+            logger.warning(f"Failed to summarize conversation memory: {str(e)}")
+            return None
+
+    async def _save(self, memory: UserMemory) -> None:
+        row = memory._row
+        if row is None:
+            row = ConversationMemory(user_id=memory.user_id)
+            self.db.add(row)
+            memory._row = row
+        row.summary = memory.summary
+        row.recent_turns = list(memory.turns)
+        row.summarized_turns = memory.summarized_turns
+        await self.db.commit()
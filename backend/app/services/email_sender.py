@@ -0,0 +1,266 @@
+"""Pooled, rate-shaped SMTP sender for bulk email with resumable delivery records."""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.message import Message
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+import aiosmtplib
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.notification import EmailDelivery, EmailDeliveryStatus
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket limiting the send rate while allowing short bursts."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SMTPConnectionPool:
+    """Pool of persistent, authenticated SMTP connections.
+
+    Connections are opened on first use and reused across messages; a
+    connection that fails is closed and replaced on the next checkout.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        size: int = 5,
+        timeout: float = 30.0
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)
+        self._connections: List[aiosmtplib.SMTP] = []
+
+    async def _open(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            timeout=self.timeout
+        )
+        await smtp.connect()
+        if self.username and self.password:
+            await smtp.login(self.username, self.password)
+        self._connections.append(smtp)
+        return smtp
+
+    async def _discard(self, smtp: aiosmtplib.SMTP) -> None:
+        if smtp in self._connections:
+            self._connections.remove(smtp)
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        """Check out a connection, opening or reconnecting as needed."""
+        async with self._slots:
+            smtp = None
+            while not self._idle.empty():
+                candidate = self._idle.get_nowait()
+                if candidate.is_connected:
+                    smtp = candidate
+                    break
+                await self._discard(candidate)
+            if smtp is None:
+                smtp = await self._open()
+
+            reusable = False
+            try:
+                yield smtp
+            except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError, asyncio.TimeoutError):
+                raise
+            except aiosmtplib.SMTPException:
+                # A refused recipient or other SMTP reply leaves the session usable
+                reusable = smtp.is_connected
+                raise
+            else:
+                reusable = True
+            finally:
+                if reusable:
+                    self._idle.put_nowait(smtp)
+                else:
+                    await self._discard(smtp)
+
+    async def close(self) -> None:
+        """Close all connections."""
+        for smtp in list(self._connections):
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+        self._connections.clear()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+
+class EmailDeliveryStore:
+    """Durable record of bulk email outcomes, one row per (job, recipient)."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        # The session is shared by concurrent send tasks
+        self._lock = asyncio.Lock()
+        self._rows: Dict[int, EmailDelivery] = {}
+
+    async def load(self, job_id: str) -> Set[int]:
+        """Load a job's records, returning the indexes already delivered."""
+        result = await self.db.execute(select(EmailDelivery).where(EmailDelivery.job_id == job_id))
+        self._rows = {row.recipient_index: row for row in result.scalars().all()}
+        return {
+            index for index, row in self._rows.items()
+            if row.status == EmailDeliveryStatus.SENT
+        }
+
+    async def record(
+        self,
+        job_id: str,
+        recipient_index: int,
+        to_email: str,
+        status: EmailDeliveryStatus,
+        attempts: int,
+        error: Optional[str] = None
+    ) -> None:
+        """Persist the outcome of one email (committed immediately)."""
+        async with self._lock:
+            row = self._rows.get(recipient_index)
+            if row is None:
+                row = EmailDelivery(job_id=job_id, recipient_index=recipient_index, to_email=to_email, attempts=0)
+                self.db.add(row)
+                self._rows[recipient_index] = row
+            row.status = status
+            row.attempts += attempts
+            row.error = error
+            await self.db.commit()
+
+
+@dataclass
+class DeliveryResult:
+    """Outcome of sending one email."""
+    index: int
+    to_email: str
+    success: bool
+    attempts: int
+    error: Optional[str] = None
+    skipped: bool = False
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """Whether an SMTP error is permanent (5xx) and should not be retried."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(recipient.code >= 500 for recipient in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 500 <= error.code < 600
+    return False
+
+
+class BulkEmailSender:
+    """Send many emails over a connection pool at a shaped rate.
+
+    Each recipient is retried with exponential backoff on transient errors,
+    and each outcome is recorded in the delivery store as soon as it is known,
+    so re-running a job with the same id skips emails already delivered.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool,
+        rate_per_second: float = 10.0,
+        burst: Optional[float] = None,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0
+    ):
+        self.pool = pool
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    async def send_all(
+        self,
+        messages: List[Message],
+        job_id: Optional[str] = None,
+        store: Optional[EmailDeliveryStore] = None
+    ) -> List[DeliveryResult]:
+        """Send messages concurrently (up to the pool size), in input order of results."""
+        delivered = await store.load(job_id) if store and job_id else set()
+        if delivered:
+            logger.info(f"Resuming email job {job_id}: {len(delivered)} already delivered")
+
+        async def send_one(index: int, message: Message) -> DeliveryResult:
+            to_email = message['To']
+            if index in delivered:
+                return DeliveryResult(index, to_email, True, 0, skipped=True)
+
+            result = await self._send_with_retry(index, message)
+            if store and job_id:
+                await store.record(
+                    job_id, index, to_email,
+                    EmailDeliveryStatus.SENT if result.success else EmailDeliveryStatus.FAILED,
+                    result.attempts, result.error
+                )
+            return result
+
+        return list(await asyncio.gather(*(send_one(i, m) for i, m in enumerate(messages))))
+
+    async def _send_with_retry(self, index: int, message: Message) -> DeliveryResult:
+        to_email = message['To']
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.bucket.acquire()
+            try:
+                async with self.pool.connection() as smtp:
+                    await smtp.send_message(message)
+                return DeliveryResult(index, to_email, True, attempt)
+            except Exception as e:
+                if is_permanent_failure(e) or attempt > self.max_retries:
+                    logger.error(f"Failed to send email to {to_email} after {attempt} attempt(s): {e}")
+                    return DeliveryResult(index, to_email, False, attempt, str(e))
+
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"Retrying email to {to_email} in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
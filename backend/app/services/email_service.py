@@ -1,6 +1,5 @@
 """Email service for sending notifications and communications."""
 
-import asyncio
 import logging
 import smtplib
 from datetime import datetime
@@ -11,9 +10,11 @@ from uuid import UUID
 
 import aiosmtplib
 from jinja2 import Environment, FileSystemLoader, Template
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import get_settings
 from app.models.notification import NotificationType
+from app.services.email_sender import BulkEmailSender, EmailDeliveryStore, SMTPConnectionPool
 
 logger = logging.getLogger(__name__)
 
@@ -61,20 +62,9 @@ class EmailService:
     ) -> bool:
         """Send an email with HTML and optional text content."""
         try:
-            # Create message
-            message = MIMEMultipart('alternative')
-            message['Subject'] = subject
-            message['From'] = f"{from_name or self.from_name} <{from_email or self.from_email}>"
-            message['To'] = to_email
-            
-            # Add text part if provided
-            if text_content:
-                text_part = MIMEText(text_content, 'plain', 'utf-8')
-                message.attach(text_part)
-            
-            # Add HTML part
-            html_part = MIMEText(html_content, 'html', 'utf-8')
-            message.attach(html_part)
+            message = self._build_message(
+                to_email, subject, html_content, text_content, from_email, from_name
+            )
             
             # Send email
             if self.smtp_host and self.smtp_username and self.smtp_password:
@@ -97,6 +87,32 @@ class EmailService:
             logger.error(f"Failed to send email to {to_email}: {e}")
             return False
     
+    def _build_message(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None,
+        from_email: Optional[str] = None,
+        from_name: Optional[str] = None
+    ) -> MIMEMultipart:
+        """Build a MIME message with HTML and optional text content."""
+        message = MIMEMultipart('alternative')
+        message['Subject'] = subject
+        message['From'] = f"{from_name or self.from_name} <{from_email or self.from_email}>"
+        message['To'] = to_email
+        
+        # Add text part if provided
+        if text_content:
+            text_part = MIMEText(text_content, 'plain', 'utf-8')
+            message.attach(text_part)
+        
+        # Add HTML part
+        html_part = MIMEText(html_content, 'html', 'utf-8')
+        message.attach(html_part)
+        
+        return message
+    
     async def send_notification_email(
         self,
         to_email: str,
@@ -255,65 +271,85 @@ class EmailService:
     async def send_bulk_emails(
         self,
         email_data: List[Dict[str, Any]],
-        batch_size: int = 10,
-        delay_between_batches: float = 1.0
+        job_id: Optional[str] = None,
+        db: Optional[AsyncSession] = None,
+        max_connections: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        max_retries: int = 3
     ) -> Dict[str, Any]:
-        """Send multiple emails in batches."""
+        """Send multiple emails over pooled SMTP connections at a shaped rate.
+        
+        With a job_id and a database session, each outcome is recorded as it
+        happens; calling again with the same job_id and email_data (e.g. after a
+        crash) skips the emails that were already delivered.
+        """
         total_emails = len(email_data)
-        successful_emails = 0
-        failed_emails = 0
-        results = []
         
-        # Process emails in batches
-        for i in range(0, total_emails, batch_size):
-            batch = email_data[i:i + batch_size]
-            batch_results = []
-            
-            # Send batch concurrently
-            tasks = []
-            for email_info in batch:
-                task = self.send_email(
-                    to_email=email_info['to_email'],
-                    subject=email_info['subject'],
-                    html_content=email_info['html_content'],
-                    text_content=email_info.get('text_content'),
-                    from_email=email_info.get('from_email'),
-                    from_name=email_info.get('from_name')
-                )
-                tasks.append(task)
-            
-            # Wait for batch to complete
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Process results
-            for j, result in enumerate(batch_results):
-                email_info = batch[j]
-                if isinstance(result, Exception):
-                    failed_emails += 1
-                    results.append({
-                        'to_email': email_info['to_email'],
-                        'success': False,
-                        'error': str(result)
-                    })
-                else:
-                    if result:
-                        successful_emails += 1
-                    else:
-                        failed_emails += 1
-                    results.append({
-                        'to_email': email_info['to_email'],
-                        'success': result,
-                        'error': None if result else 'Unknown error'
-                    })
-            
-            # Delay between batches to avoid overwhelming SMTP server
-            if i + batch_size < total_emails:
-                await asyncio.sleep(delay_between_batches)
+        if not (self.smtp_host and self.smtp_username and self.smtp_password):
+            logger.warning(f"SMTP not configured, {total_emails} bulk emails not sent")
+            results = [
+                {'to_email': info['to_email'], 'success': False, 'error': 'SMTP not configured'}
+                for info in email_data
+            ]
+            return self._bulk_summary(job_id, results, skipped_emails=0)
+        
+        messages = [
+            self._build_message(
+                to_email=info['to_email'],
+                subject=info['subject'],
+                html_content=info['html_content'],
+                text_content=info.get('text_content'),
+                from_email=info.get('from_email'),
+                from_name=info.get('from_name')
+            )
+            for info in email_data
+        ]
+        
+        pool = SMTPConnectionPool(
+            hostname=self.smtp_host,
+            port=self.smtp_port,
+            username=self.smtp_username,
+            password=self.smtp_password,
+            use_tls=self.smtp_use_tls,
+            size=max_connections or self.settings.SMTP_POOL_SIZE
+        )
+        sender = BulkEmailSender(
+            pool,
+            rate_per_second=rate_per_second or self.settings.SMTP_RATE_PER_SECOND,
+            max_retries=max_retries
+        )
+        store = EmailDeliveryStore(db) if db is not None and job_id else None
+        
+        try:
+            deliveries = await sender.send_all(messages, job_id=job_id, store=store)
+        finally:
+            await pool.close()
         
+        results = [
+            {
+                'to_email': delivery.to_email,
+                'success': delivery.success,
+                'error': delivery.error,
+                'attempts': delivery.attempts,
+                'skipped': delivery.skipped
+            }
+            for delivery in deliveries
+        ]
+        return self._bulk_summary(job_id, results, skipped_emails=sum(d.skipped for d in deliveries))
+    
+    def _bulk_summary(
+        self,
+        job_id: Optional[str],
+        results: List[Dict[str, Any]],
+        skipped_emails: int
+    ) -> Dict[str, Any]:
+        successful_emails = sum(1 for result in results if result['success'])
         return {
-            'total_emails': total_emails,
+            'job_id': job_id,
+            'total_emails': len(results),
             'successful_emails': successful_emails,
-            'failed_emails': failed_emails,
+            'failed_emails': len(results) - successful_emails,
+            'skipped_emails': skipped_emails,
             'results': results,
             'sent_at': datetime.utcnow().isoformat()
         }
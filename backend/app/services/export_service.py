@@ -0,0 +1,199 @@
+"""Streaming export of class submission data as CSV or Parquet."""
+
+import csv
+import io
+import logging
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.database import db_manager
+from app.core.exceptions import ValidationError
+from app.models.assignment import Assignment, Submission
+from app.models.user import User
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor and written per output chunk
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_COLUMNS = [
+    "student_id",
+    "student_name",
+    "student_email",
+    "assignment_id",
+    "assignment_title",
+    "status",
+    "score",
+    "max_score",
+    "submitted_at",
+    "graded_at",
+]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back chunk by chunk."""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class ClassDataExporter:
+    """Export a class's submissions without materializing them in memory.
+
+    Rows are read through a server-side cursor in chunks of ``chunk_size`` and
+    each chunk is encoded and yielded before the next one is fetched, so memory
+    use stays flat regardless of the class size. Each export opens its own
+    session, because a streaming response outlives the request's session.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker[AsyncSession]] = None,
+        chunk_size: int = EXPORT_CHUNK_SIZE
+    ):
+        self.session_factory = session_factory or db_manager.get_session_factory()
+        self.chunk_size = chunk_size
+
+    def stream(self, class_id: UUID, format_type: str) -> AsyncIterator[bytes]:
+        """Get the byte stream for an export format ("csv" or "parquet")."""
+        if format_type == "csv":
+            return self.stream_csv(class_id)
+        if format_type == "parquet":
+            if not PYARROW_AVAILABLE:
+                raise ValidationError("Parquet export requires pyarrow to be installed")
+            return self.stream_parquet(class_id)
+        raise ValidationError(f"Unsupported export format: {format_type}")
+
+    async def iter_row_chunks(self, class_id: UUID) -> AsyncIterator[Sequence[Sequence[Any]]]:
+        """Yield lists of export rows (in EXPORT_COLUMNS order) for a class."""
+        query = (
+            select(
+                User.id,
+                User.name,
+                User.email,
+                Assignment.id,
+                Assignment.title,
+                Submission.status,
+                Submission.score,
+                Submission.max_score,
+                Submission.submitted_at,
+                Submission.graded_at
+            )
+            .join(Assignment, Submission.assignment_id == Assignment.id)
+            .join(User, Submission.student_id == User.id)
+            .where(Assignment.class_id == class_id)
+            .order_by(User.name, Submission.submitted_at, Submission.id)
+            .execution_options(yield_per=self.chunk_size)
+        )
+
+        async with self.session_factory() as session:
+            result = await session.stream(query)
+            async for partition in result.partitions():
+                yield partition
+
+    async def stream_csv(self, class_id: UUID) -> AsyncIterator[bytes]:
+        """Stream the export as UTF-8 CSV, one encoded chunk per fetched partition."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM so spreadsheet applications detect UTF-8 (student names are often Chinese)
+        buffer.write("\ufeff")
+        writer.writerow(EXPORT_COLUMNS)
+
+        async for rows in self.iter_row_chunks(class_id):
+            writer.writerows(self._format_csv_row(row) for row in rows)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    async def stream_parquet(self, class_id: UUID) -> AsyncIterator[bytes]:
+        """Stream the export as Parquet, writing one row group per fetched partition."""
+        schema = self._parquet_schema()
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            async for rows in self.iter_row_chunks(class_id):
+                columns = list(zip(*rows))
+                table = pa.Table.from_arrays(
+                    [
+                        pa.array(self._format_parquet_column(name, values), type=field.type)
+                        for name, values, field in zip(EXPORT_COLUMNS, columns, schema)
+                    ],
+                    schema=schema
+                )
+                writer.write_table(table)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    @staticmethod
+    def _format_value(value: Any) -> Any:
+        if isinstance(value, UUID):
+            return str(value)
+        if isinstance(value, Enum):
+            return value.value
+        return value
+
+    def _format_csv_row(self, row: Sequence[Any]) -> List[Any]:
+        return [
+            value.isoformat() if isinstance(value, datetime) else self._format_value(value)
+            for value in row
+        ]
+
+    def _format_parquet_column(self, name: str, values: Sequence[Any]) -> List[Any]:
+        if name in ("score", "max_score"):
+            return [float(value) if value is not None else None for value in values]
+        return [self._format_value(value) for value in values]
+
+    @staticmethod
+    def _parquet_schema() -> "pa.Schema":
+        return pa.schema([
+            ("student_id", pa.string()),
+            ("student_name", pa.string()),
+            ("student_email", pa.string()),
+            ("assignment_id", pa.string()),
+            ("assignment_title", pa.string()),
+            ("status", pa.string()),
+            ("score", pa.float64()),
+            ("max_score", pa.float64()),
+            ("submitted_at", pa.timestamp("us", tz="UTC")),
+            ("graded_at", pa.timestamp("us", tz="UTC")),
+        ])
@@ -1,25 +1,44 @@
 """File service for file upload and management operations."""
 
+import asyncio
 import hashlib
+import io
 import json
+import logging
 import mimetypes
 import os
+import shutil
+import tempfile
 import uuid
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
 from uuid import UUID
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError, NoCredentialsError
 from fastapi import HTTPException, UploadFile, status
 from PIL import Image
 from sqlalchemy import and_, select, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import cache_manager
 from app.core.config import get_settings
 from app.models.file import File, FileStatus, FileType
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpooledUpload:
+    """Upload streamed to a temporary file, with digest computed on the fly."""
+    path: str
+    size: int
+    file_hash: str
+    head: bytes
+
 
 class FileService:
     """Service class for file operations."""
@@ -78,6 +97,15 @@ class FileService:
     # Avatar image dimensions
     AVATAR_SIZE = (200, 200)
     
+    # Streaming upload settings
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB per read, bounds per-upload memory
+    MAGIC_BYTES_LENGTH = 1024  # Leading bytes kept for type sniffing and scanning
+    UPLOAD_SPOOL_DIR = os.path.join("uploads", "tmp")
+    S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024  # 8MB
+    
+    # AI analysis settings
+    ANALYSIS_MAX_CONCURRENCY = 4
+    
     # Security settings
     VIRUS_SCAN_ENABLED = False  # Would integrate with antivirus service
     CONTENT_MODERATION_ENABLED = False  # Would integrate with content moderation service
@@ -209,6 +237,61 @@ class FileService:
         except Exception:
             return False
     
+    async def _spool_upload(self, file: UploadFile, max_size: int) -> SpooledUpload:
+        """Stream an upload to a temporary file in fixed-size chunks.
+        
+        The SHA-256 digest and size are computed incrementally and only the
+        leading bytes are kept in memory, so peak memory per upload is bounded
+        by ``UPLOAD_CHUNK_SIZE``. Reading stops as soon as ``max_size`` is
+        exceeded.
+        """
+        os.makedirs(self.UPLOAD_SPOOL_DIR, exist_ok=True)
+        
+        digest = hashlib.sha256()
+        head = b""
+        size = 0
+        
+        fd, spool_path = tempfile.mkstemp(dir=self.UPLOAD_SPOOL_DIR, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                while True:
+                    chunk = await file.read(self.UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    
+                    size += len(chunk)
+                    if size > max_size:
+                        max_size_mb = max_size / (1024 * 1024)
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"文件大小不能超过 {max_size_mb:.1f}MB"
+                        )
+                    
+                    if len(head) < self.MAGIC_BYTES_LENGTH:
+                        head += chunk[:self.MAGIC_BYTES_LENGTH - len(head)]
+                    
+                    digest.update(chunk)
+                    buffer.write(chunk)
+        except BaseException:
+            self._discard_spool(spool_path)
+            raise
+        
+        await file.seek(0)  # Reset file position for potential reuse
+        
+        return SpooledUpload(
+            path=spool_path,
+            size=size,
+            file_hash=digest.hexdigest(),
+            head=head
+        )
+    
+    def _discard_spool(self, spool_path: str) -> None:
+        """Remove a temporary upload file if it still exists."""
+        try:
+            os.remove(spool_path)
+        except FileNotFoundError:
+            pass
+    
     async def _validate_file(
         self,
         file: UploadFile,
@@ -219,6 +302,33 @@ class FileService:
     ) -> Tuple[bool, str]:
         """Validate uploaded file with enhanced security checks."""
         
+        # Read content if not provided
+        if content is None:
+            content = await file.read()
+            await file.seek(0)  # Reset file position
+        
+        return self._validate_upload(
+            file,
+            allowed_types,
+            max_size,
+            is_avatar,
+            head=content,
+            size=len(content),
+            image_source=io.BytesIO(content)
+        )
+    
+    def _validate_upload(
+        self,
+        file: UploadFile,
+        allowed_types: dict,
+        max_size: int,
+        is_avatar: bool,
+        head: bytes,
+        size: int,
+        image_source: Union[str, BinaryIO]
+    ) -> Tuple[bool, str]:
+        """Validate upload from its leading bytes, total size and image source."""
+        
         # Basic filename validation
         if not file.filename or len(file.filename) > 255:
             return False, "文件名无效或过长"
@@ -233,18 +343,13 @@ class FileService:
             max_size_mb = max_size / (1024 * 1024)
             return False, f"文件大小不能超过 {max_size_mb:.1f}MB"
         
-        # Read content if not provided
-        if content is None:
-            content = await file.read()
-            await file.seek(0)  # Reset file position
-        
         # Check actual file size from content
-        if len(content) > max_size:
+        if size > max_size:
             max_size_mb = max_size / (1024 * 1024)
             return False, f"文件大小不能超过 {max_size_mb:.1f}MB"
         
         # Detect actual MIME type from content
-        actual_mime_type = self._detect_mime_type(file.filename, content)
+        actual_mime_type = self._detect_mime_type(file.filename, head)
         
         # Check if detected MIME type matches declared type
         if file.content_type and actual_mime_type != file.content_type:
@@ -273,16 +378,14 @@ class FileService:
             return False, "头像必须是图片文件"
         
         # Check for empty files
-        if len(content) == 0:
+        if size == 0:
             return False, "文件不能为空"
         
         # Validate image files
         if mime_type_to_check.startswith("image/"):
             try:
-                from PIL import Image
-                import io
-                
-                with Image.open(io.BytesIO(content)) as img:
+                # Image.open only parses the header, pixel data is not decoded
+                with Image.open(image_source) as img:
                     # Check image dimensions
                     width, height = img.size
                     
@@ -313,12 +416,16 @@ class FileService:
     
     async def _upload_to_s3(
         self, 
-        content: bytes, 
+        content: Union[bytes, str], 
         filename: str, 
         mime_type: str,
         user_id: UUID
     ) -> Tuple[str, str]:
-        """Upload file to S3 and return URL and storage path."""
+        """Upload file to S3 and return URL and storage path.
+        
+        ``content`` may be raw bytes or the path of a spooled upload; paths are
+        sent with a multipart upload so the file is never loaded into memory.
+        """
         if not self.has_cloud_storage:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -328,19 +435,38 @@ class FileService:
         try:
             # Create S3 key with user folder structure
             s3_key = f"uploads/{user_id}/{datetime.now().strftime('%Y/%m/%d')}/{filename}"
+            metadata = {
+                'uploaded_by': str(user_id),
+                'upload_time': datetime.now(timezone.utc).isoformat()
+            }
             
             # Upload to S3
-            self._s3_client.put_object(
-                Bucket=self.settings.AWS_S3_BUCKET,
-                Key=s3_key,
-                Body=content,
-                ContentType=mime_type,
-                ServerSideEncryption='AES256',
-                Metadata={
-                    'uploaded_by': str(user_id),
-                    'upload_time': datetime.now(timezone.utc).isoformat()
-                }
-            )
+            if isinstance(content, str):
+                transfer_config = TransferConfig(
+                    multipart_threshold=self.S3_MULTIPART_THRESHOLD,
+                    multipart_chunksize=self.S3_MULTIPART_THRESHOLD
+                )
+                await asyncio.to_thread(
+                    self._s3_client.upload_file,
+                    content,
+                    self.settings.AWS_S3_BUCKET,
+                    s3_key,
+                    ExtraArgs={
+                        'ContentType': mime_type,
+                        'ServerSideEncryption': 'AES256',
+                        'Metadata': metadata
+                    },
+                    Config=transfer_config
+                )
+            else:
+                self._s3_client.put_object(
+                    Bucket=self.settings.AWS_S3_BUCKET,
+                    Key=s3_key,
+                    Body=content,
+                    ContentType=mime_type,
+                    ServerSideEncryption='AES256',
+                    Metadata=metadata
+                )
             
             # Generate file URL
             file_url = f"https://{self.settings.AWS_S3_BUCKET}.s3.{self.settings.AWS_REGION}.amazonaws.com/{s3_key}"
@@ -365,21 +491,16 @@ class FileService:
                 detail=f"文件上传失败: {str(e)}"
             )
     
-    async def _save_file_locally(self, file: UploadFile, filename: str) -> str:
-        """Save file to local storage (fallback implementation)."""
+    async def _save_file_locally(self, spool_path: str, filename: str) -> str:
+        """Move a spooled upload into local storage (fallback implementation)."""
         # Create upload directory structure
         upload_dir = os.path.join("uploads", "local")
         os.makedirs(upload_dir, exist_ok=True)
         
         file_path = os.path.join(upload_dir, filename)
         
-        # Save file
-        content = await file.read()
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
-        
-        # Reset file position for potential reuse
-        await file.seek(0)
+        # Rename is atomic when the spool directory shares the filesystem
+        shutil.move(spool_path, file_path)
         
         return file_path
     
@@ -502,13 +623,46 @@ class FileService:
             max_size = self.MAX_DOCUMENT_SIZE
             is_avatar = False
         
-        # Read file content for validation
-        content = await file.read()
-        await file.seek(0)  # Reset file position
+        # Stream content to a spool file, hashing as we go
+        spooled = await self._spool_upload(file, max_size)
+        
+        try:
+            return await self._store_spooled_upload(
+                file,
+                spooled,
+                user_id,
+                allowed_types,
+                max_size,
+                is_avatar,
+                assignment_id,
+                submission_id
+            )
+        finally:
+            # No-op when the spool file has been moved into storage
+            self._discard_spool(spooled.path)
+    
+    async def _store_spooled_upload(
+        self,
+        file: UploadFile,
+        spooled: SpooledUpload,
+        user_id: UUID,
+        allowed_types: dict,
+        max_size: int,
+        is_avatar: bool,
+        assignment_id: Optional[UUID],
+        submission_id: Optional[UUID]
+    ) -> File:
+        """Validate, deduplicate and persist a spooled upload."""
         
         # Enhanced file validation
-        is_valid, message = await self._validate_file(
-            file, allowed_types, max_size, is_avatar, content
+        is_valid, message = self._validate_upload(
+            file,
+            allowed_types,
+            max_size,
+            is_avatar,
+            head=spooled.head,
+            size=spooled.size,
+            image_source=spooled.path
         )
         if not is_valid:
             raise HTTPException(
@@ -517,7 +671,7 @@ class FileService:
             )
         
         # Detect actual MIME type
-        actual_mime_type = self._detect_mime_type(file.filename, content)
+        actual_mime_type = self._detect_mime_type(file.filename, spooled.head)
         
         # Get file extension
         file_extension = allowed_types.get(actual_mime_type, "")
@@ -529,13 +683,14 @@ class FileService:
         # Generate unique filename
         filename = self._generate_filename(file.filename or "file", file_extension)
         
-        # Calculate file hash for deduplication
-        file_hash = self._calculate_file_hash(content)
-        
-        # Check for duplicate files
-        existing_file = await self._check_duplicate_file(file_hash, user_id)
-        if existing_file:
-            return existing_file
+        # Check for duplicate files before anything is moved into storage.
+        # Avatars are always re-processed, so they are never deduplicated.
+        if not is_avatar:
+            existing_file = await self._check_duplicate_file(
+                spooled.file_hash, user_id, assignment_id, submission_id
+            )
+            if existing_file:
+                return existing_file
         
         # Create initial file record
         file_record = File(
@@ -543,7 +698,8 @@ class FileService:
             original_name=file.filename or filename,
             file_type=self._get_file_type(actual_mime_type),
             mime_type=actual_mime_type,
-            file_size=len(content),
+            file_size=spooled.size,
+            file_hash=spooled.file_hash,
             file_url="",  # Will be set after upload
             storage_path="",  # Will be set after upload
             status=FileStatus.UPLOADING,
@@ -558,15 +714,17 @@ class FileService:
         await self.db.refresh(file_record)
         
         try:
+            # Store metadata while the spool file is still available locally
+            metadata = await self._extract_file_metadata(spooled.path, actual_mime_type)
+            
             # Upload to cloud storage or save locally
             if self.has_cloud_storage:
                 file_url, storage_path = await self._upload_to_s3(
-                    content, filename, actual_mime_type, user_id
+                    spooled.path, filename, actual_mime_type, user_id
                 )
             else:
                 # Save locally as fallback
-                await file.seek(0)
-                storage_path = await self._save_file_locally(file, filename)
+                storage_path = await self._save_file_locally(spooled.path, filename)
                 file_url = f"/files/serve/{filename}"
             
             # Process avatar image if needed
@@ -596,8 +754,6 @@ class FileService:
             file_record.status = FileStatus.READY
             file_record.processed_at = datetime.now(timezone.utc)
             
-            # Store file metadata
-            metadata = await self._extract_file_metadata(content, actual_mime_type)
             if metadata:
                 file_record.file_metadata = json.dumps(metadata)
             
@@ -616,22 +772,46 @@ class FileService:
                 detail=f"文件上传失败: {str(e)}"
             )
     
-    async def _check_duplicate_file(self, file_hash: str, user_id: UUID) -> Optional[File]:
-        """Check if file with same hash already exists for user."""
-        # For now, we'll skip deduplication to avoid complexity
-        # In production, you might want to implement this
-        return None
+    async def _check_duplicate_file(
+        self,
+        file_hash: str,
+        user_id: UUID,
+        assignment_id: Optional[UUID] = None,
+        submission_id: Optional[UUID] = None
+    ) -> Optional[File]:
+        """Check if the user already uploaded this content in the same context.
+
+        A match must also belong to the same assignment and submission, so that
+        the same PDF attached to another submission gets its own record.
+        """
+        result = await self.db.execute(
+            select(File).where(
+                and_(
+                    File.file_hash == file_hash,
+                    File.uploaded_by == user_id,
+                    File.status == FileStatus.READY,
+                    File.assignment_id.is_(None) if assignment_id is None
+                    else File.assignment_id == assignment_id,
+                    File.submission_id.is_(None) if submission_id is None
+                    else File.submission_id == submission_id
+                )
+            ).limit(1)
+        )
+        return result.scalar_one_or_none()
     
-    async def _extract_file_metadata(self, content: bytes, mime_type: str) -> Optional[Dict[str, Any]]:
-        """Extract metadata from file content."""
+    async def _extract_file_metadata(
+        self,
+        content: Union[bytes, str],
+        mime_type: str
+    ) -> Optional[Dict[str, Any]]:
+        """Extract metadata from file content or a local file path."""
         metadata = {}
         
         try:
             if mime_type.startswith("image/"):
-                from PIL import Image
-                import io
+                source = io.BytesIO(content) if isinstance(content, bytes) else content
                 
-                with Image.open(io.BytesIO(content)) as img:
+                with Image.open(source) as img:
                     metadata.update({
                         "width": img.width,
                         "height": img.height,
@@ -650,7 +830,9 @@ class FileService:
                 # For PDF files, you could extract page count, title, etc.
                 # This would require PyPDF2 or similar library
                 metadata["type"] = "pdf"
-                metadata["size_bytes"] = len(content)
+                metadata["size_bytes"] = (
+                    len(content) if isinstance(content, bytes) else os.path.getsize(content)
+                )
             
             return metadata if metadata else None
             
@@ -1241,18 +1423,87 @@ class FileService:
         if not file_record or file_record.status != FileStatus.READY:
             return None
         
+        await self._reuse_extracted_text([file_record])
+        result = await self._analyze_file_record(file_record, analysis_type)
+        
+        # Persist text extracted during analysis
+        if file_record in self.db.dirty:
+            await self.db.commit()
+        
+        return result
+    
+    async def _analyze_file_record(
+        self,
+        file_record: File,
+        analysis_type: str
+    ) -> Dict[str, Any]:
+        """Analyze a loaded file record, reusing cached results for its content hash."""
+        cached = await self._get_cached_analysis(file_record, analysis_type)
+        if cached is not None:
+            return cached
+        
         try:
             if file_record.file_type == FileType.IMAGE:
-                return await self._analyze_image_content(file_record, analysis_type)
+                result = await self._analyze_image_content(file_record, analysis_type)
             elif file_record.file_type == FileType.PDF:
-                return await self._analyze_pdf_content(file_record, analysis_type)
+                result = await self._analyze_pdf_content(file_record, analysis_type)
             elif file_record.file_type == FileType.DOCUMENT:
-                return await self._analyze_document_content(file_record, analysis_type)
+                result = await self._analyze_document_content(file_record, analysis_type)
             else:
                 return {"error": "不支持的文件类型进行AI分析"}
         
         except Exception as e:
             return {"error": f"AI分析失败: {str(e)}"}
+        
+        if result and "error" not in result:
+            await self._cache_analysis(file_record, analysis_type, result)
+        
+        return result
+    
+    async def _get_cached_analysis(
+        self,
+        file_record: File,
+        analysis_type: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get cached AI analysis for the file's content hash."""
+        if not file_record.file_hash or not self.settings.REDIS_URL:
+            return None
+        return await cache_manager.get_file_analysis(file_record.file_hash, analysis_type)
+    
+    async def _cache_analysis(
+        self,
+        file_record: File,
+        analysis_type: str,
+        result: Dict[str, Any]
+    ) -> None:
+        """Cache AI analysis under the file's content hash."""
+        if not file_record.file_hash or not self.settings.REDIS_URL:
+            return
+        await cache_manager.cache_file_analysis(file_record.file_hash, analysis_type, result)
+    
+    async def _reuse_extracted_text(self, file_records: List[File]) -> None:
+        """Fill in extracted text already stored for other copies of the same content."""
+        pending = {
+            record.file_hash: record
+            for record in file_records
+            if record.file_hash and not record.extracted_text
+        }
+        if not pending:
+            return
+        
+        result = await self.db.execute(
+            select(File.file_hash, File.extracted_text).where(
+                and_(
+                    File.file_hash.in_(list(pending.keys())),
+                    File.extracted_text.isnot(None)
+                )
+            )
+        )
+        known_text = {file_hash: text for file_hash, text in result.all()}
+        
+        for record in file_records:
+            if not record.extracted_text and record.file_hash in known_text:
+                record.extracted_text = known_text[record.file_hash]
     
     async def _analyze_image_content(
         self,
@@ -1308,7 +1559,8 @@ class FileService:
 请用中文回答，格式化为JSON结构。"""
             
             # Call OpenAI Vision API
-            response = client.chat.completions.create(
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
                 model="gpt-4-vision-preview",
                 messages=[
                     {
@@ -1420,7 +1672,8 @@ class FileService:
 请用中文回答，格式化为JSON结构。"""
             
             # Call OpenAI API
-            response = client.chat.completions.create(
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "user", "content": prompt}
@@ -1492,7 +1745,8 @@ class FileService:
 请用中文回答，格式化为JSON结构。"""
             
             # Call OpenAI API
-            response = client.chat.completions.create(
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "user", "content": prompt}
@@ -1527,70 +1781,79 @@ class FileService:
     async def _get_file_content(self, file_record: File) -> Optional[bytes]:
         """Get file content from storage."""
         try:
-            if self.has_cloud_storage and file_record.storage_path.startswith('uploads/'):
-                # Download from S3
-                response = self._s3_client.get_object(
-                    Bucket=self.settings.AWS_S3_BUCKET,
-                    Key=file_record.storage_path
-                )
-                return response['Body'].read()
-            else:
-                # Read from local storage
-                if os.path.exists(file_record.storage_path):
-                    with open(file_record.storage_path, 'rb') as f:
-                        return f.read()
-            
-            return None
-            
+            return await asyncio.to_thread(self._read_file_content, file_record)
         except Exception:
             return None
     
+    def _read_file_content(self, file_record: File) -> Optional[bytes]:
+        """Read file content from storage (blocking)."""
+        if self.has_cloud_storage and file_record.storage_path.startswith('uploads/'):
+            # Download from S3
+            response = self._s3_client.get_object(
+                Bucket=self.settings.AWS_S3_BUCKET,
+                Key=file_record.storage_path
+            )
+            return response['Body'].read()
+        else:
+            # Read from local storage
+            if os.path.exists(file_record.storage_path):
+                with open(file_record.storage_path, 'rb') as f:
+                    return f.read()
+        
+        return None
+    
     async def _extract_pdf_text(self, file_record: File) -> Optional[str]:
-        """Extract text content from PDF file."""
+        """Extract text content from PDF file, reusing previously extracted text."""
+        if file_record.extracted_text:
+            return file_record.extracted_text
+        
         try:
             content = await self._get_file_content(file_record)
             if not content:
                 return None
             
-            # Use PyPDF2 to extract text
-            import PyPDF2
-            import io
-            
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
-            text_content = []
-            
-            for page in pdf_reader.pages:
-                text_content.append(page.extract_text())
-            
-            return "\n".join(text_content)
+            text = await asyncio.to_thread(self._parse_pdf_text, content)
+            file_record.extracted_text = text
+            return text
             
         except Exception:
             return None
     
+    def _parse_pdf_text(self, content: bytes) -> str:
+        """Parse text out of PDF bytes (blocking)."""
+        # Use PyPDF2 to extract text
+        import PyPDF2
+        
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
+        text_content = []
+        
+        for page in pdf_reader.pages:
+            text_content.append(page.extract_text())
+        
+        return "\n".join(text_content)
+    
     async def _extract_document_text(self, file_record: File) -> Optional[str]:
-        """Extract text content from document files."""
+        """Extract text content from document files, reusing previously extracted text."""
+        if file_record.extracted_text:
+            return file_record.extracted_text
+        
         try:
             content = await self._get_file_content(file_record)
             if not content:
                 return None
             
             if file_record.mime_type == "text/plain":
-                return content.decode('utf-8', errors='ignore')
+                text = content.decode('utf-8', errors='ignore')
+                file_record.extracted_text = text
+                return text
             
             elif file_record.mime_type in [
                 "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             ]:
                 # Extract text from DOCX
-                import docx
-                import io
-                
-                doc = docx.Document(io.BytesIO(content))
-                text_content = []
-                
-                for paragraph in doc.paragraphs:
-                    text_content.append(paragraph.text)
-                
-                return "\n".join(text_content)
+                text = await asyncio.to_thread(self._parse_docx_text, content)
+                file_record.extracted_text = text
+                return text
             
             # For other document types, return basic info
             return f"文档类型: {file_record.mime_type}, 大小: {file_record.file_size} 字节"
@@ -1598,22 +1861,107 @@ class FileService:
         except Exception:
             return None
     
+    def _parse_docx_text(self, content: bytes) -> str:
+        """Parse paragraph text out of DOCX bytes (blocking)."""
+        import docx
+        
+        doc = docx.Document(io.BytesIO(content))
+        return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+    
     async def batch_analyze_files(
         self,
         file_ids: List[UUID],
-        analysis_type: str = "general"
+        analysis_type: str = "general",
+        max_concurrency: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
     ) -> Dict[UUID, Dict[str, Any]]:
-        """Batch analyze multiple files."""
-        results = {}
+        """Batch analyze multiple files with a bounded worker pool.
+        
+        Records are loaded in a single query. Files sharing a content hash are
+        analysed once, and text already extracted for any copy of the same
+        content is reused. ``progress_callback`` is awaited after each file.
+        """
+        file_ids = list(dict.fromkeys(file_ids))
+        
+        records_result = await self.db.execute(
+            select(File).where(File.id.in_(file_ids))
+        )
+        records = {record.id: record for record in records_result.scalars().all()}
+        await self._reuse_extracted_text(list(records.values()))
         
-        for file_id in file_ids:
+        semaphore = asyncio.Semaphore(max_concurrency or self.ANALYSIS_MAX_CONCURRENCY)
+        in_flight: Dict[str, asyncio.Task] = {}
+        results: Dict[UUID, Dict[str, Any]] = {}
+        completed = 0
+        
+        async def analyze_record(file_record: File) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._analyze_file_record(file_record, analysis_type)
+        
+        async def analyze_file(file_id: UUID) -> None:
+            nonlocal completed
+            file_record = records.get(file_id)
+            
             try:
-                result = await self.analyze_content_with_ai(file_id, analysis_type)
-                results[file_id] = result or {"error": "分析失败"}
+                if not file_record or file_record.status != FileStatus.READY:
+                    result = None
+                else:
+                    # Identical content is analysed once per batch
+                    content_key = file_record.file_hash or str(file_record.id)
+                    if content_key not in in_flight:
+                        in_flight[content_key] = asyncio.create_task(
+                            analyze_record(file_record)
+                        )
+                    result = await in_flight[content_key]
+                results[file_id] = dict(result) if result else {"error": "分析失败"}
             except Exception as e:
                 results[file_id] = {"error": f"分析异常: {str(e)}"}
+            
+            completed += 1
+            await self._report_analysis_progress(
+                progress_callback, file_id, results[file_id], completed, len(file_ids)
+            )
+        
+        await asyncio.gather(*(analyze_file(file_id) for file_id in file_ids))
         
-        return results
+        # Share text extracted in this batch with duplicates, then persist it
+        extracted = {
+            record.file_hash: record.extracted_text
+            for record in records.values()
+            if record.file_hash and record.extracted_text
+        }
+        for record in records.values():
+            if not record.extracted_text and record.file_hash in extracted:
+                record.extracted_text = extracted[record.file_hash]
+        
+        if self.db.dirty:
+            await self.db.commit()
+        
+        return {file_id: results[file_id] for file_id in file_ids}
+    
+    async def _report_analysis_progress(
+        self,
+        progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        file_id: UUID,
+        result: Dict[str, Any],
+        completed: int,
+        total: int
+    ) -> None:
+        """Report per-file batch analysis progress."""
+        if not progress_callback:
+            return
+        
+        try:
+            await progress_callback({
+                "file_id": str(file_id),
+                "status": "failed" if "error" in result else "completed",
+                "completed": completed,
+                "total": total,
+                "progress": int(completed / total * 100) if total else 100,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            })
+        except Exception as e:
+            logger.warning(f"Batch analysis progress callback failed: {e}")
     
     async def get_file_statistics(self, user_id: Optional[UUID] = None) -> dict:
         """Get file upload statistics."""
@@ -17,6 +17,9 @@ from app.models.assignment import Assignment, Submission, SubmissionStatus
 from app.models.file import File
 from app.schemas.grading import GradingRequest, GradingResult, GradingTaskUpdate
 from app.services.ai_grading_api import get_ai_grading_api_client
+from app.services.analytics_service import update_learning_analytics
+from app.services.leaderboard_service import update_leaderboards
+from app.services.score_statistics import update_score_statistics
 from app.services.grading_service import GradingTaskManager
 
 logger = logging.getLogger(__name__)
@@ -338,6 +341,7 @@ class GradingProcessor:
     ) -> None:
         """Save grading result to submission."""
         submission = await self._get_submission_with_details(task.submission_id)
+        regrade = submission.graded_at is not None
         
         # Update submission with grading results
         submission.score = grading_result.score
@@ -354,6 +358,9 @@ class GradingProcessor:
                 submission.teacher_comments = f"AI Suggestions: {grading_result.suggestions}"
         
         await self.db.commit()
+        await update_learning_analytics(self.db, submission, regrade=regrade)
+        await update_leaderboards(self.db, submission)
+        update_score_statistics(submission)
     
     def _grading_result_to_dict(self, grading_result: GradingResult) -> Dict:
         """Convert grading result to dictionary for storage."""
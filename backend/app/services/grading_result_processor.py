@@ -6,7 +6,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import and_, desc, func, select
+import numpy as np
+from sqlalchemy import and_, desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -16,6 +17,7 @@ from app.models.ai import GradingTask, GradingTaskStatus
 from app.models.assignment import Assignment, Submission
 from app.models.user import User
 from app.schemas.grading import GradingResult
+from app.services.score_statistics import robust_z_scores, score_statistics
 
 logger = logging.getLogger(__name__)
 
@@ -176,13 +178,15 @@ class GradingResultAnalyzer:
         assignment_id: UUID,
         threshold_std_dev: float = 2.0
     ) -> List[Dict]:
-        """Detect anomalies in grading results for an assignment."""
+        """Detect anomalies in grading results for an assignment.
+        
+        Scores are flagged by their robust (median/MAD) z-score, computed for
+        the whole assignment in one vectorized pass; details are only loaded
+        for the flagged submissions.
+        """
         try:
-            # Get all graded submissions for the assignment
-            query = select(Submission).options(
-                selectinload(Submission.grading_tasks),
-                selectinload(Submission.student)
-            ).where(
+            # Get all graded scores for the assignment
+            query = select(Submission.id, Submission.score).where(
                 and_(
                     Submission.assignment_id == assignment_id,
                     Submission.score.isnot(None)
@@ -190,48 +194,60 @@ class GradingResultAnalyzer:
             )
             
             result = await self.db.execute(query)
-            submissions = result.scalars().all()
+            rows = result.all()
             
-            if len(submissions) < 3:  # Need at least 3 submissions for anomaly detection
+            if len(rows) < 3:  # Need at least 3 submissions for anomaly detection
                 return []
             
             # Calculate statistics
-            scores = [s.score for s in submissions if s.score is not None]
-            mean_score = statistics.mean(scores)
-            std_dev = statistics.stdev(scores) if len(scores) > 1 else 0
+            scores = np.fromiter((row.score for row in rows), dtype=np.float64, count=len(rows))
+            z_scores = robust_z_scores(scores)
+            flagged = np.flatnonzero(z_scores > threshold_std_dev)
+            if flagged.size == 0:
+                return []
+            
+            mean_score = float(scores.mean())
+            median_score = float(np.median(scores))
+            
+            details_query = select(Submission).options(
+                selectinload(Submission.grading_tasks),
+                selectinload(Submission.student)
+            ).where(Submission.id.in_([rows[i].id for i in flagged]))
+            details_result = await self.db.execute(details_query)
+            submissions = {s.id: s for s in details_result.scalars().all()}
             
             anomalies = []
+            detected_at = datetime.utcnow().isoformat()
             
-            for submission in submissions:
-                if submission.score is None:
+            for index in flagged:
+                submission = submissions.get(rows[index].id)
+                if submission is None:
                     continue
                 
-                # Check for score anomalies
-                z_score = abs(submission.score - mean_score) / std_dev if std_dev > 0 else 0
+                z_score = float(z_scores[index])
+                anomaly = {
+                    "submission_id": str(submission.id),
+                    "student_id": str(submission.student_id),
+                    "student_name": submission.student.name,
+                    "score": submission.score,
+                    "mean_score": mean_score,
+                    "median_score": median_score,
+                    "z_score": z_score,
+                    "anomaly_type": "outlier_score",
+                    "severity": "high" if z_score > 3.0 else "medium",
+                    "detected_at": detected_at
+                }
+                
+                # Add grading task info if available
+                if submission.grading_tasks:
+                    latest_task = max(
+                        submission.grading_tasks,
+                        key=lambda t: t.created_at
+                    )
+                    anomaly["grading_task_id"] = str(latest_task.id)
+                    anomaly["ai_confidence"] = latest_task.result.get("confidence") if latest_task.result else None
                 
-                if z_score > threshold_std_dev:
-                    anomaly = {
-                        "submission_id": str(submission.id),
-                        "student_id": str(submission.student_id),
-                        "student_name": submission.student.name,
-                        "score": submission.score,
-                        "mean_score": mean_score,
-                        "z_score": z_score,
-                        "anomaly_type": "outlier_score",
-                        "severity": "high" if z_score > 3.0 else "medium",
-                        "detected_at": datetime.utcnow().isoformat()
-                    }
-                    
-                    # Add grading task info if available
-                    if submission.grading_tasks:
-                        latest_task = max(
-                            submission.grading_tasks,
-                            key=lambda t: t.created_at
-                        )
-                        anomaly["grading_task_id"] = str(latest_task.id)
-                        anomaly["ai_confidence"] = latest_task.result.get("confidence") if latest_task.result else None
-                    
-                    anomalies.append(anomaly)
+                anomalies.append(anomaly)
             
             return anomalies
             
@@ -366,16 +382,8 @@ class GradingResultAnalyzer:
     ) -> Dict:
         """Analyze performance compared to class average."""
         try:
-            # Get class average for the assignment
-            query = select(func.avg(Submission.score)).where(
-                and_(
-                    Submission.assignment_id == submission.assignment_id,
-                    Submission.score.isnot(None)
-                )
-            )
-            
-            result = await self.db.execute(query)
-            class_average = result.scalar()
+            # Get class average for the assignment from the cached distribution
+            class_average = await score_statistics.mean(self.db, submission.assignment_id)
             
             if class_average is None:
                 return {"status": "insufficient_data"}
@@ -528,25 +536,8 @@ class GradingResultAnalyzer:
     async def _calculate_percentile(self, assignment_id: UUID, score: int) -> Optional[int]:
         """Calculate percentile rank for a score within an assignment."""
         try:
-            # Get all scores for the assignment
-            query = select(Submission.score).where(
-                and_(
-                    Submission.assignment_id == assignment_id,
-                    Submission.score.isnot(None)
-                )
-            )
-            
-            result = await self.db.execute(query)
-            all_scores = [row[0] for row in result.fetchall()]
-            
-            if len(all_scores) < 2:
-                return None
-            
-            # Calculate percentile
-            scores_below = sum(1 for s in all_scores if s < score)
-            percentile = int((scores_below / len(all_scores)) * 100)
-            
-            return percentile
+            # Binary search in the cached, sorted score array
+            return await score_statistics.percentile_rank(self.db, assignment_id, score)
             
         except Exception:
             return None
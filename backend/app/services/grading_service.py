@@ -22,6 +22,9 @@ from app.models.ai import GradingTask, GradingTaskStatus
 from app.models.assignment import Assignment, Submission, SubmissionStatus
 from app.models.file import File
 from app.models.user import User
+from app.services.analytics_service import update_learning_analytics
+from app.services.leaderboard_service import update_leaderboards
+from app.services.score_statistics import update_score_statistics
 from app.schemas.grading import (
     BatchGradingRequest,
     BatchGradingResponse,
@@ -178,13 +181,16 @@ class EnhancedGradingTaskManager:
                 }
                 
                 # Update submission with score if available
+                graded_submission = None
                 submission = await self._get_submission_for_grading(task.submission_id)
+                regrade = submission.graded_at is not None
                 statistics = summary_results.get('statistics', {})
                 if statistics.get('total_score') is not None:
                     submission.score = statistics['total_score']
                     submission.ai_feedback = grading_results.get('grading_result', '')
                     submission.status = SubmissionStatus.GRADED
                     submission.graded_at = datetime.utcnow()
+                    graded_submission = submission
                 
                 # Generate PDF report if requested
                 await self._generate_pdf_report(task, result)
@@ -198,9 +204,15 @@ class EnhancedGradingTaskManager:
                 # Reset submission status
                 submission = await self._get_submission_for_grading(task.submission_id)
                 submission.status = SubmissionStatus.SUBMITTED
+                graded_submission = None
             
             await self.db.commit()
             
+            if graded_submission is not None:
+                await update_learning_analytics(self.db, graded_submission, regrade=regrade)
+                await update_leaderboards(self.db, graded_submission)
+                update_score_statistics(graded_submission)
+            
         except Exception as e:
             logger.error(f"Enhanced grading process failed for task {task.id}: {e}")
             
@@ -367,14 +379,21 @@ class EnhancedGradingTaskManager:
             task.updated_at = datetime.utcnow()
             
             # If task is completed, update submission
+            graded_submission = None
+            regrade = False
             if update_data.status == GradingTaskStatus.COMPLETED:
-                await self._complete_grading_task(task, update_data)
+                graded_submission, regrade = await self._complete_grading_task(task, update_data)
             elif update_data.status == GradingTaskStatus.FAILED:
                 await self._handle_failed_task(task)
             
             await self.db.commit()
             await self.db.refresh(task)
             
+            if graded_submission is not None:
+                await update_learning_analytics(self.db, graded_submission, regrade=regrade)
+                await update_leaderboards(self.db, graded_submission)
+                update_score_statistics(graded_submission)
+            
             logger.info(f"Updated grading task {task_id} with status {update_data.status}")
             
             return GradingTaskResponse.from_orm(task)
@@ -721,10 +740,18 @@ class EnhancedGradingTaskManager:
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
     
-    async def _complete_grading_task(self, task: GradingTask, update_data: GradingTaskUpdate):
-        """Complete a grading task and update submission."""
+    async def _complete_grading_task(
+        self,
+        task: GradingTask,
+        update_data: GradingTaskUpdate
+    ) -> Tuple[Submission, bool]:
+        """Complete a grading task and update submission.
+        
+        Returns the graded submission and whether it had been graded before.
+        """
         # Update submission with grading results
         submission = await self._get_submission_for_grading(task.submission_id)
+        regrade = submission.graded_at is not None
         
         if update_data.score is not None:
             submission.score = update_data.score
@@ -738,6 +765,8 @@ class EnhancedGradingTaskManager:
         # Set completion timestamp
         task.completed_at = datetime.utcnow()
         task.progress = 100
+        
+        return submission, regrade
     
     async def _handle_failed_task(self, task: GradingTask):
         """Handle a failed grading task."""
@@ -0,0 +1,327 @@
+"""Class and assignment leaderboards backed by Redis sorted sets."""
+
+import logging
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import redis_manager
+from app.models.assignment import Assignment, Submission, SubmissionStatus
+
+logger = logging.getLogger(__name__)
+
+# Leaderboards are maintained incrementally; the TTL only bounds staleness
+# when an update was missed because Redis was unreachable.
+LEADERBOARD_TTL_SECONDS = 24 * 3600
+
+# Errors that make us fall back to SQL (ValueError: REDIS_URL not configured)
+REDIS_ERRORS = (RedisError, OSError, ValueError)
+
+GRADED_STATUSES = [SubmissionStatus.GRADED, SubmissionStatus.RETURNED]
+
+# (student_id, score, graded_count)
+ScoreRow = Tuple[str, float, int]
+
+
+def class_leaderboard_key(class_id: UUID) -> str:
+    """Sorted set of student average score percentages in a class."""
+    return f"leaderboard:class:{class_id}"
+
+
+def class_counts_key(class_id: UUID) -> str:
+    """Hash of graded submission counts per student in a class."""
+    return f"leaderboard:class:{class_id}:counts"
+
+
+def assignment_leaderboard_key(assignment_id: UUID) -> str:
+    """Sorted set of student score percentages on an assignment."""
+    return f"leaderboard:assignment:{assignment_id}"
+
+
+class LeaderboardService:
+    """Top-N, rank and percentile lookups for class and assignment leaderboards.
+
+    Each class and assignment has a Redis sorted set keyed by student id, so
+    lookups are O(log n). Sets are rebuilt from the database when missing,
+    and every lookup falls back to an aggregate SQL query when Redis is down.
+    """
+
+    def __init__(self, db: AsyncSession, redis_client: Optional[Redis] = None):
+        self.db = db
+        self._redis_client = redis_client
+
+    def _get_redis(self) -> Redis:
+        if self._redis_client is None:
+            self._redis_client = redis_manager.get_redis()
+        return self._redis_client
+
+    # Updates
+
+    async def record_grade(self, submission: Submission) -> None:
+        """Update the leaderboards after a grade is finalized for a submission."""
+        if submission.score is None:
+            return
+
+        assignment = await self.db.get(Assignment, submission.assignment_id)
+        if assignment is None:
+            return
+
+        student_id = str(submission.student_id)
+        class_score = await self._student_class_score(assignment.class_id, submission.student_id)
+
+        try:
+            redis_client = self._get_redis()
+            assignment_key = assignment_leaderboard_key(assignment.id)
+            class_key = class_leaderboard_key(assignment.class_id)
+
+            if await redis_client.exists(assignment_key):
+                pipe = redis_client.pipeline(transaction=True)
+                pipe.zadd(assignment_key, {student_id: self._score_percentage(submission, assignment)})
+                pipe.expire(assignment_key, LEADERBOARD_TTL_SECONDS)
+                await pipe.execute()
+            else:
+                await self._load_assignment(redis_client, assignment.id)
+
+            if await redis_client.exists(class_key) and class_score is not None:
+                average, graded_count = class_score
+                counts_key = class_counts_key(assignment.class_id)
+                pipe = redis_client.pipeline(transaction=True)
+                pipe.zadd(class_key, {student_id: average})
+                pipe.hset(counts_key, student_id, graded_count)
+                pipe.expire(class_key, LEADERBOARD_TTL_SECONDS)
+                pipe.expire(counts_key, LEADERBOARD_TTL_SECONDS)
+                await pipe.execute()
+            else:
+                await self._load_class(redis_client, assignment.class_id)
+
+        except REDIS_ERRORS as e:
+            logger.warning(f"Leaderboard update skipped for submission {submission.id}: {e}")
+
+    async def rebuild(self, class_id: UUID, assignment_id: Optional[UUID] = None) -> int:
+        """Rebuild a leaderboard from the database, returning the number of students."""
+        redis_client = self._get_redis()
+        if assignment_id:
+            return len(await self._load_assignment(redis_client, assignment_id))
+        return len(await self._load_class(redis_client, class_id))
+
+    # Lookups
+
+    async def get_top(
+        self,
+        class_id: UUID,
+        limit: Optional[int] = 10,
+        assignment_id: Optional[UUID] = None
+    ) -> List[dict]:
+        """Get the top students, best first (all students when limit is None)."""
+        try:
+            rows = await self._redis_top(class_id, limit, assignment_id)
+        except REDIS_ERRORS as e:
+            logger.warning(f"Leaderboard lookup falling back to SQL: {e}")
+            rows = await self._sql_scores(class_id, assignment_id)
+            rows = rows[:limit] if limit is not None else rows
+
+        entries = []
+        for idx, (student_id, score, graded_count) in enumerate(rows):
+            # Competition ranking: tied scores share a rank
+            tied = entries and entries[-1]["score"] == round(score, 2)
+            entries.append({
+                "rank": entries[-1]["rank"] if tied else idx + 1,
+                "student_id": student_id,
+                "score": round(score, 2),
+                "graded_count": graded_count
+            })
+        return entries
+
+    async def get_student_rank(
+        self,
+        class_id: UUID,
+        student_id: UUID,
+        assignment_id: Optional[UUID] = None
+    ) -> Optional[dict]:
+        """Get a student's rank, score and percentile, or None if they have no grades."""
+        try:
+            position = await self._redis_rank(class_id, str(student_id), assignment_id)
+        except REDIS_ERRORS as e:
+            logger.warning(f"Leaderboard lookup falling back to SQL: {e}")
+            position = self._rank_in(await self._sql_scores(class_id, assignment_id), str(student_id))
+
+        if position is None:
+            return None
+
+        score, higher, lower, total = position
+        return {
+            "student_id": str(student_id),
+            "rank": higher + 1,
+            "score": round(score, 2),
+            "total_students": total,
+            "percentile": round(lower * 100 / total, 1)
+        }
+
+    async def get_percentile(
+        self,
+        class_id: UUID,
+        student_id: UUID,
+        assignment_id: Optional[UUID] = None
+    ) -> Optional[float]:
+        """Percentage of ranked students scoring strictly below the student."""
+        rank = await self.get_student_rank(class_id, student_id, assignment_id)
+        return rank["percentile"] if rank else None
+
+    # Redis
+
+    async def _ensure_loaded(self, redis_client: Redis, class_id: UUID, assignment_id: Optional[UUID]) -> str:
+        if assignment_id:
+            key = assignment_leaderboard_key(assignment_id)
+            if not await redis_client.exists(key):
+                await self._load_assignment(redis_client, assignment_id)
+        else:
+            key = class_leaderboard_key(class_id)
+            if not await redis_client.exists(key):
+                await self._load_class(redis_client, class_id)
+        return key
+
+    async def _redis_top(
+        self,
+        class_id: UUID,
+        limit: Optional[int],
+        assignment_id: Optional[UUID]
+    ) -> List[ScoreRow]:
+        redis_client = self._get_redis()
+        key = await self._ensure_loaded(redis_client, class_id, assignment_id)
+
+        members = await redis_client.zrevrange(key, 0, -1 if limit is None else limit - 1, withscores=True)
+        if not members:
+            return []
+
+        if assignment_id:
+            return [(member, score, 1) for member, score in members]
+
+        counts = await redis_client.hmget(class_counts_key(class_id), [member for member, _ in members])
+        return [
+            (member, score, int(count or 0))
+            for (member, score), count in zip(members, counts)
+        ]
+
+    async def _redis_rank(
+        self,
+        class_id: UUID,
+        student_id: str,
+        assignment_id: Optional[UUID]
+    ) -> Optional[Tuple[float, int, int, int]]:
+        redis_client = self._get_redis()
+        key = await self._ensure_loaded(redis_client, class_id, assignment_id)
+
+        score = await redis_client.zscore(key, student_id)
+        if score is None:
+            return None
+
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zcount(key, f"({score}", "+inf")
+        pipe.zcount(key, "-inf", f"({score}")
+        pipe.zcard(key)
+        higher, lower, total = await pipe.execute()
+        return score, higher, lower, total
+
+    async def _load_class(self, redis_client: Redis, class_id: UUID) -> List[ScoreRow]:
+        rows = await self._sql_scores(class_id)
+        key = class_leaderboard_key(class_id)
+        counts_key = class_counts_key(class_id)
+
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(key, counts_key)
+        if rows:
+            pipe.zadd(key, {student_id: score for student_id, score, _ in rows})
+            pipe.hset(counts_key, mapping={student_id: count for student_id, _, count in rows})
+            pipe.expire(key, LEADERBOARD_TTL_SECONDS)
+            pipe.expire(counts_key, LEADERBOARD_TTL_SECONDS)
+        await pipe.execute()
+        return rows
+
+    async def _load_assignment(self, redis_client: Redis, assignment_id: UUID) -> List[ScoreRow]:
+        rows = await self._sql_scores(None, assignment_id)
+        key = assignment_leaderboard_key(assignment_id)
+
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(key)
+        if rows:
+            pipe.zadd(key, {student_id: score for student_id, score, _ in rows})
+            pipe.expire(key, LEADERBOARD_TTL_SECONDS)
+        await pipe.execute()
+        return rows
+
+    # SQL
+
+    @staticmethod
+    def _score_percentage(submission: Submission, assignment: Assignment) -> float:
+        max_score = submission.max_score or assignment.total_points or 100
+        return submission.score * 100.0 / max_score
+
+    @staticmethod
+    def _percentage_column():
+        return Submission.score * 100.0 / func.coalesce(Submission.max_score, Assignment.total_points, 100)
+
+    async def _sql_scores(
+        self,
+        class_id: Optional[UUID],
+        assignment_id: Optional[UUID] = None
+    ) -> List[ScoreRow]:
+        """Aggregate scores per student from the database, best first."""
+        percentage = self._percentage_column()
+        query = (
+            select(
+                Submission.student_id,
+                func.avg(percentage).label("score"),
+                func.count(Submission.id).label("graded_count")
+            )
+            .join(Assignment, Submission.assignment_id == Assignment.id)
+            .where(
+                Submission.status.in_(GRADED_STATUSES),
+                Submission.score.is_not(None)
+            )
+            .group_by(Submission.student_id)
+            .order_by(func.avg(percentage).desc(), Submission.student_id)
+        )
+        if assignment_id:
+            query = query.where(Submission.assignment_id == assignment_id)
+        else:
+            query = query.where(Assignment.class_id == class_id)
+
+        result = await self.db.execute(query)
+        return [(str(student_id), float(score), count) for student_id, score, count in result.all()]
+
+    async def _student_class_score(self, class_id: UUID, student_id: UUID) -> Optional[Tuple[float, int]]:
+        """Average score percentage and graded count for one student in a class."""
+        query = (
+            select(func.avg(self._percentage_column()), func.count(Submission.id))
+            .join(Assignment, Submission.assignment_id == Assignment.id)
+            .where(
+                Assignment.class_id == class_id,
+                Submission.student_id == student_id,
+                Submission.status.in_(GRADED_STATUSES),
+                Submission.score.is_not(None)
+            )
+        )
+        average, graded_count = (await self.db.execute(query)).one()
+        return (float(average), graded_count) if graded_count else None
+
+    @staticmethod
+    def _rank_in(rows: List[ScoreRow], student_id: str) -> Optional[Tuple[float, int, int, int]]:
+        scores = {row[0]: row[1] for row in rows}
+        if student_id not in scores:
+            return None
+        score = scores[student_id]
+        higher = sum(1 for other in scores.values() if other > score)
+        lower = sum(1 for other in scores.values() if other < score)
+        return score, higher, lower, len(scores)
+
+
+async def update_leaderboards(db: AsyncSession, submission: Submission) -> None:
+    """Grading-completion hook: update leaderboards without failing the grading."""
+    try:
+        await LeaderboardService(db).record_grade(submission)
+    except Exception as e:
+        logger.warning(f"Failed to update leaderboards for submission {submission.id}: {str(e)}")
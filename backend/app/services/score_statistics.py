@@ -0,0 +1,166 @@
+"""NumPy-backed score statistics with per-assignment sorted score caches."""
+
+import logging
+import time
+from typing import Callable, Dict, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.assignment import Submission
+
+logger = logging.getLogger(__name__)
+
+# Scales the MAD so that robust z-scores match standard z-scores for normal data
+MAD_SCALE = 0.6745
+# Fallback when more than half the scores are identical (MAD == 0)
+MEAN_AD_SCALE = 1.253314
+
+
+def robust_z_scores(scores: np.ndarray) -> np.ndarray:
+    """Modified z-scores (Iglewicz-Hoaglin) for a whole batch in one pass.
+
+    Uses the median absolute deviation, falling back to the mean absolute
+    deviation when the MAD is zero; all zeros if every score is identical.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return scores
+
+    median = np.median(scores)
+    deviations = np.abs(scores - median)
+    mad = np.median(deviations)
+    if mad > 0:
+        return MAD_SCALE * deviations / mad
+
+    mean_ad = deviations.mean()
+    if mean_ad > 0:
+        return deviations / (MEAN_AD_SCALE * mean_ad)
+    return np.zeros_like(scores)
+
+
+class ScoreDistribution:
+    """Sorted scores of one assignment, keyed by submission for regrades."""
+
+    def __init__(self, scores: Optional[Dict[UUID, float]] = None):
+        self._by_submission: Dict[UUID, float] = dict(scores or {})
+        self._sorted = np.sort(np.fromiter(self._by_submission.values(), dtype=np.float64))
+        self._sum = float(self._sorted.sum())
+
+    def __len__(self) -> int:
+        return self._sorted.size
+
+    @property
+    def scores(self) -> np.ndarray:
+        """Scores in ascending order (read-only view)."""
+        view = self._sorted.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._sum / self._sorted.size if self._sorted.size else None
+
+    def percentile_rank(self, score: float) -> Optional[int]:
+        """Share of scores strictly below ``score``, as an integer percentage."""
+        if self._sorted.size < 2:
+            return None
+        below = int(np.searchsorted(self._sorted, score, side="left"))
+        return int(below / self._sorted.size * 100)
+
+    def record(self, submission_id: UUID, score: float) -> None:
+        """Insert a new score, or move a regraded one, keeping the array sorted."""
+        previous = self._by_submission.get(submission_id)
+        if previous is not None:
+            if previous == score:
+                return
+            position = int(np.searchsorted(self._sorted, previous, side="left"))
+            self._sorted = np.delete(self._sorted, position)
+            self._sum -= previous
+
+        position = int(np.searchsorted(self._sorted, score, side="right"))
+        self._sorted = np.insert(self._sorted, position, score)
+        self._sum += score
+        self._by_submission[submission_id] = score
+
+    def remove(self, submission_id: UUID) -> None:
+        previous = self._by_submission.pop(submission_id, None)
+        if previous is None:
+            return
+        position = int(np.searchsorted(self._sorted, previous, side="left"))
+        self._sorted = np.delete(self._sorted, position)
+        self._sum -= previous
+
+
+class ScoreStatisticsEngine:
+    """Process-wide cache of score distributions per assignment.
+
+    Distributions are loaded from the database on first use, kept current by
+    the grading-completion hook, and reloaded after ``ttl_seconds`` so that
+    scores written by other workers are eventually picked up.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._distributions: Dict[UUID, ScoreDistribution] = {}
+        self._loaded_at: Dict[UUID, float] = {}
+
+    async def get_distribution(self, db: AsyncSession, assignment_id: UUID) -> ScoreDistribution:
+        """Cached distribution for an assignment, loading it if missing or stale."""
+        distribution = self._distributions.get(assignment_id)
+        if distribution is not None and self._clock() - self._loaded_at[assignment_id] < self.ttl_seconds:
+            return distribution
+
+        result = await db.execute(
+            select(Submission.id, Submission.score).where(
+                and_(
+                    Submission.assignment_id == assignment_id,
+                    Submission.score.isnot(None)
+                )
+            )
+        )
+        distribution = ScoreDistribution({row.id: float(row.score) for row in result})
+        self._distributions[assignment_id] = distribution
+        self._loaded_at[assignment_id] = self._clock()
+        return distribution
+
+    async def percentile_rank(self, db: AsyncSession, assignment_id: UUID, score: float) -> Optional[int]:
+        distribution = await self.get_distribution(db, assignment_id)
+        return distribution.percentile_rank(score)
+
+    async def mean(self, db: AsyncSession, assignment_id: UUID) -> Optional[float]:
+        distribution = await self.get_distribution(db, assignment_id)
+        return distribution.mean
+
+    def record_submission(self, submission: Submission) -> None:
+        """Apply a newly graded score to the cached distribution, if loaded."""
+        distribution = self._distributions.get(submission.assignment_id)
+        if distribution is None:
+            return
+        if submission.score is None:
+            distribution.remove(submission.id)
+        else:
+            distribution.record(submission.id, float(submission.score))
+
+    def invalidate(self, assignment_id: UUID) -> None:
+        self._distributions.pop(assignment_id, None)
+        self._loaded_at.pop(assignment_id, None)
+
+    def clear(self) -> None:
+        self._distributions.clear()
+        self._loaded_at.clear()
+
+
+score_statistics = ScoreStatisticsEngine()
+
+
+def update_score_statistics(submission: Submission) -> None:
+    """Grading-completion hook: keep cached score distributions current."""
+    try:
+        score_statistics.record_submission(submission)
+    except Exception as e:
+        logger.warning(f"Failed to update score statistics for submission {submission.id}: {str(e)}")
+        score_statistics.invalidate(submission.assignment_id)
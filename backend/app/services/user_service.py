@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core.auth import auth_manager
+from app.core.permissions import ResourceType, invalidate_resource_permissions, invalidate_user_permissions
 from app.models.user import User, UserRole, ParentStudentRelation
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
 
@@ -160,6 +161,7 @@ class UserService:
         user.updated_at = datetime.now(timezone.utc)
         
         await self.db.commit()
+        invalidate_user_permissions(user_id, self.db)
         return True
     
     async def activate_user(self, user_id: UUID) -> bool:
@@ -172,8 +174,25 @@ class UserService:
         user.updated_at = datetime.now(timezone.utc)
         
         await self.db.commit()
+        invalidate_user_permissions(user_id, self.db)
         return True
     
+    async def change_user_role(self, user_id: UUID, role: UserRole) -> Optional[User]:
+        """Change a user's role."""
+        user = await self.get_user_by_id(user_id)
+        if not user:
+            return None
+        
+        user.role = role
+        user.updated_at = datetime.now(timezone.utc)
+        
+        await self.db.commit()
+        await self.db.refresh(user)
+        invalidate_user_permissions(user_id, self.db)
+        invalidate_resource_permissions(ResourceType.USER, user_id, self.db)
+        
+        return user
+    
     async def verify_user_email(self, user_id: UUID) -> bool:
         """Verify user email."""
         user = await self.get_user_by_id(user_id)
@@ -234,6 +253,7 @@ class UserService:
         
         self.db.add(relation)
         await self.db.commit()
+        invalidate_user_permissions(parent_id, self.db)
         
         return True
     
@@ -254,6 +274,7 @@ class UserService:
         
         await self.db.delete(relation)
         await self.db.commit()
+        invalidate_user_permissions(parent_id, self.db)
         
         return True
     
@@ -577,4 +598,6 @@ class UserService:
             updated_count += 1
         
         await self.db.commit()
+        for user in users:
+            invalidate_user_permissions(user.id, self.db)
         return updated_count
\ No newline at end of file
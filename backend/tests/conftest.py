@@ -6,8 +6,11 @@ from typing import AsyncGenerator, Generator
 import pytest
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
 
-from app.main import app
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.core.database import Base
 
 
 @pytest.fixture(scope="session")
@@ -21,11 +24,50 @@ def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
 @pytest.fixture
 def client() -> TestClient:
     """Create a test client for the FastAPI app."""
+    from app.main import app
+
     return TestClient(app)
 
 
 @pytest.fixture
 async def async_client() -> AsyncGenerator[AsyncClient, None]:
     """Create an async test client for the FastAPI app."""
+    from app.main import app
+
     async with AsyncClient(app=app, base_url="http://test") as ac:
-        yield ac
\ No newline at end of file
+        yield ac
+
+
+@pytest.fixture
+def db_url() -> str:
+    """Database URL for ``db_engine``; override in a module to use e.g. a file database."""
+    return "sqlite+aiosqlite:///:memory:"
+
+
+@pytest.fixture
+async def db_engine(db_url: str) -> AsyncGenerator[AsyncEngine, None]:
+    """Engine with every model table created.
+
+    An in-memory database is shared by all sessions through a single pooled
+    connection, so services that open their own sessions see the same data.
+    """
+    options = {"poolclass": StaticPool} if ":memory:" in db_url else {}
+    engine = create_async_engine(db_url, **options)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def db_session_factory(db_engine: AsyncEngine) -> async_sessionmaker:
+    """Session factory bound to ``db_engine``."""
+    return async_sessionmaker(db_engine, expire_on_commit=False)
+
+
+@pytest.fixture
+async def db_session(db_session_factory: async_sessionmaker) -> AsyncGenerator[AsyncSession, None]:
+    """A session on the test database."""
+    async with db_session_factory() as session:
+        yield session
@@ -0,0 +1,168 @@
+"""Tests for incremental learning analytics rollups."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.analytics import LearningAnalytics
+from app.models.assignment import Assignment, Submission, SubmissionStatus
+from app.models.class_model import Class
+from app.models.user import User, UserRole
+from app.services.analytics_service import AnalyticsService, update_learning_analytics
+
+# (assignment index, score, max score) in grading order
+SUBMISSION_STREAM = [
+    (0, 90, 100), (1, 4, 10), (2, 55, 100), (0, 70, 100), (1, 9, 10),
+    (3, 30, 50), (2, 80, 100), (0, 40, 100), (3, 45, 50), (1, 6, 10),
+    (2, 20, 100), (0, 100, 100),
+]
+
+
+@pytest.fixture
+async def grading_setup(db_session: AsyncSession):
+    """Create a teacher, a student, a class and assignments on several knowledge points."""
+    teacher = User(email="teacher@test.com", password_hash="hashed_password", name="Teacher", role=UserRole.TEACHER)
+    student = User(email="student@test.com", password_hash="hashed_password", name="Student", role=UserRole.STUDENT)
+    db_session.add_all([teacher, student])
+    await db_session.flush()
+
+    test_class = Class(name="Test Class", class_code="ROLLUP1", teacher_id=teacher.id, subject="Math")
+    db_session.add(test_class)
+    await db_session.flush()
+
+    assignments = [
+        Assignment(title="Fractions 1", subject="Math", topic="fractions", total_points=100,
+                   class_id=test_class.id, teacher_id=teacher.id),
+        Assignment(title="Geometry quiz", subject="Math", topic="geometry", total_points=10,
+                   class_id=test_class.id, teacher_id=teacher.id),
+        Assignment(title="Essay", subject="English", topic=None, total_points=100,
+                   class_id=test_class.id, teacher_id=teacher.id),
+        Assignment(title="Fractions 2", subject="Math", topic="fractions", total_points=50,
+                   class_id=test_class.id, teacher_id=teacher.id),
+    ]
+    db_session.add_all(assignments)
+    await db_session.commit()
+    return student, assignments
+
+
+async def _grade_stream(db_session: AsyncSession, student: User, assignments) -> None:
+    """Grade the fixed submission stream, running the completion hook after each one."""
+    started = datetime(2024, 1, 1, 9, 0)
+    for i, (index, score, max_score) in enumerate(SUBMISSION_STREAM):
+        submission = Submission(
+            assignment_id=assignments[index].id,
+            student_id=student.id,
+            score=score,
+            max_score=max_score,
+            status=SubmissionStatus.GRADED,
+            submitted_at=started + timedelta(hours=i),
+            graded_at=started + timedelta(hours=i, minutes=30)
+        )
+        db_session.add(submission)
+        await db_session.commit()
+        await update_learning_analytics(db_session, submission)
+
+
+async def _snapshot(db_session: AsyncSession, service: AnalyticsService, student_id) -> dict:
+    db_session.expire_all()  # rollups are written with Core upserts
+    return {
+        (row.subject, row.knowledge_point): (
+            row.total_attempts, row.correct_attempts, row.error_count,
+            row.streak_count, row.best_streak, float(row.mastery_level), float(row.accuracy_rate)
+        )
+        for row in await service.get_knowledge_rollups(student_id)
+    }
+
+
+async def test_incremental_rollups_match_recomputation(db_session: AsyncSession, grading_setup):
+    """Replaying the stream through the hook gives the same rows as a full rebuild."""
+    student, assignments = grading_setup
+    student_id = student.id
+    service = AnalyticsService(db_session)
+
+    await _grade_stream(db_session, student, assignments)
+    incremental = await _snapshot(db_session, service, student_id)
+
+    assert set(incremental) == {("Math", "fractions"), ("Math", "geometry"), ("English", "English")}
+    # fractions: 90, 70, 60, 40, 90, 100 (percentages) -> streaks 1,2,3,0,1,2
+    attempts, correct, errors, streak, best_streak, mastery, accuracy = incremental[("Math", "fractions")]
+    assert (attempts, correct, errors, streak, best_streak) == (6, 5, 1, 2, 3)
+    assert accuracy == pytest.approx(5 * 100 / 6, abs=0.01)
+    expected_mastery = 90.0
+    for score in (70, 60, 40, 90, 100):
+        expected_mastery = expected_mastery * 0.7 + score * 0.3
+    assert mastery == pytest.approx(expected_mastery, abs=0.05)
+
+    replayed = await service.rebuild_knowledge_rollups(student_id)
+    assert replayed == len(SUBMISSION_STREAM)
+    rebuilt = await _snapshot(db_session, service, student_id)
+
+    assert rebuilt.keys() == incremental.keys()
+    for key, row in incremental.items():
+        assert row[:5] == rebuilt[key][:5]
+        assert row[5:] == pytest.approx(rebuilt[key][5:], abs=0.05)
+
+
+async def test_endpoints_read_rollups(db_session: AsyncSession, grading_setup):
+    """Weak areas and mastery levels come from the rollup rows."""
+    student, assignments = grading_setup
+    service = AnalyticsService(db_session)
+    await _grade_stream(db_session, student, assignments)
+
+    mastery = await service.calculate_mastery_levels(student.id)
+    assert set(mastery) == {"fractions", "geometry", "English"}
+    assert all(0 <= level <= 1 for level in mastery.values())
+    assert await service.calculate_mastery_levels(student.id, subjects=["English"]) == {
+        "English": mastery["English"]
+    }
+
+    # English: 55, 80, 20 -> low mastery; geometry: 40, 90, 60 -> error rate above 30%
+    weak_areas = await service.identify_weak_areas(student.id, threshold=0.6)
+    assert [area["area"] for area in weak_areas] == ["English", "geometry"]
+    assert [area["severity"] for area in weak_areas] == ["high", "medium"]
+    assert weak_areas[0]["total_attempts"] == 3
+
+
+async def test_ungraded_submission_is_ignored(db_session: AsyncSession, grading_setup):
+    """Submissions without a score don't create rollup rows."""
+    student, assignments = grading_setup
+    submission = Submission(assignment_id=assignments[0].id, student_id=student.id)
+    db_session.add(submission)
+    await db_session.commit()
+
+    await update_learning_analytics(db_session, submission)
+
+    result = await db_session.execute(select(LearningAnalytics))
+    assert result.scalars().all() == []
+
+
+async def test_regrades_match_recomputation(db_session: AsyncSession, grading_setup):
+    """Re-grading (AI regrade, then a teacher override) replaces the earlier score."""
+    student, assignments = grading_setup
+    student_id = student.id
+    service = AnalyticsService(db_session)
+    await _grade_stream(db_session, student, assignments)
+
+    submission = (await db_session.execute(
+        select(Submission).where(Submission.assignment_id == assignments[0].id).order_by(Submission.graded_at)
+    )).scalars().first()
+
+    for score, graded_at in ((20, datetime(2024, 1, 2, 9, 0)), (95, datetime(2024, 1, 2, 10, 0))):
+        regrade = submission.graded_at is not None
+        submission.score = score
+        submission.graded_at = graded_at
+        await db_session.commit()
+        await update_learning_analytics(db_session, submission, regrade=regrade)
+
+    incremental = await _snapshot(db_session, service, student_id)
+    assert incremental[("Math", "fractions")][0] == 6  # still one attempt per submission
+
+    await service.rebuild_knowledge_rollups(student_id)
+    rebuilt = await _snapshot(db_session, service, student_id)
+
+    assert rebuilt.keys() == incremental.keys()
+    for key, row in incremental.items():
+        assert row[:5] == rebuilt[key][:5]
+        assert row[5:] == pytest.approx(rebuilt[key][5:], abs=0.05)
@@ -0,0 +1,197 @@
+"""Tests for per-user conversation memory with a fake LLM."""
+
+import asyncio
+import re
+import threading
+import time
+from typing import Any, List, Optional
+from uuid import uuid4
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from sqlalchemy import insert
+
+from app.models.user import User, UserRole
+from app.services.conversation_memory import ConversationMemoryStore
+
+
+class FakeSummaryLLM(BaseChatModel):
+    """Summarizes by listing the tags found in the prompt; counts its calls."""
+
+    calls: int = 0
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-summary"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("summary model unavailable")
+        tags = sorted(set(re.findall(r"\[[^\]]+\]", messages[-1].content)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(tags)))])
+
+
+class FakeAgent:
+    """Blocking agent that records the history it was given."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.seen = []
+        self.threads = set()
+
+    def __call__(self, tag: str, user_input: str, history: List[BaseMessage]) -> str:
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        self.seen.append((tag, history))
+        return f"{tag} 收到：{user_input}"
+
+
+@pytest.fixture
+def db_url(tmp_path) -> str:
+    """A file database, so concurrent sessions use separate connections."""
+    return f"sqlite+aiosqlite:///{tmp_path / 'memory.db'}"
+
+
+async def _create_users(db_session_factory, count: int) -> list:
+    user_ids = [uuid4() for _ in range(count)]
+    async with db_session_factory() as db:
+        await db.execute(insert(User), [
+            {"id": user_id, "email": f"{user_id.hex}@test.com", "password_hash": "x", "name": "学生",
+             "role": UserRole.STUDENT}
+            for user_id in user_ids
+        ])
+        await db.commit()
+    return user_ids
+
+
+async def _chat(db_session_factory, llm, agent, user_id, tag: str, text: str, **limits) -> str:
+    """One request: its own session and store, like AIAgentService."""
+    async with db_session_factory() as db:
+        store = ConversationMemoryStore(db, llm, **limits)
+        user_input = f"{tag} {text}"
+        return await store.run_turn(user_id, user_input, lambda history: agent(tag, user_input, history))
+
+
+async def test_concurrent_users_never_see_each_other(db_session_factory):
+    user_ids = await _create_users(db_session_factory, 12)
+    tags = {user_id: f"[user-{i}]" for i, user_id in enumerate(user_ids)}
+    llm, agent = FakeSummaryLLM(), FakeAgent(delay=0.005)
+
+    async def conversation(user_id):
+        for turn in range(8):
+            await _chat(db_session_factory, llm, agent, user_id, tags[user_id], f"第{turn}个问题", max_turns=4)
+
+    await asyncio.gather(*(conversation(user_id) for user_id in user_ids))
+
+    assert llm.calls > 0  # summaries were generated along the way
+    for tag, history in agent.seen:
+        found = set(re.findall(r"\[[^\]]+\]", " ".join(m.content for m in history)))
+        assert found <= {tag}
+
+    async with db_session_factory() as db:
+        for user_id in user_ids:
+            memory = await ConversationMemoryStore(db, llm, max_turns=4).load(user_id)
+            assert memory.summary == tags[user_id]
+            assert memory.summarized_turns + len(memory.turns) == 8
+            assert all(turn["human"].startswith(tags[user_id]) for turn in memory.turns)
+
+
+async def test_agent_runs_off_the_event_loop(db_session_factory):
+    user_ids = await _create_users(db_session_factory, 5)
+    llm, agent = FakeSummaryLLM(), FakeAgent(delay=0.3)
+
+    start = time.monotonic()
+    await asyncio.gather(*(_chat(db_session_factory, llm, agent, uid, f"[u{i}]", "你好") for i, uid in enumerate(user_ids)))
+    elapsed = time.monotonic() - start
+
+    assert threading.get_ident() not in agent.threads
+    assert elapsed < 5 * 0.3 / 2  # blocking calls overlapped instead of running back to back
+
+
+async def test_summary_regenerated_only_when_budget_exceeded(db_session_factory):
+    [user_id] = await _create_users(db_session_factory, 1)
+    llm, agent = FakeSummaryLLM(), FakeAgent()
+
+    for turn in range(4):
+        await _chat(db_session_factory, llm, agent, user_id, "[a]", f"问题{turn}", max_turns=4)
+    assert llm.calls == 0
+
+    await _chat(db_session_factory, llm, agent, user_id, "[a]", "问题4", max_turns=4)
+    assert llm.calls == 1
+
+    # The window was pruned to half, so the next turn fits without a new summary
+    await _chat(db_session_factory, llm, agent, user_id, "[a]", "问题5", max_turns=4)
+    assert llm.calls == 1
+    history = agent.seen[-1][1]
+    assert isinstance(history[0], SystemMessage) and "[a]" in history[0].content
+    assert [m.content for m in history[1:] if isinstance(m, HumanMessage)] == ["[a] 问题3", "[a] 问题4"]
+
+    # A single long turn exceeds the token budget
+    await _chat(db_session_factory, llm, agent, user_id, "[a]", "很长的问题" * 200, max_turns=4, max_tokens=500)
+    assert llm.calls == 2
+
+
+async def test_failed_summary_keeps_turns(db_session_factory):
+    [user_id] = await _create_users(db_session_factory, 1)
+    llm, agent = FakeSummaryLLM(fail=True), FakeAgent()
+
+    for turn in range(5):
+        await _chat(db_session_factory, llm, agent, user_id, "[f]", f"问题{turn}", max_turns=4)
+    assert llm.calls == 1
+
+    async with db_session_factory() as db:
+        memory = await ConversationMemoryStore(db, llm, max_turns=4).load(user_id)
+        assert memory.summary == "" and memory.summarized_turns == 0
+        assert [turn["human"] for turn in memory.turns] == [f"[f] 问题{turn}" for turn in range(5)]
+
+    # Once the model recovers, the next turn folds everything that was kept
+    llm.fail = False
+    await _chat(db_session_factory, llm, agent, user_id, "[f]", "问题5", max_turns=4)
+    async with db_session_factory() as db:
+        memory = await ConversationMemoryStore(db, llm, max_turns=4).load(user_id)
+        assert memory.summary == "[f]"
+        assert memory.summarized_turns + len(memory.turns) == 6
+
+
+async def test_failed_agent_turn_not_recorded(db_session_factory):
+    [user_id] = await _create_users(db_session_factory, 1)
+    llm, agent = FakeSummaryLLM(), FakeAgent()
+    await _chat(db_session_factory, llm, agent, user_id, "[e]", "第一个问题")
+
+    def failing_agent(history):
+        raise RuntimeError("agent unavailable")
+
+    async with db_session_factory() as db:
+        with pytest.raises(RuntimeError):
+            await ConversationMemoryStore(db, llm).run_turn(user_id, "[e] 第二个问题", failing_agent)
+
+    async with db_session_factory() as db:
+        memory = await ConversationMemoryStore(db, llm).load(user_id)
+        assert [turn["human"] for turn in memory.turns] == ["[e] 第一个问题"]
+
+
+async def test_memory_persists_and_clears(db_session_factory):
+    [user_id] = await _create_users(db_session_factory, 1)
+    llm, agent = FakeSummaryLLM(), FakeAgent()
+
+    await _chat(db_session_factory, llm, agent, user_id, "[p]", "记住我喜欢几何")
+
+    async with db_session_factory() as db:
+        memory = await ConversationMemoryStore(db, llm).load(user_id)
+        assert memory.turns == [{"human": "[p] 记住我喜欢几何", "ai": "[p] 收到：[p] 记住我喜欢几何"}]
+
+        await ConversationMemoryStore(db, llm).clear(user_id)
+
+    async with db_session_factory() as db:
+        memory = await ConversationMemoryStore(db, llm).load(user_id)
+        assert memory.turns == [] and memory.summary == ""
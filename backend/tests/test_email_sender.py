@@ -0,0 +1,174 @@
+"""Tests for the pooled bulk email sender against a local SMTP server."""
+
+import socket
+import time
+from collections import Counter
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from sqlalchemy import select
+
+from app.models.notification import EmailDelivery, EmailDeliveryStatus
+from app.services.email_sender import TokenBucket
+from app.services.email_service import EmailService
+
+
+class RecordingHandler:
+    """SMTP handler that records deliveries and can reject recipients."""
+
+    def __init__(self):
+        self.delivered = Counter()
+        self.peers = set()
+        self.rcpt_peers = set()
+        self.rejections = {}  # address -> list of SMTP replies to return before accepting
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.rcpt_peers.add(session.peer)
+        replies = self.rejections.get(address)
+        if replies:
+            return replies.pop(0)
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.peers.add(session.peer)
+        for address in envelope.rcpt_tos:
+            self.delivered[address] += 1
+        return "250 Message accepted"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(
+        handler,
+        hostname="127.0.0.1",
+        port=_free_port(),
+        authenticator=lambda *args: AuthResult(success=True),
+        auth_require_tls=False
+    )
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+@pytest.fixture
+def email_service(smtp_server):
+    controller, _ = smtp_server
+    service = EmailService.__new__(EmailService)
+    service.settings = type("Settings", (), {"SMTP_POOL_SIZE": 3, "SMTP_RATE_PER_SECOND": 100.0})()
+    service.smtp_host = controller.hostname
+    service.smtp_port = controller.port
+    service.smtp_username = "sender"
+    service.smtp_password = "secret"
+    service.smtp_use_tls = False
+    service.from_email = "noreply@test.com"
+    service.from_name = "Test"
+    return service
+
+
+def _emails(count: int) -> list:
+    return [
+        {"to_email": f"student{i}@test.com", "subject": f"成绩通知 {i}", "html_content": f"<p>{i}</p>"}
+        for i in range(count)
+    ]
+
+
+async def test_bulk_send_reuses_pooled_connections(email_service, smtp_server):
+    """All emails go out over at most pool-size connections."""
+    _, handler = smtp_server
+
+    summary = await email_service.send_bulk_emails(_emails(30))
+
+    assert summary["successful_emails"] == 30
+    assert summary["failed_emails"] == 0
+    assert all(handler.delivered[f"student{i}@test.com"] == 1 for i in range(30))
+    assert 1 <= len(handler.peers) <= 3
+
+
+async def test_send_rate_is_shaped(email_service, smtp_server):
+    """The token bucket caps throughput after the initial burst."""
+    start = time.monotonic()
+    summary = await email_service.send_bulk_emails(_emails(12), rate_per_second=8.0)
+    elapsed = time.monotonic() - start
+
+    assert summary["successful_emails"] == 12
+    # Burst of 8, then 4 more at 8/s
+    assert elapsed >= 0.45
+
+
+async def test_token_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        await bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(5):
+        await bucket.acquire()
+    assert time.monotonic() - start >= 0.08
+
+
+async def test_transient_errors_retried_permanent_errors_not(email_service, smtp_server):
+    _, handler = smtp_server
+    handler.rejections = {
+        "student1@test.com": ["451 Try again later", "451 Try again later"],
+        "student2@test.com": ["550 No such user"],
+    }
+
+    summary = await email_service.send_bulk_emails(_emails(3), max_retries=3)
+    results = {r["to_email"]: r for r in summary["results"]}
+
+    assert results["student0@test.com"]["attempts"] == 1
+    assert results["student1@test.com"]["success"] is True
+    assert results["student1@test.com"]["attempts"] == 3
+    assert results["student2@test.com"]["success"] is False
+    assert results["student2@test.com"]["attempts"] == 1
+    assert handler.delivered["student1@test.com"] == 1
+
+
+async def test_refused_recipients_keep_connections_pooled(email_service, smtp_server):
+    """An SMTP reply error returns the connection to the pool instead of leaking it."""
+    _, handler = smtp_server
+    handler.rejections = {f"student{i}@test.com": ["550 No such user"] for i in range(10)}
+
+    summary = await email_service.send_bulk_emails(_emails(12))
+
+    assert summary["failed_emails"] == 10
+    assert summary["successful_emails"] == 2
+    assert len(handler.rcpt_peers) <= 3
+
+
+async def test_interrupted_job_resumes_without_resending(email_service, smtp_server, db_session, monkeypatch):
+    """Re-running a job only sends the emails that were not delivered."""
+    _, handler = smtp_server
+    monkeypatch.setattr("app.services.email_sender.random.uniform", lambda a, b: 0.0)  # no backoff wait
+    emails = _emails(10)
+    # The server keeps deferring two recipients, so the first run gives up on them
+    handler.rejections = {
+        "student3@test.com": ["421 Service not available"] * 2,
+        "student7@test.com": ["451 Try again later"] * 2,
+    }
+
+    first = await email_service.send_bulk_emails(emails, job_id="grades-2024", db=db_session, max_retries=1)
+    assert first["successful_emails"] == 8
+
+    rows = (await db_session.execute(select(EmailDelivery))).scalars().all()
+    assert Counter(row.status for row in rows) == {EmailDeliveryStatus.SENT: 8, EmailDeliveryStatus.FAILED: 2}
+
+    second = await email_service.send_bulk_emails(emails, job_id="grades-2024", db=db_session, max_retries=1)
+    assert second["successful_emails"] == 10
+    assert second["skipped_emails"] == 8
+
+    assert all(count == 1 for count in handler.delivered.values())
+    assert sum(handler.delivered.values()) == 10
+    failed = await db_session.execute(
+        select(EmailDelivery).where(EmailDelivery.status == EmailDeliveryStatus.FAILED)
+    )
+    assert failed.scalars().all() == []
@@ -0,0 +1,119 @@
+"""Tests for streaming class data export."""
+
+import csv
+import io
+import tracemalloc
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import insert
+
+from app.core.exceptions import ValidationError
+from app.models.assignment import Assignment, Submission, SubmissionStatus
+from app.models.class_model import Class
+from app.models.user import User, UserRole
+from app.services.export_service import EXPORT_COLUMNS, PYARROW_AVAILABLE, ClassDataExporter
+
+
+async def _create_class(db_session_factory, students: int, assignments: int):
+    """Bulk-insert a class with one graded submission per student and assignment."""
+    teacher_id, class_id = uuid4(), uuid4()
+    student_ids = [uuid4() for _ in range(students)]
+    assignment_ids = [uuid4() for _ in range(assignments)]
+    started = datetime(2024, 1, 1)
+
+    async with db_session_factory() as session:
+        await session.execute(insert(User), [
+            {"id": teacher_id, "email": f"teacher-{class_id.hex}@test.com", "password_hash": "x", "name": "Teacher",
+             "role": UserRole.TEACHER},
+            *({"id": student_id, "email": f"student{i}-{class_id.hex}@test.com", "password_hash": "x",
+               "name": f"学生{i:05d}", "role": UserRole.STUDENT}
+              for i, student_id in enumerate(student_ids))
+        ])
+        await session.execute(insert(Class), [{"id": class_id, "name": "Export", "class_code": class_id.hex[:8],
+                                               "teacher_id": teacher_id}])
+        await session.execute(insert(Assignment), [
+            {"id": assignment_id, "title": f"Assignment {i}", "class_id": class_id, "teacher_id": teacher_id}
+            for i, assignment_id in enumerate(assignment_ids)
+        ])
+        for i, assignment_id in enumerate(assignment_ids):
+            await session.execute(insert(Submission), [
+                {"id": uuid4(), "assignment_id": assignment_id, "student_id": student_id,
+                 "status": SubmissionStatus.GRADED, "score": (i + j) % 100, "max_score": 100,
+                 "submitted_at": started + timedelta(minutes=i), "graded_at": started + timedelta(hours=i)}
+                for j, student_id in enumerate(student_ids)
+            ])
+        await session.commit()
+
+    return class_id
+
+
+async def _consume(stream) -> tuple:
+    """Drain an export stream, returning (bytes written, peak traced memory, chunk count)."""
+    total = chunks = 0
+    tracemalloc.start()
+    try:
+        async for chunk in stream:
+            total += len(chunk)
+            chunks += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return total, peak, chunks
+
+
+async def test_csv_export_content(db_session_factory):
+    """CSV export contains a header and one row per submission."""
+    class_id = await _create_class(db_session_factory, students=3, assignments=2)
+    exporter = ClassDataExporter(db_session_factory, chunk_size=2)
+
+    chunks = [chunk async for chunk in exporter.stream(class_id, "csv")]
+    assert len(chunks) == 3  # 6 rows in chunks of 2
+
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+    assert rows[0] == EXPORT_COLUMNS
+    assert len(rows) == 7
+    assert rows[1][1] == "学生00000"
+    assert rows[1][5] == SubmissionStatus.GRADED.value
+    assert rows[1][8] == "2024-01-01T00:00:00"
+
+
+async def test_csv_export_memory_stays_flat(db_session_factory):
+    """Exporting 100k rows uses no more memory than exporting 10k rows."""
+    small_class = await _create_class(db_session_factory, students=100, assignments=100)
+    large_class = await _create_class(db_session_factory, students=1000, assignments=100)
+    exporter = ClassDataExporter(db_session_factory, chunk_size=1000)
+    await _consume(exporter.stream(small_class, "csv"))  # warm up statement caches
+
+    small_bytes, small_peak, _ = await _consume(exporter.stream(small_class, "csv"))
+    large_bytes, large_peak, chunks = await _consume(exporter.stream(large_class, "csv"))
+
+    assert chunks == 100
+    assert large_bytes > 9 * small_bytes
+    # Memory is bounded by the chunk size, not by the number of rows
+    assert large_peak < small_peak * 1.5
+    assert large_peak < large_bytes / 4
+
+
+@pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow not installed")
+async def test_parquet_export(db_session_factory):
+    """Parquet export writes one row group per chunk."""
+    import pyarrow.parquet as pq
+
+    class_id = await _create_class(db_session_factory, students=50, assignments=10)
+    exporter = ClassDataExporter(db_session_factory, chunk_size=100)
+
+    data = b"".join([chunk async for chunk in exporter.stream(class_id, "parquet")])
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+
+    assert parquet_file.metadata.num_rows == 500
+    assert parquet_file.metadata.num_row_groups == 5
+    table = parquet_file.read()
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.column("score").to_pylist()[:2] == [0.0, 1.0]
+
+
+def test_unsupported_format(db_session_factory):
+    with pytest.raises(ValidationError):
+        ClassDataExporter(db_session_factory).stream(uuid4(), "xlsx")
@@ -6,10 +6,11 @@ from io import BytesIO
 from uuid import uuid4
 
 import pytest
+from fastapi import HTTPException
 from PIL import Image
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.file import FileStatus, FileType
+from app.models.file import File, FileStatus, FileType
 from app.models.user import User, UserRole
 from app.services.file_service import FileService
 
@@ -24,8 +25,14 @@ class MockUploadFile:
         self.size = len(content)
         self._position = 0
     
-    async def read(self) -> bytes:
-        return self.content
+    async def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            end = len(self.content)
+        else:
+            end = min(self._position + size, len(self.content))
+        chunk = self.content[self._position:end]
+        self._position = end
+        return chunk
     
     async def seek(self, position: int) -> None:
         self._position = position
@@ -176,6 +183,118 @@ class TestFileService:
             if os.path.exists(temp_file_path):
                 os.unlink(temp_file_path)
     
+    @pytest.mark.asyncio
+    async def test_spool_upload_streams_in_chunks(
+        self, db_session: AsyncSession, tmp_path, monkeypatch
+    ):
+        """Test streaming upload hashes and spools content chunk by chunk."""
+        file_service = FileService(db_session)
+        monkeypatch.setattr(file_service, "UPLOAD_SPOOL_DIR", str(tmp_path))
+        monkeypatch.setattr(file_service, "UPLOAD_CHUNK_SIZE", 4096)
+        
+        content = b"%PDF-1.4\n" + os.urandom(50_000)
+        mock_file = MockUploadFile(
+            filename="large.pdf",
+            content=content,
+            content_type="application/pdf"
+        )
+        
+        reads = []
+        original_read = mock_file.read
+        
+        async def tracking_read(size: int = -1) -> bytes:
+            chunk = await original_read(size)
+            reads.append(len(chunk))
+            return chunk
+        
+        mock_file.read = tracking_read
+        
+        spooled = await file_service._spool_upload(mock_file, file_service.MAX_DOCUMENT_SIZE)
+        
+        try:
+            assert max(reads) <= 4096
+            assert spooled.size == len(content)
+            assert spooled.file_hash == file_service._calculate_file_hash(content)
+            assert spooled.head == content[:file_service.MAGIC_BYTES_LENGTH]
+            with open(spooled.path, "rb") as f:
+                assert f.read() == content
+        finally:
+            file_service._discard_spool(spooled.path)
+    
+    @pytest.mark.asyncio
+    async def test_spool_upload_rejects_oversized_stream(
+        self, db_session: AsyncSession, tmp_path, monkeypatch
+    ):
+        """Test oversized uploads abort early and leave no spool file behind."""
+        file_service = FileService(db_session)
+        monkeypatch.setattr(file_service, "UPLOAD_SPOOL_DIR", str(tmp_path))
+        monkeypatch.setattr(file_service, "UPLOAD_CHUNK_SIZE", 1024)
+        
+        mock_file = MockUploadFile(
+            filename="large.jpg",
+            content=b"x" * 10_000,
+            content_type="image/jpeg"
+        )
+        mock_file.size = None  # Size unknown until streamed
+        
+        with pytest.raises(HTTPException) as exc_info:
+            await file_service._spool_upload(mock_file, max_size=4096)
+        
+        assert "文件大小不能超过" in exc_info.value.detail
+        assert os.listdir(tmp_path) == []
+    
+    @pytest.mark.asyncio
+    async def test_batch_analyze_reuses_results_for_same_content(
+        self, db_session: AsyncSession, mock_user, monkeypatch
+    ):
+        """Test duplicate content is analysed once and progress is reported per file."""
+        file_service = FileService(db_session)
+        db_session.add(mock_user)
+        
+        records = [
+            File(
+                filename=f"scan_{i}.jpg",
+                original_name=f"scan_{i}.jpg",
+                file_type=FileType.IMAGE,
+                mime_type="image/jpeg",
+                file_size=100,
+                file_hash=file_hash,
+                file_url="",
+                storage_path="",
+                status=FileStatus.READY,
+                uploaded_by=mock_user.id
+            )
+            for i, file_hash in enumerate(["a" * 64, "a" * 64, "b" * 64])
+        ]
+        db_session.add_all(records)
+        await db_session.commit()
+        
+        analysed = []
+        
+        async def fake_analyze(file_record, analysis_type):
+            analysed.append(file_record.file_hash)
+            return {"analysis": file_record.file_hash, "analysis_type": analysis_type}
+        
+        monkeypatch.setattr(file_service, "_analyze_image_content", fake_analyze)
+        
+        progress_events = []
+        
+        async def on_progress(event):
+            progress_events.append(event)
+        
+        results = await file_service.batch_analyze_files(
+            [record.id for record in records],
+            max_concurrency=2,
+            progress_callback=on_progress
+        )
+        
+        assert sorted(analysed) == ["a" * 64, "b" * 64]
+        assert results[records[0].id] == results[records[1].id]
+        assert results[records[2].id]["analysis"] == "b" * 64
+        assert len(progress_events) == 3
+        assert progress_events[-1]["completed"] == 3
+        assert progress_events[-1]["progress"] == 100
+    
     @pytest.mark.asyncio
     async def test_get_file_statistics_empty(self, db_session: AsyncSession):
         """Test file statistics with no files."""
@@ -231,4 +350,39 @@ async def test_file_upload_integration(db_session: AsyncSession, mock_user, samp
     
     # Clean up
     if os.path.exists(uploaded_file.storage_path):
-        os.unlink(uploaded_file.storage_path)
\ No newline at end of file
+        os.unlink(uploaded_file.storage_path)
+
+@pytest.mark.asyncio
+async def test_duplicate_upload_respects_context(
+    db_session: AsyncSession, mock_user, sample_image, sample_pdf, tmp_path, monkeypatch
+):
+    """Test identical content is deduplicated only within the same upload context."""
+    monkeypatch.chdir(tmp_path)
+    file_service = FileService(db_session)
+    db_session.add(mock_user)
+    await db_session.commit()
+    
+    async def upload(content, filename, content_type, **kwargs):
+        return await file_service.upload_file(
+            file=MockUploadFile(filename=filename, content=content, content_type=content_type),
+            user_id=mock_user.id,
+            **kwargs
+        )
+    
+    submission_a, submission_b = uuid4(), uuid4()
+    first = await upload(sample_pdf, "essay.pdf", "application/pdf", submission_id=submission_a)
+    again = await upload(sample_pdf, "essay.pdf", "application/pdf", submission_id=submission_a)
+    other = await upload(sample_pdf, "essay.pdf", "application/pdf", submission_id=submission_b)
+    
+    assert again.id == first.id
+    assert other.id != first.id
+    assert other.submission_id == submission_b
+    
+    # An avatar matching an earlier general image is still processed
+    general = await upload(sample_image, "photo.jpg", "image/jpeg", file_category="image")
+    avatar = await upload(sample_image, "photo.jpg", "image/jpeg", file_category="avatar")
+    
+    assert avatar.id != general.id
+    assert "_processed" in avatar.filename
+    with Image.open(avatar.storage_path) as img:
+        assert img.size == file_service.AVATAR_SIZE
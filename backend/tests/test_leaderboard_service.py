@@ -0,0 +1,159 @@
+"""Tests for Redis-backed class and assignment leaderboards."""
+
+from datetime import datetime
+
+import fakeredis
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.assignment import Assignment, Submission, SubmissionStatus
+from app.models.class_model import Class, ClassStudent
+from app.models.user import User, UserRole
+from app.services import leaderboard_service
+from app.services.class_service import ClassService
+from app.services.leaderboard_service import (
+    LeaderboardService,
+    class_leaderboard_key,
+    update_leaderboards
+)
+
+# Scores per student on (assignment out of 100, assignment out of 10)
+GRADES = {
+    "alice": (90, 9),
+    "bob": (70, 10),
+    "carol": (85, 8),
+    "dave": (40, 5),
+}
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server):
+    return fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+
+
+@pytest.fixture
+async def graded_class(db_session: AsyncSession, redis_client, monkeypatch):
+    """A class with four enrolled students (and one without grades) graded on two assignments."""
+    monkeypatch.setattr(leaderboard_service.redis_manager, "get_redis", lambda: redis_client)
+
+    teacher = User(email="teacher@test.com", password_hash="hashed_password", name="Teacher", role=UserRole.TEACHER)
+    students = {
+        name: User(email=f"{name}@test.com", password_hash="hashed_password", name=name.title(), role=UserRole.STUDENT)
+        for name in [*GRADES, "erin"]
+    }
+    db_session.add_all([teacher, *students.values()])
+    await db_session.flush()
+
+    test_class = Class(name="Test Class", class_code="RANK0001", teacher_id=teacher.id)
+    db_session.add(test_class)
+    await db_session.flush()
+    db_session.add_all(ClassStudent(class_id=test_class.id, student_id=s.id) for s in students.values())
+
+    assignments = [
+        Assignment(title="Quiz 1", total_points=100, class_id=test_class.id, teacher_id=teacher.id),
+        Assignment(title="Quiz 2", total_points=10, class_id=test_class.id, teacher_id=teacher.id),
+    ]
+    db_session.add_all(assignments)
+    await db_session.commit()
+
+    for name, scores in GRADES.items():
+        for assignment, score in zip(assignments, scores):
+            submission = Submission(
+                assignment_id=assignment.id,
+                student_id=students[name].id,
+                score=score,
+                status=SubmissionStatus.GRADED,
+                graded_at=datetime.utcnow()
+            )
+            db_session.add(submission)
+            await db_session.commit()
+            await update_leaderboards(db_session, submission)
+
+    return teacher, test_class, assignments, students
+
+
+async def test_top_rank_and_percentile(db_session: AsyncSession, redis_client, graded_class):
+    """Lookups come from the sorted sets maintained by the grading hook."""
+    _, test_class, assignments, students = graded_class
+    ids = {name: str(student.id) for name, student in students.items()}
+    service = LeaderboardService(db_session, redis_client)
+
+    # Class averages: alice 90, bob 85, carol 82.5, dave 45
+    assert await redis_client.zcard(class_leaderboard_key(test_class.id)) == 4
+    top = await service.get_top(test_class.id, limit=2)
+    assert [(e["rank"], e["student_id"], e["score"], e["graded_count"]) for e in top] == [
+        (1, ids["alice"], 90.0, 2), (2, ids["bob"], 85.0, 2)
+    ]
+
+    carol = await service.get_student_rank(test_class.id, students["carol"].id)
+    assert carol == {
+        "student_id": ids["carol"], "rank": 3, "score": 82.5, "total_students": 4, "percentile": 25.0
+    }
+    assert await service.get_percentile(test_class.id, students["alice"].id) == 75.0
+    assert await service.get_student_rank(test_class.id, students["erin"].id) is None
+
+    # Assignment leaderboard: bob's 10/10 beats alice's 9/10
+    quiz2 = await service.get_top(test_class.id, limit=1, assignment_id=assignments[1].id)
+    assert quiz2[0]["student_id"] == ids["bob"]
+    assert quiz2[0]["score"] == 100.0
+
+
+async def test_regrade_updates_scores(db_session: AsyncSession, redis_client, graded_class):
+    """Re-grading overwrites the student's score instead of adding a new entry."""
+    _, test_class, assignments, students = graded_class
+    service = LeaderboardService(db_session, redis_client)
+
+    submission = Submission(
+        assignment_id=assignments[0].id,
+        student_id=students["dave"].id,
+        score=100,
+        status=SubmissionStatus.GRADED,
+        graded_at=datetime.utcnow()
+    )
+    db_session.add(submission)
+    await db_session.commit()
+    await service.record_grade(submission)
+
+    # dave: (40 + 50 + 100) / 3
+    dave = await service.get_student_rank(test_class.id, students["dave"].id)
+    assert dave["score"] == pytest.approx(63.33, abs=0.01)
+    assert dave["total_students"] == 4
+    assert (await service.get_top(test_class.id, limit=None))[-1]["graded_count"] == 3
+
+
+async def test_redis_down_falls_back_to_sql(db_session: AsyncSession, redis_client, redis_server, graded_class):
+    """Lookups return the same results from SQL when Redis is unreachable or empty."""
+    _, test_class, assignments, students = graded_class
+    service = LeaderboardService(db_session, redis_client)
+    expected_top = await service.get_top(test_class.id, limit=None)
+    expected_rank = await service.get_student_rank(test_class.id, students["bob"].id, assignments[0].id)
+
+    redis_server.connected = False
+    assert await service.get_top(test_class.id, limit=None) == expected_top
+    assert await service.get_student_rank(test_class.id, students["bob"].id, assignments[0].id) == expected_rank
+
+    # Cold cache: sets are rebuilt from the database on first lookup
+    redis_server.connected = True
+    await redis_client.flushall()
+    assert await service.get_top(test_class.id, limit=None) == expected_top
+    assert await redis_client.zcard(class_leaderboard_key(test_class.id)) == 4
+
+
+async def test_class_ranking_uses_leaderboard(db_session: AsyncSession, graded_class):
+    """ClassService ranks graded students first and numbers the others after them."""
+    teacher, test_class, _, students = graded_class
+    class_service = ClassService(db_session)
+
+    ranking = await class_service.get_class_ranking(test_class.id, teacher.id)
+    assert [r["student_name"] for r in ranking] == ["Alice", "Bob", "Carol", "Dave", "Erin"]
+    assert [r["rank"] for r in ranking] == [1, 2, 3, 4, 5]
+    assert ranking[0]["completion_rate"] == 1.0
+    assert ranking[-1]["average_score"] is None
+
+    own = await class_service.get_student_ranking(test_class.id, students["dave"].id, students["dave"].id)
+    assert own["rank"] == 4
@@ -0,0 +1,112 @@
+"""Tests and benchmark for pooled, parallel PDF report generation."""
+
+import logging
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+from app.core import pdf_generator
+from app.core.pdf_generator import GradingPDFGenerator, PdfBundleWriter, get_pdf_generator
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_REPORTS = 200
+
+
+def _grading_results(count: int) -> list:
+    """Synthetic grading results, one per student."""
+    return [
+        {
+            "content": "\n".join(
+                [
+                    f"### 题目{q}\n**满分**: 5分\n**得分**: {(i + q) % 6}分\n**批改详情**:\n"
+                    f"- 建立方程 ✓ [2分]\n- 计算过程 *student {i}* ✗ [0分] → 答案应为{i + q}"
+                    for q in range(1, 4)
+                ]
+                + ["### 批改总结\n整体表现良好 & 需要加强计算 <练习>"]
+            ),
+            "student_info": {"name": f"学生{i}", "student_id": f"2024{i:04d}", "class": "高一(1)班"},
+            "statistics": {"total_score": i % 15, "total_full_marks": 15,
+                           "percentage": (i % 15) / 15 * 100, "questions_graded": 3},
+        }
+        for i in range(count)
+    ]
+
+
+def test_fonts_and_styles_set_up_once(tmp_path):
+    """Generators for the same font directory share font registration and styles."""
+    with patch.dict(pdf_generator._font_setup_done, clear=True), \
+            patch.object(GradingPDFGenerator, "_register_fonts") as register_fonts:
+        first = GradingPDFGenerator(str(tmp_path))
+        second = GradingPDFGenerator(str(tmp_path))
+
+    assert register_fonts.call_count == 1
+    assert first.normal_style is second.normal_style
+    assert get_pdf_generator(str(tmp_path)) is get_pdf_generator(str(tmp_path))
+
+
+def test_parallel_batch_matches_sequential(tmp_path):
+    """Parallel rendering produces the same bytes as rendering one report after another."""
+    results = _grading_results(BENCHMARK_REPORTS)
+    generator = GradingPDFGenerator(str(tmp_path / "fonts"), invariant=True)
+    generated_at = datetime(2024, 9, 1, 8, 30)
+
+    start = time.perf_counter()
+    sequential = generator.generate_batch_report(
+        results, str(tmp_path / "sequential"), max_workers=1, generated_at=generated_at
+    )
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = generator.generate_batch_report(
+        results, str(tmp_path / "parallel"), max_workers=4,
+        bundle_path=str(tmp_path / "bundle.pdf"), generated_at=generated_at
+    )
+    parallel_time = time.perf_counter() - start
+
+    logger.info(f"{BENCHMARK_REPORTS} reports: sequential {sequential_time:.2f}s, "
+                f"parallel (4 workers) {parallel_time:.2f}s")
+
+    assert len(sequential) == len(parallel) == BENCHMARK_REPORTS
+    assert [Path(p).name for p in parallel] == [Path(p).name for p in sequential]
+    for sequential_path, parallel_path in zip(sequential, parallel):
+        assert Path(sequential_path).read_bytes() == Path(parallel_path).read_bytes()
+
+    from PyPDF2 import PdfReader
+    report_pages = sum(len(PdfReader(path).pages) for path in parallel)
+    assert len(PdfReader(str(tmp_path / "bundle.pdf")).pages) == report_pages
+    assert not (tmp_path / "bundle.pdf.part").exists()
+
+
+def test_bundle_memory_stays_flat(tmp_path):
+    """Reports are written to the bundle as they are appended, not held in memory."""
+    from PyPDF2 import PdfReader
+
+    generator = GradingPDFGenerator(str(tmp_path / "fonts"), invariant=True)
+    [report] = generator.generate_batch_report(_grading_results(1), str(tmp_path / "reports"), max_workers=1)
+
+    def merge_peak(count: int) -> int:
+        tracemalloc.start()
+        with open(tmp_path / f"bundle_{count}.pdf", "wb") as f:
+            writer = PdfBundleWriter(f)
+            for _ in range(count):
+                writer.append(report)
+            writer.close()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    merge_peak(1)  # warm up lazy imports
+    small_peak, large_peak = merge_peak(50), merge_peak(200)
+
+    # PyPDF2's PdfWriter holds every page until it writes, which is about 4x here
+    assert large_peak < small_peak * 2, f"peak {small_peak} B for 50 reports, {large_peak} B for 200"
+    bundle = PdfReader(str(tmp_path / "bundle_200.pdf"), strict=True)
+    assert len(bundle.pages) == 200 * len(PdfReader(report).pages)
+    assert bundle.pages[-1].extract_text() == PdfReader(report).pages[-1].extract_text()
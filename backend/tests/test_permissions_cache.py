@@ -0,0 +1,218 @@
+"""Tests for request-scoped and shared caching of permission decisions."""
+
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+
+from app.core.permissions import (
+    Permission,
+    PermissionDecisionCache,
+    PermissionManager,
+    ResourceType,
+    permission_cache,
+)
+from app.models.assignment import Assignment
+from app.models.class_model import Class, ClassStudent
+from app.models.user import ParentStudentRelation, User, UserRole
+from app.services.assignment_service import AssignmentService
+from app.services.class_service import ClassService
+from app.services.user_service import UserService
+
+
+class StatementCounter:
+    """Counts SQL statements sent to the database."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+@pytest.fixture(autouse=True)
+def clear_permission_cache():
+    permission_cache.clear()
+    yield
+    permission_cache.clear()
+
+
+@pytest.fixture
+async def school(db_session_factory):
+    """A teacher with one class, one enrolled student and one assignment."""
+    teacher = User(id=uuid4(), email="teacher@test.com", password_hash="x", name="Teacher", role=UserRole.TEACHER)
+    other_teacher = User(id=uuid4(), email="other@test.com", password_hash="x", name="Other", role=UserRole.TEACHER)
+    student = User(id=uuid4(), email="student@test.com", password_hash="x", name="Student", role=UserRole.STUDENT)
+    class_obj = Class(id=uuid4(), name="高一(1)班", class_code="ABCD1234", teacher_id=teacher.id)
+    assignment = Assignment(id=uuid4(), title="Homework", class_id=class_obj.id, teacher_id=teacher.id)
+
+    async with db_session_factory() as session:
+        session.add_all([teacher, other_teacher, student, class_obj, assignment])
+        session.add(ClassStudent(class_id=class_obj.id, student_id=student.id, is_active=True))
+        await session.commit()
+
+    return {"teacher": teacher, "other_teacher": other_teacher, "student": student,
+            "class": class_obj, "assignment": assignment}
+
+
+async def test_repeated_checks_in_one_request_hit_db_once(db_engine, db_session_factory, school):
+    counter = StatementCounter(db_engine)
+    student, class_id = school["student"], school["class"].id
+
+    async with db_session_factory() as db:
+        # Several dependencies of one endpoint, each with its own manager
+        results = [
+            await PermissionManager(db).can_access_resource(student, ResourceType.CLASS, class_id, Permission.CLASS_READ)
+            for _ in range(5)
+        ]
+        assert results == [True] * 5
+        assert counter.count == 1
+
+        assert await PermissionManager(db).can_access_resource(
+            student, ResourceType.ASSIGNMENT, school["assignment"].id, Permission.ASSIGNMENT_READ
+        )
+        first_assignment_check = counter.count
+        assert await PermissionManager(db).can_access_resource(
+            student, ResourceType.ASSIGNMENT, school["assignment"].id, Permission.ASSIGNMENT_READ
+        )
+        assert counter.count == first_assignment_check
+
+
+async def test_shared_cache_serves_later_requests(db_engine, db_session_factory, school):
+    counter = StatementCounter(db_engine)
+    teacher, class_id = school["teacher"], school["class"].id
+
+    async with db_session_factory() as db:
+        assert await PermissionManager(db).can_access_resource(teacher, ResourceType.CLASS, class_id, Permission.CLASS_WRITE)
+    assert counter.count == 1
+
+    async with db_session_factory() as db:
+        assert await PermissionManager(db).can_access_resource(teacher, ResourceType.CLASS, class_id, Permission.CLASS_WRITE)
+    assert counter.count == 1
+
+
+async def test_membership_change_invalidates(db_session_factory, school):
+    student, teacher, class_id = school["student"], school["teacher"], school["class"].id
+
+    async with db_session_factory() as db:
+        manager = PermissionManager(db)
+        assert await manager.can_access_resource(student, ResourceType.CLASS, class_id, Permission.CLASS_READ)
+
+        await ClassService(db).remove_student_from_class(class_id, student.id, teacher.id)
+
+        assert not await manager.can_access_resource(student, ResourceType.CLASS, class_id, Permission.CLASS_READ)
+
+    async with db_session_factory() as db:
+        assert not await PermissionManager(db).can_access_resource(
+            student, ResourceType.CLASS, class_id, Permission.CLASS_READ
+        )
+        await ClassService(db).add_student_to_class(class_id, student.id, teacher.id)
+
+    async with db_session_factory() as db:
+        assert await PermissionManager(db).can_access_resource(
+            student, ResourceType.CLASS, class_id, Permission.CLASS_READ
+        )
+
+
+async def test_membership_change_invalidates_related_decisions(db_session_factory, school):
+    student, teacher, class_id = school["student"], school["teacher"], school["class"].id
+    parent = User(id=uuid4(), email="parent@test.com", password_hash="x", name="Parent", role=UserRole.PARENT)
+    async with db_session_factory() as db:
+        db.add(parent)
+        db.add(ParentStudentRelation(parent_id=parent.id, student_id=student.id))
+        await db.commit()
+
+    # Decisions whose outcome depends on the student's membership
+    file_id, task_id = uuid4(), uuid4()
+    keys = [
+        PermissionDecisionCache.make_key(parent, ResourceType.ASSIGNMENT, school["assignment"].id, Permission.ASSIGNMENT_READ),
+        PermissionDecisionCache.make_key(parent, ResourceType.FILE, file_id, Permission.FILE_READ),
+        PermissionDecisionCache.make_key(parent, ResourceType.GRADING_TASK, task_id, Permission.GRADING_TASK_READ),
+        PermissionDecisionCache.make_key(teacher, ResourceType.FILE, file_id, Permission.FILE_READ),
+        PermissionDecisionCache.make_key(teacher, ResourceType.GRADING_TASK, task_id, Permission.GRADING_TASK_READ),
+    ]
+    unrelated = PermissionDecisionCache.make_key(
+        school["other_teacher"], ResourceType.FILE, uuid4(), Permission.FILE_READ
+    )
+    for key in keys + [unrelated]:
+        permission_cache.set(key, True)
+
+    async with db_session_factory() as db:
+        await ClassService(db).remove_student_from_class(class_id, student.id, teacher.id)
+
+    assert [permission_cache.get(key) for key in keys] == [None] * len(keys)
+    assert permission_cache.get(unrelated) is True
+
+
+async def test_class_deletion_invalidates_assignment_decisions(db_session_factory, school):
+    student, teacher, assignment_id = school["student"], school["teacher"], school["assignment"].id
+
+    async with db_session_factory() as db:
+        assert await PermissionManager(db).can_access_resource(
+            student, ResourceType.ASSIGNMENT, assignment_id, Permission.ASSIGNMENT_READ
+        )
+
+    async with db_session_factory() as db:
+        await ClassService(db).delete_class(school["class"].id, teacher.id)
+
+    key = PermissionDecisionCache.make_key(student, ResourceType.ASSIGNMENT, assignment_id, Permission.ASSIGNMENT_READ)
+    assert permission_cache.get(key) is None
+
+
+async def test_assignment_ownership_change_invalidates(db_session_factory, school):
+    teacher, other_teacher, assignment_id = school["teacher"], school["other_teacher"], school["assignment"].id
+
+    async with db_session_factory() as db:
+        manager = PermissionManager(db)
+        assert await manager.can_access_resource(teacher, ResourceType.ASSIGNMENT, assignment_id, Permission.ASSIGNMENT_WRITE)
+        assert not await manager.can_access_resource(
+            other_teacher, ResourceType.ASSIGNMENT, assignment_id, Permission.ASSIGNMENT_WRITE
+        )
+
+    async with db_session_factory() as db:
+        await AssignmentService(db).transfer_assignment(assignment_id, teacher.id, other_teacher.id)
+
+    async with db_session_factory() as db:
+        manager = PermissionManager(db)
+        assert not await manager.can_access_resource(
+            teacher, ResourceType.ASSIGNMENT, assignment_id, Permission.ASSIGNMENT_WRITE
+        )
+        assert await manager.can_access_resource(
+            other_teacher, ResourceType.ASSIGNMENT, assignment_id, Permission.ASSIGNMENT_WRITE
+        )
+
+
+async def test_role_change_invalidates(db_engine, db_session_factory, school):
+    student, class_id = school["student"], school["class"].id
+
+    async with db_session_factory() as db:
+        assert await PermissionManager(db).can_access_resource(student, ResourceType.CLASS, class_id, Permission.CLASS_READ)
+        assert len(permission_cache) == 1
+
+        updated = await UserService(db).change_user_role(student.id, UserRole.PARENT)
+
+    assert len(permission_cache) == 0
+    counter = StatementCounter(db_engine)
+    async with db_session_factory() as db:
+        assert not await PermissionManager(db).can_access_resource(
+            updated, ResourceType.CLASS, class_id, Permission.CLASS_READ
+        )
+    assert counter.count == 1
+
+
+def test_shared_cache_expires_and_bounds_size():
+    now = [0.0]
+    cache = PermissionDecisionCache(ttl_seconds=30, max_entries=3, clock=lambda: now[0])
+    users = [User(id=uuid4(), role=UserRole.STUDENT) for _ in range(4)]
+    keys = [PermissionDecisionCache.make_key(u, ResourceType.CLASS, uuid4(), Permission.CLASS_READ) for u in users]
+
+    for key in keys:
+        cache.set(key, True)
+    assert len(cache) == 3
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[3]) is True
+
+    now[0] += 31
+    assert cache.get(keys[3]) is None
+    assert len(cache) == 2
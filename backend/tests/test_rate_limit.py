@@ -0,0 +1,78 @@
+"""Tests and micro-benchmark for the in-memory token-bucket rate limiter."""
+
+import time
+
+from app.core.rate_limit import InMemoryRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_limit_and_refill():
+    clock = FakeClock()
+    limiter = InMemoryRateLimiter(limit=60, window_seconds=60, clock=clock)
+
+    assert all(limiter.hit("10.0.0.1")[0] for _ in range(60))
+    allowed, retry_after = limiter.hit("10.0.0.1")
+    assert not allowed
+    assert retry_after == 1.0
+
+    # Other clients are unaffected
+    assert limiter.hit("10.0.0.2")[0]
+
+    # One token per second comes back
+    clock.now += 1
+    assert limiter.hit("10.0.0.1")[0]
+    assert not limiter.hit("10.0.0.1")[0]
+
+
+def test_idle_buckets_evicted_lazily():
+    clock = FakeClock()
+    limiter = InMemoryRateLimiter(limit=10, window_seconds=60, clock=clock)
+
+    for i in range(1000):
+        limiter.hit(f"10.0.{i // 256}.{i % 256}")
+    assert len(limiter) == 1000
+
+    # After a full window every old bucket is back at capacity, so new traffic evicts them
+    clock.now += 60
+    for i in range(600):
+        limiter.hit(f"192.168.{i // 256}.{i % 256}")
+    assert len(limiter) == 600
+
+
+def test_max_keys_bounds_memory():
+    limiter = InMemoryRateLimiter(limit=10, window_seconds=60, max_keys=500, clock=FakeClock())
+    for i in range(5000):
+        limiter.hit(f"client-{i}")
+    assert len(limiter) == 500
+
+
+def test_per_request_cost_constant_with_100k_clients():
+    """Latency for the last 10k of 100k distinct clients matches the first 10k."""
+    limiter = InMemoryRateLimiter(limit=60, window_seconds=60)
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(100_000)]
+
+    def timed(keys) -> float:
+        start = time.perf_counter()
+        for key in keys:
+            limiter.hit(key)
+        return (time.perf_counter() - start) / len(keys)
+
+    first = timed(ips[:10_000])
+    timed(ips[10_000:90_000])
+    last = timed(ips[90_000:])
+    repeat = timed(ips[:10_000])
+
+    timings = (
+        f"per-request: first 10k {first * 1e6:.2f}us, last 10k {last * 1e6:.2f}us, "
+        f"revisit {repeat * 1e6:.2f}us"
+    )
+    assert len(limiter) == 100_000
+    assert last < first * 3, timings
+    assert repeat < first * 3, timings
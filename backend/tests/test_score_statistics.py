@@ -0,0 +1,187 @@
+"""Tests for the vectorized score statistics engine.
+
+Results are checked against the per-request Python-loop computations that
+GradingResultAnalyzer used before (reproduced below as reference functions).
+"""
+
+import random
+import statistics
+from uuid import uuid4
+
+import numpy as np
+import pytest
+from sqlalchemy import event, func, insert, select
+
+from app.models.assignment import Assignment, Submission, SubmissionStatus
+from app.models.class_model import Class
+from app.models.user import User, UserRole
+from app.services.score_statistics import (
+    ScoreDistribution,
+    ScoreStatisticsEngine,
+    robust_z_scores,
+)
+
+
+def legacy_percentile(all_scores, score):
+    """Percentile rank as computed by the original loop."""
+    if len(all_scores) < 2:
+        return None
+    scores_below = sum(1 for s in all_scores if s < score)
+    return int((scores_below / len(all_scores)) * 100)
+
+
+def reference_robust_z(scores):
+    """Scalar modified z-scores, one score at a time."""
+    median = statistics.median(scores)
+    deviations = [abs(s - median) for s in scores]
+    mad = statistics.median(deviations)
+    if mad > 0:
+        return [0.6745 * d / mad for d in deviations]
+    mean_ad = statistics.mean(deviations)
+    if mean_ad > 0:
+        return [d / (1.253314 * mean_ad) for d in deviations]
+    return [0.0] * len(scores)
+
+
+def _random_scores(rng: random.Random, count: int) -> list:
+    kind = rng.choice(["int", "float", "ties"])
+    if kind == "int":
+        return [rng.randint(0, 100) for _ in range(count)]
+    if kind == "ties":
+        return [rng.choice([60, 75, 75, 90, 100]) for _ in range(count)]
+    return [round(rng.uniform(0, 100), 1) for _ in range(count)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_percentile_matches_legacy_loop(seed):
+    rng = random.Random(seed)
+    scores = _random_scores(rng, rng.randint(0, 300))
+    distribution = ScoreDistribution({uuid4(): s for s in scores})
+
+    probes = scores[:20] + [rng.uniform(-10, 110) for _ in range(20)]
+    for probe in probes:
+        assert distribution.percentile_rank(probe) == legacy_percentile(scores, probe)
+    if scores:
+        assert distribution.mean == pytest.approx(statistics.mean(scores))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_updates_match_full_sort(seed):
+    rng = random.Random(seed)
+    submissions = {uuid4(): s for s in _random_scores(rng, 100)}
+    distribution = ScoreDistribution(submissions)
+
+    for _ in range(200):
+        action = rng.random()
+        if action < 0.5 or not submissions:
+            submission_id = uuid4()
+        else:
+            submission_id = rng.choice(list(submissions))
+        if action > 0.9 and submission_id in submissions:
+            distribution.remove(submission_id)
+            del submissions[submission_id]
+        else:
+            score = float(rng.randint(0, 100))
+            distribution.record(submission_id, score)
+            submissions[submission_id] = score
+
+    expected = sorted(submissions.values())
+    assert distribution.scores.tolist() == expected
+    assert distribution.mean == pytest.approx(statistics.mean(expected))
+    for probe in range(0, 101, 5):
+        assert distribution.percentile_rank(probe) == legacy_percentile(expected, probe)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_robust_z_scores_match_scalar_reference(seed):
+    rng = random.Random(seed)
+    scores = _random_scores(rng, rng.randint(1, 500))
+
+    np.testing.assert_allclose(robust_z_scores(np.array(scores)), reference_robust_z(scores), rtol=1e-12)
+
+
+def test_robust_detection_resists_masking():
+    """A cluster of extreme scores inflates the standard deviation but not the MAD."""
+    rng = random.Random(7)
+    scores = [rng.gauss(75, 5) for _ in range(100)] + [0.0] * 15
+
+    mean, std_dev = statistics.mean(scores), statistics.stdev(scores)
+    legacy_flagged = {i for i, s in enumerate(scores) if abs(s - mean) / std_dev > 3.0}
+    robust_flagged = set(np.flatnonzero(robust_z_scores(np.array(scores)) > 3.0).tolist())
+
+    assert set(range(100, 115)) <= robust_flagged
+    assert not set(range(100, 115)) <= legacy_flagged
+
+
+async def _create_assignment(db, scores) -> Assignment:
+    teacher = User(id=uuid4(), email=f"t-{uuid4().hex}@test.com", password_hash="x", name="T", role=UserRole.TEACHER)
+    class_obj = Class(id=uuid4(), name="Class", class_code=uuid4().hex[:8], teacher_id=teacher.id)
+    assignment = Assignment(id=uuid4(), title="Quiz", class_id=class_obj.id, teacher_id=teacher.id)
+    db.add_all([teacher, class_obj, assignment])
+    await db.flush()
+
+    student_ids = [uuid4() for _ in scores]
+    await db.execute(insert(User), [
+        {"id": sid, "email": f"s-{sid.hex}@test.com", "password_hash": "x", "name": "S", "role": UserRole.STUDENT}
+        for sid in student_ids
+    ])
+    await db.execute(insert(Submission), [
+        {"id": uuid4(), "assignment_id": assignment.id, "student_id": sid, "score": score, "max_score": 100,
+         "status": SubmissionStatus.GRADED}
+        for sid, score in zip(student_ids, scores)
+    ])
+    await db.commit()
+    return assignment
+
+
+async def test_engine_matches_sql_and_updates_without_queries(db_session):
+    rng = random.Random(42)
+    scores = [rng.randint(0, 100) for _ in range(250)]
+    assignment = await _create_assignment(db_session, scores)
+    engine = ScoreStatisticsEngine()
+
+    legacy_average = (await db_session.execute(
+        select(func.avg(Submission.score)).where(Submission.assignment_id == assignment.id)
+    )).scalar()
+    assert await engine.mean(db_session, assignment.id) == pytest.approx(legacy_average)
+    for probe in (0, 37, 50, 99, 100):
+        assert await engine.percentile_rank(db_session, assignment.id, probe) == legacy_percentile(scores, probe)
+
+    statements = []
+    event.listen(db_session.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    # A regrade and a new score are applied to the cached array in place
+    submission = (await db_session.execute(
+        select(Submission).where(Submission.assignment_id == assignment.id).limit(1)
+    )).scalar_one()
+    old_score = submission.score
+    submission.score = 100
+    engine.record_submission(submission)
+    engine.record_submission(Submission(id=uuid4(), assignment_id=assignment.id, score=3))
+    statements.clear()
+
+    updated = scores.copy()
+    updated.remove(old_score)
+    updated += [100, 3]
+    for probe in (0, 37, 50, 99, 100):
+        assert await engine.percentile_rank(db_session, assignment.id, probe) == legacy_percentile(updated, probe)
+    assert await engine.mean(db_session, assignment.id) == pytest.approx(statistics.mean(updated))
+    assert statements == []
+
+
+async def test_engine_reloads_after_ttl(db_session):
+    now = [0.0]
+    engine = ScoreStatisticsEngine(ttl_seconds=60, clock=lambda: now[0])
+    assignment = await _create_assignment(db_session, [10, 20, 30])
+
+    assert await engine.percentile_rank(db_session, assignment.id, 25) == 66
+
+    await db_session.execute(insert(Submission), [
+        {"id": uuid4(), "assignment_id": assignment.id, "student_id": uuid4(), "score": 5, "max_score": 100,
+         "status": SubmissionStatus.GRADED}
+    ])
+    await db_session.commit()
+    assert await engine.percentile_rank(db_session, assignment.id, 25) == 66
+
+    now[0] += 61
+    assert await engine.percentile_rank(db_session, assignment.id, 25) == 75